@@ -1,11 +1,71 @@
 from customTypes import *
+from opcodes import Opcodes
+from memoryBus import MemoryBus
+from cartridge import Cartridge
+import alu
+from blockCompiler import BlockCompiler
+from tracing import CSVTrace
+from profiler import Profiler
+from scheduler import Scheduler, NEVER
+from interrupts import Interrupts, RESET_VECTOR
+from idle import IdleSkipper
+from breakpoints import Breakpoints
+from rewind import Rewind, FRAME_CYCLES
+import savestate
+from savestate import Fields
+try:
+    from ppu import PPU, VBLANK_LINE
+    from apu import APU
+except ImportError: # No NumPy, the bus keeps its plain PPU and APU register latches and there's no picture or sound
+    PPU = APU = None
 import math
-import csv
 from pathlib import Path
+import struct
 import sys
 
-class Emulation:
-    def __init__(self, filepath, debug=False):
+# Save state CPU section, the registers then the interrupt lines and the scheduler's count of fired events
+CPU_FIELDS = Fields(("pgmctr", "I"), ("regA", "B"), ("regX", "B"), ("regY", "B"), ("status", "B"), ("stackptr", "h"),
+                    ("cycles", "q"), ("opcode", "B"), ("halt", "?"))
+FIRED = struct.Struct("<Q")
+
+# Why a bounded run (run_cycles, run_instructions, run_frames, run_until) stopped
+CYCLES = "cycles" # Its cycle budget, or run_until's limit, ran out
+INSTRUCTIONS = "instructions"
+FRAMES = "frames"
+ADDRESS = "address" # run_until's address was reached
+PREDICATE = "predicate" # run_until's predicate came true
+BREAKPOINT = "breakpoint" # One of emu.breakpoints, see breakpoints.py
+HALT = "halt" # The program halted (the 0x02 opcode) or something called emu.stop()
+ERROR = "error" # Halted on an error, emu.error says what
+SCANLINE_CYCLES = 114 # How often run_until checks a predicate unless told otherwise, about a scanline
+
+
+class RunResult:
+    def __init__(self, reason, cycles, instructions=None, frames=None, point=None):
+        self.reason = reason
+        self.cycles = cycles # Run, counted from the start of the run
+        self.instructions = instructions # Only counted by run_instructions
+        self.frames = frames # Frames the PPU finished, None without one
+        self.point = point # The breakpoint or watchpoint for BREAKPOINT
+
+    def __repr__(self):
+        return f"<RunResult {self.reason} after {self.cycles} cycles>"
+
+
+def flag_property(bit): # Exposes one bit of the packed status byte as a bool attribute
+    def getflag(self):
+        return self.status & bit != 0
+
+    def setflag(self, value):
+        if value:
+            self.status |= bit
+        else:
+            self.status &= ~bit
+    return property(getflag, setflag)
+
+
+class Emulation(Opcodes):
+    def __init__(self, filepath, debug=False, trace=None, headless=False, audio=None, idle=True, fast=False):
         # initialize path to rom, relevant registers and flags
         self.debug = debug
         self.rompath = filepath
@@ -16,69 +76,374 @@ class Emulation:
         self.opcode = 0
         self.cycles = 0
         self.halt = False
-        # Treating the flags as components of a byte might increase performance when it comes to pushing and pulling flags
-        # I also think it would tank performance in a lot of other places where a simple boolean check is replaced with modulus math
-        # There might be some good compromise, but I don't think there are major gains to be had here?
-        self.flag_Carry = False
-        self.flag_Zero = False
-        self.flag_InterruptDisable = False
-        self.flag_Decimal = False
-        self.flag_Overflow = False
-        self.flag_Negative = False
+        self.error = None # Why we halted, if it wasn't on purpose
+        self.stopReason = None # Set by a bounded run's budget when it stops us, see run_cycles
+        # The flags are kept packed in one byte (NV1BDIZC), pushing/pulling them is then just the byte itself and the
+        # checks are a single & with a FLAG_ constant from customTypes. The old flag_* names still work, see flag_property
+        self.status = FLAG_U | FLAG_I # I comes up set, like after a reset
         self.stackptr = 0xFD
-        self.logger = []
+        self.trace = trace # Default trace sink for run_emu (see tracing.py), None runs untraced
+        self.profiler = None # Set by profile(), see profiler.py
+        self.history = None # Set by record(), see rewind.py
         self.iter = 0
+        self.optable = self.build_optable() # 256 pre-bound handlers, indexed by opcode
 
-        # initialize ram ( I believe this will need to be randomized on startup in the future)
-        self.addSpace = [0xff] * 0x8000
-        # Initialize rom
-        with open(self.rompath, "rb") as data:
-            self.header = (chunk for chunk in data.read(0x10))
-            self.addSpace += (chunk for chunk in data.read())
+        # Initialize rom, ram and the rest of the address space live on the memory bus (see memoryBus.py), the
+        # cartridge maps its prg banks into it through its mapper (see cartridge.py)
+        self.cartridge = Cartridge.from_file(self.rompath)
+        self.header = self.cartridge.header
+        self.bus = MemoryBus()
+        self.cartridge.attach(self.bus)
+        self.addSpace = self.bus # Still indexable/sliceable like the old list, handy for debugging
+        self.compiler = BlockCompiler(self) # Blocks are compiled lazily the first time run_compiled reaches them
+        self.cartridge.mapper.listeners.append(self.bank_switched)
+        self.bus.listeners.append(self.poked)
+        self.scheduler = Scheduler() # Timed events, the run loops stop for them at scheduler.next (see scheduler.py)
+        self.interrupts = Interrupts(self) # NMI, RESET and IRQ lines, see interrupts.py
+        self.cartridge.mapper.interrupts = self.interrupts
+        self.ppu = None
+        if PPU is not None:
+            # Headless keeps PPU timing but draws nothing, fast draws the whole frame at once at vblank
+            self.ppu = PPU(self.cartridge, fast=fast, headless=headless)
+            self.ppu.attach(self)
+        self.apu = None
+        if APU is not None:
+            self.apu = APU(audio) # audio is a wav path or a callable taking int16 sample batches, None makes no sound
+            self.apu.attach(self)
+        self.breakpoints = Breakpoints(self) # Pc breakpoints and memory watchpoints, free while none are set
+        self.idle = IdleSkipper(self) # Fast forwards loops that only wait for the next event, see idle.py
+        if idle:
+            self.idle.attach()
         # Move the Program Counter to correct space (Little Endian), or custom address if debug is active
         if debug:
             self.pgmctr = 0x8000
         else:
-            self.pgmctr = self.addSpace[0xFFFC] + self.addSpace[0xFFFD] * 256
+            self.pgmctr = self.bus.read(0xFFFC) + self.bus.read(0xFFFD) * 256
 
-    def run_emu(self, log): # Primary event loop
-        logger = csv.writer(log)
-        logger.writerow(["Program Counter", "Op", "Reg A", "Reg X", "Reg Y", "Fstring"])
-        self.flag_InterruptDisable = True
-        while not self.halt:
-            self.opcode = self.addSpace[self.pgmctr]
-            logger.writerow([hex(self.pgmctr), hex(self.opcode), hex(self.regA), hex(self.regX), hex(self.regY), self.build_Fstring(), self.addSpace[0:0x0C]])
-            self.pgmctr += 0x1
-            self.op()
-
-    def build_Fstring(self):
-        base = ""
-        if self.flag_Negative:
-            base = base + "N"
-        else:
-            base = base + "n"
-        if self.flag_Overflow:
-            base = base + "V"
-        else:
-            base = base + "v"
-        base = base + "TB"
-        if self.flag_Decimal:
-            base = base + "D"
+    def run_emu(self, log=None, trace=None): # Primary event loop
+        # Passing a log file keeps the old behaviour of a csv row per instruction, otherwise trace (or the sink given to
+        # __init__) picks the sink. With no sink at all we get run_untraced, which doesn't check for one per instruction
+        self.breakpoints.hit = None
+        if trace is None:
+            trace = CSVTrace(log) if log is not None else self.trace
+        if trace is None:
+            self.run_untraced()
         else:
-            base = base + "d"
-        if self.flag_InterruptDisable:
-            base = base + "I"
+            self.run_traced(trace)
+        if self.profiler is not None:
+            self.profiler.finish(self)
+
+    def profile(self, profiler=None): # Count executions and cycles per opcode and per address from here on
+        if self.profiler is not None:
+            self.profiler.detach()
+        self.profiler = (profiler or Profiler()).attach(self)
+        return self.profiler
+
+    def stop_profiling(self): # Restore the plain optable, the returned profiler keeps its counts
+        profiler, self.profiler = self.profiler, None
+        return profiler.detach() if profiler is not None else None
+
+    def record(self, history=None): # Keep rewind snapshots from here on, history.seek / back go back to them
+        if self.history is not None:
+            self.history.detach()
+        self.history = (history if history is not None else Rewind()).attach(self) # An empty history is falsy
+        return self.history
+
+    def stop_recording(self): # No more snapshots, the returned history can still seek to the ones it has
+        history, self.history = self.history, None
+        return history.detach() if history is not None else None
+
+    def stop(self): # Halt, the run loops only look at halt between events so the scheduler is told too
+        self.halt = True
+        self.scheduler.stop()
+
+    # The run loops run instructions freely up to the next scheduled event, fire whatever is due, take any pending
+    # interrupt and carry on. The deadline is read from the scheduler every instruction so an event scheduled by a
+    # register write isn't missed, raising an interrupt line pulls it down the same way
+    def run_untraced(self):
+        optable = self.optable; read = self.bus.read; scheduler = self.scheduler; interrupts = self.interrupts
+        fresh = self.error is None
+        try:
+            while not self.halt:
+                while self.cycles < scheduler.next:
+                    self.opcode = read(self.pgmctr)
+                    self.pgmctr += 1
+                    optable[self.opcode]()
+                scheduler.run_due(self.cycles)
+                if interrupts.pending and not self.halt:
+                    interrupts.service()
+        except Exception as error:
+            self.faulted(error)
+            raise
+        if fresh and self.error is not None:
+            self.faulted(self.error)
+
+    def run_traced(self, trace):
+        trace.begin(self)
+        optable = self.optable; read = self.bus.read; record = trace.record
+        scheduler = self.scheduler; interrupts = self.interrupts
+        fresh = self.error is None
+        try:
+            while not self.halt:
+                while self.cycles < scheduler.next:
+                    self.opcode = read(self.pgmctr)
+                    record(self)
+                    self.pgmctr += 1
+                    optable[self.opcode]()
+                scheduler.run_due(self.cycles)
+                if interrupts.pending and not self.halt:
+                    interrupts.service()
+        except Exception as error:
+            trace.fault(self, error)
+            raise
         else:
-            base = base + "i"
-        if self.flag_Zero:
-            base = base + "Z"
+            if fresh and self.error is not None:
+                trace.fault(self, self.error)
+        finally:
+            trace.end(self)
+
+    def faulted(self, error): # A run without a sink of its own died, a RingTrace given to __init__ dumps what it holds
+        # Compiled blocks and run_instructions don't record, the ring has the last instructions a traced run saw
+        if self.trace is not None:
+            self.trace.fault(self, error)
+
+    def run_compiled(self, limit=float("inf"), exact=False): # Run with code compiled into blocks, no logging
+        # Blocks (see blockCompiler.py) run until they leave, loop back to their start past limit cycles, or hand off to
+        # the interpreter for one instruction. Stops on halt like run_emu, or once limit cycles have gone by
+        # A block can run a few instructions past a deadline, events just fire a little late. With exact (the bounded
+        # runs) limit and budget events stop on the instruction boundary the interpreter would: a block only runs if its
+        # last instruction starts before the deadline however slow its pass is, and a looping block is given a limit
+        # that leaves room for a whole pass. Closer than that, instructions are interpreted one at a time
+        blocks = self.compiler.cache
+        getblock = self.compiler.get
+        interpret = self.compiler.interpret
+        scheduler = self.scheduler; interrupts = self.interrupts
+        self.idle.limit = limit
+        self.breakpoints.hit = None
+        fresh = self.error is None
+        try:
+            while not self.halt and self.cycles < limit:
+                deadline = scheduler.next if scheduler.next < limit else limit # Looping blocks hand back control here
+                worst = None
+                if exact and (deadline == limit or scheduler.due(deadline, "budget")):
+                    worst = self.compiler.worst
+                while self.cycles < deadline:
+                    block = blocks.get(self.pgmctr)
+                    if block is None:
+                        block = getblock(self.pgmctr)
+                    if worst is None:
+                        block(self, deadline)
+                    else:
+                        late = worst.get(self.pgmctr, 0)
+                        if self.cycles + late < deadline:
+                            block(self, deadline - late)
+                        else:
+                            interpret(self, deadline)
+                    if scheduler.next < deadline: # Scheduled sooner by a register write, or stopped
+                        deadline = scheduler.next
+                scheduler.run_due(self.cycles)
+                if interrupts.pending and not self.halt:
+                    interrupts.service()
+        except Exception as error:
+            self.faulted(error)
+            raise
+        finally:
+            self.idle.limit = NEVER
+        if fresh and self.error is not None:
+            self.faulted(self.error)
+
+    # <editor-fold desc="Bounded runs">
+    # Entry points for harnesses that drive the emulator in batches. Every budget is an event on the scheduler, so the
+    # run loops' own deadline check covers it and nothing is added to their inner loops, run_instructions is the one
+    # with a loop of its own. Compiled runs stop on budgets exactly (run_compiled's exact), on the same instruction as
+    # an interpreted run would. Each carries on from where the last run stopped (clearing halt unless there was an
+    # error) and returns a RunResult saying why it stopped. A breakpoint stops them like it stops run_emu
+    def run_cycles(self, count, compiled=True): # Until count more cycles have gone by, finishing the last instruction
+        self.budget(self.cycles + count, CYCLES)
+        return self.run_batches(compiled)
+
+    def run_frames(self, count, compiled=True): # To the start of vblank count frames on, FRAME_CYCLES each without a PPU
+        if self.ppu is None:
+            self.budget(self.cycles + count * FRAME_CYCLES, FRAMES)
+            return self.run_batches(compiled)
+        ppu = self.ppu
+        target = ppu.frames + count
+
+        def frame_event(cycle): # After the PPU's own vblank event on the same cycle
+            ppu.catch_up()
+            if ppu.frames >= target:
+                self.spent(FRAMES)
+            else:
+                ppu.schedule_line(VBLANK_LINE, frame_event, "budget")
+        if count > 0:
+            ppu.schedule_line(VBLANK_LINE, frame_event, "budget")
         else:
-            base = base + "z"
-        if self.flag_Carry:
-            base = base + "C"
+            self.budget(self.cycles, FRAMES)
+        return self.run_batches(compiled)
+
+    def run_until(self, target, limit=None, every=SCANLINE_CYCLES, compiled=True):
+        # target is an address, stopped on before its instruction runs like a breakpoint, or predicate(emu), which is
+        # checked every so many cycles (every) at an instruction boundary. limit is a cycle budget on top
+        if limit is not None:
+            self.budget(self.cycles + limit, CYCLES)
+        if callable(target):
+            def check_event(cycle):
+                if target(self):
+                    self.spent(PREDICATE)
+                else:
+                    self.scheduler.schedule(self.cycles + every, check_event, "budget")
+            self.scheduler.schedule(self.cycles, check_event, "budget")
+            return self.run_batches(compiled)
+        point = self.breakpoints.break_at(target)
+        try:
+            return self.run_batches(compiled, point)
+        finally:
+            self.breakpoints.remove(point)
+
+    def run_instructions(self, count): # Interpreted, every instruction is counted so idle loops aren't skipped
+        optable = self.optable; read = self.bus.read; scheduler = self.scheduler; interrupts = self.interrupts
+        start = self.begin_run()
+        left = count
+        self.idle.limit = 0
+        fresh = self.error is None
+        try:
+            while left > 0 and not self.halt:
+                if self.cycles >= scheduler.next:
+                    scheduler.run_due(self.cycles)
+                    if interrupts.pending and not self.halt:
+                        interrupts.service()
+                    continue
+                ran = 0
+                for ran in range(1, left + 1): # The count is the loop, the deadline is the only check
+                    self.opcode = read(self.pgmctr)
+                    self.pgmctr += 1
+                    optable[self.opcode]()
+                    if self.cycles >= scheduler.next:
+                        break
+                left -= ran
+        except Exception as error:
+            self.faulted(error)
+            raise
+        finally:
+            self.idle.limit = NEVER
+        if fresh and self.error is not None:
+            self.faulted(self.error)
+        if self.halt and self.breakpoints.resume == (self.pgmctr, self.cycles): # Stopped before running that one
+            left += 1
+        if left == 0 and not self.halt:
+            self.stopReason = INSTRUCTIONS
+        return self.stopped(start, count - left)
+
+    def budget(self, cycle, reason): # Stop the next bounded run at cycle
+        self.scheduler.schedule(cycle, lambda cycle: self.spent(reason), "budget")
+
+    def spent(self, reason):
+        self.stopReason = reason
+        self.stop()
+
+    def begin_run(self): # Where the run started, for the RunResult
+        if self.error is None:
+            self.halt = False
+        self.stopReason = None
+        self.breakpoints.hit = None
+        return self.cycles, self.ppu.frames if self.ppu is not None else None
+
+    def run_batches(self, compiled, point=None): # Run to the first budget event or halt, point is run_until's address
+        start = self.begin_run()
+        try:
+            if compiled:
+                self.run_compiled(exact=True)
+            elif self.trace is not None: # A ring given to __init__ keeps the last instructions for a crash dump
+                self.run_traced(self.trace)
+            else:
+                self.run_untraced()
+        finally:
+            self.scheduler.drop(("budget",))
+        if self.breakpoints.hit is point is not None:
+            self.breakpoints.hit = None
+            self.stopReason = ADDRESS
+        return self.stopped(start)
+
+    def stopped(self, start, instructions=None):
+        cycles, frames = start
+        point = self.breakpoints.hit
+        if self.error is not None:
+            reason = ERROR
+        elif point is not None:
+            reason = BREAKPOINT
+        elif self.stopReason is not None:
+            reason = self.stopReason
+            self.halt = False # Our own stop, not the program's
         else:
-            base = base + "c"
-        return base
+            reason = HALT
+        return RunResult(reason, self.cycles - cycles, instructions,
+                         self.ppu.frames - frames if self.ppu is not None else None, point)
+    # </editor-fold>
+
+    def interrupt(self, vector, brk=0): # Push pgmctr and the flags and jump through vector, BRK passes FLAG_B
+        self.push(self.pgmctr >> 8); self.push(self.pgmctr & 0xFF)
+        self.push(self.status | FLAG_U | brk)
+        self.status |= FLAG_I
+        self.pgmctr = self.read(vector) + self.read(vector + 1) * 256
+        self.cycles += 7
+
+    def reset(self): # The RESET line, the pushes happen as reads so only the stack pointer moves
+        self.stackptr = (self.stackptr - 3) & 0xFF
+        self.status |= FLAG_I
+        self.pgmctr = self.read(RESET_VECTOR) + self.read(RESET_VECTOR + 1) * 256
+        self.cycles += 7
+
+    # <editor-fold desc="Save states">
+    def save_state(self): # Everything needed to carry on from here, as one versioned blob (see savestate.py)
+        cpu = CPU_FIELDS.pack(self) + FIRED.pack(self.scheduler.fired) + self.interrupts.save_state()
+        sections = [(b"CPU ", cpu), (b"BUS ", self.bus.save_state()), (b"MAPR", self.cartridge.mapper.save_state())]
+        if self.ppu is not None:
+            sections.append((b"PPU ", self.ppu.save_state()))
+        if self.apu is not None:
+            sections.append((b"APU ", self.apu.save_state()))
+        return savestate.pack(self.cartridge.image.digest, sections)
+
+    def load_state(self, blob): # Back to where save_state was called, raises ValueError for a state that doesn't fit
+        sections = savestate.unpack(blob, self.cartridge.image.digest)
+        cpu = savestate.section(sections, b"CPU ")
+        for tag, component in ((b"PPU ", self.ppu), (b"APU ", self.apu)):
+            if (tag in sections) != (component is not None): # Made with or without NumPy, and loaded the other way
+                raise ValueError(f"Save state {tag.decode().strip()} section doesn't match this emulator")
+        self.bus.load_state(savestate.section(sections, b"BUS "))
+        self.cartridge.mapper.load_state(savestate.section(sections, b"MAPR"))
+        offset = CPU_FIELDS.unpack(self, cpu)
+        self.scheduler.fired, = FIRED.unpack_from(cpu, offset)
+        self.error = None
+        if self.ppu is not None:
+            self.ppu.load_state(sections[b"PPU "])
+        if self.apu is not None:
+            self.apu.load_state(sections[b"APU "])
+        self.interrupts.load_state(cpu[offset + FIRED.size:]) # Last, so a line that's up stops the run loop again
+        for page in list(self.compiler.watched): # Blocks compiled from ram, the ram under them was just replaced
+            self.compiler.invalidate_page(page)
+        self.idle.flush() # Its loops remember the last trip's registers
+    # </editor-fold>
+
+    def bank_switched(self, kind): # Compiled blocks are keyed by address, the ones in 8K windows that moved are stale
+        if kind == "prg":
+            for slot in self.cartridge.mapper.moved["prg"]:
+                first = 0x8000 + slot * 0x2000
+                self.compiler.flush(first, first + 0x1FFF)
+                self.idle.flush(first, first + 0x1FFF)
+
+    def poked(self, first, last): # Something poked first-last straight into memory, code there may have changed
+        self.compiler.flush(first, last)
+        self.idle.flush(first, last)
+
+    def build_Fstring(self): # All 256 flag strings are built ahead of time in customTypes
+        return FSTRINGS[self.status]
+
+    flag_Carry = flag_property(FLAG_C)
+    flag_Zero = flag_property(FLAG_Z)
+    flag_InterruptDisable = flag_property(FLAG_I)
+    flag_Decimal = flag_property(FLAG_D)
+    flag_Overflow = flag_property(FLAG_V)
+    flag_Negative = flag_property(FLAG_N)
 
     def push(self, value): # Push value to stack, decrease stack pointer
         self.write(0x100 + self.stackptr, value)
@@ -91,23 +456,16 @@ class Emulation:
             self.stackptr += 1
         return self.read(0x100 + self.stackptr)
 
-    def read(self, address=-1, mirror=True): # Read from address, if no address is specified, the address will be taken from the program coutner
+    def read(self, address=-1): # Read from address, if no address is specified, the address will be taken from the program coutner
         if address == -1:
             address = self.pgmctr
-        while 0x1FFF > address >= 0x800 and mirror:
-            address -= 0x800
-        return self.addSpace[address]
+        return self.bus.read(address) # Mirroring is handled by the bus page table
 
-    def write(self, address, data): # Write data to address in memory, no default here
-        if address > 0x800:
-            raise MemoryError(f"Attempted to write to invalid memory address {address} at line {self.pgmctr}")
-        else:
-            self.addSpace[address] = int(data)
+    def write(self, address, data): # Write data to address in memory, no default here. Writes to rom raise MemoryError
+        self.bus.write(address, int(data))
 
-    def set_flags(self, value, negative=True, zero=True): # Set relevant flags based on passed value.
-        # I would like to make this function more comprehensive with the option to opt in and out of certain flags but I'm not sure if that's necessary
-        self.flag_Negative = value > 127 and negative
-        self.flag_Zero = value == 0 and zero
+    def set_flags(self, value): # Set Negative and Zero based on passed value, the ops do this inline with NZ_FLAGS
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[value]
 
     def get_abs(self): # Get Absolute Address
         tlow = self.read()
@@ -133,62 +491,36 @@ class Emulation:
         addr = self.read(self.read())
         return addr + offset, addr + offset > 256
 
+    # The arithmetic is precomputed in alu.py, each of these is a single table load plus merging the flags into status
     def adc(self, a, b): # Add with carry
-        tempval = a + b + self.flag_Carry
-        self.flag_Carry = tempval > 255
-        while tempval > 255:
-            tempval -= 256
-        self.regA = tempval
-        tempsigned = signed8(a) + signed8(b) + self.flag_Carry
-        self.flag_Overflow = -128 > tempsigned or tempsigned > 127
-        self.set_flags(tempval)
-        return tempval
+        result = alu.ADC[(self.status & FLAG_C) << 16 | a << 8 | b]
+        self.status = self.status & alu.CLEAR_NVZC | result >> 8
+        return result & 0xFF
 
-    def sbc(self, a, b): # Subtract with Carry
-        tempval = a - b - (not self.flag_Carry)
-        self.flag_Carry = tempval > 0
-        while tempval < 0:
-            tempval += 256
-        self.set_flags(tempval)
-        t1 = a > 127
-        t2 = b > 127
-        t3 = tempval > 127
-        # Get the signed flag of each number, set overflow if
-        # A positive - negative = negative or if a negative - positive = positive
-        # Simplified as sign of a != sign of b and sign of b == sign of c
-        self.flag_Overflow = t1 != t2 and t2 == t3
-        return tempval
-        # overflow if bit 7 0,1,1 or 1,0,0
+    def sbc(self, a, b): # Subtract with Carry, same as adding the inverted operand
+        result = alu.ADC[(self.status & FLAG_C) << 16 | a << 8 | b ^ 0xFF]
+        self.status = self.status & alu.CLEAR_NVZC | result >> 8
+        return result & 0xFF
 
     def asl(self, val): # Arithmetic shift left
-        self.flag_Carry = val > 127
-        val = (val % 128)*2
-        self.set_flags(val)
-        return val
+        result = alu.ASL[val]
+        self.status = self.status & alu.CLEAR_NZC | result >> 8
+        return result & 0xFF
 
     def lsr(self, val): # Logical Shift Right
-        self.flag_Carry = val % 2 == 1
-        val -= self.flag_Carry
-        val /= 2
-        self.set_flags(val)
-        return val
+        result = alu.LSR[val]
+        self.status = self.status & alu.CLEAR_NZC | result >> 8
+        return result & 0xFF
 
     def rol(self, val): # Roll Left
-        willcarry = val > 127
-        val = (val % 128)*2 + self.flag_Carry
-        self.set_flags(val)
-        self.flag_Carry = willcarry
-        return val
+        result = alu.ROL[(self.status & FLAG_C) << 8 | val]
+        self.status = self.status & alu.CLEAR_NZC | result >> 8
+        return result & 0xFF
 
     def ror(self, val): # Roll Right
-        willcarry = val % 2 == 1
-        val -= willcarry
-        val /= 2
-        val += (self.flag_Carry*128)
-        self.set_flags(val)
-        self.flag_Carry = willcarry
-        return val
-        # There may be a more efficient way to set the 8th bit then mult by 0 / 1
+        result = alu.ROR[(self.status & FLAG_C) << 8 | val]
+        self.status = self.status & alu.CLEAR_NZC | result >> 8
+        return result & 0xFF
 
     def inc(self, val):
         val += 1
@@ -198,957 +530,18 @@ class Emulation:
         return val
 
     def cmp(self, a, b):
-        self.flag_Zero = a == b
-        self.flag_Negative = (a - b) > 127
-        self.flag_Carry = a >= b
+        self.status = self.status & alu.CLEAR_NZC | alu.CMP[a << 8 | b]
 
-    def bit(self, byte):
-        self.flag_Zero = (byte & self.regA) == 0
-        self.flag_Negative = byte > 127
-        self.flag_Overflow = byte > 63
+    def bit(self, byte): # N and V are copied straight from bits 7 and 6 of the operand
+        self.status = self.status & alu.CLEAR_NVZ | byte & (FLAG_N | FLAG_V) | (FLAG_Z if byte & self.regA == 0 else 0)
 
     def dec(self, a):
         a -= 1
         a += 256 * (a < 0)
         return a
 
-    def op(self):
-        # I'M GONNA RENAME INDIRECT INDEXED ADDRESSING TO EXCLUSIVE ADDRESSING AND INDEXED INDIRECT ADDRESSING TO INCLUSIVE ADDRESSING
-        # Okay so ($04, X) will be called Inclusive indirect and ($04), Y will be called Exclusive please email all of your complaints to gaben@valvesoftware.com
-
-        # At the beginning of each op, the program counter will point to the address immediately following the opcode
-        # For operations with a length of one, a return should be used to skip this automatic increment at the end of the op function
-        # These automatic increments are done in an attempt to shorten the  amount of space each op takes up, I realize this may not be best practice
-        # And if it proves to be too confusing I can revisit this later
-
-        match self.opcode:
-            case 0x00:
-                # <editor-fold desc="Break">
-                self.pgmctr += 1
-                self.push(math.floor(self.pgmctr / 256)); self.push(self.pgmctr % 256)
-                flags = self.flag_Carry
-                flags += self.flag_Zero * 2
-                flags += self.flag_InterruptDisable * 4
-                flags += self.flag_Decimal * 8
-                flags += 0x30
-                flags += self.flag_Overflow * 64
-                flags += self.flag_Negative * 128
-                self.push(flags)
-                tlow = self.read(0xFFFE)
-                thigh = self.read(0xFFFF)
-                self.pgmctr = tlow + thigh * 256
-                self.cycles += 7
-                return
-                # </editor-fold>
-            case 0x01:
-                # <editor-fold desc="OR w/ Accumulator, Indirect X (Inclusive Indirect)">
-                addr = self.get_incl_indr()
-                self.regA |= self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 6
-                # </editor-fold>
-            case 0x02:
-                # <editor-fold desc="Halt">
-                self.halt = True
-                # </editor-fold>
-            case 0x05:
-                # <editor-fold desc="OR w/ Accumulator Zero Page">
-                addr = self.read()
-                self.regA |= self.read(addr)
-                self.set_flags(self.regA); self.cycles += 3
-                # </editor-fold>
-            case 0x06:
-                # <editor-fold desc="Arithmetic Shift Left Zero Page">
-                addr = self.read()
-                self.write(addr, self.asl(self.read(addr)))
-                self.cycles = 5
-                # </editor-fold>
-            case 0x08:
-                # <editor-fold desc="Push Flags">
-                flagbyte = 48
-                if self.flag_Carry:
-                    flagbyte += 1
-                if self.flag_Zero:
-                    flagbyte += 2
-                if self.flag_InterruptDisable:
-                    flagbyte += 4
-                if self.flag_Decimal:
-                    flagbyte += 8
-                if self.flag_Overflow:
-                    flagbyte += 64
-                if self.flag_Negative:
-                    flagbyte += 128
-                self.push(flagbyte); self.cycles += 3; return
-                # </editor-fold>
-            case 0x09:
-                # <editor-fold desc="OR w/ Accumulator Immediate">
-                self.regA |= self.read()
-                self.set_flags(self.regA); self.cycles += 2
-                # </editor-fold>
-            case 0x0D:
-                # <editor-fold desc="OR w/ Accumulator Absolute">
-                self.regA |= self.read(self.get_abs())
-                self.set_flags(self.regA); self.cycles += 4
-                # </editor-fold>
-            case 0x0A:
-                # <editor-fold desc="Arithmetic Shift Left Accumulator">
-                self.regA = self.asl(self.regA)
-                self.cycles = 2; return
-                # </editor-fold>
-            case 0x0E:
-                # <editor-fold desc="Arithmetic Shift Left Absolute">
-                addr = self.get_abs()
-                self.write(addr, self.asl(self.read(addr))); self.cycles += 6
-                # </editor-fold>
-            case 0x10:
-                # <editor-fold desc="Branch on Plus">
-                if not self.flag_Negative:
-                    signedval = signed8(self.read())
-                    temppg = self.pgmctr
-                    self.pgmctr += signedval
-                    if math.floor(temppg / 256) != math.floor(self.pgmctr / 256):
-                        self.cycles += 1  # Branch takes extra cycle if crossing page boundary
-                    self.cycles += 1  # Takes 1 additional cycles if nonzero
-                self.cycles += 2  # Takes 2 cycles no matter what
-                # </editor-fold>
-            # TODO: Refactor Branching to use get_abs_indx()
-            case 0x11:
-                # <editor-fold desc="OR w/ Accumulator Indirect, Y Indexed (Exclusive Indirect)">
-                addr, addcycle = self.get_excl_indr()
-                self.regA |= self.read(addr)
-                self.cycles += addcycle + 5
-                self.set_flags(self.regA)
-                # </editor-fold>
-            case 0x15:
-                # <editor-fold desc="OR w/ Accumulator Zero Page, X Indexed">
-                addr = (self.read() + self.regX) % 256
-                self.regA |= self.read(addr)
-                self.set_flags(self.regA); self.cycles += 4
-                # </editor-fold>
-            case 0x16:
-                # <editor-fold desc="Arithmetic Shift Left Zero Page, X Indexed">
-                addr = (self.read() + self.regX) % 256
-                self.write(addr, self.asl(self.read(addr))); self.cycles += 6
-                # </editor-fold>
-            case 0x18:
-                # <editor-fold desc="Clear Carry">
-                self.flag_Carry = False; self.cycles += 2
-                return
-                # </editor-fold>
-            case 0x19:
-                # <editor-fold desc="OR w/ Accumulator Absolute, Y Index">
-                addr = self.get_abs_indx(self.get_abs(), self.regY)
-                self.regA |= self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 4
-                # </editor-fold>
-            case 0x1D:
-                # <editor-fold desc="OR w/ Accumulator Absolute, X Indexed">
-                addr = self.get_abs_indx(self.get_abs(), self.regX)
-                self.regA |= self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 4
-                # </editor-fold>
-            case 0x1E:
-                # <editor-fold desc="Arithmetic Shift Left Absolute, X Indexed">
-                addr = self.get_abs() + self.regX
-                self.write(addr, self.asl(self.read(addr))); self.cycles += 7
-                # </editor-fold>
-            case 0x20:
-                # <editor-fold desc="Jump to Subroutine">
-                tlow = self.read(); self.pgmctr += 1
-                thigh = self.read()
-                self.push(math.floor(self.pgmctr/256)); self.push(self.pgmctr % 256)
-                self.pgmctr = (tlow+thigh*256); self.cycles += 6
-                return # prevent auto increment to pgmctr since we just set it
-                # </editor-fold>
-            case 0x21:
-                # <editor-fold desc="AND w/ Accumulator Indirect, X Indexed (Inclusive Indirect)">
-                addr = self.get_incl_indr()
-                self.regA &= self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 6
-                # </editor-fold>
-            case 0x24:
-                # <editor-fold desc="test Bit Zero Page">
-                addr = self.read()
-                self.bit(self.read(addr))
-                self.cycles += 3
-                # </editor-fold>
-            case 0x25:
-                # <editor-fold desc="AND w/ Accumulator Zero Page">
-                addr = self.read()
-                self.regA &= self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 3
-                # </editor-fold>
-            case 0x26:
-                # <editor-fold desc="Rotate Left Zero Page">
-                addr = self.read()
-                self.write(addr, self.rol(self.read(addr))); self.cycles += 5
-                # </editor-fold>
-            case 0x28:
-                # <editor-fold desc="Pull Flags">
-                flags = bin(self.pull())[2:]
-                while len(flags) < 8:
-                    flags = "0" + flags
-                self.flag_Carry = flags[7] == "1"
-                self.flag_Zero = flags[6] == "1"
-                self.flag_InterruptDisable = flags[5] == "1"
-                # self.flag_Decimal = flags[4] Not necessary due to NES disabling BCD
-                self.flag_Overflow = flags[1] == "1"
-                self.flag_Negative = flags[0] == "1"
-                self.cycles += 3; return
-                # </editor-fold>
-                # TODO: Probably more efficient to do this as subtraction in a while loop?
-            case 0x29:
-                # <editor-fold desc="AND w/ Accumulator Immediate">
-                self.regA &= self.read()
-                self.set_flags(self.regA)
-                self.cycles += 2
-                # </editor-fold>
-            case 0x2A:
-                # <editor-fold desc="Rotate Left Accumulator">
-                self.regA = self.rol(self.regA)
-                self.cycles += 2; return
-                # </editor-fold>
-            case 0x2C:
-                # <editor-fold desc="test Bit Absolute">
-                addr = self.get_abs()
-                self.bit(self.read(addr))
-                self.cycles += 4
-                # </editor-fold>
-            case 0x2D:
-                # <editor-fold desc="AND w/ Accumulator Absolute">
-                addr = self.get_abs()
-                self.regA &= self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 4
-                # </editor-fold>
-            case 0x2E:
-                # <editor-fold desc="Rotate Left Absolute">
-                addr = self.get_abs()
-                self.write(addr, self.rol(self.read(addr)))
-                self.cycles += 6
-                # </editor-fold>
-            case 0x30:
-                # <editor-fold desc="Branch on Minus">
-                if self.flag_Negative:
-                    signedval = signed8(self.read())
-                    temppg = self.pgmctr
-                    self.pgmctr += signedval
-                    if math.floor(temppg / 256) != math.floor(self.pgmctr / 256):
-                        self.cycles += 1  # Branch takes extra cycle if crossing page boundary
-                    self.cycles += 1  # Takes 1 additional cycles if nonzero
-                self.cycles += 2  # Takes 2 cycles no matter what
-                # </editor-fold>
-            case 0x31:
-                # <editor-fold desc="AND w/ Accumulator Indirect, Y Indexed (Exclusive Indirect)">
-                addr, addcycle = self.get_excl_indr()
-                self.regA &= self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 5 + addcycle
-                # </editor-fold>
-            case 0x35:
-                # <editor-fold desc="AND w/ Accumulator Zero Page, X Indexed">
-                addr = (self.read() + self.regX) % 256
-                self.regA &= self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 4
-                # </editor-fold>
-            case 0x36:
-                # <editor-fold desc="Rotate Left Zero Page, X Indexed">
-                addr = (self.read() + self.regX) % 256
-                self.write(addr, self.rol(self.read(addr))); self.cycles += 6
-                # </editor-fold>
-            case 0x38:
-                # <editor-fold desc="Set Carry">
-                self.flag_Carry = True; self.cycles += 2
-                return
-                # </editor-fold>
-            case 0x39:
-                # <editor-fold desc="AND w/ Accumulator Absolute Y Indexed">
-                addr = self.get_abs_indx(self.get_abs(), self.regY)
-                self.regA &= self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 4
-                # </editor-fold>
-            case 0x3D:
-                # <editor-fold desc="AND w/ Accumulator Absolute X Indexed">
-                addr = self.get_abs_indx(self.get_abs(), self.regX)
-                self.regA &= self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 4
-                # </editor-fold>
-            case 0x3E:
-                # <editor-fold desc="Rotate Left Absolute, X Indexed">
-                addr = self.get_abs_indx(self.get_abs(), self.regX) # Add cycle if page boundary crossed
-                self.write(addr, self.rol(self.read(addr)))
-                self.cycles += 7
-                # </editor-fold>
-            case 0x40:
-                # <editor-fold desc="Return from Interrupt">
-                flags = self.pull()
-                tlow = self.pull(); thigh = self.pull()
-                self.pgmctr = tlow + thigh * 256
-                self.flag_Negative = flags > 127
-                flags -= self.flag_Negative * 128
-                self.flag_Overflow = flags > 63
-                flags -= self.flag_Overflow * 64 - 0x30
-                self.flag_Decimal = flags > 7
-                flags -= self.flag_Decimal * 8
-                self.flag_InterruptDisable = flags > 3
-                flags -= self.flag_InterruptDisable
-                self.flag_Zero = flags > 1
-                self.flag_Carry = flags % 2 == 1
-                self.cycles += 7
-                return
-                # </editor-fold>
-            case 0x41:
-                # <editor-fold desc="EOR w/ Accumulator Indirect, X Indexed (Inclusive Indirect)">
-                addr = self.get_incl_indr()
-                self.regA ^= self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 6
-                # </editor-fold>
-            case 0x45:
-                # <editor-fold desc="EOR w/ Accumulator Zero Page">
-                addr = self.read()
-                self.regA ^= self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 3
-                # </editor-fold>
-            case 0x46:
-                # <editor-fold desc="Logical Shift Right Zero Page">
-                addr = self.read()
-                self.write(addr, self.lsr(self.read(addr)))
-                self.cycles += 5
-                # </editor-fold>
-            case 0x48:
-                # <editor-fold desc="Push Accumulator">
-                self.push(self.regA); self.cycles += 3
-                return
-                # </editor-fold>
-            case 0x49:
-                # <editor-fold desc="EOR w/ Accumulator Immediate">
-                self.regA ^= self.read()
-                self.set_flags(self.regA)
-                self.cycles += 2
-                # </editor-fold>
-            case 0x4A:
-                # <editor-fold desc="Logical Shift Right Accumulator">
-                self.regA = self.lsr(self.regA)
-                self.cycles += 2; return
-                # </editor-fold>
-            case 0x4C:
-                # <editor-fold desc="Jump">
-                tlow = self.read(); self.pgmctr += 1
-                thigh = self.read()
-                self.pgmctr = (tlow + thigh * 256); self.cycles += 3
-                return # prevent auto increment to pgmctr since we just set it
-                # </editor-fold>
-            case 0x4D:
-                # <editor-fold desc="EOR w/ Accumulator Absolute">
-                addr = self.get_abs()
-                self.regA ^= self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 4
-                # </editor-fold>
-            case 0x4E:
-                # <editor-fold desc="Logical Shift Right Absolute">
-                addr = self.get_abs()
-                self.write(addr, self.rol(self.read(addr)))
-                self.cycles += 6
-                # </editor-fold>
-            case 0x50:
-                # <editor-fold desc="Branch on Not Overflow">
-                if not self.flag_Overflow:
-                    signedval = signed8(self.read())
-                    temppg = self.pgmctr
-                    self.pgmctr += signedval
-                    if math.floor(temppg / 256) != math.floor(self.pgmctr / 256):
-                        self.cycles += 1  # Branch takes extra cycle if crossing page boundary
-                    self.cycles += 1  # Takes 1 additional cycles if nonzero
-                self.cycles += 2  # Takes 2 cycles no matter what
-                # </editor-fold>
-            case 0x51:
-                # <editor-fold desc="EOR w/ Accumulator Indirect, Y Indexed (Exclusive Indirect)">
-                addr, addcycle = self.get_excl_indr()
-                self.regA ^= self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 5 + addcycle
-                # </editor-fold>
-            case 0x55:
-                # <editor-fold desc="EOR w/ Accumulator Zero Page, X Indexed">
-                addr = self.read() + self.regX
-                self.regA ^= self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 4
-                # </editor-fold>
-            case 0x56:
-                # <editor-fold desc="Logical Shift Right Zero Page, X Indexed">
-                addr = (self.read() + self.regX) % 256
-                self.write(addr, self.lsr(self.read(addr)))
-                # </editor-fold>
-            case 0x58:
-                # <editor-fold desc="Clear Interrupt-Disable">
-                self.flag_InterruptDisable = False; self.cycles += 2
-                return
-                # </editor-fold>
-            case 0x59:
-                # <editor-fold desc="EOR w/ Accumulator Absolute Y Indexed">
-                addr = self.get_abs_indx(self.get_abs(), self.regY)  # Add cycle if page boundary crossed
-                self.regA ^= self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 4
-                # </editor-fold>
-            case 0x5D:
-                # <editor-fold desc="EOR w/ Accumulator Absolute X Indexed">
-                addr = self.get_abs_indx(self.get_abs(), self.regX)  # Add cycle if page boundary crossed
-                self.regA ^= self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 4
-                # </editor-fold>
-            case 0x5E:
-                # <editor-fold desc="Logical Shift Right Absolute, X Indexed">
-                addr = self.get_abs_indx(self.get_abs(), self.regX)  # Add cycle if page boundary crossed
-                self.write(addr, self.lsr(self.read(addr))); self.cycles += 7
-                # </editor-fold>
-            case 0x60:
-                # <editor-fold desc="Return from Subroutine">
-                tlow = self.pull()
-                self.pgmctr = (tlow+self.pull()*256); self.cycles += 6
-                # </editor-fold>
-            case 0x61:
-                # <editor-fold desc="Add with Carry Indirect, X Indexed (Inclusive Indirect)">
-                addr = self.get_incl_indr()
-                self.regA = self.adc(self.read(addr), self.regA)
-                self.cycles += 6
-                # </editor-fold>
-            case 0x65:
-                # <editor-fold desc="Add to Accumulator Zero Page">
-                addr = self.read()
-                self.regA = self.adc(self.regA, self.read(addr))
-                self.cycles += 3
-                # </editor-fold>
-            case 0x66:
-                # <editor-fold desc="Rotate Right Zero Page">
-                addr = self.read()
-                self.write(addr, self.ror(self.read(addr))); self.cycles += 5
-                # </editor-fold>
-            case 0x68:
-                # <editor-fold desc="Pull Accumulator">
-                self.regA = self.pull(); self.cycles += 4
-                self.set_flags(self.regA)
-                return
-                # </editor-fold>
-            case 0x69:
-                # <editor-fold desc="Add to Accumulator Immediate">
-                self.regA = self.adc(self.regA, self.read())
-                self.cycles += 2
-                # Fun fact, the NES does not use the Decimal flag, ask me how much time I spent implementing BCD from the raw 6502 docs before coming to this realization
-                # </editor-fold>
-            case 0x6A:
-                # <editor-fold desc="Rotate Right Accumulator">
-                self.regA = self.ror(self.regA)
-                self.cycles += 2; return
-                # </editor-fold>
-            case 0x6C:
-                # <editor-fold desc="Jump to Indirect Address">
-                addr = self.get_abs()
-                tlow = self.read(addr)
-                addr += 1
-                if addr % 256 == 0:
-                    addr -= 256
-                thigh = self.read(addr)
-                self.pgmctr = tlow + thigh*256
-                self.cycles += 5
-                return
-                # </editor-fold>
-            case 0x6D:
-                # <editor-fold desc="Add to Accumulator Absolute">
-                addr = self.get_abs()
-                self.regA = self.adc(self.regA, self.read(addr))
-                self.cycles += 4
-                # </editor-fold>
-            case 0x6E:
-                # <editor-fold desc="Rotate Right Absolute">
-                addr = self.get_abs()
-                self.write(addr, self.ror(self.read(addr)))
-                self.cycles += 6
-                # </editor-fold>
-            case 0x70:
-                # <editor-fold desc="Branch on Overflow">
-                if self.flag_Overflow:
-                    signedval = signed8(self.read())
-                    temppg = self.pgmctr
-                    self.pgmctr += signedval
-                    if math.floor(temppg / 256) != math.floor(self.pgmctr / 256):
-                        self.cycles += 1  # Branch takes extra cycle if crossing page boundary
-                    self.cycles += 1  # Takes 1 additional cycles if nonzero
-                self.cycles += 2  # Takes 2 cycles no matter what
-                # </editor-fold>
-            case 0x71:
-                # <editor-fold desc="Add with Carry Indirect, Y Indexed (Exclusive Indirect)">
-                addr, addcycle = self.get_excl_indr()
-                self.regA = self.adc(self.regA, self.read(addr))
-                self.cycles += 5 + addcycle
-                # </editor-fold>
-            case 0x75:
-                # <editor-fold desc="Add to Accumulator Zero Page, X Indexed">
-                addr = (self.read() + self.regX) % 256
-                self.regA = self.adc(self.regA, self.read(addr))
-                self.cycles += 4
-                # </editor-fold>
-            case 0x76:
-                # <editor-fold desc="Rotate Right Zero Page, X Indexed">
-                addr = (self.read() + self.regX) % 256
-                self.write(addr, self.ror(self.read(addr)))
-                self.cycles += 6
-                # </editor-fold>
-            case 0x78:
-                # <editor-fold desc="Set Interrupt-Disable">
-                self.flag_InterruptDisable = True; self.cycles += 2
-                return
-                # </editor-fold>
-            case 0x79:
-                # <editor-fold desc="Add to Accumulator Absolute, Y Indexed">
-                addr = self.get_abs_indx(self.get_abs(), self.regY) # Add cycle if page boundary crossed
-                self.regA = self.adc(self.regA, self.read(addr + self.regY))
-                self.cycles += 4
-                # </editor-fold>
-            case 0x7D:
-                # <editor-fold desc="Add to Accumulator Absolute, X Indexed">
-                addr = self.get_abs_indx(self.get_abs(), self.regX)  # Add cycle if page boundary crossed
-                self.regA = self.adc(self.regA, self.read(addr + self.regX))
-                self.cycles += 4
-                # </editor-fold>
-            case 0x7E:
-                # <editor-fold desc="Rotate Right Absolute, X Indexed">
-                addr = self.get_abs() + self.regX # No Additional cycles when boundary crossed
-                self.write(addr, self.ror(self.read(addr)))
-                self.cycles += 7
-                # </editor-fold>
-            case 0x81:
-                # <editor-fold desc="Store Accumulator Indirect, X Indexed (Inclusive Indirect)">
-                addr = self.get_incl_indr()
-                print(hex(addr), hex(self.regA))
-                self.write(self.read(addr),self.regA)
-                self.cycles += 6
-                # </editor-fold>
-            case 0x84:
-                # <editor-fold desc="STY Zero Page">
-                self.write(self.read(), self.regY); self.cycles += 3
-                # </editor-fold>
-            case 0x85:
-                # <editor-fold desc="STA Zero Page">
-                self.write(self.read(), self.regA)
-                self.cycles += 3
-                # </editor-fold>
-            case 0x86:
-                # <editor-fold desc="STX Zero Page">
-                self.write(self.read(), self.regX); self.cycles += 3
-                # </editor-fold>
-            case 0x88:
-                # <editor-fold desc="Decrement Y">
-                self.regY = self.dec(self.regY)
-                self.cycles += 2
-                self.set_flags(self.regY)
-                # </editor-fold>
-            case 0x8A:
-                # <editor-fold desc="Transfer X > A">
-                self.regA = self.regX; self.cycles += 2
-                self.set_flags(self.regA); return
-                # </editor-fold>
-            case 0x8C:
-                # <editor-fold desc="Store Register Y Absolute">
-                self.write(self.read(self.get_abs()), self.regY); self.cycles += 4
-                # </editor-fold>
-            case 0x8D:
-                # <editor-fold desc="Store Register A Absolute">
-                self.write(self.get_abs(), self.regA)
-                self.cycles += 4
-                # </editor-fold>
-            case 0x8E:
-                # <editor-fold desc="Store Register X Absolute">
-                self.write(self.read(self.get_abs()), self.regX); self.cycles += 4
-                # </editor-fold>
-            case 0x90:
-                # <editor-fold desc="Branch on Not Carry">
-                if not self.flag_Carry:
-                    signedval = signed8(self.read())
-                    temppg = self.pgmctr
-                    self.pgmctr += signedval
-                    if math.floor(temppg / 256) != math.floor(self.pgmctr / 256):
-                        self.cycles += 1  # Branch takes extra cycle if crossing page boundary
-                    self.cycles += 1  # Takes 1 additional cycles if nonzero
-                self.cycles += 2  # Takes 2 cycles no matter what
-                # </editor-fold>
-            case 0x91:
-                # <editor-fold desc="Store Accumulator Indirect, XY Indexed (Exclusive Indirect)">
-                addr, addcycle = self.get_excl_indr()
-                self.write(self.read(addr), self.regA)
-                self.cycles += 6
-                # </editor-fold>
-            case 0x95:
-                # <editor-fold desc="STA Zero Page, X Indexed">
-                addr = (self.read() + self.regX) % 256
-                self.write(addr, self.regA)
-                self.cycles += 4
-                # </editor-fold>
-            case 0x98:
-                # <editor-fold desc="Transfer Y > A">
-                self.regA = self.regY; self.cycles += 2
-                self.set_flags(self.regA); return
-                # </editor-fold>
-            case 0x99:
-                # <editor-fold desc="Store Accumulator Absolute, Y Indexed">
-                addr = self.get_abs_indx(self.get_abs(), self.regX)
-                self.write(self.read(addr), self.regA)
-                self.cycles += 5
-                # </editor-fold>
-            case 0x9A:
-                # <editor-fold desc="Transfer X to Stack Pointer">
-                self.stackptr = self.regX
-                self.set_flags(self.regX)
-                self.cycles += 2
-                return
-                # </editor-fold>
-            case 0x9D:
-                # <editor-fold desc="Store Accumulator Absolute, X Indexed">
-                addr = self.get_abs_indx(self.get_abs(), self.regX)
-                self.write(addr, self.regA)
-                self.cycles += 5
-                # </editor-fold>
-            case 0xA0:
-                # <editor-fold desc="Load Y Immediate">
-                self.regY = self.read(); self.cycles += 2
-                self.set_flags(self.regY)
-                # </editor-fold>
-            case 0xA1:
-                # <editor-fold desc="Load Accumulator Indirect, X Indexed (Inclusive Indirect)">
-                addr = self.get_incl_indr()
-                self.regA = self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 6
-                # </editor-fold>
-            case 0xA2:
-                # <editor-fold desc="Load Immediate X">
-                self.regX = self.read(); self.cycles += 2
-                self.set_flags(self.regX)
-                # </editor-fold>
-            case 0xA5:
-                # <editor-fold desc="Load A Zero Page">
-                self.regA = self.read(); self.cycles += 2
-                self.set_flags(self.regA)
-                # </editor-fold>
-            case 0xA8:
-                # <editor-fold desc="Transfer A > Y">
-                self.regY = self.regA; self.cycles += 2
-                self.set_flags(self.regY); return
-                # </editor-fold>
-            case 0xA9:
-                # <editor-fold desc="Load A Immediate">
-                self.regA = self.read(); self.cycles += 2
-                self.set_flags(self.regA)
-                # </editor-fold>
-            case 0xAA:
-                # <editor-fold desc="Transfer A > X">
-                self.regX = self.regA; self.cycles += 2
-                self.set_flags(self.regX); return
-                # </editor-fold>
-            case 0xAD:
-                # <editor-fold desc="Load A Absolute">
-                addr = self.get_abs()
-                self.regA = self.read(addr)
-                self.set_flags(self.regA); self.cycles += 4
-                # </editor-fold>
-            case 0xB0:
-                # <editor-fold desc="Branch on Carry">
-                if self.flag_Carry:
-                    signedval = signed8(self.read())
-                    temppg = self.pgmctr
-                    self.pgmctr += signedval
-                    if math.floor(temppg / 256) != math.floor(self.pgmctr / 256):
-                        self.cycles += 1 # Branch takes extra cycle if crossing page boundary
-                    self.cycles += 1 # Takes 1 additional cycles if nonzero
-                self.cycles += 2 # Takes 2 cycles no matter what
-                # </editor-fold>
-            case 0xB1:
-                # <editor-fold desc="Load Accumulator Indirect, Y Indexed (Exclsuive Indirect)">
-                addr, addcycle = self.get_excl_indr()
-                self.regA = self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 5 + addcycle
-                # </editor-fold>
-            case 0xB5:
-                # <editor-fold desc="Load Accumulator Zero Page, X Indexed">
-                addr = (self.read() + self.regX) % 256
-                self.regA = self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 4
-                # </editor-fold>
-            case 0xB8:
-                # <editor-fold desc="Clear Overflow">
-                self.flag_Overflow = False; self.cycles += 2
-                return
-                # </editor-fold>
-            case 0xB9:
-                # <editor-fold desc="Load Accumulator Absolute, Y Indexed">
-                addr = self.get_abs_indx(self.get_abs(), self.regY)
-                self.regA = self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 4
-                # </editor-fold>
-            case 0xBA:
-                # <editor-fold desc="Transfer Stack Pointer to X">
-                self.regX = self.stackptr
-                self.set_flags(self.regX)
-                self.cycles += 2
-                return
-                # </editor-fold>
-            case 0xBD:
-                # <editor-fold desc="Load Accumulator Absolute, X Indexed">
-                addr = self.get_abs_indx(self.get_abs(), self.regX)
-                self.regA = self.read(addr)
-                self.set_flags(self.regA)
-                self.cycles += 4
-                # </editor-fold>
-            case 0xC0:
-                # <editor-fold desc="Compare with Y Register Immediate">
-                self.cmp(self.regY, self.read())
-                self.cycles += 2
-                # </editor-fold>
-            case 0xC1:
-                # <editor-fold desc="Compare with Accumulator Indirect, X Indexed (Inclusive Indirect)">
-                addr = self.get_incl_indr()
-                self.cmp(self.regA, self.read(addr))
-                self.cycles += 6
-                # </editor-fold>
-            case 0xC4:
-                # <editor-fold desc="Compare with Y Zero Page">
-                addr = self.read()
-                self.cmp(self.regY, self.read(addr))
-                self.cycles += 3
-                # </editor-fold>
-            case 0xC5:
-                # <editor-fold desc="Compare with Accumulator Zero Page">
-                addr = self.read()
-                self.cmp(self.regA, self.read(addr))
-                self.cycles += 3
-                # </editor-fold>
-            case 0xC6:
-                # <editor-fold desc="Decrement Memory Zero Page">
-                addr = self.read()
-                self.write(addr, self.dec(self.read(addr)))
-                self.cycles += 5
-                # </editor-fold>
-            case 0xC8:
-                # <editor-fold desc="Increment Y">
-                self.regY = self.inc(self.regY)
-                self.cycles += 2; return
-                # </editor-fold>
-            case 0xC9:
-                # <editor-fold desc="Compare with Accumulator Immediate">
-                self.cmp(self.regA, self.read())
-                self.cycles += 2
-                # </editor-fold>
-            case 0xCA:
-                # <editor-fold desc="Decrement X">
-                self.regX = self.dec(self.regX)
-                self.cycles += 2
-                self.set_flags(self.regX)
-                return
-                # </editor-fold>
-            case 0xCC:
-                # <editor-fold desc="Compare with Y Register Absolute">
-                addr = self.get_abs()
-                self.cmp(self.regY, self.read(addr))
-                self.cycles += 4
-                # </editor-fold>
-            case 0xCD:
-                # <editor-fold desc="Compare with Accumulator Absolute">
-                addr = self.get_abs()
-                self.cmp(self.regA, self.read(addr))
-                self.cycles += 4
-                # </editor-fold>
-            case 0xCE:
-                # <editor-fold desc="Decrement Memory Absolute">
-                addr = self.get_abs()
-                self.write(addr,self.dec(self.read(addr)))
-                self.cycles += 3
-                # </editor-fold>
-            case 0xD0:
-                # <editor-fold desc="Branch on Not Equal">
-                if not self.flag_Zero:
-                    signedval = signed8(self.read())
-                    temppg = self.pgmctr
-                    self.pgmctr += signedval
-                    if math.floor(temppg / 256) != math.floor(self.pgmctr / 256):
-                        self.cycles += 1 # Branch takes extra cycle if crossing page boundary
-                    self.cycles += 1 # Takes 1 additional cycles if nonzero
-                self.cycles += 2 # Takes 2 cycles no matter what
-                # </editor-fold>
-            case 0xD1:
-                # <editor-fold desc="Compare with Accumulator Indirect, Y Indexed (Exclusive Indirect)">
-                addr = self.get_incl_indr()
-                self.cmp(self.regA, self.read(addr))
-                self.cycles += 5
-                # </editor-fold>
-            case 0xD5:
-                # <editor-fold desc="Compare with Accumulator Zero Page, X Indexed">
-                addr = (self.read() + self.regX) % 256
-                self.cmp(self.regA, self.read(addr))
-                self.cycles += 3
-                # </editor-fold>
-            case 0xD6:
-                # <editor-fold desc="Decrement Memory Zero Page, X Indexed">
-                addr = (self.read() + self.regX) % 256
-                self.write(addr, self.dec(self.read(addr)))
-                self.cycles += 6
-                # </editor-fold>
-            case 0xD8:
-                # <editor-fold desc="Clear Decimal -- Not Used">
-                self.flag_Decimal = False; self.cycles += 2
-                return
-                # </editor-fold>
-            case 0xD9:
-                # <editor-fold desc="Compare with Accumulator Absolute, y Indexed">
-                addr = self.get_abs_indx(self.get_abs(), self.regY)
-                self.cmp(self.regA, self.read(addr))
-                self.cycles += 4
-                # </editor-fold>
-            case 0xDD:
-                # <editor-fold desc="Compare with Accumulator Absolute, X Indexed">
-                addr = self.get_abs_indx(self.get_abs(), self.regX)
-                self.cmp(self.regA, self.read(addr))
-                self.cycles += 4
-                # </editor-fold>
-            case 0xDE:
-                # <editor-fold desc="Decrement Memory Absolute, X Indexed">
-                addr = self.get_abs_indx(self.get_abs(), self.regX)
-                self.write(addr, self.dec(self.read(addr)))
-                self.write += 7
-                # </editor-fold>
-            case 0xE0:
-                # <editor-fold desc="Compare with X Register Immediate">
-                self.cmp(self.regX, self.read())
-                self.cycles += 2
-                # </editor-fold>
-            case 0xE1:
-                # <editor-fold desc="Subtract with Carry Indirect, X Indexed (Inclusive Indirect)">
-                addr = self.get_incl_indr()
-                self.regA = self.sbc(self.regA, self.read(addr))
-                self.cycles += 6
-                # </editor-fold>
-            case 0xE4:
-                # <editor-fold desc="Compare with X Register Zero Page">
-                addr = self.read()
-                self.cmp(self.regX, self.read(addr))
-                self.cycles += 3
-                # </editor-fold>
-            case 0xE5:
-                # <editor-fold desc="Subtract with Carry Zero Page">
-                addr = self.read()
-                self.regA = self.sbc(self.regA, self.read(addr))
-                self.cycles += 3
-                # </editor-fold>
-            case 0xE6:
-                # <editor-fold desc="Increment Memory Zero page">
-                addr = self.read()
-                self.write(addr, self.inc(self.read(addr)))
-                self.cycles += 5
-                # </editor-fold>
-            case 0xE8:
-                # <editor-fold desc="Increment X">
-                self.regX = self.inc(self.regX)
-                self.cycles += 2; return
-                # </editor-fold>
-            case 0xE9:
-                # <editor-fold desc="Subtract with Carry Immediate">
-                self.regA = self.sbc(self.regA, self.read())
-                self.cycles += 2
-                # </editor-fold>
-            case 0xEA:
-                # <editor-fold desc="No Operation">
-                self.cycles += 2; return
-                # </editor-fold>
-            case 0xEC:
-                # <editor-fold desc="Compare with X Register Absolute">
-                addr = self.get_abs()
-                self.cmp(self.regX, self.read(addr))
-                self.cycles += 4
-                # </editor-fold>
-            case 0xED:
-                # <editor-fold desc="Subtract with Carry Absolute">
-                addr = self.get_abs()
-                self.regA = self.sbc(self.regA, self.read(addr))
-                self.cycles += 4
-                # </editor-fold>
-            case 0xEE:
-                # <editor-fold desc="Increment Memory Absolute">
-                addr = self.get_abs()
-                self.write(addr, self.inc(self.read(addr)))
-                self.cycles += 6
-                # </editor-fold>
-            case 0xF0:
-                # <editor-fold desc="Branch on Equal">
-                if self.flag_Zero:
-                    signedval = signed8(self.read())
-                    temppg = self.pgmctr
-                    self.pgmctr += signedval
-                    if math.floor(temppg / 256) != math.floor(self.pgmctr / 256):
-                        self.cycles += 1  # Branch takes extra cycle if crossing page boundary
-                    self.cycles += 1  # Takes 1 additional cycles if nonzero
-                self.cycles += 2  # Takes 2 cycles no matter what
-                # </editor-fold>
-            case 0xF1:
-                # <editor-fold desc="Subtract with Carry Indirect, Y Indexed (Exclusive Indirect)">
-                addr, addcycle = self.get_excl_indr()
-                self.regA = self.sbc(self.regA, self.read(addr))
-                self.cycles += 5 + addcycle
-                # </editor-fold>
-            case 0xF5:
-                # <editor-fold desc="Subtract with Carry Zero Page, X Indexed">
-                addr = (self.read() + self.regX) % 256
-                self.regA = self.sbc(self.regA, self.read(addr))
-                self.cycles += 4
-                # </editor-fold>
-            case 0xF6:
-                # <editor-fold desc="Increment Memory Zero Page, X Indexed">
-                addr = (self.read() + self.regX) % 256
-                self.write(addr, self.inc(self.read(addr)))
-                self.cycles += 6
-                # </editor-fold>
-            case 0xF8:
-                # <editor-fold desc="Set Decimal Flag -- Not Used">
-                self.flag_Decimal = True; self.cycles = 2
-                return
-                # </editor-fold>
-            case 0xF9:
-                # <editor-fold desc="Subtract with Carry Absolute, Y Indexed">
-                addr = self.get_abs_indx(self.get_abs(), self.regY)
-                self.regA = self.sbc(self.regA, self.read(addr))
-                self.cycles += 4
-                # </editor-fold>
-            case 0xFD:
-                # <editor-fold desc="Subtract with Carry Absolute, X Indexed">
-                addr = self.get_abs_indx(self.get_abs(), self.regX)
-                self.regA = self.sbc(self.regA, self.read(addr))
-                self.cycles += 4
-                # </editor-fold>
-            case 0xFE:
-                # <editor-fold desc="Increment Memory Absolute, X Indexed">
-                addr = self.get_abs() + self.regX
-                self.write(addr, self.inc(self.read(addr)))
-                self.cycles += 7 # No additional cycles for crossing page boundary
-                # </editor-fold>
-            case _:
-                print(hex(self.opcode) + " not implemented")
-                self.halt = True
-        # The below line automatically increments the counter for all cases
-        # This can be skipped for one byte instructions by returning, it saves space
-        self.pgmctr += 1
+    def op(self): # Execute the current opcode, see opcodes.py for the individual ops
+        self.optable[self.opcode]()
 
 # TODO: Check if I can simplify ADC/SBC to not take RegA as an argument, as well as get_abs_inx taking get_abs as an arg
 # TODO: Function to shorten length of branch instructions?
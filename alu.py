@@ -0,0 +1,106 @@
+from customTypes import *
+from array import array
+import time
+
+# Precomputed ALU results. Every table entry packs the result byte in the low 8 bits and the flags the op affects in
+# the high 8 bits (already in their NV1BDIZC positions), so an op is one index, one & 0xFF and one >> 8:
+#   result = ADC[carry << 16 | a << 8 | b]
+#   regA = result & 0xFF; status = status & CLEAR_NVZC | result >> 8
+# SBC is ADC with the operand inverted (a - b - !c == a + ~b + c), so it shares the ADC table, index it with b ^ 0xFF
+# CMP only changes flags, so its table is just the flag byte
+
+STARTUP_BUDGET = 0.5 # Seconds we're willing to spend building tables at import
+MEMORY_BUDGET = 0x80000 # Bytes
+
+CLEAR_NVZC = 0xFF ^ (FLAG_N | FLAG_V | FLAG_Z | FLAG_C)
+CLEAR_NZC = 0xFF ^ (FLAG_N | FLAG_Z | FLAG_C)
+CLEAR_NVZ = 0xFF ^ (FLAG_N | FLAG_V | FLAG_Z)
+
+
+# Reference implementations, plain arithmetic and no tables. The tables are built from these and the tests check the
+# tables against them for every possible input
+def ref_adc(a, b, carry):
+    total = a + b + carry
+    result = total & 0xFF
+    flags = NZ_FLAGS[result]
+    if total > 0xFF:
+        flags |= FLAG_C
+    if signed8(a) + signed8(b) + carry not in range(-128, 128): # Signed result doesn't fit in a byte
+        flags |= FLAG_V
+    return result, flags
+
+
+def ref_sbc(a, b, carry):
+    total = a - b - (not carry)
+    result = total & 0xFF
+    flags = NZ_FLAGS[result]
+    if total >= 0: # Carry is set when there was no borrow
+        flags |= FLAG_C
+    if signed8(a) - signed8(b) - (not carry) not in range(-128, 128):
+        flags |= FLAG_V
+    return result, flags
+
+
+def ref_cmp(a, b):
+    flags = NZ_FLAGS[(a - b) & 0xFF]
+    if a >= b:
+        flags |= FLAG_C
+    return flags
+
+
+def ref_asl(value):
+    result = (value << 1) & 0xFF
+    return result, NZ_FLAGS[result] | (FLAG_C if value & 0x80 else 0)
+
+
+def ref_lsr(value):
+    result = value >> 1
+    return result, NZ_FLAGS[result] | (value & FLAG_C)
+
+
+def ref_rol(value, carry):
+    result = (value << 1 | carry) & 0xFF
+    return result, NZ_FLAGS[result] | (FLAG_C if value & 0x80 else 0)
+
+
+def ref_ror(value, carry):
+    result = value >> 1 | carry << 7
+    return result, NZ_FLAGS[result] | (value & FLAG_C)
+
+
+def pack(result_flags):
+    result, flags = result_flags
+    return result | flags << 8
+
+
+def build_tables():
+    adc = array("H", [pack(ref_adc(a, b, carry)) for carry in (0, 1) for a in range(256) for b in range(256)])
+    cmp = bytes(ref_cmp(a, b) for a in range(256) for b in range(256))
+    asl = array("H", [pack(ref_asl(value)) for value in range(256)])
+    lsr = array("H", [pack(ref_lsr(value)) for value in range(256)])
+    rol = array("H", [pack(ref_rol(value, carry)) for carry in (0, 1) for value in range(256)])
+    ror = array("H", [pack(ref_ror(value, carry)) for carry in (0, 1) for value in range(256)])
+    return adc, cmp, asl, lsr, rol, ror
+
+
+def table_bytes(*tables):
+    return sum(len(table) * getattr(table, "itemsize", 1) for table in tables)
+
+
+start = time.perf_counter()
+ADC, CMP, ASL, LSR, ROL, ROR = build_tables()
+BUILD_TIME = time.perf_counter() - start
+TABLE_BYTES = table_bytes(ADC, CMP, ASL, LSR, ROL, ROR)
+
+
+def report():
+    return f"ALU tables: {TABLE_BYTES / 1024:.0f} KB built in {BUILD_TIME * 1000:.1f} ms " \
+           f"(budget {MEMORY_BUDGET / 1024:.0f} KB, {STARTUP_BUDGET * 1000:.0f} ms)"
+
+
+def within_budget(): # Build time depends on the machine and its load, bench.py reports it rather than the tests
+    return BUILD_TIME <= STARTUP_BUDGET and TABLE_BYTES <= MEMORY_BUDGET
+
+
+if __name__ == '__main__':
+    print(report())
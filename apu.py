@@ -0,0 +1,604 @@
+from interrupts import IRQ_FRAME, IRQ_DMC
+from savestate import Fields
+import numpy as np
+import os
+import struct
+import wave
+
+# Audio processing unit. Two pulse channels, triangle, noise and DMC, and the frame counter that clocks their
+# envelopes, sweeps and length counters, registers at 0x4000-0x4013, 0x4015 and 0x4017
+# Like the PPU it doesn't run alongside the CPU. Register writes are only logged with the cycle they happened on, and
+# catch_up replays the log and the frame counter steps in order. The stretch between two of those is a span where
+# nothing about any channel changes, so each span's samples are made with array ops over the sample times in it, and
+# once a video frame the frame's samples are mixed and handed to the sink in one go
+# With no sink nothing is synthesized at all, catch_up only keeps what the CPU can see (0x4015, the frame and DMC
+# IRQs) up to date. 0x4015 and 0x4017 writes are applied straight away since they move IRQ timing around
+# Every frame counter step is a scheduled event that catches up, whether or not there's a sink or the frame IRQ is on,
+# so the log never holds more than one step's worth of writes
+
+CPU_HZ = 1789773
+SAMPLE_RATE = 44100
+FLUSH_CYCLES = 29781 # About one video frame of audio per batch
+
+# Frame counter steps, cycles from the start of the sequence, and the length of the whole sequence
+STEPS = {4: (7457, 14913, 22371, 29829), 5: (7457, 14913, 22371, 29829, 37281)}
+SEQUENCE = {4: 29830, 5: 37282}
+QUARTER = {4: (True, True, True, True), 5: (True, True, True, False, True)} # Envelopes and the triangle's linear counter
+HALF = {4: (False, True, False, True), 5: (False, True, False, False, True)} # Length counters and sweeps
+
+LENGTHS = (10, 254, 20, 2, 40, 4, 80, 6, 160, 8, 60, 10, 14, 12, 26, 14,
+           12, 16, 24, 18, 48, 20, 96, 22, 192, 24, 72, 26, 16, 28, 32, 30)
+DUTIES = np.array([[0, 1, 0, 0, 0, 0, 0, 0], [0, 1, 1, 0, 0, 0, 0, 0], [0, 1, 1, 1, 1, 0, 0, 0],
+                   [1, 0, 0, 1, 1, 1, 1, 1]], np.int64)
+TRIANGLE = np.array(list(range(15, -1, -1)) + list(range(16)), np.int64)
+NOISE_PERIODS = (4, 8, 16, 32, 64, 96, 128, 160, 202, 254, 380, 508, 762, 1016, 2034, 4068)
+DMC_RATES = (428, 380, 340, 320, 286, 254, 226, 214, 190, 160, 142, 128, 106, 84, 72, 54)
+DMC_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1, bitorder="little").astype(np.int64) * 4 - 2
+
+# Save states, the APU's own scalars then one logged write per entry of the log
+FIELDS = Fields(("now", "q"), ("mode", "B"), ("irqInhibit", "?"), ("frameIrq", "?"), ("sequenceStart", "q"),
+                ("stepIndex", "B"), ("nextStep", "q"), ("sampleTime", "d"), ("samples", "q"), ("flushAt", "q"))
+COUNTS = struct.Struct("<II") # Logged writes, samples waiting for the next flush
+WRITE = struct.Struct("<qHB")
+
+# The non linear mixer as lookup tables, indexed by pulse1 + pulse2 and by 3 * triangle + 2 * noise + dmc
+PULSE_MIX = np.array([0.0] + [95.52 / (8128 / n + 100) for n in range(1, 31)])
+TND_MIX = np.array([0.0] + [163.67 / (24329 / n + 100) for n in range(1, 203)])
+
+
+def noise_sequence(short): # Whether the noise channel is up at each step of its LFSR, from power on
+    shift, out, seen = 1, [], set()
+    tap = 6 if short else 1
+    while shift not in seen:
+        seen.add(shift)
+        out.append(not shift & 1)
+        shift = shift >> 1 | ((shift ^ shift >> tap) & 1) << 14
+    return np.array(out, np.int64)
+
+
+NOISE = (noise_sequence(False), noise_sequence(True)) # 32767 and 93 steps long
+
+
+class WavWriter: # Sink that streams 16 bit mono samples into a wav file
+    def __init__(self, path, rate=SAMPLE_RATE):
+        self.file = wave.open(os.fspath(path), "wb")
+        self.file.setnchannels(1)
+        self.file.setsampwidth(2)
+        self.file.setframerate(rate)
+
+    def __call__(self, samples):
+        self.file.writeframes(samples.astype("<i2").tobytes())
+
+    def close(self):
+        self.file.close()
+
+
+# <editor-fold desc="Channels">
+# Every channel's run(times, cycles) gives its output (0-15, the DMC 0-127) at times, cycle offsets into a span of
+# cycles, and then moves its own timer on by the span. times is None when nothing is listening
+class Channel: # The length counter everything but the DMC has
+    FIELDS = Fields(("enabled", "?"), ("length", "B"), ("halt", "?")) # What save states keep, each class adds its own
+
+    def __init__(self):
+        self.enabled = False
+        self.length = 0
+        self.halt = False # Also the envelope loop flag
+
+    def load_length(self, data):
+        if self.enabled:
+            self.length = LENGTHS[data >> 3]
+
+    def clock_length(self):
+        if self.length and not self.halt:
+            self.length -= 1
+
+
+class Enveloped(Channel): # Pulse and noise volume
+    FIELDS = Channel.FIELDS + Fields(("volume", "B"), ("constant", "?"), ("start", "?"), ("divider", "B"),
+                                     ("decay", "B"))
+
+    def __init__(self):
+        super().__init__()
+        self.volume = 0
+        self.constant = False
+        self.start = False
+        self.divider = self.decay = 0
+
+    def control(self, data):
+        self.halt = bool(data & 0x20)
+        self.constant = bool(data & 0x10)
+        self.volume = data & 0x0F
+
+    def clock_envelope(self):
+        if self.start:
+            self.start = False
+            self.decay = 15
+            self.divider = self.volume
+        elif self.divider:
+            self.divider -= 1
+        else:
+            self.divider = self.volume
+            if self.decay:
+                self.decay -= 1
+            elif self.halt:
+                self.decay = 15
+
+    def level(self):
+        return self.volume if self.constant else self.decay
+
+
+class Pulse(Enveloped):
+    FIELDS = Enveloped.FIELDS + Fields(("duty", "B"), ("period", "H"), ("sweepEnabled", "?"), ("negate", "?"),
+                                       ("reload", "?"), ("sweepPeriod", "B"), ("shift", "B"), ("sweepDivider", "B"),
+                                       ("step", "B"), ("phase", "d"))
+
+    def __init__(self, ones):
+        super().__init__()
+        self.ones = ones # Pulse 1 negates with ones' complement, so its sweep goes one further down
+        self.duty = 0
+        self.period = 0
+        self.sweepEnabled = self.negate = self.reload = False
+        self.sweepPeriod = self.shift = self.sweepDivider = 0
+        self.step = 0
+        self.phase = 0.0 # Cycles since the sequencer last stepped
+
+    def write(self, register, data):
+        if register == 0:
+            self.duty = data >> 6
+            self.control(data)
+        elif register == 1:
+            self.sweepEnabled = bool(data & 0x80)
+            self.sweepPeriod = data >> 4 & 7
+            self.negate = bool(data & 0x08)
+            self.shift = data & 7
+            self.reload = True
+        elif register == 2:
+            self.period = self.period & 0x700 | data
+        else:
+            self.period = self.period & 0xFF | (data & 7) << 8
+            self.load_length(data)
+            self.step = 0
+            self.start = True
+
+    def target(self):
+        change = self.period >> self.shift
+        return self.period - change - self.ones if self.negate else self.period + change
+
+    def muted(self):
+        return self.period < 8 or self.target() > 0x7FF
+
+    def clock_sweep(self):
+        if not self.sweepDivider and self.sweepEnabled and self.shift and not self.muted():
+            self.period = max(self.target(), 0)
+        if not self.sweepDivider or self.reload:
+            self.sweepDivider = self.sweepPeriod
+            self.reload = False
+        else:
+            self.sweepDivider -= 1
+
+    def run(self, times, cycles):
+        period = 2 * (self.period + 1) # The sequencer steps every period + 1 APU cycles, 2 CPU cycles each
+        out = 0
+        if times is not None and self.length and not self.muted():
+            steps = ((self.phase + times) // period).astype(np.int64)
+            out = DUTIES[self.duty][(self.step + steps) & 7] * self.level()
+        total = self.phase + cycles
+        self.step = (self.step + int(total // period)) & 7
+        self.phase = total % period
+        return out
+
+
+class Triangle(Channel):
+    FIELDS = Channel.FIELDS + Fields(("period", "H"), ("linear", "B"), ("linearReload", "B"), ("reloadLinear", "?"),
+                                     ("step", "B"), ("phase", "d"))
+
+    def __init__(self):
+        super().__init__()
+        self.period = 0
+        self.linear = self.linearReload = 0
+        self.reloadLinear = False
+        self.step = 0
+        self.phase = 0.0
+
+    def write(self, register, data):
+        if register == 0:
+            self.halt = bool(data & 0x80) # Also the linear counter's control flag
+            self.linearReload = data & 0x7F
+        elif register == 2:
+            self.period = self.period & 0x700 | data
+        elif register == 3:
+            self.period = self.period & 0xFF | (data & 7) << 8
+            self.load_length(data)
+            self.reloadLinear = True
+
+    def clock_linear(self):
+        if self.reloadLinear:
+            self.linear = self.linearReload
+        elif self.linear:
+            self.linear -= 1
+        if not self.halt:
+            self.reloadLinear = False
+
+    def run(self, times, cycles):
+        if not (self.length and self.linear) or self.period < 2: # Stopped, or ultrasonic, it holds where it is
+            return TRIANGLE[self.step] if times is not None else 0
+        period = self.period + 1
+        out = 0
+        if times is not None:
+            out = TRIANGLE[(self.step + ((self.phase + times) // period).astype(np.int64)) & 31]
+        total = self.phase + cycles
+        self.step = (self.step + int(total // period)) & 31
+        self.phase = total % period
+        return out
+
+
+class Noise(Enveloped):
+    FIELDS = Enveloped.FIELDS + Fields(("short", "?"), ("period", "H"), ("index", "H"), ("phase", "d"))
+
+    def __init__(self):
+        super().__init__()
+        self.short = False
+        self.period = NOISE_PERIODS[0]
+        self.index = 0 # Where we are in NOISE[short]
+        self.phase = 0.0
+
+    def write(self, register, data):
+        if register == 0:
+            self.control(data)
+        elif register == 2:
+            self.short = bool(data & 0x80)
+            self.period = NOISE_PERIODS[data & 0x0F]
+        elif register == 3:
+            self.load_length(data)
+            self.start = True
+
+    def run(self, times, cycles):
+        sequence = NOISE[self.short]
+        out = 0
+        if times is not None and self.length:
+            steps = ((self.phase + times) // self.period).astype(np.int64)
+            out = sequence[(self.index + steps) % len(sequence)] * self.level()
+        total = self.phase + cycles
+        self.index = (self.index + int(total // self.period)) % len(sequence)
+        self.phase = total % self.period
+        return out
+
+
+class DMC: # Delta modulation, 1 bit samples read from CPU memory move the output up or down by 2
+    FIELDS = Fields(("irqEnabled", "?"), ("loop", "?"), ("rate", "H"), ("level", "B"), ("start", "H"),
+                    ("sampleLength", "H"), ("address", "H"), ("remaining", "H"), ("byte", "B"), ("bitsLeft", "B"),
+                    ("silence", "?"), ("irq", "?"), ("phase", "d"))
+
+    def __init__(self, read):
+        self.read = read
+        self.irqEnabled = self.loop = False
+        self.rate = DMC_RATES[0]
+        self.level = 0
+        self.start = 0xC000
+        self.sampleLength = 1
+        self.address = 0xC000
+        self.remaining = 0 # Bytes of the sample still to read
+        self.byte = 0
+        self.bitsLeft = 0 # Of byte, 0 starts a new output cycle
+        self.silence = True
+        self.irq = False
+        self.phase = 0.0
+
+    def write(self, register, data):
+        if register == 0:
+            self.irqEnabled = bool(data & 0x80)
+            self.loop = bool(data & 0x40)
+            self.rate = DMC_RATES[data & 0x0F]
+            if not self.irqEnabled:
+                self.irq = False
+        elif register == 1:
+            self.level = data & 0x7F
+        elif register == 2:
+            self.start = 0xC000 + data * 64
+        else:
+            self.sampleLength = data * 16 + 1
+
+    def restart(self):
+        self.address = self.start
+        self.remaining = self.sampleLength
+
+    def fetch(self):
+        self.byte = self.read(self.address)
+        self.address = self.address + 1 if self.address < 0xFFFF else 0x8000
+        self.remaining -= 1
+        if not self.remaining:
+            if self.loop:
+                self.restart()
+            elif self.irqEnabled:
+                self.irq = True
+
+    def run(self, times, cycles):
+        total = self.phase + cycles
+        bits = int(total // self.rate) # Output bits clocked during the span
+        first = self.rate - self.phase # Offset of the first of them
+        self.phase = total % self.rate
+        if not bits or self.silence and not self.remaining and not self.bitsLeft:
+            self.bitsLeft = (self.bitsLeft - bits) % 8
+            return self.level if times is not None else 0
+        deltas = np.zeros(bits, np.int64)
+        done = 0
+        while done < bits:
+            if not self.bitsLeft:
+                self.bitsLeft = 8
+                self.silence = not self.remaining
+                if not self.silence:
+                    self.fetch()
+            take = min(self.bitsLeft, bits - done)
+            if not self.silence:
+                used = 8 - self.bitsLeft
+                deltas[done:done + take] = DMC_BITS[self.byte, used:used + take]
+            self.bitsLeft -= take
+            done += take
+        levels = self.level + np.cumsum(deltas)
+        if levels.min() < 0 or levels.max() > 127: # Hit a rail, the steps past it are dropped one by one
+            level = self.level
+            for n, delta in enumerate(deltas.tolist()):
+                if 0 <= level + delta <= 127:
+                    level += delta
+                levels[n] = level
+        start, self.level = self.level, int(levels[-1])
+        if times is None:
+            return 0
+        clocked = np.searchsorted(first + np.arange(bits) * self.rate, times, side="right")
+        return np.concatenate(([start], levels))[clocked]
+# </editor-fold>
+
+
+class APU:
+    def __init__(self, sink=None, rate=SAMPLE_RATE):
+        if isinstance(sink, (str, os.PathLike)):
+            sink = WavWriter(sink, rate)
+        self.sink = sink # Called with each batch of int16 samples, None synthesizes nothing
+        self.rate = rate
+        self.sampleStep = CPU_HZ / rate # Cycles between samples
+        self.sampleTime = 0.0 # Cycle the next sample falls on
+        self.chunks = [] # Mixed spans waiting for the next flush
+        self.samples = 0 # Handed to the sink so far
+        self.pulse1, self.pulse2 = Pulse(1), Pulse(0)
+        self.triangle = Triangle()
+        self.noise = Noise()
+        self.dmc = DMC(self.read_memory)
+        self.log = [] # (cycle, address, data) writes catch_up hasn't replayed yet
+        self.now = 0 # Cycle everything has been run up to
+        self.mode = 4
+        self.irqInhibit = False
+        self.frameIrq = False
+        self.sequenceStart = 0 # Cycle the frame counter sequence last started on
+        self.stepIndex = 0
+        self.nextStep = STEPS[4][0]
+        self.flushAt = 0 # Cycle of the next flush event, when there's a sink
+        self.cpu = None
+        self.bus = None
+        self.scheduler = None
+        self.interrupts = None
+        self.stepEvent = self.dmcEvent = None
+
+    def attach(self, emu): # Take over the APU registers on emu's bus and run off its cycle count
+        self.cpu = emu
+        self.bus = emu.bus
+        for address in range(0x4000, 0x4014):
+            self.bus.ioWriteHandlers[address] = self.log_write
+        self.bus.ioWriteHandlers[0x4015] = self.write_status
+        self.bus.ioWriteHandlers[0x4017] = self.write_frame_counter
+        self.bus.ioReadHandlers[0x4015] = self.read_status
+        self.scheduler = getattr(emu, "scheduler", None)
+        self.interrupts = getattr(emu, "interrupts", None)
+        self.now = self.sequenceStart = emu.cycles
+        self.sampleTime = float(emu.cycles)
+        self.nextStep = self.sequenceStart + STEPS[4][0]
+        self.flushAt = self.now + FLUSH_CYCLES
+        self.reschedule()
+
+    def reschedule(self): # Frame step, DMC and flush events for where we are, on attach and after load_state
+        if self.scheduler is not None:
+            self.scheduler.drop(("frame step", "dmc", "audio"))
+            self.stepEvent = self.dmcEvent = None
+            self.schedule_step()
+            self.schedule_dmc()
+            if self.sink is not None:
+                self.scheduler.schedule(self.flushAt, self.flush_event, "audio")
+
+    def channels(self):
+        return self.pulse1, self.pulse2, self.triangle, self.noise, self.dmc
+
+    def read_memory(self, address): # DMC sample bytes
+        return self.bus.read(address) if self.bus is not None else 0
+
+    # <editor-fold desc="Timing">
+    def catch_up(self):
+        if self.cpu is not None:
+            self.run_to(self.cpu.cycles)
+
+    def run_to(self, cycle): # Replay logged writes and frame counter steps up to cycle, synthesizing the spans between
+        log = self.log
+        done = 0
+        while True:
+            write = log[done] if done < len(log) else None
+            if write is not None and write[0] <= self.nextStep:
+                at = write[0]
+            else:
+                at, write = self.nextStep, None
+            if at > cycle:
+                break
+            self.advance(at)
+            if write is None:
+                self.frame_step()
+            else:
+                self.apply(write[1], write[2])
+                done += 1
+        self.advance(cycle)
+        del log[:done]
+        self.update_irq()
+
+    def update_irq(self): # Put the IRQ lines in line with the two flags
+        if self.interrupts is not None:
+            for flag, line in ((self.frameIrq, IRQ_FRAME), (self.dmc.irq, IRQ_DMC)):
+                if flag:
+                    self.interrupts.raise_line(line)
+                else:
+                    self.interrupts.acknowledge(line)
+
+    def advance(self, cycle): # One span with nothing changing, every channel run over it at once
+        cycles = cycle - self.now
+        if cycles <= 0:
+            return
+        if self.sink is None: # The DMC is the only channel with state the CPU can see
+            self.dmc.run(None, cycles)
+        else:
+            count = max(0, int(np.ceil((cycle - self.sampleTime) / self.sampleStep)))
+            times = self.sampleTime - self.now + np.arange(count) * self.sampleStep if count else None
+            self.sampleTime += count * self.sampleStep
+            pulse = self.pulse1.run(times, cycles) + self.pulse2.run(times, cycles)
+            tnd = 3 * self.triangle.run(times, cycles) + 2 * self.noise.run(times, cycles) + self.dmc.run(times, cycles)
+            if count:
+                self.chunks.append(np.broadcast_to(PULSE_MIX[pulse] + TND_MIX[tnd], (count,)))
+        self.now = cycle
+
+    def frame_step(self):
+        index = self.stepIndex
+        if QUARTER[self.mode][index]:
+            self.clock_quarter()
+        if HALF[self.mode][index]:
+            self.clock_half()
+        if self.mode == 4 and index == 3 and not self.irqInhibit:
+            self.frameIrq = True
+        self.stepIndex += 1
+        if self.stepIndex == len(STEPS[self.mode]):
+            self.stepIndex = 0
+            self.sequenceStart += SEQUENCE[self.mode]
+        self.nextStep = self.sequenceStart + STEPS[self.mode][self.stepIndex]
+
+    def clock_quarter(self):
+        self.pulse1.clock_envelope(); self.pulse2.clock_envelope(); self.noise.clock_envelope()
+        self.triangle.clock_linear()
+
+    def clock_half(self):
+        for channel in (self.pulse1, self.pulse2, self.triangle, self.noise):
+            channel.clock_length()
+        self.pulse1.clock_sweep(); self.pulse2.clock_sweep()
+
+    def quiet_until(self): # First cpu cycle a 0x4015 read could change on (the end of a DMC sample is an event)
+        return self.nextStep
+
+    def schedule_step(self): # Event for the next frame counter step, raises the frame IRQ on time and replays the log
+        if self.stepEvent is not None:
+            self.scheduler.cancel(self.stepEvent)
+        self.stepEvent = self.scheduler.schedule(self.nextStep, self.step_event, "frame step")
+
+    def step_event(self, cycle):
+        self.stepEvent = None
+        self.catch_up()
+        self.schedule_step()
+
+    def schedule_dmc(self): # Event for when the sample should run out, for the DMC IRQ and the 0x4015 bit
+        if self.dmcEvent is not None:
+            self.scheduler.cancel(self.dmcEvent)
+            self.dmcEvent = None
+        dmc = self.dmc
+        if dmc.remaining:
+            cycles = int((dmc.remaining * 8 + dmc.bitsLeft) * dmc.rate - dmc.phase) + 1
+            self.dmcEvent = self.scheduler.schedule(self.now + cycles, self.dmc_event, "dmc")
+
+    def dmc_event(self, cycle):
+        self.dmcEvent = None
+        self.catch_up()
+        self.schedule_dmc()
+
+    def flush_event(self, cycle):
+        self.flush()
+        self.flushAt = cycle + FLUSH_CYCLES
+        self.scheduler.schedule(self.flushAt, self.flush_event, "audio")
+
+    def flush(self): # Hand everything synthesized so far to the sink as 16 bit samples
+        self.catch_up()
+        if not self.chunks:
+            return
+        mixed = np.concatenate(self.chunks)
+        self.chunks = []
+        self.samples += len(mixed)
+        self.sink(np.minimum(mixed * 32767, 32767).astype(np.int16))
+
+    def close(self): # Flush and close the sink if it's a file
+        if self.sink is not None:
+            self.flush()
+            if hasattr(self.sink, "close"):
+                self.sink.close()
+    # </editor-fold>
+
+    # <editor-fold desc="Save states">
+    def save_state(self): # Scalars of the APU and every channel, the write log and any samples not flushed yet
+        pending = np.concatenate(self.chunks) if self.chunks else np.zeros(0)
+        parts = [FIELDS.pack(self), COUNTS.pack(len(self.log), len(pending))]
+        parts += [channel.FIELDS.pack(channel) for channel in self.channels()]
+        parts += [WRITE.pack(*write) for write in self.log]
+        parts.append(pending.astype(np.float64))
+        return b"".join(parts)
+
+    def load_state(self, data):
+        offset = FIELDS.unpack(self, data)
+        writes, samples = COUNTS.unpack_from(data, offset)
+        offset += COUNTS.size
+        for channel in self.channels():
+            offset = channel.FIELDS.unpack(channel, data, offset)
+        self.log = list(WRITE.iter_unpack(data[offset:offset + writes * WRITE.size]))
+        offset += writes * WRITE.size
+        self.chunks = [np.frombuffer(data, np.float64, samples, offset).copy()] if samples else []
+        self.reschedule()
+    # </editor-fold>
+
+    # <editor-fold desc="Registers">
+    def log_write(self, address, data): # 0x4000-0x4013, replayed in order by catch_up
+        self.log.append((self.cpu.cycles if self.cpu is not None else self.now, address, data))
+
+    def apply(self, address, data):
+        channel = (self.pulse1, self.pulse2, self.triangle, self.noise, self.dmc)[address >> 2 & 7]
+        channel.write(address & 3, data)
+
+    def write_status(self, address, data): # 0x4015, channel enables
+        self.catch_up()
+        for bit, channel in enumerate((self.pulse1, self.pulse2, self.triangle, self.noise)):
+            channel.enabled = bool(data >> bit & 1)
+            if not channel.enabled:
+                channel.length = 0
+        dmc = self.dmc
+        dmc.irq = False
+        if not data & 0x10:
+            dmc.remaining = 0
+        elif not dmc.remaining:
+            dmc.restart()
+        self.update_irq()
+        if self.scheduler is not None:
+            self.schedule_dmc()
+
+    def read_status(self, address):
+        self.catch_up()
+        status = sum(1 << bit for bit, channel in enumerate((self.pulse1, self.pulse2, self.triangle, self.noise))
+                     if channel.length)
+        status |= 0x10 if self.dmc.remaining else 0
+        status |= 0x40 if self.frameIrq else 0
+        status |= 0x80 if self.dmc.irq else 0
+        self.frameIrq = False
+        self.update_irq()
+        return status
+
+    def write_frame_counter(self, address, data): # 0x4017, restarts the sequence
+        self.catch_up()
+        self.mode = 5 if data & 0x80 else 4
+        self.irqInhibit = bool(data & 0x40)
+        if self.irqInhibit:
+            self.frameIrq = False
+            self.update_irq()
+        self.sequenceStart = self.now
+        self.stepIndex = 0
+        self.nextStep = self.sequenceStart + STEPS[self.mode][0]
+        if self.mode == 5: # Clocks everything straight away
+            self.clock_quarter()
+            self.clock_half()
+        if self.scheduler is not None:
+            self.schedule_step()
+    # </editor-fold>
@@ -0,0 +1,420 @@
+from blockCompiler import ALU_OPS, LOADS, SHIFTS
+from customTypes import *
+from memoryBus import OPEN_BUS
+import alu
+import numpy as np
+
+# Lockstep batch emulation. N copies of one rom run together, their registers held as NumPy vectors (one entry per
+# copy) and their memory as rows of one array: ram is (N, 0x800), then prg ram and the PPU and I/O register latches.
+# Each step fetches every running copy's opcode, groups the copies by opcode, and runs each group as a handful of array
+# ops over just those rows, so the cost of a step is per opcode in use rather than per copy
+# The vector kernels cover the ops the block compiler compiles (see blockCompiler.py), whose tables they share and
+# which land in exactly the state the interpreter does. Anything else runs on a scratch Emulation one copy at a time,
+# through the real op in opcodes.py, so every op behaves as it does in Emulation.op(), quirks and all
+# A batch is the CPU and memory only, like a MemoryBus with nothing attached: 0x2000-0x3FFF and 0x4000-0x401F are
+# plain per copy latches (write the pads' bits into ioRegisters), nothing is scheduled and no interrupts are raised
+# The prg banks stay as they were at power on. A write the plain bus would refuse (rom, mapper registers, unmapped)
+# halts that copy with the error instead of raising, the others carry on
+# Kernels hand the rows they can't do exactly like Emulation (a refused write, a read past 0xFFFF, the stack pointer
+# gone below 0) to the interpreter before changing anything, so those copies stop in the state Emulation leaves
+
+MEMORY = 0x800 + 0x2000 + 8 + 0x20 # A copy's ram, prg ram, PPU and I/O latches, the layout MemoryBus.save_state uses
+PRGRAM = slice(0x800, 0x2800)
+PPU_LATCHES = slice(0x2800, 0x2808)
+IO_LATCHES = slice(0x2808, MEMORY)
+
+NZ = np.frombuffer(NZ_FLAGS, np.uint8).astype(np.int64)
+ADC = np.array(alu.ADC, np.int64)
+CMP = np.frombuffer(alu.CMP, np.uint8).astype(np.int64)
+TABLES = {name: np.array(getattr(alu, name), np.int64) for name in ("ASL", "LSR", "ROL", "ROR")}
+REGISTERS = {"a": "regA", "x": "regX", "y": "regY"}
+
+KERNELS = {} # opcode: function(batch, rows, code)
+
+
+def kernel(*codes):
+    def register(fn):
+        for code in codes:
+            KERNELS[code] = fn
+        return fn
+    return register
+
+
+# <editor-fold desc="Operands, each moves pgmctr on to the next instruction like the interpreter">
+def fetch(batch, rows, length): # The operand byte or little endian word after the opcode
+    pc = batch.pgmctr[rows]
+    operand = batch.load(rows, pc)
+    if length == 3:
+        operand |= batch.load(rows, pc + 1) << 8
+    batch.pgmctr[rows] = pc + length - 1
+    return operand
+
+
+def address(batch, rows, mode): # Effective address and the extra cycle indexing across a page costs (get_abs_indx)
+    if mode == "zp":
+        return fetch(batch, rows, 2), 0
+    if mode == "zpx":
+        return (fetch(batch, rows, 2) + batch.regX[rows]) & 0xFF, 0
+    base = fetch(batch, rows, 3)
+    if mode == "abs":
+        return base, 0
+    index = (batch.regX if mode == "absx" else batch.regY)[rows]
+    return base + index, (base & 0xFF) + index > 255
+
+
+def value(batch, rows, code, mode): # (operand, extra cycles), or None if refer took over
+    if mode == "imm":
+        return fetch(batch, rows, 2), 0
+    pc = batch.pgmctr[rows]
+    addr, extra = address(batch, rows, mode)
+    if refer(batch, rows, code, pc, addr > 0xFFFF):
+        return None
+    return batch.load(rows, addr), extra
+
+
+def refer(batch, rows, code, pc, odd): # Rows in odd go through the interpreter and the kernel starts over on the rest,
+    # pc is where the kernel found them. True if it did, the kernel returns straight away
+    if not odd.any():
+        return False
+    batch.pgmctr[rows] = pc
+    batch.interpret(rows[odd], code)
+    if not odd.all():
+        KERNELS[code](batch, rows[~odd], code)
+    return True
+
+
+def set_nz(batch, rows, result):
+    batch.status[rows] = batch.status[rows] & CLEAR_NZ | NZ[result]
+# </editor-fold>
+
+
+# <editor-fold desc="Loads, stores and arithmetic">
+@kernel(*LOADS)
+def run_load(batch, rows, code):
+    reg, mode, cycles = LOADS[code]
+    loaded = value(batch, rows, code, mode)
+    if loaded is None:
+        return
+    result, extra = loaded
+    getattr(batch, REGISTERS[reg])[rows] = result
+    set_nz(batch, rows, result)
+    batch.cycles[rows] += cycles + extra
+
+
+STORES = {0x85: ("a", "zp", 3), 0x86: ("x", "zp", 3), 0x84: ("y", "zp", 3), 0x95: ("a", "zpx", 4),
+          0x8D: ("a", "abs", 4), 0x9D: ("a", "absx", 5)}
+
+
+@kernel(*STORES)
+def run_store(batch, rows, code):
+    reg, mode, cycles = STORES[code]
+    pc = batch.pgmctr[rows]
+    addr, extra = address(batch, rows, mode)
+    if refer(batch, rows, code, pc, ~batch.writable(addr)):
+        return
+    batch.store(rows, addr, getattr(batch, REGISTERS[reg])[rows])
+    batch.cycles[rows] += cycles + extra
+
+
+@kernel(*ALU_OPS)
+def run_alu(batch, rows, code):
+    name, mode, cycles = ALU_OPS[code]
+    loaded = value(batch, rows, code, mode)
+    if loaded is None:
+        return
+    operand, extra = loaded
+    a = batch.regA[rows]
+    if name in ("adc", "sbc"):
+        result = ADC[(batch.status[rows] & FLAG_C) << 16 | a << 8 | (operand if name == "adc" else operand ^ 0xFF)]
+        batch.regA[rows] = result & 0xFF
+        batch.status[rows] = batch.status[rows] & alu.CLEAR_NVZC | result >> 8
+    elif name.startswith("cmp"):
+        register = getattr(batch, REGISTERS[name[-1]])[rows]
+        batch.status[rows] = batch.status[rows] & alu.CLEAR_NZC | CMP[register << 8 | operand]
+    else:
+        result = a & operand if name == "and" else a | operand if name == "ora" else a ^ operand
+        batch.regA[rows] = result
+        set_nz(batch, rows, result)
+    batch.cycles[rows] += cycles + extra
+
+
+@kernel(*SHIFTS)
+def run_shift(batch, rows, code):
+    name, mode, cycles = SHIFTS[code]
+    addr = None
+    if mode is None:
+        operand = batch.regA[rows]
+    else:
+        addr = address(batch, rows, mode)[0]
+        operand = batch.load(rows, addr)
+    if name in ("ROL", "ROR"):
+        operand = (batch.status[rows] & FLAG_C) << 8 | operand
+    result = TABLES[name][operand]
+    if addr is None:
+        batch.regA[rows] = result & 0xFF
+    else:
+        batch.store(rows, addr, result & 0xFF)
+    batch.status[rows] = batch.status[rows] & alu.CLEAR_NZC | result >> 8
+    batch.cycles[rows] += cycles
+
+
+INCREMENTS = {0xE6: ("zp", 5), 0xF6: ("zpx", 6), 0xEE: ("abs", 6)}
+
+
+@kernel(*INCREMENTS)
+def run_increment(batch, rows, code):
+    mode, cycles = INCREMENTS[code]
+    pc = batch.pgmctr[rows]
+    addr = address(batch, rows, mode)[0]
+    if refer(batch, rows, code, pc, ~batch.writable(addr)):
+        return
+    result = (batch.load(rows, addr) + 1) & 0xFF
+    batch.store(rows, addr, result)
+    set_nz(batch, rows, result)
+    batch.cycles[rows] += cycles
+# </editor-fold>
+
+
+# <editor-fold desc="Registers, flags and the stack">
+TRANSFERS = { # opcode: (register set, from, added)
+    0xE8: ("regX", "regX", 1), 0xC8: ("regY", "regY", 1), 0xCA: ("regX", "regX", -1), 0xAA: ("regX", "regA", 0),
+    0xA8: ("regY", "regA", 0), 0x8A: ("regA", "regX", 0), 0x98: ("regA", "regY", 0), 0xBA: ("regX", "stackptr", 0),
+}
+FLAGS = { # opcode: (and, or), CLI doesn't poll for an IRQ as nothing raises one here
+    0xEA: (0xFF, 0), 0x18: (0xFF ^ FLAG_C, 0), 0x38: (0xFF, FLAG_C), 0x58: (0xFF ^ FLAG_I, 0), 0x78: (0xFF, FLAG_I),
+    0xB8: (0xFF ^ FLAG_V, 0), 0xD8: (0xFF ^ FLAG_D, 0),
+}
+
+
+@kernel(*TRANSFERS)
+def run_transfer(batch, rows, code):
+    target, source, added = TRANSFERS[code]
+    result = (getattr(batch, source)[rows] + added) & 0xFF
+    getattr(batch, target)[rows] = result
+    set_nz(batch, rows, result)
+    batch.cycles[rows] += 2
+
+
+@kernel(*FLAGS)
+def run_flags(batch, rows, code):
+    clear, set_ = FLAGS[code]
+    batch.status[rows] = batch.status[rows] & clear | set_
+    batch.cycles[rows] += 2
+
+
+def push(batch, rows, data): # Emulation.push, for rows with room on the stack, the rest were referred
+    sp = batch.stackptr[rows]
+    batch.ram[rows, 0x100 + sp] = data
+    batch.stackptr[rows] = sp - 1
+
+
+def pull(batch, rows): # Emulation.pull
+    sp = batch.stackptr[rows]
+    sp = np.where(sp == 0xFF, 0, sp + 1)
+    batch.stackptr[rows] = sp
+    return batch.ram[rows, 0x100 + sp].astype(np.int64)
+
+
+@kernel(0x48, 0x08, 0x68, 0x28)
+def run_stack(batch, rows, code):
+    if refer(batch, rows, code, batch.pgmctr[rows], batch.stackptr[rows] < 0):
+        return
+    if code == 0x48:
+        push(batch, rows, batch.regA[rows])
+    elif code == 0x08:
+        push(batch, rows, batch.status[rows] | FLAG_B | FLAG_U)
+    elif code == 0x68:
+        result = batch.regA[rows] = pull(batch, rows)
+        set_nz(batch, rows, result)
+    else:
+        batch.status[rows] = pull(batch, rows) & ~FLAG_B | FLAG_U
+    batch.cycles[rows] += 4 if code == 0x68 else 3
+# </editor-fold>
+
+
+# <editor-fold desc="Control flow">
+BRANCHES = {0x10: (FLAG_N, 0), 0x30: (FLAG_N, FLAG_N), 0x50: (FLAG_V, 0), 0x70: (FLAG_V, FLAG_V),
+            0x90: (FLAG_C, 0), 0xB0: (FLAG_C, FLAG_C), 0xD0: (FLAG_Z, 0), 0xF0: (FLAG_Z, FLAG_Z)} # (flag, taken when)
+
+
+@kernel(*BRANCHES)
+def run_branch(batch, rows, code): # +1 cycle if taken and +1 more if the operand and target-1 are on different pages
+    flag, when = BRANCHES[code]
+    pc = batch.pgmctr[rows]
+    taken = batch.status[rows] & flag == when
+    offset = batch.load(rows, pc)
+    target = pc + np.where(taken, offset - (offset >> 7 << 8), 0)
+    batch.cycles[rows] += 2 + taken * (1 + (pc >> 8 != target >> 8))
+    batch.pgmctr[rows] = target + 1
+
+
+@kernel(0x4C)
+def run_jmp(batch, rows, code):
+    batch.pgmctr[rows] = fetch(batch, rows, 3)
+    batch.cycles[rows] += 3
+
+
+@kernel(0x20)
+def run_jsr(batch, rows, code): # Pushes the address of its last operand byte
+    if refer(batch, rows, code, batch.pgmctr[rows], batch.stackptr[rows] < 1):
+        return
+    target = fetch(batch, rows, 3)
+    last = batch.pgmctr[rows] - 1
+    push(batch, rows, last >> 8)
+    push(batch, rows, last & 0xFF)
+    batch.pgmctr[rows] = target
+    batch.cycles[rows] += 6
+
+
+@kernel(0x60)
+def run_rts(batch, rows, code):
+    if refer(batch, rows, code, batch.pgmctr[rows], batch.stackptr[rows] < 0):
+        return
+    low = pull(batch, rows)
+    batch.pgmctr[rows] = low + pull(batch, rows) * 256 + 1
+    batch.cycles[rows] += 6
+# </editor-fold>
+
+
+class Batch:
+    def __init__(self, filepath, count):
+        from Emulation import Emulation, CPU_FIELDS
+        self.count = count
+        # The scratch emulator runs the ops without a kernel, on a bus set up like the batch's own memory map
+        self.scratch = emu = Emulation(filepath, headless=True, idle=False)
+        bus = emu.bus
+        self.rom = np.array(bus[0x8000:0x10000], np.int64) # As mapped at power on
+        bus.map_buffer(0x80, 0xFF, bytearray(self.rom.astype(np.uint8).tobytes()), writable=False)
+        bus.map_handler(0x20, 0x3F, bus.read_ppu, bus.write_ppu)
+        bus.map_handler(0x40, 0x40, bus.read_io, bus.write_io)
+        bus.ioReadHandlers.clear()
+        bus.ioWriteHandlers.clear()
+
+        self.memory = np.tile(np.frombuffer(bus.save_state(), np.uint8), (count, 1)) # (count, MEMORY)
+        self.ram = self.memory[:, :0x800]
+        self.prgram = self.memory[:, PRGRAM]
+        self.ppuRegisters = self.memory[:, PPU_LATCHES]
+        self.ioRegisters = self.memory[:, IO_LATCHES]
+        self.fields = [name for name, _ in CPU_FIELDS.spec if name != "halt"]
+        for name in self.fields: # pgmctr, regA ... cycles, opcode, as they are after power on
+            setattr(self, name, np.full(count, getattr(emu, name), np.int64))
+        self.halt = np.zeros(count, bool)
+        self.errors = {} # Copy: why it halted, for the ones that didn't halt on purpose
+        self.steps = 0
+        self.groups = 0 # Opcode groups run, a step costs one per opcode in use whatever the count
+        self.interpreted = 0 # Instructions that went through the scratch emulator rather than a kernel
+
+    # <editor-fold desc="Memory">
+    def load(self, rows, addr): # The byte at addr[i] in copy rows[i], as int64
+        low, high = addr.min(), addr.max()
+        if high < 0x2000 and low >= 0:
+            return self.ram[rows, addr & 0x7FF].astype(np.int64)
+        if low >= 0x8000 and high <= 0xFFFF:
+            return self.rom[addr - 0x8000]
+        out = np.full(len(rows), OPEN_BUS, np.int64)
+        wild = (addr < 0) | (addr > 0xFFFF) # The plain bus would raise, off the end of its page table
+        if wild.any():
+            self.fault(rows[wild], [f"Read from {hex(address)}, outside the address space" for address in addr[wild]])
+            addr = addr & 0xFFFF
+        for first, last, memory, mask, offset in self.regions(True):
+            hit = (addr >= first) & (addr <= last)
+            if hit.any():
+                out[hit] = memory[rows[hit], (addr[hit] & mask) + offset] if memory is not None \
+                    else self.rom[addr[hit] - 0x8000]
+        return out
+
+    def writable(self, addr): # Which of addr the plain bus takes writes to: ram, the latches and prg ram
+        return (addr >= 0) & (addr < 0x4020) | (addr >= 0x6000) & (addr < 0x8000)
+
+    def store(self, rows, addr, data):
+        if addr.max() < 0x2000 and addr.min() >= 0:
+            self.ram[rows, addr & 0x7FF] = data
+            return
+        handled = np.zeros(len(rows), bool)
+        for first, last, memory, mask, offset in self.regions(False):
+            hit = (addr >= first) & (addr <= last)
+            if hit.any():
+                memory[rows[hit], (addr[hit] & mask) + offset] = data[hit]
+                handled |= hit
+        if not handled.all():
+            self.fault(rows[~handled], [f"Attempted to write to invalid memory address {hex(address)}"
+                                        for address in addr[~handled]])
+
+    def regions(self, reading): # (first, last, memory, mask, offset into the row), the rom is None
+        regions = [(0x0000, 0x1FFF, self.memory, 0x7FF, 0), (0x2000, 0x3FFF, self.memory, 0x7, PPU_LATCHES.start),
+                   (0x4000, 0x401F, self.memory, 0x1F, IO_LATCHES.start),
+                   (0x6000, 0x7FFF, self.memory, 0x1FFF, PRGRAM.start)]
+        if reading:
+            regions.append((0x8000, 0xFFFF, None, 0, 0))
+        return regions
+
+    def fault(self, rows, messages):
+        for row, message in zip(rows.tolist(), messages):
+            if not self.halt[row]:
+                self.errors[row] = message
+                self.halt[row] = True
+    # </editor-fold>
+
+    # <editor-fold desc="Running">
+    def step(self): # One instruction in every copy that's still running, returns how many ran
+        rows = np.flatnonzero(~self.halt)
+        if not len(rows):
+            return 0
+        pcs = self.pgmctr[rows]
+        codes = self.load(rows, pcs)
+        if pcs.max() > 0xFFFF: # Ran off the end of memory, load halted those like the fetch raises in Emulation
+            running = pcs <= 0xFFFF
+            rows, codes = rows[running], codes[running]
+            if not len(rows):
+                return 0
+        self.opcode[rows] = codes
+        self.pgmctr[rows] += 1
+        if codes.min() == codes.max(): # All in step, one group
+            self.run_group(rows, int(codes[0]))
+        else:
+            order = np.argsort(codes, kind="stable")
+            codes = codes[order]
+            bounds = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+            starts, ends = np.concatenate(([0], bounds)).tolist(), np.concatenate((bounds, [len(rows)])).tolist()
+            for start, end in zip(starts, ends):
+                self.run_group(rows[order[start:end]], int(codes[start]))
+        self.steps += 1
+        return len(rows)
+
+    def run_group(self, rows, code):
+        self.groups += 1
+        KERNELS.get(code, Batch.interpret)(self, rows, code)
+
+    def run(self, steps): # Up to steps steps, fewer if every copy halts, returns instructions run over all copies
+        total = 0
+        for _ in range(steps):
+            ran = self.step()
+            if not ran:
+                break
+            total += ran
+        return total
+
+    def interpret(self, rows, code): # The Emulation op, one copy at a time on the scratch emulator
+        emu = self.scratch
+        bus = emu.bus
+        fields = self.fields
+        self.interpreted += len(rows)
+        for row in rows.tolist():
+            for name in fields:
+                setattr(emu, name, int(getattr(self, name)[row]))
+            emu.opcode = code
+            emu.halt = False
+            emu.error = None
+            bus.load_state(memoryview(self.memory[row]))
+            try:
+                emu.optable[code]()
+            except (MemoryError, IndexError) as error: # What the plain bus raises for accesses it refuses
+                self.fault(np.array([row]), [str(error)]) # Whatever the op did before it raised stays done
+            for name in fields:
+                getattr(self, name)[row] = getattr(emu, name)
+            self.memory[row] = np.frombuffer(bus.save_state(), np.uint8)
+            if emu.halt:
+                self.halt[row] = True
+                if emu.error is not None:
+                    self.errors[row] = emu.error
+    # </editor-fold>
@@ -0,0 +1,232 @@
+from Emulation import Emulation
+from customTypes import *
+from profiler import Profiler
+import alu
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+try:
+    import resource
+except ImportError: # Windows, peak RSS is reported as None there
+    resource = None
+
+# CPU throughput benchmark. Runs a fixed set of workloads through Emulation and reports instructions/sec, emulated
+# cycles/sec and peak RSS for each, for the interpreter and the block compiler
+# Results can be saved as a json baseline and later runs compared against it, anything slower than the baseline by more
+# than the threshold is flagged as a regression (and the exit status is 1)
+# Usage: python bench.py [-r repeats] [--scale n] [--save baseline.json] [--compare baseline.json] [--threshold 0.1]
+
+ROMPATH = "5_Instructions1.nes"
+ENGINES = ("interpreter", "compiled")
+THRESHOLD = 0.10 # Fraction slower than the baseline before it counts as a regression
+
+
+# <editor-fold desc="Workloads">
+# The synthetic workloads are little 6502 programs at 0x8000 that loop a fixed number of times and halt with $02
+# Loops count with X (256 inner iterations) and Y (outer), scale sets the outer count
+def branch(code, opcode, target): # Append a relative branch to target
+    code += bytes([opcode, (target - (len(code) + 2)) & 0xFF])
+
+
+def outer_loop(code, target, scale): # INY / CPY #scale / BNE target / halt
+    code += bytes([0xC8, 0xC0, scale & 0xFF])
+    branch(code, 0xD0, target)
+    code.append(0x02)
+
+
+def alu_loop(scale):
+    code = bytearray([0xA0, 0x00, 0xA2, 0x00]) # LDY #0, LDX #0
+    top = len(code)
+    code += bytes([0x18, 0x69, 0x37, # CLC, ADC #$37
+                   0x49, 0x5A, 0x29, 0xF7, 0x09, 0x01, # EOR #$5A, AND #$F7, ORA #$01
+                   0x4A, 0x2A, 0x6A, # LSR A, ROL A, ROR A
+                   0x38, 0xE9, 0x11, 0xC9, 0x40, # SEC, SBC #$11, CMP #$40
+                   0xE8]) # INX
+    branch(code, 0xD0, top)
+    outer_loop(code, top, scale)
+    return code
+
+
+def memory_copy(scale): # Copy 0x0200-0x02FF to 0x0300-0x03FF, scale times
+    code = bytearray([0xA0, 0x00, 0xA2, 0x00])
+    top = len(code)
+    code += bytes([0xBD, 0x00, 0x02, # LDA $0200,X
+                   0x9D, 0x00, 0x03, # STA $0300,X
+                   0xE8])
+    branch(code, 0xD0, top)
+    outer_loop(code, top, scale)
+    return code
+
+
+def branchy(scale): # Every iteration takes some branches and falls through others depending on the bits of X
+    code = bytearray([0xA0, 0x00, 0xA2, 0x00])
+    top = len(code)
+    code += bytes([0x8A, 0x4A]) # TXA, LSR A
+    for opcode in (0x90, 0xB0, 0x30, 0x10, 0xF0, 0xD0): # BCC, BCS, BMI, BPL, BEQ, BNE, each over a NOP
+        code += bytes([opcode, 0x01, 0xEA])
+        code += bytes([0x4A]) # LSR A, so the next branch sees different bits
+    code += bytes([0xC9, 0x10, 0x90, 0x01, 0xEA]) # CMP #$10, BCC over a NOP
+    code += bytes([0xE8])
+    branch(code, 0xD0, top)
+    outer_loop(code, top, scale)
+    return code
+
+
+def call_chain(scale): # JSR three deep with a push and pull at the bottom
+    code = bytearray([0xA0, 0x00, 0xA2, 0x00])
+    top = len(code)
+    code += bytes([0x20, 0x00, 0x90, 0xE8]) # JSR $9000, INX
+    branch(code, 0xD0, top)
+    outer_loop(code, top, scale)
+    code += bytes(0x1000 - len(code)) # Subroutines at 0x9000
+    code += bytes([0x20, 0x04, 0x90, 0x60, # 9000: JSR $9004, RTS
+                   0x20, 0x08, 0x90, 0x60, # 9004: JSR $9008, RTS
+                   0x48, 0x68, 0x60]) # 9008: PHA, PLA, RTS
+    return code
+
+
+SYNTHETIC = {"alu": alu_loop, "copy": memory_copy, "branch": branchy, "calls": call_chain}
+ROM_PASSES = 400 # The bundled rom is only ~80 instructions, so it's run over and over from the top
+
+
+def build_rom(program, path): # 32K NROM image with the program at 0x8000 and the reset vector pointing at it
+    prg = bytearray([0xFF] * 0x8000)
+    prg[:len(program)] = program
+    prg[0x7FFC] = 0x00; prg[0x7FFD] = 0x80
+    with open(path, "wb") as rom:
+        rom.write(b"NES\x1a\x02\x00" + bytes(10) + prg)
+
+
+def restart(emu): # Put the cpu back at the top of the program for another pass, memory is left as it is
+    emu.pgmctr = 0x8000; emu.regA = emu.regX = emu.regY = 0
+    emu.stackptr = 0xFD; emu.status = FLAG_U | FLAG_I; emu.halt = False # As it comes out of reset
+
+
+class Workload:
+    def __init__(self, name, rompath, passes=1):
+        self.name = name
+        self.rompath = rompath
+        self.passes = passes
+
+    def emulator(self):
+        return Emulation(self.rompath, debug=True)
+
+    def run(self, emu, engine): # Every pass of the workload on emu, returns the time spent running (setup excluded)
+        run = emu.run_compiled if engine == "compiled" else emu.run_emu
+        elapsed = 0.0
+        for _ in range(self.passes):
+            restart(emu)
+            start = time.perf_counter()
+            run()
+            elapsed += time.perf_counter() - start
+        return elapsed
+
+    def count(self): # Instructions and cycles for the whole workload, from one profiled interpreter run
+        emu = self.emulator()
+        profiler = emu.profile(Profiler())
+        self.run(emu, "interpreter")
+        return profiler.instructions(), profiler.cycles()
+
+
+def workloads(directory, scale): # Writes the synthetic roms into directory
+    out = []
+    for name, program in SYNTHETIC.items():
+        path = os.path.join(directory, f"{name}.nes")
+        build_rom(program(scale), path)
+        out.append(Workload(name, path))
+    out.append(Workload("rom", ROMPATH, ROM_PASSES))
+    return out
+# </editor-fold>
+
+
+def peak_rss(): # Peak resident set size of this process in bytes
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024 # Linux reports KB, macOS bytes
+
+
+def bench(workloads, engines=ENGINES, repeats=3): # {"workload/engine": {...}}, best of repeats
+    results = {}
+    for workload in workloads:
+        instructions, cycles = workload.count()
+        for engine in engines:
+            best = min(workload.run(workload.emulator(), engine) for _ in range(repeats))
+            best = max(best, 1e-9)
+            results[f"{workload.name}/{engine}"] = {
+                "instructions": instructions,
+                "cycles": cycles,
+                "seconds": best,
+                "ips": instructions / best,
+                "cps": cycles / best,
+                "peak_rss": peak_rss(), # Process wide, so it only ever goes up through the run
+            }
+    return results
+
+
+def compare(results, baseline, threshold=THRESHOLD): # Regressions as (key, measure, baseline value, current value)
+    regressions = []
+    for key, result in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        for measure in ("ips", "cps"):
+            if result[measure] < old[measure] * (1 - threshold):
+                regressions.append((key, measure, old[measure], result[measure]))
+        if result["peak_rss"] and old.get("peak_rss") and result["peak_rss"] > old["peak_rss"] * (1 + threshold):
+            regressions.append((key, "peak_rss", old["peak_rss"], result["peak_rss"]))
+    return regressions
+
+
+def save(results, path):
+    with open(path, "w") as file:
+        json.dump({"python": sys.version.split()[0], "platform": platform.platform(), "results": results}, file,
+                  indent=2)
+
+
+def load(path):
+    with open(path) as file:
+        return json.load(file)["results"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU throughput benchmark with a json baseline")
+    parser.add_argument("-r", "--repeats", type=int, default=3)
+    parser.add_argument("--scale", type=int, default=64, help="Outer loop count of the synthetic workloads (1-255)")
+    parser.add_argument("--engine", choices=ENGINES, action="append", help="Engine to run (default: all)")
+    parser.add_argument("--save", help="Write results to this json baseline")
+    parser.add_argument("--compare", help="Compare results against this json baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="Allowed slowdown before flagging, 0.1 = 10%%")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        with contextlib.redirect_stdout(io.StringIO()): # Nothing in the workloads should print, but keep the table clean
+            results = bench(workloads(directory, args.scale), args.engine or ENGINES, args.repeats)
+
+    print(f"{'workload':<22} {'instructions':>12} {'ips':>12} {'cps':>12} {'peak rss':>10}")
+    for key, result in results.items():
+        rss = f"{result['peak_rss'] / 0x100000:.1f} MB" if result["peak_rss"] else "-"
+        print(f"{key:<22} {result['instructions']:>12,} {result['ips']:>12,.0f} {result['cps']:>12,.0f} {rss:>10}")
+    print(alu.report() if alu.within_budget() else "OVER BUDGET " + alu.report())
+
+    status = 0
+    if args.compare:
+        regressions = compare(results, load(args.compare), args.threshold)
+        for key, measure, old, new in regressions:
+            print(f"REGRESSION {key} {measure}: {old:,.0f} -> {new:,.0f} ({new / old - 1:+.1%})")
+        if not regressions:
+            print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+        status = 1 if regressions else 0
+    if args.save:
+        save(results, args.save)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
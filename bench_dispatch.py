@@ -0,0 +1,1063 @@
+from Emulation import Emulation
+from customTypes import *
+import argparse
+import contextlib
+import io
+import math
+import random
+import time
+
+# Microbenchmark for opcode dispatch. Runs every implemented opcode through the old match statement and through the
+# handler table Emulation.op() uses now, and reports instructions per second for each
+# Usage: python bench_dispatch.py [-n iterations] [opcode ...]
+
+ROMPATH = "5_Instructions1.nes"
+PROGRAM = 0x0300 # Ops are run out of ram so the operand bytes (and anything the op writes) stay put between runs
+OPERANDS = (0x10, 0x02)
+
+
+def match_op(emu): # The 256-arm match statement Emulation.op() used to be, kept around as the reference engine
+    # I'M GONNA RENAME INDIRECT INDEXED ADDRESSING TO EXCLUSIVE ADDRESSING AND INDEXED INDIRECT ADDRESSING TO INCLUSIVE ADDRESSING
+    # Okay so ($04, X) will be called Inclusive indirect and ($04), Y will be called Exclusive please email all of your complaints to gaben@valvesoftware.com
+
+    # At the beginning of each op, the program counter will point to the address immediately following the opcode
+    # For operations with a length of one, a return should be used to skip this automatic increment at the end of the op function
+    # These automatic increments are done in an attempt to shorten the  amount of space each op takes up, I realize this may not be best practice
+    # And if it proves to be too confusing I can revisit this later
+
+    match emu.opcode:
+        case 0x00:
+            # <editor-fold desc="Break">
+            emu.pgmctr += 1
+            emu.push(math.floor(emu.pgmctr / 256)); emu.push(emu.pgmctr % 256)
+            flags = emu.flag_Carry
+            flags += emu.flag_Zero * 2
+            flags += emu.flag_InterruptDisable * 4
+            flags += emu.flag_Decimal * 8
+            flags += 0x30
+            flags += emu.flag_Overflow * 64
+            flags += emu.flag_Negative * 128
+            emu.push(flags)
+            emu.flag_InterruptDisable = True
+            tlow = emu.read(0xFFFE)
+            thigh = emu.read(0xFFFF)
+            emu.pgmctr = tlow + thigh * 256
+            emu.cycles += 7
+            return
+            # </editor-fold>
+        case 0x01:
+            # <editor-fold desc="OR w/ Accumulator, Indirect X (Inclusive Indirect)">
+            addr = emu.get_incl_indr()
+            emu.regA |= emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 6
+            # </editor-fold>
+        case 0x02:
+            # <editor-fold desc="Halt">
+            emu.halt = True
+            # </editor-fold>
+        case 0x05:
+            # <editor-fold desc="OR w/ Accumulator Zero Page">
+            addr = emu.read()
+            emu.regA |= emu.read(addr)
+            emu.set_flags(emu.regA); emu.cycles += 3
+            # </editor-fold>
+        case 0x06:
+            # <editor-fold desc="Arithmetic Shift Left Zero Page">
+            addr = emu.read()
+            emu.write(addr, emu.asl(emu.read(addr)))
+            emu.cycles += 5
+            # </editor-fold>
+        case 0x08:
+            # <editor-fold desc="Push Flags">
+            flagbyte = 48
+            if emu.flag_Carry:
+                flagbyte += 1
+            if emu.flag_Zero:
+                flagbyte += 2
+            if emu.flag_InterruptDisable:
+                flagbyte += 4
+            if emu.flag_Decimal:
+                flagbyte += 8
+            if emu.flag_Overflow:
+                flagbyte += 64
+            if emu.flag_Negative:
+                flagbyte += 128
+            emu.push(flagbyte); emu.cycles += 3; return
+            # </editor-fold>
+        case 0x09:
+            # <editor-fold desc="OR w/ Accumulator Immediate">
+            emu.regA |= emu.read()
+            emu.set_flags(emu.regA); emu.cycles += 2
+            # </editor-fold>
+        case 0x0D:
+            # <editor-fold desc="OR w/ Accumulator Absolute">
+            emu.regA |= emu.read(emu.get_abs())
+            emu.set_flags(emu.regA); emu.cycles += 4
+            # </editor-fold>
+        case 0x0A:
+            # <editor-fold desc="Arithmetic Shift Left Accumulator">
+            emu.regA = emu.asl(emu.regA)
+            emu.cycles += 2; return
+            # </editor-fold>
+        case 0x0E:
+            # <editor-fold desc="Arithmetic Shift Left Absolute">
+            addr = emu.get_abs()
+            emu.write(addr, emu.asl(emu.read(addr))); emu.cycles += 6
+            # </editor-fold>
+        case 0x10:
+            # <editor-fold desc="Branch on Plus">
+            if not emu.flag_Negative:
+                signedval = signed8(emu.read())
+                temppg = emu.pgmctr
+                emu.pgmctr += signedval
+                if math.floor(temppg / 256) != math.floor(emu.pgmctr / 256):
+                    emu.cycles += 1  # Branch takes extra cycle if crossing page boundary
+                emu.cycles += 1  # Takes 1 additional cycles if nonzero
+            emu.cycles += 2  # Takes 2 cycles no matter what
+            # </editor-fold>
+        # TODO: Refactor Branching to use get_abs_indx()
+        case 0x11:
+            # <editor-fold desc="OR w/ Accumulator Indirect, Y Indexed (Exclusive Indirect)">
+            addr, addcycle = emu.get_excl_indr()
+            emu.regA |= emu.read(addr)
+            emu.cycles += addcycle + 5
+            emu.set_flags(emu.regA)
+            # </editor-fold>
+        case 0x15:
+            # <editor-fold desc="OR w/ Accumulator Zero Page, X Indexed">
+            addr = (emu.read() + emu.regX) % 256
+            emu.regA |= emu.read(addr)
+            emu.set_flags(emu.regA); emu.cycles += 4
+            # </editor-fold>
+        case 0x16:
+            # <editor-fold desc="Arithmetic Shift Left Zero Page, X Indexed">
+            addr = (emu.read() + emu.regX) % 256
+            emu.write(addr, emu.asl(emu.read(addr))); emu.cycles += 6
+            # </editor-fold>
+        case 0x18:
+            # <editor-fold desc="Clear Carry">
+            emu.flag_Carry = False; emu.cycles += 2
+            return
+            # </editor-fold>
+        case 0x19:
+            # <editor-fold desc="OR w/ Accumulator Absolute, Y Index">
+            addr = emu.get_abs_indx(emu.get_abs(), emu.regY)
+            emu.regA |= emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 4
+            # </editor-fold>
+        case 0x1D:
+            # <editor-fold desc="OR w/ Accumulator Absolute, X Indexed">
+            addr = emu.get_abs_indx(emu.get_abs(), emu.regX)
+            emu.regA |= emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 4
+            # </editor-fold>
+        case 0x1E:
+            # <editor-fold desc="Arithmetic Shift Left Absolute, X Indexed">
+            addr = emu.get_abs() + emu.regX
+            emu.write(addr, emu.asl(emu.read(addr))); emu.cycles += 7
+            # </editor-fold>
+        case 0x20:
+            # <editor-fold desc="Jump to Subroutine">
+            tlow = emu.read(); emu.pgmctr += 1
+            thigh = emu.read()
+            emu.push(math.floor(emu.pgmctr/256)); emu.push(emu.pgmctr % 256)
+            emu.pgmctr = (tlow+thigh*256); emu.cycles += 6
+            return # prevent auto increment to pgmctr since we just set it
+            # </editor-fold>
+        case 0x21:
+            # <editor-fold desc="AND w/ Accumulator Indirect, X Indexed (Inclusive Indirect)">
+            addr = emu.get_incl_indr()
+            emu.regA &= emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 6
+            # </editor-fold>
+        case 0x24:
+            # <editor-fold desc="test Bit Zero Page">
+            addr = emu.read()
+            emu.bit(emu.read(addr))
+            emu.cycles += 3
+            # </editor-fold>
+        case 0x25:
+            # <editor-fold desc="AND w/ Accumulator Zero Page">
+            addr = emu.read()
+            emu.regA &= emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 3
+            # </editor-fold>
+        case 0x26:
+            # <editor-fold desc="Rotate Left Zero Page">
+            addr = emu.read()
+            emu.write(addr, emu.rol(emu.read(addr))); emu.cycles += 5
+            # </editor-fold>
+        case 0x28:
+            # <editor-fold desc="Pull Flags">
+            flags = bin(emu.pull())[2:]
+            while len(flags) < 8:
+                flags = "0" + flags
+            emu.flag_Carry = flags[7] == "1"
+            emu.flag_Zero = flags[6] == "1"
+            emu.flag_InterruptDisable = flags[5] == "1"
+            emu.flag_Decimal = flags[4] == "1"
+            emu.flag_Overflow = flags[1] == "1"
+            emu.flag_Negative = flags[0] == "1"
+            emu.cycles += 3; return
+            # </editor-fold>
+            # TODO: Probably more efficient to do this as subtraction in a while loop?
+        case 0x29:
+            # <editor-fold desc="AND w/ Accumulator Immediate">
+            emu.regA &= emu.read()
+            emu.set_flags(emu.regA)
+            emu.cycles += 2
+            # </editor-fold>
+        case 0x2A:
+            # <editor-fold desc="Rotate Left Accumulator">
+            emu.regA = emu.rol(emu.regA)
+            emu.cycles += 2; return
+            # </editor-fold>
+        case 0x2C:
+            # <editor-fold desc="test Bit Absolute">
+            addr = emu.get_abs()
+            emu.bit(emu.read(addr))
+            emu.cycles += 4
+            # </editor-fold>
+        case 0x2D:
+            # <editor-fold desc="AND w/ Accumulator Absolute">
+            addr = emu.get_abs()
+            emu.regA &= emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 4
+            # </editor-fold>
+        case 0x2E:
+            # <editor-fold desc="Rotate Left Absolute">
+            addr = emu.get_abs()
+            emu.write(addr, emu.rol(emu.read(addr)))
+            emu.cycles += 6
+            # </editor-fold>
+        case 0x30:
+            # <editor-fold desc="Branch on Minus">
+            if emu.flag_Negative:
+                signedval = signed8(emu.read())
+                temppg = emu.pgmctr
+                emu.pgmctr += signedval
+                if math.floor(temppg / 256) != math.floor(emu.pgmctr / 256):
+                    emu.cycles += 1  # Branch takes extra cycle if crossing page boundary
+                emu.cycles += 1  # Takes 1 additional cycles if nonzero
+            emu.cycles += 2  # Takes 2 cycles no matter what
+            # </editor-fold>
+        case 0x31:
+            # <editor-fold desc="AND w/ Accumulator Indirect, Y Indexed (Exclusive Indirect)">
+            addr, addcycle = emu.get_excl_indr()
+            emu.regA &= emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 5 + addcycle
+            # </editor-fold>
+        case 0x35:
+            # <editor-fold desc="AND w/ Accumulator Zero Page, X Indexed">
+            addr = (emu.read() + emu.regX) % 256
+            emu.regA &= emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 4
+            # </editor-fold>
+        case 0x36:
+            # <editor-fold desc="Rotate Left Zero Page, X Indexed">
+            addr = (emu.read() + emu.regX) % 256
+            emu.write(addr, emu.rol(emu.read(addr))); emu.cycles += 6
+            # </editor-fold>
+        case 0x38:
+            # <editor-fold desc="Set Carry">
+            emu.flag_Carry = True; emu.cycles += 2
+            return
+            # </editor-fold>
+        case 0x39:
+            # <editor-fold desc="AND w/ Accumulator Absolute Y Indexed">
+            addr = emu.get_abs_indx(emu.get_abs(), emu.regY)
+            emu.regA &= emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 4
+            # </editor-fold>
+        case 0x3D:
+            # <editor-fold desc="AND w/ Accumulator Absolute X Indexed">
+            addr = emu.get_abs_indx(emu.get_abs(), emu.regX)
+            emu.regA &= emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 4
+            # </editor-fold>
+        case 0x3E:
+            # <editor-fold desc="Rotate Left Absolute, X Indexed">
+            addr = emu.get_abs_indx(emu.get_abs(), emu.regX) # Add cycle if page boundary crossed
+            emu.write(addr, emu.rol(emu.read(addr)))
+            emu.cycles += 7
+            # </editor-fold>
+        case 0x40:
+            # <editor-fold desc="Return from Interrupt">
+            flags = emu.pull()
+            tlow = emu.pull(); thigh = emu.pull()
+            emu.pgmctr = tlow + thigh * 256
+            emu.flag_Negative = flags > 127
+            flags -= emu.flag_Negative * 128
+            emu.flag_Overflow = flags > 63
+            flags -= emu.flag_Overflow * 64
+            flags %= 16 # Drop B and the unused bit
+            emu.flag_Decimal = flags > 7
+            flags -= emu.flag_Decimal * 8
+            emu.flag_InterruptDisable = flags > 3
+            flags -= emu.flag_InterruptDisable * 4
+            emu.flag_Zero = flags > 1
+            emu.flag_Carry = flags % 2 == 1
+            emu.cycles += 7
+            return
+            # </editor-fold>
+        case 0x41:
+            # <editor-fold desc="EOR w/ Accumulator Indirect, X Indexed (Inclusive Indirect)">
+            addr = emu.get_incl_indr()
+            emu.regA ^= emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 6
+            # </editor-fold>
+        case 0x45:
+            # <editor-fold desc="EOR w/ Accumulator Zero Page">
+            addr = emu.read()
+            emu.regA ^= emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 3
+            # </editor-fold>
+        case 0x46:
+            # <editor-fold desc="Logical Shift Right Zero Page">
+            addr = emu.read()
+            emu.write(addr, emu.lsr(emu.read(addr)))
+            emu.cycles += 5
+            # </editor-fold>
+        case 0x48:
+            # <editor-fold desc="Push Accumulator">
+            emu.push(emu.regA); emu.cycles += 3
+            return
+            # </editor-fold>
+        case 0x49:
+            # <editor-fold desc="EOR w/ Accumulator Immediate">
+            emu.regA ^= emu.read()
+            emu.set_flags(emu.regA)
+            emu.cycles += 2
+            # </editor-fold>
+        case 0x4A:
+            # <editor-fold desc="Logical Shift Right Accumulator">
+            emu.regA = emu.lsr(emu.regA)
+            emu.cycles += 2; return
+            # </editor-fold>
+        case 0x4C:
+            # <editor-fold desc="Jump">
+            tlow = emu.read(); emu.pgmctr += 1
+            thigh = emu.read()
+            emu.pgmctr = (tlow + thigh * 256); emu.cycles += 3
+            return # prevent auto increment to pgmctr since we just set it
+            # </editor-fold>
+        case 0x4D:
+            # <editor-fold desc="EOR w/ Accumulator Absolute">
+            addr = emu.get_abs()
+            emu.regA ^= emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 4
+            # </editor-fold>
+        case 0x4E:
+            # <editor-fold desc="Logical Shift Right Absolute">
+            addr = emu.get_abs()
+            emu.write(addr, emu.rol(emu.read(addr)))
+            emu.cycles += 6
+            # </editor-fold>
+        case 0x50:
+            # <editor-fold desc="Branch on Not Overflow">
+            if not emu.flag_Overflow:
+                signedval = signed8(emu.read())
+                temppg = emu.pgmctr
+                emu.pgmctr += signedval
+                if math.floor(temppg / 256) != math.floor(emu.pgmctr / 256):
+                    emu.cycles += 1  # Branch takes extra cycle if crossing page boundary
+                emu.cycles += 1  # Takes 1 additional cycles if nonzero
+            emu.cycles += 2  # Takes 2 cycles no matter what
+            # </editor-fold>
+        case 0x51:
+            # <editor-fold desc="EOR w/ Accumulator Indirect, Y Indexed (Exclusive Indirect)">
+            addr, addcycle = emu.get_excl_indr()
+            emu.regA ^= emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 5 + addcycle
+            # </editor-fold>
+        case 0x55:
+            # <editor-fold desc="EOR w/ Accumulator Zero Page, X Indexed">
+            addr = emu.read() + emu.regX
+            emu.regA ^= emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 4
+            # </editor-fold>
+        case 0x56:
+            # <editor-fold desc="Logical Shift Right Zero Page, X Indexed">
+            addr = (emu.read() + emu.regX) % 256
+            emu.write(addr, emu.lsr(emu.read(addr)))
+            # </editor-fold>
+        case 0x58:
+            # <editor-fold desc="Clear Interrupt-Disable">
+            emu.flag_InterruptDisable = False; emu.cycles += 2
+            return
+            # </editor-fold>
+        case 0x59:
+            # <editor-fold desc="EOR w/ Accumulator Absolute Y Indexed">
+            addr = emu.get_abs_indx(emu.get_abs(), emu.regY)  # Add cycle if page boundary crossed
+            emu.regA ^= emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 4
+            # </editor-fold>
+        case 0x5D:
+            # <editor-fold desc="EOR w/ Accumulator Absolute X Indexed">
+            addr = emu.get_abs_indx(emu.get_abs(), emu.regX)  # Add cycle if page boundary crossed
+            emu.regA ^= emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 4
+            # </editor-fold>
+        case 0x5E:
+            # <editor-fold desc="Logical Shift Right Absolute, X Indexed">
+            addr = emu.get_abs_indx(emu.get_abs(), emu.regX)  # Add cycle if page boundary crossed
+            emu.write(addr, emu.lsr(emu.read(addr))); emu.cycles += 7
+            # </editor-fold>
+        case 0x60:
+            # <editor-fold desc="Return from Subroutine">
+            tlow = emu.pull()
+            emu.pgmctr = (tlow+emu.pull()*256); emu.cycles += 6
+            # </editor-fold>
+        case 0x61:
+            # <editor-fold desc="Add with Carry Indirect, X Indexed (Inclusive Indirect)">
+            addr = emu.get_incl_indr()
+            emu.regA = emu.adc(emu.read(addr), emu.regA)
+            emu.cycles += 6
+            # </editor-fold>
+        case 0x65:
+            # <editor-fold desc="Add to Accumulator Zero Page">
+            addr = emu.read()
+            emu.regA = emu.adc(emu.regA, emu.read(addr))
+            emu.cycles += 3
+            # </editor-fold>
+        case 0x66:
+            # <editor-fold desc="Rotate Right Zero Page">
+            addr = emu.read()
+            emu.write(addr, emu.ror(emu.read(addr))); emu.cycles += 5
+            # </editor-fold>
+        case 0x68:
+            # <editor-fold desc="Pull Accumulator">
+            emu.regA = emu.pull(); emu.cycles += 4
+            emu.set_flags(emu.regA)
+            return
+            # </editor-fold>
+        case 0x69:
+            # <editor-fold desc="Add to Accumulator Immediate">
+            emu.regA = emu.adc(emu.regA, emu.read())
+            emu.cycles += 2
+            # Fun fact, the NES does not use the Decimal flag, ask me how much time I spent implementing BCD from the raw 6502 docs before coming to this realization
+            # </editor-fold>
+        case 0x6A:
+            # <editor-fold desc="Rotate Right Accumulator">
+            emu.regA = emu.ror(emu.regA)
+            emu.cycles += 2; return
+            # </editor-fold>
+        case 0x6C:
+            # <editor-fold desc="Jump to Indirect Address">
+            addr = emu.get_abs()
+            tlow = emu.read(addr)
+            addr += 1
+            if addr % 256 == 0:
+                addr -= 256
+            thigh = emu.read(addr)
+            emu.pgmctr = tlow + thigh*256
+            emu.cycles += 5
+            return
+            # </editor-fold>
+        case 0x6D:
+            # <editor-fold desc="Add to Accumulator Absolute">
+            addr = emu.get_abs()
+            emu.regA = emu.adc(emu.regA, emu.read(addr))
+            emu.cycles += 4
+            # </editor-fold>
+        case 0x6E:
+            # <editor-fold desc="Rotate Right Absolute">
+            addr = emu.get_abs()
+            emu.write(addr, emu.ror(emu.read(addr)))
+            emu.cycles += 6
+            # </editor-fold>
+        case 0x70:
+            # <editor-fold desc="Branch on Overflow">
+            if emu.flag_Overflow:
+                signedval = signed8(emu.read())
+                temppg = emu.pgmctr
+                emu.pgmctr += signedval
+                if math.floor(temppg / 256) != math.floor(emu.pgmctr / 256):
+                    emu.cycles += 1  # Branch takes extra cycle if crossing page boundary
+                emu.cycles += 1  # Takes 1 additional cycles if nonzero
+            emu.cycles += 2  # Takes 2 cycles no matter what
+            # </editor-fold>
+        case 0x71:
+            # <editor-fold desc="Add with Carry Indirect, Y Indexed (Exclusive Indirect)">
+            addr, addcycle = emu.get_excl_indr()
+            emu.regA = emu.adc(emu.regA, emu.read(addr))
+            emu.cycles += 5 + addcycle
+            # </editor-fold>
+        case 0x75:
+            # <editor-fold desc="Add to Accumulator Zero Page, X Indexed">
+            addr = (emu.read() + emu.regX) % 256
+            emu.regA = emu.adc(emu.regA, emu.read(addr))
+            emu.cycles += 4
+            # </editor-fold>
+        case 0x76:
+            # <editor-fold desc="Rotate Right Zero Page, X Indexed">
+            addr = (emu.read() + emu.regX) % 256
+            emu.write(addr, emu.ror(emu.read(addr)))
+            emu.cycles += 6
+            # </editor-fold>
+        case 0x78:
+            # <editor-fold desc="Set Interrupt-Disable">
+            emu.flag_InterruptDisable = True; emu.cycles += 2
+            return
+            # </editor-fold>
+        case 0x79:
+            # <editor-fold desc="Add to Accumulator Absolute, Y Indexed">
+            addr = emu.get_abs_indx(emu.get_abs(), emu.regY) # Add cycle if page boundary crossed
+            emu.regA = emu.adc(emu.regA, emu.read(addr + emu.regY))
+            emu.cycles += 4
+            # </editor-fold>
+        case 0x7D:
+            # <editor-fold desc="Add to Accumulator Absolute, X Indexed">
+            addr = emu.get_abs_indx(emu.get_abs(), emu.regX)  # Add cycle if page boundary crossed
+            emu.regA = emu.adc(emu.regA, emu.read(addr + emu.regX))
+            emu.cycles += 4
+            # </editor-fold>
+        case 0x7E:
+            # <editor-fold desc="Rotate Right Absolute, X Indexed">
+            addr = emu.get_abs() + emu.regX # No Additional cycles when boundary crossed
+            emu.write(addr, emu.ror(emu.read(addr)))
+            emu.cycles += 7
+            # </editor-fold>
+        case 0x81:
+            # <editor-fold desc="Store Accumulator Indirect, X Indexed (Inclusive Indirect)">
+            addr = emu.get_incl_indr()
+            print(hex(addr), hex(emu.regA))
+            emu.write(emu.read(addr),emu.regA)
+            emu.cycles += 6
+            # </editor-fold>
+        case 0x84:
+            # <editor-fold desc="STY Zero Page">
+            emu.write(emu.read(), emu.regY); emu.cycles += 3
+            # </editor-fold>
+        case 0x85:
+            # <editor-fold desc="STA Zero Page">
+            emu.write(emu.read(), emu.regA)
+            emu.cycles += 3
+            # </editor-fold>
+        case 0x86:
+            # <editor-fold desc="STX Zero Page">
+            emu.write(emu.read(), emu.regX); emu.cycles += 3
+            # </editor-fold>
+        case 0x88:
+            # <editor-fold desc="Decrement Y">
+            emu.regY = emu.dec(emu.regY)
+            emu.cycles += 2
+            emu.set_flags(emu.regY)
+            # </editor-fold>
+        case 0x8A:
+            # <editor-fold desc="Transfer X > A">
+            emu.regA = emu.regX; emu.cycles += 2
+            emu.set_flags(emu.regA); return
+            # </editor-fold>
+        case 0x8C:
+            # <editor-fold desc="Store Register Y Absolute">
+            emu.write(emu.read(emu.get_abs()), emu.regY); emu.cycles += 4
+            # </editor-fold>
+        case 0x8D:
+            # <editor-fold desc="Store Register A Absolute">
+            emu.write(emu.get_abs(), emu.regA)
+            emu.cycles += 4
+            # </editor-fold>
+        case 0x8E:
+            # <editor-fold desc="Store Register X Absolute">
+            emu.write(emu.read(emu.get_abs()), emu.regX); emu.cycles += 4
+            # </editor-fold>
+        case 0x90:
+            # <editor-fold desc="Branch on Not Carry">
+            if not emu.flag_Carry:
+                signedval = signed8(emu.read())
+                temppg = emu.pgmctr
+                emu.pgmctr += signedval
+                if math.floor(temppg / 256) != math.floor(emu.pgmctr / 256):
+                    emu.cycles += 1  # Branch takes extra cycle if crossing page boundary
+                emu.cycles += 1  # Takes 1 additional cycles if nonzero
+            emu.cycles += 2  # Takes 2 cycles no matter what
+            # </editor-fold>
+        case 0x91:
+            # <editor-fold desc="Store Accumulator Indirect, XY Indexed (Exclusive Indirect)">
+            addr, addcycle = emu.get_excl_indr()
+            emu.write(emu.read(addr), emu.regA)
+            emu.cycles += 6
+            # </editor-fold>
+        case 0x95:
+            # <editor-fold desc="STA Zero Page, X Indexed">
+            addr = (emu.read() + emu.regX) % 256
+            emu.write(addr, emu.regA)
+            emu.cycles += 4
+            # </editor-fold>
+        case 0x98:
+            # <editor-fold desc="Transfer Y > A">
+            emu.regA = emu.regY; emu.cycles += 2
+            emu.set_flags(emu.regA); return
+            # </editor-fold>
+        case 0x99:
+            # <editor-fold desc="Store Accumulator Absolute, Y Indexed">
+            addr = emu.get_abs_indx(emu.get_abs(), emu.regX)
+            emu.write(emu.read(addr), emu.regA)
+            emu.cycles += 5
+            # </editor-fold>
+        case 0x9A:
+            # <editor-fold desc="Transfer X to Stack Pointer">
+            emu.stackptr = emu.regX
+            emu.set_flags(emu.regX)
+            emu.cycles += 2
+            return
+            # </editor-fold>
+        case 0x9D:
+            # <editor-fold desc="Store Accumulator Absolute, X Indexed">
+            addr = emu.get_abs_indx(emu.get_abs(), emu.regX)
+            emu.write(addr, emu.regA)
+            emu.cycles += 5
+            # </editor-fold>
+        case 0xA0:
+            # <editor-fold desc="Load Y Immediate">
+            emu.regY = emu.read(); emu.cycles += 2
+            emu.set_flags(emu.regY)
+            # </editor-fold>
+        case 0xA1:
+            # <editor-fold desc="Load Accumulator Indirect, X Indexed (Inclusive Indirect)">
+            addr = emu.get_incl_indr()
+            emu.regA = emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 6
+            # </editor-fold>
+        case 0xA2:
+            # <editor-fold desc="Load Immediate X">
+            emu.regX = emu.read(); emu.cycles += 2
+            emu.set_flags(emu.regX)
+            # </editor-fold>
+        case 0xA5:
+            # <editor-fold desc="Load A Zero Page">
+            emu.regA = emu.read(); emu.cycles += 2
+            emu.set_flags(emu.regA)
+            # </editor-fold>
+        case 0xA8:
+            # <editor-fold desc="Transfer A > Y">
+            emu.regY = emu.regA; emu.cycles += 2
+            emu.set_flags(emu.regY); return
+            # </editor-fold>
+        case 0xA9:
+            # <editor-fold desc="Load A Immediate">
+            emu.regA = emu.read(); emu.cycles += 2
+            emu.set_flags(emu.regA)
+            # </editor-fold>
+        case 0xAA:
+            # <editor-fold desc="Transfer A > X">
+            emu.regX = emu.regA; emu.cycles += 2
+            emu.set_flags(emu.regX); return
+            # </editor-fold>
+        case 0xAD:
+            # <editor-fold desc="Load A Absolute">
+            addr = emu.get_abs()
+            emu.regA = emu.read(addr)
+            emu.set_flags(emu.regA); emu.cycles += 4
+            # </editor-fold>
+        case 0xB0:
+            # <editor-fold desc="Branch on Carry">
+            if emu.flag_Carry:
+                signedval = signed8(emu.read())
+                temppg = emu.pgmctr
+                emu.pgmctr += signedval
+                if math.floor(temppg / 256) != math.floor(emu.pgmctr / 256):
+                    emu.cycles += 1 # Branch takes extra cycle if crossing page boundary
+                emu.cycles += 1 # Takes 1 additional cycles if nonzero
+            emu.cycles += 2 # Takes 2 cycles no matter what
+            # </editor-fold>
+        case 0xB1:
+            # <editor-fold desc="Load Accumulator Indirect, Y Indexed (Exclsuive Indirect)">
+            addr, addcycle = emu.get_excl_indr()
+            emu.regA = emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 5 + addcycle
+            # </editor-fold>
+        case 0xB5:
+            # <editor-fold desc="Load Accumulator Zero Page, X Indexed">
+            addr = (emu.read() + emu.regX) % 256
+            emu.regA = emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 4
+            # </editor-fold>
+        case 0xB8:
+            # <editor-fold desc="Clear Overflow">
+            emu.flag_Overflow = False; emu.cycles += 2
+            return
+            # </editor-fold>
+        case 0xB9:
+            # <editor-fold desc="Load Accumulator Absolute, Y Indexed">
+            addr = emu.get_abs_indx(emu.get_abs(), emu.regY)
+            emu.regA = emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 4
+            # </editor-fold>
+        case 0xBA:
+            # <editor-fold desc="Transfer Stack Pointer to X">
+            emu.regX = emu.stackptr
+            emu.set_flags(emu.regX)
+            emu.cycles += 2
+            return
+            # </editor-fold>
+        case 0xBD:
+            # <editor-fold desc="Load Accumulator Absolute, X Indexed">
+            addr = emu.get_abs_indx(emu.get_abs(), emu.regX)
+            emu.regA = emu.read(addr)
+            emu.set_flags(emu.regA)
+            emu.cycles += 4
+            # </editor-fold>
+        case 0xC0:
+            # <editor-fold desc="Compare with Y Register Immediate">
+            emu.cmp(emu.regY, emu.read())
+            emu.cycles += 2
+            # </editor-fold>
+        case 0xC1:
+            # <editor-fold desc="Compare with Accumulator Indirect, X Indexed (Inclusive Indirect)">
+            addr = emu.get_incl_indr()
+            emu.cmp(emu.regA, emu.read(addr))
+            emu.cycles += 6
+            # </editor-fold>
+        case 0xC4:
+            # <editor-fold desc="Compare with Y Zero Page">
+            addr = emu.read()
+            emu.cmp(emu.regY, emu.read(addr))
+            emu.cycles += 3
+            # </editor-fold>
+        case 0xC5:
+            # <editor-fold desc="Compare with Accumulator Zero Page">
+            addr = emu.read()
+            emu.cmp(emu.regA, emu.read(addr))
+            emu.cycles += 3
+            # </editor-fold>
+        case 0xC6:
+            # <editor-fold desc="Decrement Memory Zero Page">
+            addr = emu.read()
+            emu.write(addr, emu.dec(emu.read(addr)))
+            emu.cycles += 5
+            # </editor-fold>
+        case 0xC8:
+            # <editor-fold desc="Increment Y">
+            emu.regY = emu.inc(emu.regY)
+            emu.cycles += 2; return
+            # </editor-fold>
+        case 0xC9:
+            # <editor-fold desc="Compare with Accumulator Immediate">
+            emu.cmp(emu.regA, emu.read())
+            emu.cycles += 2
+            # </editor-fold>
+        case 0xCA:
+            # <editor-fold desc="Decrement X">
+            emu.regX = emu.dec(emu.regX)
+            emu.cycles += 2
+            emu.set_flags(emu.regX)
+            return
+            # </editor-fold>
+        case 0xCC:
+            # <editor-fold desc="Compare with Y Register Absolute">
+            addr = emu.get_abs()
+            emu.cmp(emu.regY, emu.read(addr))
+            emu.cycles += 4
+            # </editor-fold>
+        case 0xCD:
+            # <editor-fold desc="Compare with Accumulator Absolute">
+            addr = emu.get_abs()
+            emu.cmp(emu.regA, emu.read(addr))
+            emu.cycles += 4
+            # </editor-fold>
+        case 0xCE:
+            # <editor-fold desc="Decrement Memory Absolute">
+            addr = emu.get_abs()
+            emu.write(addr,emu.dec(emu.read(addr)))
+            emu.cycles += 3
+            # </editor-fold>
+        case 0xD0:
+            # <editor-fold desc="Branch on Not Equal">
+            if not emu.flag_Zero:
+                signedval = signed8(emu.read())
+                temppg = emu.pgmctr
+                emu.pgmctr += signedval
+                if math.floor(temppg / 256) != math.floor(emu.pgmctr / 256):
+                    emu.cycles += 1 # Branch takes extra cycle if crossing page boundary
+                emu.cycles += 1 # Takes 1 additional cycles if nonzero
+            emu.cycles += 2 # Takes 2 cycles no matter what
+            # </editor-fold>
+        case 0xD1:
+            # <editor-fold desc="Compare with Accumulator Indirect, Y Indexed (Exclusive Indirect)">
+            addr = emu.get_incl_indr()
+            emu.cmp(emu.regA, emu.read(addr))
+            emu.cycles += 5
+            # </editor-fold>
+        case 0xD5:
+            # <editor-fold desc="Compare with Accumulator Zero Page, X Indexed">
+            addr = (emu.read() + emu.regX) % 256
+            emu.cmp(emu.regA, emu.read(addr))
+            emu.cycles += 3
+            # </editor-fold>
+        case 0xD6:
+            # <editor-fold desc="Decrement Memory Zero Page, X Indexed">
+            addr = (emu.read() + emu.regX) % 256
+            emu.write(addr, emu.dec(emu.read(addr)))
+            emu.cycles += 6
+            # </editor-fold>
+        case 0xD8:
+            # <editor-fold desc="Clear Decimal -- Not Used">
+            emu.flag_Decimal = False; emu.cycles += 2
+            return
+            # </editor-fold>
+        case 0xD9:
+            # <editor-fold desc="Compare with Accumulator Absolute, y Indexed">
+            addr = emu.get_abs_indx(emu.get_abs(), emu.regY)
+            emu.cmp(emu.regA, emu.read(addr))
+            emu.cycles += 4
+            # </editor-fold>
+        case 0xDD:
+            # <editor-fold desc="Compare with Accumulator Absolute, X Indexed">
+            addr = emu.get_abs_indx(emu.get_abs(), emu.regX)
+            emu.cmp(emu.regA, emu.read(addr))
+            emu.cycles += 4
+            # </editor-fold>
+        case 0xDE:
+            # <editor-fold desc="Decrement Memory Absolute, X Indexed">
+            addr = emu.get_abs_indx(emu.get_abs(), emu.regX)
+            emu.write(addr, emu.dec(emu.read(addr)))
+            emu.cycles += 7
+            # </editor-fold>
+        case 0xE0:
+            # <editor-fold desc="Compare with X Register Immediate">
+            emu.cmp(emu.regX, emu.read())
+            emu.cycles += 2
+            # </editor-fold>
+        case 0xE1:
+            # <editor-fold desc="Subtract with Carry Indirect, X Indexed (Inclusive Indirect)">
+            addr = emu.get_incl_indr()
+            emu.regA = emu.sbc(emu.regA, emu.read(addr))
+            emu.cycles += 6
+            # </editor-fold>
+        case 0xE4:
+            # <editor-fold desc="Compare with X Register Zero Page">
+            addr = emu.read()
+            emu.cmp(emu.regX, emu.read(addr))
+            emu.cycles += 3
+            # </editor-fold>
+        case 0xE5:
+            # <editor-fold desc="Subtract with Carry Zero Page">
+            addr = emu.read()
+            emu.regA = emu.sbc(emu.regA, emu.read(addr))
+            emu.cycles += 3
+            # </editor-fold>
+        case 0xE6:
+            # <editor-fold desc="Increment Memory Zero page">
+            addr = emu.read()
+            emu.write(addr, emu.inc(emu.read(addr)))
+            emu.cycles += 5
+            # </editor-fold>
+        case 0xE8:
+            # <editor-fold desc="Increment X">
+            emu.regX = emu.inc(emu.regX)
+            emu.cycles += 2; return
+            # </editor-fold>
+        case 0xE9:
+            # <editor-fold desc="Subtract with Carry Immediate">
+            emu.regA = emu.sbc(emu.regA, emu.read())
+            emu.cycles += 2
+            # </editor-fold>
+        case 0xEA:
+            # <editor-fold desc="No Operation">
+            emu.cycles += 2; return
+            # </editor-fold>
+        case 0xEC:
+            # <editor-fold desc="Compare with X Register Absolute">
+            addr = emu.get_abs()
+            emu.cmp(emu.regX, emu.read(addr))
+            emu.cycles += 4
+            # </editor-fold>
+        case 0xED:
+            # <editor-fold desc="Subtract with Carry Absolute">
+            addr = emu.get_abs()
+            emu.regA = emu.sbc(emu.regA, emu.read(addr))
+            emu.cycles += 4
+            # </editor-fold>
+        case 0xEE:
+            # <editor-fold desc="Increment Memory Absolute">
+            addr = emu.get_abs()
+            emu.write(addr, emu.inc(emu.read(addr)))
+            emu.cycles += 6
+            # </editor-fold>
+        case 0xF0:
+            # <editor-fold desc="Branch on Equal">
+            if emu.flag_Zero:
+                signedval = signed8(emu.read())
+                temppg = emu.pgmctr
+                emu.pgmctr += signedval
+                if math.floor(temppg / 256) != math.floor(emu.pgmctr / 256):
+                    emu.cycles += 1  # Branch takes extra cycle if crossing page boundary
+                emu.cycles += 1  # Takes 1 additional cycles if nonzero
+            emu.cycles += 2  # Takes 2 cycles no matter what
+            # </editor-fold>
+        case 0xF1:
+            # <editor-fold desc="Subtract with Carry Indirect, Y Indexed (Exclusive Indirect)">
+            addr, addcycle = emu.get_excl_indr()
+            emu.regA = emu.sbc(emu.regA, emu.read(addr))
+            emu.cycles += 5 + addcycle
+            # </editor-fold>
+        case 0xF5:
+            # <editor-fold desc="Subtract with Carry Zero Page, X Indexed">
+            addr = (emu.read() + emu.regX) % 256
+            emu.regA = emu.sbc(emu.regA, emu.read(addr))
+            emu.cycles += 4
+            # </editor-fold>
+        case 0xF6:
+            # <editor-fold desc="Increment Memory Zero Page, X Indexed">
+            addr = (emu.read() + emu.regX) % 256
+            emu.write(addr, emu.inc(emu.read(addr)))
+            emu.cycles += 6
+            # </editor-fold>
+        case 0xF8:
+            # <editor-fold desc="Set Decimal Flag -- Not Used">
+            emu.flag_Decimal = True; emu.cycles += 2
+            return
+            # </editor-fold>
+        case 0xF9:
+            # <editor-fold desc="Subtract with Carry Absolute, Y Indexed">
+            addr = emu.get_abs_indx(emu.get_abs(), emu.regY)
+            emu.regA = emu.sbc(emu.regA, emu.read(addr))
+            emu.cycles += 4
+            # </editor-fold>
+        case 0xFD:
+            # <editor-fold desc="Subtract with Carry Absolute, X Indexed">
+            addr = emu.get_abs_indx(emu.get_abs(), emu.regX)
+            emu.regA = emu.sbc(emu.regA, emu.read(addr))
+            emu.cycles += 4
+            # </editor-fold>
+        case 0xFE:
+            # <editor-fold desc="Increment Memory Absolute, X Indexed">
+            addr = emu.get_abs() + emu.regX
+            emu.write(addr, emu.inc(emu.read(addr)))
+            emu.cycles += 7 # No additional cycles for crossing page boundary
+            # </editor-fold>
+        case _:
+            print(hex(emu.opcode) + " not implemented")
+            emu.halt = True
+    # The below line automatically increments the counter for all cases
+    # This can be skipped for one byte instructions by returning, it saves space
+    emu.pgmctr += 1
+
+
+def new_emu():
+    emu = Emulation(ROMPATH, debug=True)
+    emu.addSpace[PROGRAM + 1:PROGRAM + 3] = list(OPERANDS)
+    return emu
+
+
+def implemented_opcodes(emu): # Every opcode that has a real handler in the table
+    return [code for code in range(256) if emu.optable[code] != emu.op_illegal]
+
+
+def snapshot(emu):
+    return (emu.pgmctr, emu.regA, emu.regX, emu.regY, emu.stackptr, emu.cycles, emu.halt, emu.status,
+            emu.addSpace[0:0x801])
+
+
+def randomize(emu, code, rng): # Give the emulator a random (but reproducible) state to run one op from
+    emu.addSpace[0:0x800] = [rng.randrange(256) for _ in range(0x800)]
+    emu.addSpace[PROGRAM] = code
+    emu.opcode = code
+    emu.pgmctr = PROGRAM + 1
+    emu.regA = rng.randrange(256); emu.regX = rng.randrange(256); emu.regY = rng.randrange(256)
+    emu.stackptr = rng.randrange(0x10, 0xF0)
+    emu.cycles = 0
+    emu.halt = False
+    emu.status = rng.randrange(256) & ~FLAG_B | FLAG_U
+
+
+def run_guarded(engine):
+    try:
+        with contextlib.redirect_stdout(io.StringIO()): # Illegal opcodes (and $81) print, we don't need to see it
+            engine()
+    except Exception as exc:
+        return type(exc)
+    return None
+
+
+def check_engines(codes=None, trials=20, seed=0): # Run both engines from identical states, return the opcodes that disagree
+    old = new_emu(); new = new_emu()
+    if codes is None:
+        codes = range(256)
+    mismatches = []
+    for code in codes:
+        for trial in range(trials):
+            randomize(old, code, random.Random(f"{seed}.{code}.{trial}"))
+            randomize(new, code, random.Random(f"{seed}.{code}.{trial}"))
+            olderr = run_guarded(lambda: match_op(old))
+            newerr = run_guarded(new.op)
+            if olderr != newerr or snapshot(old) != snapshot(new):
+                mismatches.append(code)
+                break
+    return mismatches
+
+
+def time_engine(emu, code, engine, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        emu.pgmctr = PROGRAM + 1; emu.stackptr = 0xFD; emu.halt = False
+        emu.regA = 0x41; emu.regX = 0x03; emu.regY = 0x05
+        emu.opcode = code
+        engine()
+    return time.perf_counter() - start
+
+
+def bench(codes, iterations):
+    emu = new_emu()
+    results = []
+    # The register resets in time_engine cost the same for both engines, so time an empty engine and take it back out
+    overhead = min(time_engine(emu, 0xEA, lambda: None, iterations) for _ in range(3))
+    for code in codes:
+        emu.addSpace[PROGRAM] = code
+        matchtime = min(time_engine(emu, code, lambda: match_op(emu), iterations) for _ in range(3)) - overhead
+        tabletime = min(time_engine(emu, code, emu.op, iterations) for _ in range(3)) - overhead
+        results.append((code, iterations / max(matchtime, 1e-9), iterations / max(tabletime, 1e-9)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Opcode dispatch microbenchmark, match statement vs handler table")
+    parser.add_argument("-n", "--iterations", type=int, default=20000)
+    parser.add_argument("opcodes", nargs="*", help="Opcodes to benchmark in hex (default: all implemented)")
+    args = parser.parse_args()
+    emu = new_emu()
+    codes = [int(code, 16) for code in args.opcodes] or implemented_opcodes(emu)
+
+    mismatches = check_engines(codes)
+    if mismatches:
+        print("WARNING, engines disagree on: " + ", ".join(f"{code:#04x}" for code in mismatches))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = bench(codes, args.iterations)
+    print(f"{'op':>6} {'match ips':>14} {'table ips':>14} {'speedup':>8}")
+    for code, matchips, tableips in results:
+        print(f"{code:#06x} {matchips:>14,.0f} {tableips:>14,.0f} {tableips / matchips:>7.2f}x")
+    # Opcodes at the bottom of the match paid for every arm above them, the table should be flat across the range
+    for low, high in ((0x00, 0x3F), (0x40, 0x7F), (0x80, 0xBF), (0xC0, 0xFF)):
+        chunk = [r for r in results if low <= r[0] <= high]
+        if chunk:
+            matchavg = sum(r[1] for r in chunk) / len(chunk)
+            tableavg = sum(r[2] for r in chunk) / len(chunk)
+            print(f"{low:#04x}-{high:#04x}: match avg {matchavg:,.0f} ips, table avg {tableavg:,.0f} ips")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,442 @@
+from customTypes import *
+import alu
+
+# Basic block compiler. Takes a run of straight line instructions starting at some address, stopping at (and
+# including) a branch, jump, JSR or RTS, and writes one python function for the whole run. The registers live in
+# locals for the length of the block and only get written back to the Emulation at the end, and operand bytes,
+# addresses and cycle counts are all baked in as constants so nothing gets decoded twice
+# Blocks that end in a branch or jump back to their own start loop inside the function, which is where the big wins
+# are for delay and copy loops
+
+# Only ops listed in EMITTERS get compiled. The block stops before anything else (RTI, BRK, halt, ops with known quirks
+# in opcodes.py) and the interpreter runs that instruction instead, compiled code has to land in exactly the same state
+# as the interpreter would, cycles included
+# Code is only compiled out of pages directly backed by a buffer above internal ram (prg ram, rom). Pages that can be
+# written to get their writes routed through code_write so the blocks on them are thrown away when they change
+
+MAX_BLOCK = 32 # Instructions
+MAX_OP_CYCLES = 7
+BUS_CYCLES = 514 # Most a bus write can add on top of its instruction, the OAM DMA stall
+
+BRANCHES = { # opcode: condition for the branch being taken
+    0x10: "not p & 0x80", 0x30: "p & 0x80", 0x50: "not p & 0x40", 0x70: "p & 0x40",
+    0x90: "not p & 0x01", 0xB0: "p & 0x01", 0xD0: "not p & 0x02", 0xF0: "p & 0x02",
+}
+
+SETNZ = "p = p & CLEAR_NZ | NZ[{0}]"
+
+EMITTERS = {} # opcode: (length, function(compiler, addr, operand) -> list of lines)
+
+
+def emitter(length, *codes):
+    def register(fn):
+        for code in codes:
+            EMITTERS[code] = (length, fn)
+        return fn
+    return register
+
+
+# <editor-fold desc="Addressing helpers, each returns (lines, expression)">
+def sync(addr): # Bring the Emulation up to date before touching a register page, handlers might care about timing
+    return f"emu.cycles = cyc; emu.pgmctr = {addr}"
+
+
+def read_const(address, addr):
+    if address < 0x2000:
+        return [], f"ram[{address & 0x7FF}]"
+    return [sync(addr)], f"read({address})"
+
+
+def read_indexed(base, index, addr): # abs,X / abs,Y, page crossing costs a cycle like get_abs_indx
+    return [f"t = {base} + {index}",
+            f"cyc += {base & 0xFF} + {index} > 255",
+            "if t < 0x2000:",
+            "    v = ram[t & 0x7FF]",
+            "else:",
+            f"    {sync(addr)}",
+            "    v = read(t)"], "v"
+
+
+def operand_value(mode, operand, addr): # addr is where the interpreter's pgmctr sits after fetching the operand
+    if mode == "imm":
+        return [], str(operand)
+    if mode == "zp":
+        return [], f"ram[{operand}]"
+    if mode == "zpx":
+        return [], f"ram[({operand} + x) & 0xFF]"
+    if mode == "abs":
+        return read_const(operand, addr)
+    if mode == "absx":
+        return read_indexed(operand, "x", addr)
+    if mode == "absy":
+        return read_indexed(operand, "y", addr)
+# </editor-fold>
+
+
+# <editor-fold desc="Loads and stores">
+LOADS = {0xA9: ("a", "imm", 2), 0xA2: ("x", "imm", 2), 0xA0: ("y", "imm", 2), 0xAD: ("a", "abs", 4),
+         0xBD: ("a", "absx", 4), 0xB9: ("a", "absy", 4), 0xB5: ("a", "zpx", 4)}
+
+
+@emitter(2, 0xA9, 0xA2, 0xA0, 0xB5)
+@emitter(3, 0xAD, 0xBD, 0xB9)
+def emit_load(compiler, code, addr, operand):
+    reg, mode, cycles = LOADS[code]
+    lines, value = operand_value(mode, operand, addr)
+    return lines + [f"{reg} = {value}", SETNZ.format(reg), f"cyc += {cycles}"]
+
+
+@emitter(2, 0x85, 0x86, 0x84)
+def emit_store_zp(compiler, code, addr, operand):
+    reg = {0x85: "a", 0x86: "x", 0x84: "y"}[code]
+    return [f"ram[{operand}] = {reg}", "cyc += 3"]
+
+
+@emitter(2, 0x95)
+def emit_store_zpx(compiler, code, addr, operand):
+    return [f"ram[({operand} + x) & 0xFF] = a", "cyc += 4"]
+
+
+@emitter(3, 0x8D)
+def emit_store_abs(compiler, code, addr, operand):
+    if operand < 0x2000:
+        return [f"ram[{operand & 0x7FF}] = a", "cyc += 4"]
+    if not compiler.writable(operand):
+        return None # Let the interpreter raise the MemoryError
+    compiler.ends = True # Register writes can have side effects, start a fresh block after them
+    return [sync(addr), f"write({operand}, a)", "cyc = emu.cycles + 4"] # Handlers can add cycles (OAM DMA)
+
+
+@emitter(3, 0x9D)
+def emit_store_absx(compiler, code, addr, operand):
+    if operand + 0xFF >= 0x2000: # Can land past ram, maybe on this block's own code or a register, end it like abs does
+        compiler.ends = True
+    return [f"t = {operand} + x",
+            f"cyc += {operand & 0xFF} + x > 255",
+            "if t < 0x2000:",
+            "    ram[t & 0x7FF] = a",
+            "else:",
+            f"    {sync(addr)}",
+            "    write(t, a)",
+            "    cyc = emu.cycles",
+            "cyc += 5"]
+# </editor-fold>
+
+
+# <editor-fold desc="Arithmetic and logic">
+ALU_OPS = {0x69: ("adc", "imm", 2), 0x65: ("adc", "zp", 3), 0x6D: ("adc", "abs", 4),
+           0xE9: ("sbc", "imm", 2), 0xE5: ("sbc", "zp", 3), 0xED: ("sbc", "abs", 4), 0xF5: ("sbc", "zpx", 4),
+           0xFD: ("sbc", "absx", 4), 0xF9: ("sbc", "absy", 4), 0x75: ("adc", "zpx", 4),
+           0x29: ("and", "imm", 2), 0x25: ("and", "zp", 3), 0x2D: ("and", "abs", 4), 0x35: ("and", "zpx", 4),
+           0x3D: ("and", "absx", 4), 0x39: ("and", "absy", 4),
+           0x09: ("ora", "imm", 2), 0x05: ("ora", "zp", 3), 0x0D: ("ora", "abs", 4), 0x15: ("ora", "zpx", 4),
+           0x1D: ("ora", "absx", 4), 0x19: ("ora", "absy", 4),
+           0x49: ("eor", "imm", 2), 0x45: ("eor", "zp", 3), 0x4D: ("eor", "abs", 4),
+           0x5D: ("eor", "absx", 4), 0x59: ("eor", "absy", 4),
+           0xC9: ("cmpa", "imm", 2), 0xC5: ("cmpa", "zp", 3), 0xCD: ("cmpa", "abs", 4),
+           0xDD: ("cmpa", "absx", 4), 0xD9: ("cmpa", "absy", 4),
+           0xE0: ("cmpx", "imm", 2), 0xE4: ("cmpx", "zp", 3), 0xEC: ("cmpx", "abs", 4),
+           0xC0: ("cmpy", "imm", 2), 0xC4: ("cmpy", "zp", 3), 0xCC: ("cmpy", "abs", 4)}
+
+ALU_LINES = {
+    "adc": ["r = ADC[(p & 1) << 16 | a << 8 | {0}]", "a = r & 0xFF", "p = p & CLEAR_NVZC | r >> 8"],
+    "sbc": ["r = ADC[(p & 1) << 16 | a << 8 | {0} ^ 0xFF]", "a = r & 0xFF", "p = p & CLEAR_NVZC | r >> 8"],
+    "and": ["a &= {0}", SETNZ.format("a")],
+    "ora": ["a |= {0}", SETNZ.format("a")],
+    "eor": ["a ^= {0}", SETNZ.format("a")],
+    "cmpa": ["p = p & CLEAR_NZC | CMP[a << 8 | {0}]"],
+    "cmpx": ["p = p & CLEAR_NZC | CMP[x << 8 | {0}]"],
+    "cmpy": ["p = p & CLEAR_NZC | CMP[y << 8 | {0}]"],
+}
+
+
+@emitter(2, *[code for code, (_, mode, _) in ALU_OPS.items() if mode in ("imm", "zp", "zpx")])
+@emitter(3, *[code for code, (_, mode, _) in ALU_OPS.items() if mode in ("abs", "absx", "absy")])
+def emit_alu(compiler, code, addr, operand):
+    name, mode, cycles = ALU_OPS[code]
+    lines, value = operand_value(mode, operand, addr)
+    return lines + [line.format(value) for line in ALU_LINES[name]] + [f"cyc += {cycles}"]
+
+
+SHIFTS = {0x4A: ("LSR", None, 2), 0x2A: ("ROL", None, 2), 0x6A: ("ROR", None, 2),
+          0x26: ("ROL", "zp", 5), 0x46: ("LSR", "zp", 5), 0x66: ("ROR", "zp", 5),
+          0x36: ("ROL", "zpx", 6), 0x16: ("ASL", "zpx", 6), 0x76: ("ROR", "zpx", 6)}
+
+
+@emitter(1, 0x4A, 0x2A, 0x6A)
+@emitter(2, 0x26, 0x46, 0x66, 0x36, 0x16, 0x76)
+def emit_shift(compiler, code, addr, operand):
+    table, mode, cycles = SHIFTS[code]
+    target = {None: "a", "zp": f"ram[{operand}]", "zpx": f"ram[({operand} + x) & 0xFF]"}[mode]
+    lines = []
+    if mode == "zpx":
+        lines.append(f"t = ({operand} + x) & 0xFF")
+        target = "ram[t]"
+    index = "{0}" if table in ("ASL", "LSR") else "(p & 1) << 8 | {0}"
+    return lines + [f"r = {table}[{index.format(target)}]", f"{target} = r & 0xFF",
+                    "p = p & CLEAR_NZC | r >> 8", f"cyc += {cycles}"]
+
+
+@emitter(2, 0xE6, 0xF6)
+def emit_inc_zp(compiler, code, addr, operand):
+    if code == 0xE6:
+        return [f"v = (ram[{operand}] + 1) & 0xFF", f"ram[{operand}] = v", SETNZ.format("v"), "cyc += 5"]
+    return [f"t = ({operand} + x) & 0xFF", "v = (ram[t] + 1) & 0xFF", "ram[t] = v", SETNZ.format("v"), "cyc += 6"]
+
+
+@emitter(3, 0xEE)
+def emit_inc_abs(compiler, code, addr, operand):
+    if operand >= 0x2000:
+        return None
+    return [f"v = (ram[{operand & 0x7FF}] + 1) & 0xFF", f"ram[{operand & 0x7FF}] = v", SETNZ.format("v"), "cyc += 6"]
+# </editor-fold>
+
+
+# <editor-fold desc="Registers, flags and the stack">
+IMPLIED = {
+    0xE8: ["x = (x + 1) & 0xFF", SETNZ.format("x")],
+    0xC8: ["y = (y + 1) & 0xFF", SETNZ.format("y")],
+    0xCA: ["x = (x - 1) & 0xFF", SETNZ.format("x")],
+    0xAA: ["x = a", SETNZ.format("x")],
+    0xA8: ["y = a", SETNZ.format("y")],
+    0x8A: ["a = x", SETNZ.format("a")],
+    0x98: ["a = y", SETNZ.format("a")],
+    0xBA: ["x = sp", SETNZ.format("x")],
+    0xEA: [],
+    0x18: ["p &= 0xFE"], 0x38: ["p |= 0x01"], 0x58: ["p &= 0xFB", "emu.interrupts.poll()"], 0x78: ["p |= 0x04"],
+    0xB8: ["p &= 0xBF"], 0xD8: ["p &= 0xF7"],
+}
+
+def push(value, pgmctr): # Emulation.push, sp doesn't wrap, so once it's gone below 0 the bus decides like it does there
+    return ["if sp < 0:", f"    {sync(pgmctr)}", f"    write(0x100 + sp, {value})", "else:",
+            f"    ram[0x100 + sp] = {value}", "sp -= 1"]
+
+
+def pull(target): # Emulation.pull
+    return ["sp = 0 if sp == 0xFF else sp + 1", f"{target} = ram[0x100 + sp] if sp >= 0 else read(0x100 + sp)"]
+
+
+STACK = { # opcode: (pushed or None, pulled into or None, lines after, cycles)
+    0x48: ("a", None, [], 3),
+    0x08: ("p | 0x30", None, [], 3),
+    0x68: (None, "a", [SETNZ.format("a")], 4),
+    0x28: (None, "p", ["p = p & 0xEF | 0x20", "emu.interrupts.poll()"], 3),
+}
+
+
+@emitter(1, *IMPLIED)
+def emit_implied(compiler, code, addr, operand):
+    return IMPLIED[code] + ["cyc += 2"]
+
+
+@emitter(1, *STACK)
+def emit_stack(compiler, code, addr, operand):
+    pushed, pulled, after, cycles = STACK[code]
+    lines = push(pushed, addr + 1) if pushed is not None else pull(pulled)
+    return lines + after + [f"cyc += {cycles}"]
+# </editor-fold>
+
+
+# <editor-fold desc="Control flow, these end the block">
+@emitter(2, *BRANCHES)
+def emit_branch(compiler, code, addr, operand):
+    # Same cycle rule as the interpreter, +1 if taken and +1 more if the operand and target-1 are on different pages
+    offset = signed8(operand)
+    taken = addr + offset + 1
+    cross = (addr >> 8) != ((addr + offset) >> 8)
+    compiler.ends = compiler.jumps = True
+    return [f"if {BRANCHES[code]}:"] + compiler.goto(taken, 3 + cross, indent="    ") + \
+           ["else:", "    cyc += 2", f"    pc = {addr + 1}"]
+
+
+@emitter(3, 0x4C)
+def emit_jmp(compiler, code, addr, operand):
+    compiler.ends = compiler.jumps = True
+    return compiler.goto(operand, 3)
+
+
+@emitter(3, 0x20)
+def emit_jsr(compiler, code, addr, operand):
+    compiler.ends = compiler.jumps = True
+    ret = addr # The interpreter pushes the address of the last operand byte
+    return push(ret >> 8, ret) + push(ret & 0xFF, ret) + ["cyc += 6", f"pc = {operand}"]
+
+
+@emitter(1, 0x60)
+def emit_rts(compiler, code, addr, operand):
+    compiler.ends = compiler.jumps = True
+    return pull("lo") + pull("hi") + ["pc = lo + hi * 256 + 1", "cyc += 6"]
+# </editor-fold>
+
+
+class BlockCompiler:
+    def __init__(self, emu):
+        self.emu = emu
+        self.bus = emu.bus
+        self.cache = {} # Start address: compiled block, or the interpreter step for addresses we can't compile
+        self.spans = {} # Start address: (first, last) byte the block was compiled from
+        self.worst = {} # Start address: most cycles a pass can take before its last instruction starts
+        self.pageBlocks = {} # Page: start addresses of blocks with bytes on that page, only for writable pages
+        self.watched = {} # Page: the direct view we took away from the bus to watch writes
+        self.stops = set() # Breakpoint addresses, blocks end before them and they're interpreted (see breakpoints.py)
+        self.exact = False # Set while memory is watched or a condition is checked, everything is interpreted
+        self.compiled = 0
+        self.namespace = {"NZ": NZ_FLAGS, "ADC": alu.ADC, "CMP": alu.CMP, "ASL": alu.ASL, "LSR": alu.LSR,
+                          "ROL": alu.ROL, "ROR": alu.ROR, "CLEAR_NZ": CLEAR_NZ, "CLEAR_NZC": alu.CLEAR_NZC,
+                          "CLEAR_NVZC": alu.CLEAR_NVZC}
+        self.ends = False # Set by emitters for instructions that have to be the last one in a block
+        self.jumps = False # Set by emitters that assign pc themselves
+        self.loops = False # Set when the block jumps back to its own start
+        self.idleLoop = None # The block is an idle loop (see idle.py), its loop fast forwards
+        self.start = 0
+
+    def compilable(self, page): # Only code in buffer backed pages outside internal ram
+        return page >= 0x20 and self.bus.readPages[page] is not None
+
+    def writable(self, address):
+        page = address >> 8
+        return self.bus.writePages[page] is not None or self.bus.writeHandlers[page] != self.bus.bad_write
+
+    def goto(self, target, cycles, indent=""): # Jump to target, looping inside the block if target is its start
+        if target == self.start:
+            self.loops = True
+            skip = []
+            if self.idleLoop is not None: # A trip that changed nothing will go the same way every time until limit
+                skip = [f"{indent}if a == a0 and x == x0 and y == y0 and p == p0:",
+                        f"{indent}    cyc = skip(loop, cyc, cyc - c0, limit)"]
+            return [f"{indent}cyc += {cycles}"] + skip + [f"{indent}if cyc < limit:", f"{indent}    continue",
+                                                           f"{indent}pc = {target}"]
+        return [f"{indent}cyc += {cycles}", f"{indent}pc = {target}"]
+
+    def get(self, address): # Block starting at address, compiling it if it isn't cached yet
+        block = self.cache.get(address)
+        if block is None:
+            block = self.compile_block(address)
+        return block
+
+    def compile_block(self, start):
+        peek = self.bus.peek
+        self.start = start; self.loops = False
+        idle = self.emu.idle
+        self.idleLoop = idle.find(start) if idle.enabled else None
+        body = ["a0 = a; x0 = x; y0 = y; p0 = p; c0 = cyc"] if self.idleLoop is not None else []
+        addr = start
+        count = 0
+        if self.compilable(start >> 8) and not self.exact and start not in self.stops:
+            while count < MAX_BLOCK:
+                if addr != start and addr in self.stops:
+                    break
+                code = peek(addr)
+                if code not in EMITTERS:
+                    break
+                length, emit = EMITTERS[code]
+                if not all(self.compilable((addr + i) >> 8) for i in range(length)) or addr + length > 0x10000:
+                    break
+                operand = None
+                if length == 2:
+                    operand = peek(addr + 1)
+                elif length == 3:
+                    operand = peek(addr + 1) | peek(addr + 2) << 8
+                self.ends = self.jumps = False
+                lines = emit(self, code, addr + length - 1, operand)
+                if lines is None:
+                    break
+                body.append(f"# {addr:#06x}: {code:02X}")
+                body += lines
+                addr += length
+                count += 1
+                if self.ends:
+                    break
+        if self.idleLoop is not None and not self.loops: # Loop split over blocks, interpret the jump back so the
+            self.cache[self.idleLoop.end] = self.interpret # skipper's wrapped branch sees it
+        if count == 0:
+            self.cache[start] = self.interpret
+            return self.interpret
+        if not self.jumps:
+            body.append(f"pc = {addr}")
+        block = self.build(start, body)
+        self.cache[start] = block
+        self.spans[start] = (start, addr - 1)
+        self.worst[start] = MAX_OP_CYCLES * (count - 1) + (BUS_CYCLES if any("write(" in line for line in body) else 0)
+        for page in range(start >> 8, ((addr - 1) >> 8) + 1):
+            if self.bus.writePages[page] is not None or page in self.watched:
+                self.watch(page, start)
+        self.compiled += 1
+        return block
+
+    def build(self, start, body):
+        indent = "            " if self.loops else "        "
+        source = ["def block(emu, limit, ram=ram, read=read, write=write):",
+                  "    a = emu.regA; x = emu.regX; y = emu.regY; p = emu.status; sp = emu.stackptr; cyc = emu.cycles",
+                  "    try:"]
+        if self.loops:
+            source.append("        while True:")
+        source += [indent + line for line in body]
+        if self.loops:
+            source.append(indent + "break")
+        source += ["    finally:",
+                   "        emu.regA = a; emu.regX = x; emu.regY = y; emu.status = p; emu.stackptr = sp; emu.cycles = cyc",
+                   "    emu.pgmctr = pc"]
+        namespace = dict(self.namespace, ram=self.bus.ram, read=self.bus.read, write=self.bus.write,
+                         skip=self.emu.idle.skip, loop=self.idleLoop)
+        exec(compile("\n".join(source), f"<block {start:#06x}>", "exec"), namespace)
+        return namespace["block"]
+
+    def interpret(self, emu, limit): # Fallback for anything the compiler can't handle, runs one instruction
+        emu.opcode = emu.bus.read(emu.pgmctr)
+        emu.pgmctr += 1
+        emu.optable[emu.opcode]()
+
+    # <editor-fold desc="Invalidation">
+    def watch(self, page, start): # Route writes to page through code_write while it has compiled code on it
+        self.pageBlocks.setdefault(page, set()).add(start)
+        if page in self.watched:
+            return
+        self.watched[page] = self.bus.writePages[page]
+        self.bus.writePages[page] = None
+        self.bus.writeHandlers[page] = self.code_write
+
+    def code_write(self, address, data):
+        page = address >> 8
+        view = self.watched[page]
+        view[address & 0xFF] = data
+        self.invalidate_page(page)
+
+    def invalidate_page(self, page): # Throw away every block with bytes on page and give the page its direct view back
+        for start in self.pageBlocks.pop(page, ()):
+            self.cache.pop(start, None)
+            self.worst.pop(start, None)
+            first, last = self.spans.pop(start, (start, start))
+            for other in range(first >> 8, (last >> 8) + 1):
+                if other != page and other in self.pageBlocks:
+                    self.pageBlocks[other].discard(start)
+        view = self.watched.pop(page, None)
+        if view is not None:
+            self.bus.writePages[page] = view
+            self.bus.writeHandlers[page] = self.bus.bad_write
+
+    def forget(self, addresses): # Throw away the blocks with any of addresses in them, breakpoints came or went there
+        for start, (first, last) in list(self.spans.items()):
+            if any(first <= address <= last for address in addresses):
+                self.cache.pop(start, None)
+                del self.spans[start]
+                del self.worst[start]
+        for address in addresses:
+            self.cache.pop(address, None)
+
+    def flush(self, first=0, last=0xFFFF): # Forget the blocks with bytes in first-last, when the memory map changes
+        if first == 0 and last == 0xFFFF: # Everything, breakpoints, idle skipping on or off
+            for page in list(self.watched):
+                self.invalidate_page(page)
+            self.cache.clear()
+            self.spans.clear()
+            self.worst.clear()
+            return
+        for start, (low, high) in list(self.spans.items()):
+            if low <= last and high >= first:
+                self.cache.pop(start, None)
+                del self.spans[start]
+                del self.worst[start]
+        for start in [start for start in self.cache if first <= start <= last]: # Interpreted steps have no span
+            del self.cache[start]
+    # </editor-fold>
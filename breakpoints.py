@@ -0,0 +1,226 @@
+from memoryBus import aliases
+
+# Breakpoints and watchpoints. Nothing here is looked at while none are set, the optable, the bus page table and the
+# block compiler are exactly what they'd be without it
+# A breakpoint on a pc wraps the optable slots of the opcodes sitting at breakpoint addresses (every slot if one is on a
+# page that can be written, the code there could change), so only those instructions pay a dict lookup. The block
+# compiler ends blocks before breakpoint addresses and interprets them, compiled code runs at full speed up to them
+# A breakpoint with a condition and no pc is checked before every instruction, which wraps every slot
+# A watchpoint takes the pages its addresses (and their mirrors) are on out of the bus's direct path and puts a handler
+# in their place that does the access as before and then looks the address up in a dict for that page. Every other
+# page keeps its view. Compiled code goes straight into ram without the bus, so while anything is watched or a
+# condition is set run_compiled interprets everything
+# A hit stops the emulator like the halt opcode does, emu.stop(), and the run loops drop out. A breakpoint stops before
+# its instruction with the pc on it, running on from there executes it. A watchpoint stops after the instruction that
+# made the access
+# Breakpoint wrappers stay outermost in the optable. Idle skipping and the profiler wrap slots and later put back what
+# they found, so they make their changes through beneath(), which takes our wrappers off first and wraps what they
+# left afterwards
+# Idle loop skipping (see idle.py) runs trips of a loop without running their instructions, breakpoints in an idle loop
+# only see the trips that are really run
+
+READ = 1
+WRITE = 2
+
+
+class Breakpoint:
+    def __init__(self, pgmctr=None, condition=None):
+        self.pgmctr = pgmctr # None checks condition before every instruction
+        self.condition = condition # condition(emu) -> bool, None always breaks
+        self.hits = 0
+
+    def __repr__(self):
+        where = f"at {self.pgmctr:#06x}" if self.pgmctr is not None else "anywhere"
+        return f"<Breakpoint {where}{' if condition' if self.condition is not None else ''}, {self.hits} hits>"
+
+
+class Watchpoint:
+    def __init__(self, first, last, access, condition=None):
+        self.first = first
+        self.last = last # Inclusive
+        self.access = access # READ, WRITE or both
+        self.condition = condition # condition(address, data) -> bool, None always breaks
+        self.hits = 0
+        self.address = self.data = None # Of the last access that hit, as the CPU made it (so maybe a mirror)
+
+    def __repr__(self):
+        kinds = "/".join(kind for bit, kind in ((READ, "read"), (WRITE, "write")) if self.access & bit)
+        return f"<Watchpoint {kinds} {self.first:#06x}-{self.last:#06x}, {self.hits} hits>"
+
+
+class Breakpoints:
+    def __init__(self, emu):
+        self.emu = emu
+        self.bus = emu.bus
+        self.points = [] # Everything set, in the order it was added
+        self.pcs = {} # pgmctr: [Breakpoint]
+        self.conditions = [] # Breakpoints without a pgmctr
+        self.hooked = {} # (page, READ or WRITE): [offset: [Watchpoint], our handler, the bus entries we replaced]
+        self.handlers = {} # Opcode: the handler we wrapped
+        self.hit = None # What stopped the current or last run, None if nothing did
+        self.resume = None # (pgmctr, cycles) when a breakpoint stopped us, running on from exactly there executes it
+        emu.cartridge.mapper.listeners.append(self.switched)
+
+    def break_at(self, pgmctr, condition=None): # Stop before the instruction at pgmctr, when condition(emu) if given
+        return self.add(Breakpoint(pgmctr, condition))
+
+    def break_when(self, condition): # Stop before any instruction where condition(emu) holds
+        return self.add(Breakpoint(None, condition))
+
+    def watch(self, first, last=None, read=False, write=True, condition=None): # Stop after an access to first-last
+        return self.add(Watchpoint(first, first if last is None else last, (READ if read else 0) | (WRITE if write else 0),
+                                   condition))
+
+    def add(self, point):
+        self.points.append(point)
+        self.refresh()
+        return point
+
+    def remove(self, point):
+        self.points.remove(point)
+        self.refresh()
+
+    def clear(self):
+        del self.points[:]
+        self.refresh()
+
+    def __len__(self):
+        return len(self.points)
+
+    # <editor-fold desc="Installing">
+    def refresh(self): # Take everything out and put back what points needs
+        emu = self.emu
+        for key in list(self.hooked):
+            self.unhook(*key)
+        self.pcs = {}
+        self.conditions = []
+        tables = {}
+        for point in self.points:
+            if isinstance(point, Watchpoint):
+                for address in range(point.first, point.last + 1):
+                    for alias in aliases(address):
+                        for access in (READ, WRITE):
+                            if point.access & access:
+                                table = tables.setdefault((alias >> 8, access), {})
+                                table.setdefault(alias & 0xFF, []).append(point)
+            elif point.pgmctr is None:
+                self.conditions.append(point)
+            else:
+                self.pcs.setdefault(point.pgmctr, []).append(point)
+        compiler = emu.compiler
+        stops, exact = set(self.pcs), bool(self.conditions or tables)
+        if exact or compiler.exact:
+            compiler.flush() # Gives back the pages it watches for code writes before we take any
+        else: # Only pc breakpoints came or went, run_until(address) does that every call
+            compiler.forget(stops ^ compiler.stops)
+        compiler.stops, compiler.exact = stops, exact
+        for (page, access), offsets in tables.items():
+            self.hook(page, access, offsets)
+        self.wrap_ops()
+
+    def hook(self, page, access, offsets): # Route page's reads or writes through a handler that checks offsets
+        bus = self.bus
+        if access == READ:
+            view, handler, peek = replaced = bus.readPages[page], bus.readHandlers[page], bus.peekHandlers[page]
+
+            def checked(address):
+                data = view[address & 0xFF] if view is not None else handler(address)
+                points = offsets.get(address & 0xFF)
+                if points is not None:
+                    self.watched(points, address, data)
+                return data
+            bus.readPages[page] = None
+            bus.readHandlers[page] = checked
+            bus.peekHandlers[page] = peek if view is None else lambda address: view[address & 0xFF]
+        else:
+            view, handler = replaced = bus.writePages[page], bus.writeHandlers[page]
+
+            def checked(address, data):
+                if view is not None:
+                    view[address & 0xFF] = data
+                else:
+                    handler(address, data)
+                points = offsets.get(address & 0xFF)
+                if points is not None:
+                    self.watched(points, address, data)
+            bus.writePages[page] = None
+            bus.writeHandlers[page] = checked
+        self.hooked[page, access] = [offsets, checked, replaced]
+
+    def unhook(self, page, access):
+        bus = self.bus
+        offsets, checked, replaced = self.hooked.pop((page, access))
+        if access == READ:
+            if bus.readPages[page] is None and bus.readHandlers[page] is checked: # Else a bank switch mapped it again
+                bus.readPages[page], bus.readHandlers[page], bus.peekHandlers[page] = replaced
+        elif bus.writePages[page] is None and bus.writeHandlers[page] is checked:
+            bus.writePages[page], bus.writeHandlers[page] = replaced
+        return offsets
+
+    def wrap_ops(self): # Wrap the slots of the opcodes breakpoints can land on, and unwrap the rest
+        optable = self.emu.optable
+        codes = set()
+        if self.conditions or any(self.emu.compiler.writable(pgmctr) for pgmctr in self.pcs):
+            codes = set(range(0x100))
+        elif self.pcs:
+            codes = {self.bus.peek(pgmctr) for pgmctr in self.pcs}
+        for code in set(self.handlers) - codes:
+            optable[code] = self.handlers.pop(code)
+        for code in codes - set(self.handlers):
+            self.handlers[code] = optable[code]
+            optable[code] = self.wrap(optable[code])
+
+    def beneath(self, change): # Run change(), another layer wrapping or restoring optable slots, under our wrappers
+        optable = self.emu.optable
+        for code, handler in self.handlers.items():
+            optable[code] = handler
+        self.handlers.clear()
+        try:
+            return change()
+        finally:
+            self.wrap_ops()
+
+    def wrap(self, handler):
+        emu = self.emu
+        pcs = self.pcs
+
+        def checked():
+            if emu.pgmctr - 1 in pcs or self.conditions:
+                if self.check(emu.pgmctr - 1):
+                    return
+            handler()
+        return checked
+
+    def switched(self, kind): # Banks moved under us, take the new pages' views and look at the new opcodes
+        if kind != "prg" or not self.points:
+            return
+        for page, access in list(self.hooked):
+            self.hook(page, access, self.unhook(page, access))
+        self.wrap_ops()
+    # </editor-fold>
+
+    # <editor-fold desc="Hits">
+    def check(self, pgmctr): # True if a breakpoint stops the instruction at pgmctr, the pc is put back on it
+        emu = self.emu
+        if self.resume == (pgmctr, emu.cycles): # Stopped here last time, this is the run on from it
+            self.resume = None
+            return False
+        for point in self.pcs.get(pgmctr, []) + self.conditions:
+            if point.condition is None or point.condition(emu):
+                emu.pgmctr = pgmctr
+                self.resume = (pgmctr, emu.cycles)
+                self.stop(point)
+                return True
+        return False
+
+    def watched(self, points, address, data):
+        for point in points:
+            if point.condition is None or point.condition(address, data):
+                point.address, point.data = address, data
+                self.stop(point)
+
+    def stop(self, point):
+        point.hits += 1
+        self.hit = point
+        self.emu.stop()
+    # </editor-fold>
@@ -0,0 +1,425 @@
+from interrupts import IRQ_MAPPER
+from savestate import Fields
+import hashlib
+import mmap
+import os
+import struct
+
+# Cartridges: the iNES / NES 2.0 header, the prg and chr data behind it, and the mapper that decides which banks of it
+# the CPU and PPU see
+# Banks are never copied. Every 8K prg bank is cut up once into its 32 page views, and a bank switch is one slice
+# assignment of that list into the bus page table, so it costs the same for a 512K rom as for a 32K one. chr is handled
+# the same way in 1K slots (chrPages), which is what the PPU reads pattern data through
+# The rom itself is mmapped read only (RomImage) and cached by hash, so any number of emulators running the same rom
+# share one copy of it and one set of bank views
+
+HEADER_SIZE = 0x10
+TRAINER_SIZE = 0x200
+PRG_UNIT = 0x4000 # Header prg size is in 16K units
+CHR_UNIT = 0x2000 # and chr in 8K units
+PRG_BANK = 0x2000 # Smallest prg bank any of our mappers switches
+CHR_BANK = 0x400 # Smallest chr bank
+
+HORIZONTAL = "horizontal"
+VERTICAL = "vertical"
+FOUR_SCREEN = "four screen"
+SINGLE_LOW = "single low"
+SINGLE_HIGH = "single high"
+MIRRORINGS = (HORIZONTAL, VERTICAL, FOUR_SCREEN, SINGLE_LOW, SINGLE_HIGH) # Save states keep the index
+
+
+class Header: # The 16 bytes at the start of a .nes file
+    def __init__(self, data):
+        data = bytes(data[:HEADER_SIZE])
+        if len(data) < HEADER_SIZE or data[:4] != b"NES\x1a":
+            raise ValueError("Not an iNES rom, the header doesn't start with NES<EOF>")
+        flags6, flags7 = data[6], data[7]
+        self.nes2 = flags7 & 0x0C == 0x08
+        self.trainer = bool(flags6 & 0x04)
+        self.battery = bool(flags6 & 0x02)
+        if flags6 & 0x08:
+            self.mirroring = FOUR_SCREEN
+        else:
+            self.mirroring = VERTICAL if flags6 & 0x01 else HORIZONTAL
+        self.mapper = flags6 >> 4
+        self.submapper = 0
+        if self.nes2:
+            self.mapper |= flags7 & 0xF0 | (data[8] & 0x0F) << 8
+            self.submapper = data[8] >> 4
+            self.prgSize = self.rom_size(data[4], data[9] & 0x0F, PRG_UNIT)
+            self.chrSize = self.rom_size(data[5], data[9] >> 4, CHR_UNIT)
+            self.prgRamSize = 64 << (data[10] & 0x0F) if data[10] & 0x0F else 0
+            self.chrRamSize = 64 << (data[11] & 0x0F) if data[11] & 0x0F else 0
+        else:
+            if not any(data[12:16]): # Old dumps have junk ("DiskDude!") from byte 7 on, the high nibble is garbage then
+                self.mapper |= flags7 & 0xF0
+            self.prgSize = data[4] * PRG_UNIT
+            self.chrSize = data[5] * CHR_UNIT
+            self.prgRamSize = 0x2000
+            self.chrRamSize = 0 if data[5] else 0x2000
+
+    @staticmethod
+    def rom_size(low, high, unit): # NES 2.0 sizes are 12 bit unit counts, or exponent-multiplier when the msb nibble is F
+        if high == 0x0F:
+            return (1 << (low >> 2)) * ((low & 0x03) * 2 + 1)
+        return (high << 8 | low) * unit
+
+    def __repr__(self):
+        return f"<Header mapper {self.mapper} prg {self.prgSize // 1024}K chr {self.chrSize // 1024}K {self.mirroring}" \
+               f"{' nes2' if self.nes2 else ''}>"
+
+
+SLOTS = struct.Struct("<4H8HB") # Mapper save states start with the prg and chr slots and the mirroring
+
+
+def pad(data, unit): # Copy of data padded up to a whole number of units, truncated dumps are filled with zeros
+    size = max(unit, -(-len(data) // unit) * unit)
+    return bytearray(data) + bytes(size - len(data))
+
+
+def split(data, unit, size): # size bytes of data cut into unit sized views
+    return [data[offset:offset + unit] for offset in range(0, size, unit)]
+
+
+class RomImage: # The immutable part of a rom, shared by every cartridge made from the same file
+    def __init__(self, data, digest=None): # data is the whole .nes file, bytes or an mmap
+        self.data = data
+        self.digest = digest
+        self.header = Header(data)
+        view = memoryview(data).toreadonly()
+        offset = HEADER_SIZE
+        self.trainer = None
+        if self.header.trainer:
+            self.trainer = bytes(view[offset:offset + TRAINER_SIZE])
+            offset += TRAINER_SIZE
+        self.prg = self.section(view, offset, self.header.prgSize, PRG_BANK)
+        offset += self.header.prgSize
+        self.chr = self.section(view, offset, self.header.chrSize, CHR_BANK) if self.header.chrSize else None
+        # Bank views are made once here, so cartridges sharing the image share them too
+        self.prgBanks = [split(bank, 0x100, PRG_BANK) for bank in split(self.prg, PRG_BANK, len(self.prg))]
+        self.chrBanks = split(self.chr, CHR_BANK, len(self.chr)) if self.chr is not None else None
+
+    @staticmethod
+    def section(view, offset, size, unit): # Zero copy view of size bytes, only a truncated dump gets copied to pad it
+        if size and size % unit == 0 and offset + size <= len(view):
+            return view[offset:offset + size]
+        return memoryview(pad(view[offset:offset + size], unit)).toreadonly()
+
+    @classmethod
+    def from_file(cls, path): # Maps the file read only, the page cache holds it and we never copy it
+        with open(path, "rb") as rom:
+            data = mmap.mmap(rom.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(data, hashlib.sha1(data).hexdigest())
+
+
+# Process wide image cache. Images are keyed by the hash of the file, so copies of a rom under different names share
+# one mapping too. paths remembers which digest a (path, size, mtime) had so reopening a file doesn't hash it again
+IMAGES = {}
+PATHS = {}
+
+
+def load_image(path):
+    stat = os.stat(path)
+    key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+    image = IMAGES.get(PATHS.get(key))
+    if image is None:
+        image = RomImage.from_file(path)
+        image = IMAGES.setdefault(image.digest, image)
+        PATHS[key] = image.digest
+    return image
+
+
+def clear_cache(): # Forget every image, cartridges already made keep theirs
+    IMAGES.clear()
+    PATHS.clear()
+
+
+class Cartridge:
+    def __init__(self, image): # image is a RomImage, or the whole .nes file as bytes
+        if not isinstance(image, RomImage):
+            image = RomImage(image)
+        self.image = image
+        self.header = image.header
+        self.trainer = image.trainer
+        self.prg = image.prg # Read only and shared until something pokes rom, see make_private
+        self.prgBanks = image.prgBanks
+        self.private = False
+        self.chrRam = image.chr is None
+        if self.chrRam:
+            self.chr = bytearray(self.header.chrRamSize or CHR_UNIT)
+            self.chrBanks = split(memoryview(self.chr), CHR_BANK, len(self.chr))
+        else:
+            self.chr = image.chr
+            self.chrBanks = image.chrBanks
+        mapper = MAPPERS.get(self.header.mapper)
+        if mapper is None:
+            raise ValueError(f"Mapper {self.header.mapper} isn't supported")
+        self.mapper = mapper(self)
+
+    @classmethod
+    def from_file(cls, path): # Goes through the image cache, every cartridge of the same rom shares its prg and chr
+        return cls(load_image(path))
+
+    def attach(self, bus): # Map the cartridge into the CPU address space
+        bus.rom = self.prg
+        bus.cartridge = self
+        if self.trainer is not None: # Trainers sit at 0x7000
+            bus.prgram[0x1000:0x1000 + TRAINER_SIZE] = self.trainer
+        self.mapper.attach(bus)
+
+    def make_private(self): # Copy prg so it can be poked without touching other cartridges, called by bus.poke
+        if self.private:
+            return
+        self.private = True
+        self.prg = bytearray(self.prg)
+        self.prgBanks = [split(bank, 0x100, PRG_BANK) for bank in split(memoryview(self.prg), PRG_BANK, len(self.prg))]
+        self.mapper.prgBanks = self.prgBanks
+        if self.mapper.bus is not None:
+            self.mapper.bus.rom = self.prg
+            for slot, bank in enumerate(self.mapper.prgSlots):
+                self.mapper.map_prg(slot, bank)
+
+
+class Mapper: # NROM, and the base every other mapper builds on
+    number = 0
+    hasRegisters = False # NROM leaves rom writes going to bad_write
+    FIELDS = Fields() # Registers saved after the bank slots, for mappers that have any
+
+    def __init__(self, cartridge):
+        self.cartridge = cartridge
+        self.mirroring = cartridge.header.mirroring
+        self.prgBanks = cartridge.prgBanks # 8K banks, each as its 32 page views
+        self.chrBanks = cartridge.chrBanks # 1K banks
+        self.chrSlots = [n % len(self.chrBanks) for n in range(8)] # 1K chr bank in each slot
+        self.chrPages = [self.chrBanks[bank] for bank in self.chrSlots] # What the PPU sees at 0x0000-0x1FFF
+        self.prgSlots = [0, 1, 2, 3] # 8K prg bank in each of 0x8000, 0xA000, 0xC000, 0xE000
+        self.listeners = [] # Called with "prg" or "chr" after a bank switch
+        self.moved = {"prg": set(), "chr": set()} # Slots showing a different bank since listeners were last told
+        self.bus = None
+        self.interrupts = None # Set by Emulation, mappers with an IRQ counter drive IRQ_MAPPER on it
+
+    def attach(self, bus):
+        self.bus = bus
+        bus.map_handler(0x80, 0xFF, bus.open_bus, self.write_register if self.hasRegisters else bus.bad_write)
+        self.reset()
+        for moved in self.moved.values(): # Power on banks aren't a switch
+            moved.clear()
+
+    def reset(self): # Power on banks
+        for slot in range(4):
+            self.map_prg(slot, slot)
+
+    def write_register(self, address, data): # Writes to 0x8000-0xFFFF when the mapper has registers
+        pass
+
+    def map_prg(self, slot, bank): # Put 8K bank (negative counts from the end) in slot 0-3, one slice assignment
+        bank %= len(self.prgBanks)
+        if bank != self.prgSlots[slot]:
+            self.moved["prg"].add(slot)
+        self.prgSlots[slot] = bank
+        first = 0x80 + slot * 0x20
+        self.bus.readPages[first:first + 0x20] = self.prgBanks[bank]
+
+    def map_prg16(self, slot, bank): # 16K bank into slot 0 (0x8000) or 1 (0xC000)
+        self.map_prg(slot * 2, bank * 2)
+        self.map_prg(slot * 2 + 1, bank * 2 + 1)
+
+    def map_chr(self, slot, bank, size=1): # size 1K banks starting at bank into 1K slots from slot
+        for n in range(size):
+            if (bank + n) % len(self.chrBanks) != self.chrSlots[slot + n]:
+                self.moved["chr"].add(slot + n)
+            self.chrSlots[slot + n] = (bank + n) % len(self.chrBanks)
+            self.chrPages[slot + n] = self.chrBanks[self.chrSlots[slot + n]]
+
+    def switched(self, kind): # Tell listeners, only if a slot really moved, they can look at moved[kind] to see which
+        moved = self.moved[kind]
+        if not moved: # Games rewrite bank registers with the banks already there all the time
+            return
+        for listener in self.listeners:
+            listener(kind)
+        moved.clear()
+
+    def save_state(self): # Bank slots, registers and chr ram, see savestate.py
+        state = SLOTS.pack(*self.prgSlots, *self.chrSlots, MIRRORINGS.index(self.mirroring)) + self.FIELDS.pack(self)
+        return state + self.cartridge.chr if self.cartridge.chrRam else state
+
+    def load_state(self, data): # Banks are only mapped again, and listeners told, when they differ from now
+        slots = SLOTS.unpack_from(data)
+        offset = self.FIELDS.unpack(self, data, SLOTS.size)
+        self.mirroring = MIRRORINGS[slots[12]]
+        if list(slots[:4]) != self.prgSlots:
+            for slot, bank in enumerate(slots[:4]):
+                self.map_prg(slot, bank)
+            self.switched("prg")
+        if list(slots[4:12]) != self.chrSlots:
+            for slot, bank in enumerate(slots[4:12]):
+                self.map_chr(slot, bank)
+            self.switched("chr")
+        if self.cartridge.chrRam:
+            self.cartridge.chr[:] = data[offset:offset + len(self.cartridge.chr)]
+
+    def chr_read(self, address): # PPU side access to pattern memory
+        return self.chrPages[address >> 10 & 7][address & 0x3FF]
+
+    def chr_write(self, address, data): # Only does anything on chr ram
+        if self.cartridge.chrRam:
+            self.chrPages[address >> 10 & 7][address & 0x3FF] = data
+
+
+class MMC1(Mapper): # Mapper 1, registers are loaded a bit at a time through a 5 bit shift register
+    number = 1
+    hasRegisters = True
+    FIELDS = Mapper.FIELDS + Fields(("shift", "B"), ("control", "B"), ("chr0", "B"), ("chr1", "B"), ("prgBank", "B"))
+
+    def reset(self):
+        self.shift = 0x10 # The 1 marks when 5 bits have gone in
+        self.control = 0x0C # prg mode 3, 0x8000 switchable and the last bank fixed at 0xC000
+        self.chr0 = self.chr1 = self.prgBank = 0
+        self.update_prg(); self.update_chr()
+
+    def write_register(self, address, data):
+        if data & 0x80:
+            self.shift = 0x10
+            self.control |= 0x0C
+            self.update_prg()
+            return
+        full = self.shift & 1
+        self.shift = self.shift >> 1 | (data & 1) << 4
+        if not full:
+            return
+        value = self.shift
+        self.shift = 0x10
+        register = address >> 13 & 3 # 0x8000, 0xA000, 0xC000, 0xE000
+        if register == 0:
+            self.control = value
+            self.mirroring = (SINGLE_LOW, SINGLE_HIGH, VERTICAL, HORIZONTAL)[value & 3]
+            self.update_prg(); self.update_chr()
+        elif register == 1:
+            self.chr0 = value; self.update_chr()
+        elif register == 2:
+            self.chr1 = value; self.update_chr()
+        else:
+            self.prgBank = value & 0x0F; self.update_prg()
+
+    def update_prg(self):
+        mode = self.control >> 2 & 3
+        if mode < 2: # 32K at a time, low bit ignored
+            self.map_prg16(0, self.prgBank & 0x0E); self.map_prg16(1, self.prgBank | 0x01)
+        elif mode == 2:
+            self.map_prg16(0, 0); self.map_prg16(1, self.prgBank)
+        else:
+            self.map_prg16(0, self.prgBank); self.map_prg16(1, len(self.prgBanks) // 2 - 1)
+        self.switched("prg")
+
+    def update_chr(self):
+        if self.control & 0x10: # Two 4K banks
+            self.map_chr(0, self.chr0 * 4, 4); self.map_chr(4, self.chr1 * 4, 4)
+        else: # One 8K bank, low bit ignored
+            self.map_chr(0, (self.chr0 & 0x1E) * 4, 8)
+        self.switched("chr")
+
+
+class UxROM(Mapper): # Mapper 2, 16K switchable at 0x8000 and the last 16K fixed at 0xC000
+    number = 2
+    hasRegisters = True
+
+    def reset(self):
+        self.map_prg16(0, 0); self.map_prg16(1, len(self.prgBanks) // 2 - 1)
+
+    def write_register(self, address, data):
+        self.map_prg16(0, data)
+        self.switched("prg")
+
+
+class CNROM(Mapper): # Mapper 3, fixed prg and one switchable 8K chr bank
+    number = 3
+    hasRegisters = True
+
+    def write_register(self, address, data):
+        self.map_chr(0, (data & 3) * 8, 8)
+        self.switched("chr")
+
+
+class MMC3(Mapper): # Mapper 4, eight bank registers picked through 0x8000, plus a scanline counter for IRQs
+    number = 4
+    hasRegisters = True
+    FIELDS = Mapper.FIELDS + Fields(("select", "B"), ("irqLatch", "B"), ("irqCounter", "B"), ("irqReload", "?"),
+                                    ("irqEnabled", "?"), ("irqPending", "?"))
+
+    def reset(self):
+        self.select = 0
+        self.registers = [0, 2, 4, 5, 6, 7, 0, 1]
+        self.irqLatch = self.irqCounter = 0
+        self.irqReload = self.irqEnabled = self.irqPending = False
+        self.update_prg(); self.update_chr()
+
+    def write_register(self, address, data):
+        odd = address & 1
+        register = address >> 13 & 3
+        if register == 0:
+            if odd:
+                self.registers[self.select & 7] = data
+                if self.select & 7 < 6:
+                    self.update_chr()
+                else:
+                    self.update_prg()
+            else:
+                self.select = data
+                self.update_prg(); self.update_chr()
+        elif register == 1:
+            if not odd and self.mirroring != FOUR_SCREEN:
+                self.mirroring = HORIZONTAL if data & 1 else VERTICAL
+        elif register == 2:
+            if odd:
+                self.irqCounter = 0; self.irqReload = True
+            else:
+                self.irqLatch = data
+        else:
+            self.irqEnabled = bool(odd)
+            if not odd:
+                self.set_irq(False)
+
+    def update_prg(self):
+        first, second = self.registers[6], self.registers[7]
+        if self.select & 0x40: # 0x8000 fixed to the second to last bank, R6 at 0xC000
+            self.map_prg(0, -2); self.map_prg(2, first)
+        else:
+            self.map_prg(0, first); self.map_prg(2, -2)
+        self.map_prg(1, second); self.map_prg(3, -1)
+        self.switched("prg")
+
+    def update_chr(self):
+        r = self.registers
+        low, high = (4, 0) if self.select & 0x80 else (0, 4) # Bit 7 swaps which half gets the 2K banks
+        self.map_chr(low, r[0] & 0xFE, 2); self.map_chr(low + 2, r[1] & 0xFE, 2)
+        for n in range(4):
+            self.map_chr(high + n, r[2 + n])
+        self.switched("chr")
+
+    def clock_scanline(self): # Called by the PPU once per visible scanline (A12 rising edge)
+        if self.irqCounter == 0 or self.irqReload:
+            self.irqCounter = self.irqLatch
+            self.irqReload = False
+        else:
+            self.irqCounter -= 1
+        if self.irqCounter == 0 and self.irqEnabled:
+            self.set_irq(True)
+
+    def save_state(self):
+        return bytes(self.registers) + super().save_state()
+
+    def load_state(self, data): # The IRQ line itself is restored with the CPU's interrupt lines
+        self.registers = list(data[:8])
+        super().load_state(data[8:])
+
+    def set_irq(self, level):
+        self.irqPending = level
+        if self.interrupts is not None:
+            if level:
+                self.interrupts.raise_line(IRQ_MAPPER)
+            else:
+                self.interrupts.acknowledge(IRQ_MAPPER)
+
+
+MAPPERS = {mapper.number: mapper for mapper in (Mapper, MMC1, UxROM, CNROM, MMC3)}
+NROM = Mapper
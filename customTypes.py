@@ -31,3 +31,26 @@ def badd(a, b, carry=False):
     print(tempout)
     print(int("0b"+tempout, 2))
     return int(tempout,2), carry
+
+
+# Processor status register, kept packed as one byte laid out NV1BDIZC like the real thing
+FLAG_C = 0x01 # Carry
+FLAG_Z = 0x02 # Zero
+FLAG_I = 0x04 # Interrupt Disable
+FLAG_D = 0x08 # Decimal (the NES ignores it, but it still gets pushed and pulled)
+FLAG_B = 0x10 # Break, only exists on the copy pushed to the stack
+FLAG_U = 0x20 # Unused, always reads 1
+FLAG_V = 0x40 # Overflow
+FLAG_N = 0x80 # Negative
+CLEAR_NZ = 0xFF ^ (FLAG_N | FLAG_Z)
+
+# N and Z bits for every byte value, setting flags from a result is status & CLEAR_NZ | NZ_FLAGS[value]
+NZ_FLAGS = bytes((value & FLAG_N) | (FLAG_Z if value == 0 else 0) for value in range(256))
+
+
+def build_fstring(status): # NvTBdIzc style flag string, lower case is clear. T and B are always shown set
+    return "".join(letter if status & bit else letter.lower() for letter, bit in
+                   (("N", FLAG_N), ("V", FLAG_V), ("T", 0xFF), ("B", 0xFF), ("D", FLAG_D), ("I", FLAG_I), ("Z", FLAG_Z), ("C", FLAG_C)))
+
+
+FSTRINGS = tuple(build_fstring(status) for status in range(256))
@@ -0,0 +1,178 @@
+from blockCompiler import BRANCHES
+from customTypes import *
+from scheduler import NEVER
+
+# Idle loop skipping. Games spend a lot of every frame in loops like LDA $2002 / BPL or JMP * waiting for vblank or
+# for the NMI handler to set a flag. A loop counts as idle when it's nothing but the read only ops in READS and ends in
+# a branch or JMP back to its own start. Those can't change memory, so if one trip round the loop ends with the same
+# registers and flags it started with, every following trip does exactly the same thing until something else changes
+# what the reads see. That only happens at a scheduled event (vblank, IRQs, the NMI handler that runs after them) or,
+# for PPU and APU status reads, at the points their owners report through quiet_until. The skipper adds whole
+# iterations' worth of cycles up to the nearest of those, and the run loop carries on from the same state it would have
+# reached by running them
+# The interpreter finds loops through wrapped backward branches and jumps, the block compiler builds the check into
+# the loop of the compiled block (see BlockCompiler.goto)
+
+MAX_LOOP = 16 # Bytes
+JMP = 0x4C
+
+# opcode: (length, cycles, reads memory). None of these write memory or touch the stack. LDA zero page (quirk in
+# opcodes.py) and LDX/LDY from memory (not implemented yet) are left out
+READS = {
+    0xA9: (2, 2, False), 0xAD: (3, 4, True), # LDA
+    0xA2: (2, 2, False), 0xA0: (2, 2, False), # LDX, LDY
+    0x24: (2, 3, True), 0x2C: (3, 4, True), # BIT
+    0xC9: (2, 2, False), 0xC5: (2, 3, True), 0xCD: (3, 4, True), # CMP
+    0xE0: (2, 2, False), 0xE4: (2, 3, True), 0xEC: (3, 4, True), # CPX
+    0xC0: (2, 2, False), 0xC4: (2, 3, True), 0xCC: (3, 4, True), # CPY
+    0x29: (2, 2, False), 0x25: (2, 3, True), 0x2D: (3, 4, True), # AND
+    0x09: (2, 2, False), 0x05: (2, 3, True), 0x0D: (3, 4, True), # ORA
+    0x49: (2, 2, False), 0x45: (2, 3, True), 0x4D: (3, 4, True), # EOR
+    0xEA: (1, 2, False), 0x18: (1, 2, False), 0x38: (1, 2, False), 0xB8: (1, 2, False), # NOP, CLC, SEC, CLV
+    0xAA: (1, 2, False), 0xA8: (1, 2, False), 0x8A: (1, 2, False), 0x98: (1, 2, False), # TAX, TAY, TXA, TYA
+}
+
+
+class Loop:
+    def __init__(self, head, end, length, cycles, quiet):
+        self.head = head
+        self.end = end # Address of the branch or jump back to head
+        self.length = length # Instructions
+        self.cycles = cycles # One trip round, +1 more if the branch crosses a page
+        self.quiet = quiet # Functions giving the cycle the status registers the loop reads might next change on
+        self.state = None # Interpreter, registers and flags the last time round at head, and the cycle it was
+        self.at = 0
+
+
+class IdleSkipper:
+    def __init__(self, emu):
+        self.emu = emu
+        self.enabled = False
+        self.limit = NEVER # run_compiled's limit while it's running, interpreted loops mustn't skip past it either
+        self.loops = {} # Head: Loop, or None where the code isn't an idle loop
+        self.skips = 0 # Times a loop was fast forwarded
+        self.iterations = self.instructions = self.cycles = 0 # Skipped in total
+        self.handlers = {} # Opcode: the handler attach wrapped
+
+    def attach(self): # Wrap the backward jumping ops of the optable, the compiler checks enabled itself
+        if self.enabled:
+            return self
+        self.emu.breakpoints.beneath(self.wrap_ops)
+        self.enabled = True
+        self.emu.compiler.flush() # Blocks compiled with or without the check in their loops
+        return self
+
+    def detach(self): # Every instruction runs again, for anything counting them (reverse.py)
+        if not self.enabled:
+            return self
+        self.emu.breakpoints.beneath(self.unwrap_ops)
+        self.enabled = False
+        self.emu.compiler.flush()
+        return self
+
+    def flush(self, first=0, last=0xFFFF): # Code in first-last moved (prg bank switch), analyse loops there again
+        if first == 0 and last == 0xFFFF:
+            self.loops.clear()
+            return
+        for head in [head for head in self.loops if first - MAX_LOOP < head <= last]:
+            del self.loops[head]
+
+    def wrap_ops(self):
+        optable = self.emu.optable
+        for code in list(BRANCHES) + [JMP]:
+            self.handlers[code] = optable[code]
+            optable[code] = self.wrap(optable[code])
+
+    def unwrap_ops(self):
+        for code, handler in self.handlers.items():
+            self.emu.optable[code] = handler
+        self.handlers.clear()
+
+    def wrap(self, handler):
+        emu = self.emu
+        looped = self.looped
+
+        def jumped():
+            pc = emu.pgmctr
+            handler()
+            if emu.pgmctr < pc:
+                looped(emu.pgmctr, pc - 1)
+        return jumped
+
+    def find(self, head): # The idle Loop starting at head, or None
+        if head in self.loops:
+            return self.loops[head]
+        loop = self.loops[head] = self.analyse(head)
+        return loop
+
+    def analyse(self, head):
+        bus = self.emu.bus
+        if head < 0x8000 or head + MAX_LOOP > 0x10000: # Only rom, code in ram can change under us
+            return None
+        peek = bus.peek
+        addr = head
+        length = cycles = 0
+        quiet = []
+        while addr < head + MAX_LOOP:
+            code = peek(addr)
+            if code in BRANCHES:
+                target = addr + 2 + signed8(peek(addr + 1))
+                return Loop(head, addr, length + 1, cycles + 3, tuple(quiet)) if target == head else None
+            if code == JMP:
+                target = peek(addr + 1) | peek(addr + 2) << 8
+                return Loop(head, addr, length + 1, cycles + 3, tuple(quiet)) if target == head else None
+            if code not in READS:
+                return None
+            size, spent, reads = READS[code]
+            if reads:
+                address = peek(addr + 1) | (peek(addr + 2) << 8 if size == 3 else 0)
+                if not self.readable(address, quiet):
+                    return None
+            addr += size
+            length += 1
+            cycles += spent
+        return None
+
+    def readable(self, address, quiet): # Whether an idle loop may read address, adds what bounds the skip to quiet
+        emu = self.emu
+        if address < 0x2000:
+            return True
+        if address < 0x4000:
+            if address & 7 != 2: # Only PPUSTATUS, the other registers have side effects that add up
+                return False
+            if emu.ppu is not None and emu.ppu.quiet_until not in quiet:
+                quiet.append(emu.ppu.quiet_until)
+            return True
+        if address == 0x4015:
+            if emu.apu is not None and emu.apu.quiet_until not in quiet:
+                quiet.append(emu.apu.quiet_until)
+            return True
+        return address >= 0x4020 and emu.bus.readPages[address >> 8] is not None
+
+    def looped(self, head, end): # The interpreter took a jump back to head from the instruction at end
+        loop = self.loops[head] if head in self.loops else self.find(head)
+        if loop is None or loop.end != end:
+            return
+        emu = self.emu
+        state = (emu.regA, emu.regX, emu.regY, emu.status, emu.scheduler.fired) # An event between two trips breaks it
+        iteration = emu.cycles - loop.at
+        if state == loop.state and loop.cycles <= iteration <= loop.cycles + 1: # A whole trip that changed nothing
+            emu.cycles = self.skip(loop, emu.cycles, iteration, min(emu.scheduler.next, self.limit))
+        loop.state = state
+        loop.at = emu.cycles
+
+    def skip(self, loop, cycles, iteration, limit): # Cycles after skipping every whole trip that ends by limit
+        bound = limit
+        for quiet in loop.quiet:
+            bound = min(bound, quiet())
+        trips = (bound - cycles) // iteration
+        if trips <= 0:
+            return cycles
+        skipped = trips * iteration
+        self.skips += 1
+        self.iterations += trips
+        self.instructions += trips * loop.length
+        self.cycles += skipped
+        if self.emu.profiler is not None:
+            self.emu.profiler.idle_skipped(loop.head, trips * loop.length, skipped)
+        return cycles + skipped
@@ -0,0 +1,64 @@
+from customTypes import *
+import struct
+
+# Interrupt lines into the CPU. Every source owns one bit of pending, so the run loops only ever look at that one
+# integer, and they only look at it when the scheduler deadline has dropped them out of the inner loop. Raising a line
+# pulls the deadline down (scheduler.stop), so the common path with nothing pending costs nothing per instruction
+# NMI and RESET are edges, servicing them clears the bit. The IRQ sources are levels, they stay pending until the
+# source acknowledges (MMC3 on a write to 0xE000, the APU when its status is read), and are held off while I is set.
+# Clearing I (CLI, PLP, RTI) calls poll() so a held off IRQ is taken straight away
+
+NMI = 0x01
+RESET = 0x02
+IRQ_MAPPER = 0x04
+IRQ_FRAME = 0x08 # APU frame counter
+IRQ_DMC = 0x10
+IRQ = IRQ_MAPPER | IRQ_FRAME | IRQ_DMC
+
+NMI_VECTOR = 0xFFFA
+RESET_VECTOR = 0xFFFC
+IRQ_VECTOR = 0xFFFE # Shared with BRK
+
+STATE = struct.Struct("<B3Q") # pending, then taken for NMI, RESET and IRQ
+
+
+class Interrupts:
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.pending = 0 # Or of the lines that are up
+        self.taken = {NMI: 0, RESET: 0, IRQ: 0} # How many times each was serviced, for tests and debugging
+
+    def raise_line(self, line):
+        if not self.pending & line:
+            self.pending |= line
+            self.cpu.scheduler.stop()
+
+    def acknowledge(self, line): # The source lowered its line
+        self.pending &= ~line
+
+    def save_state(self):
+        return STATE.pack(self.pending, self.taken[NMI], self.taken[RESET], self.taken[IRQ])
+
+    def load_state(self, data): # Lines come back as they were, the run loop is told in case one is up
+        self.pending, self.taken[NMI], self.taken[RESET], self.taken[IRQ] = STATE.unpack_from(data)
+        if self.pending:
+            self.cpu.scheduler.stop()
+
+    def poll(self): # I was just cleared, get the run loop back out if an IRQ is waiting
+        if self.pending:
+            self.cpu.scheduler.stop()
+
+    def service(self): # Called by the run loops at an instruction boundary when pending is set
+        cpu = self.cpu
+        pending = self.pending
+        if pending & RESET:
+            self.pending &= ~(RESET | NMI) # A reset swallows an NMI that came in with it
+            self.taken[RESET] += 1
+            cpu.reset()
+        elif pending & NMI:
+            self.pending &= ~NMI
+            self.taken[NMI] += 1
+            cpu.interrupt(NMI_VECTOR)
+        elif pending & IRQ and not cpu.status & FLAG_I:
+            self.taken[IRQ] += 1
+            cpu.interrupt(IRQ_VECTOR)
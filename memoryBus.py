@@ -0,0 +1,192 @@
+# CPU memory bus. The 64K address space is split into 256 pages of 256 bytes, and each page is looked up in a table by
+# the high byte of the address. A page is either backed directly by a 256 byte memoryview into one of the buffers below
+# (ram, prg ram, rom) or by a read/write handler for anything with side effects (PPU/APU registers etc.)
+# Mirroring is done by pointing several pages at the same slice of a buffer, so there's no address math at access time
+
+# CPU memory map:
+# 0x0000 - 0x07FF  2K internal ram
+# 0x0800 - 0x1FFF  mirrors of internal ram
+# 0x2000 - 0x2007  PPU registers, mirrored every 8 bytes up to 0x3FFF
+# 0x4000 - 0x401F  APU and I/O registers
+# 0x4020 - 0x5FFF  cartridge expansion, unmapped
+# 0x6000 - 0x7FFF  8K prg ram
+# 0x8000 - 0xFFFF  prg rom, 16K roms are mirrored into 0xC000
+
+OPEN_BUS = 0xFF # What unmapped reads return (ram used to be filled with 0xFF too)
+
+
+def aliases(address): # Every address that reaches the same byte or register as address, mirrors included
+    if address < 0x2000:
+        return [(address & 0x7FF) + mirror for mirror in range(0, 0x2000, 0x800)]
+    if address < 0x4000:
+        return [(address & 0x2007) + mirror for mirror in range(0, 0x2000, 8)]
+    return [address]
+
+
+class MemoryBus:
+    def __init__(self, prg=b""): # prg is mapped flat at 0x8000, a cartridge (see cartridge.py) maps itself instead
+        # ( I believe ram will need to be randomized on startup in the future)
+        self.ram = bytearray([0xFF] * 0x800)
+        self.prgram = bytearray(0x2000)
+        self.rom = bytearray(prg)
+        self.ppuRegisters = bytearray(8) # Just latches for now, there's no PPU yet
+        self.ioRegisters = bytearray(0x20)
+        self.ioReadHandlers = {} # Address: handler for the io registers something (PPU DMA, APU, pads) has claimed
+        self.ioWriteHandlers = {}
+        self.cartridge = None
+        self.listeners = [] # Called with (first, last) after a poke changed bytes above internal ram (code can live there)
+
+        # readPages / writePages hold a memoryview for directly backed pages and None for handler pages
+        self.readPages = [None] * 256
+        self.writePages = [None] * 256
+        self.readHandlers = [self.open_bus] * 256
+        self.writeHandlers = [self.bad_write] * 256
+        self.peekHandlers = [self.open_bus] * 256
+
+        self.map_buffer(0x00, 0x1F, self.ram)
+        self.map_handler(0x20, 0x3F, self.read_ppu, self.write_ppu)
+        self.map_handler(0x40, 0x40, self.read_io, self.write_io)
+        self.map_buffer(0x60, 0x7F, self.prgram)
+        if self.rom:
+            self.map_buffer(0x80, 0xFF, self.rom, writable=False)
+
+    def map_buffer(self, first, last, buffer, offset=0, writable=True): # Point pages first-last at buffer, wrapping around if the buffer is smaller than the range
+        view = memoryview(buffer)
+        for page in range(first, last + 1):
+            start = (offset + (page - first) * 0x100) % len(buffer)
+            self.readPages[page] = view[start:start + 0x100]
+            self.writePages[page] = self.readPages[page] if writable else None
+            if not writable:
+                self.writeHandlers[page] = self.bad_write
+
+    def map_handler(self, first, last, read, write, peek=None): # Route pages first-last through handlers, peek is a side effect free read for debugging
+        for page in range(first, last + 1):
+            self.readPages[page] = None
+            self.writePages[page] = None
+            self.readHandlers[page] = read
+            self.writeHandlers[page] = write
+            self.peekHandlers[page] = peek or read
+
+    def read(self, address):
+        page = self.readPages[address >> 8]
+        if page is not None:
+            return page[address & 0xFF]
+        return self.readHandlers[address >> 8](address)
+
+    def write(self, address, data):
+        page = self.writePages[address >> 8]
+        if page is not None:
+            page[address & 0xFF] = data
+        else:
+            self.writeHandlers[address >> 8](address, data)
+
+    def peek(self, address): # Read without triggering any register side effects
+        page = self.readPages[address >> 8]
+        if page is not None:
+            return page[address & 0xFF]
+        return self.peekHandlers[address >> 8](address)
+
+    def poke(self, address, data): # Write straight into backing memory, even rom. Handler pages get a normal write
+        page = self.pokeable(address >> 8)
+        if page is not None:
+            page[address & 0xFF] = data
+            self.poked(address, address)
+        else:
+            self.writeHandlers[address >> 8](address, data)
+
+    def pokeable(self, page): # View poke can write through, shared read only rom gets copied for this bus first
+        view = self.readPages[page]
+        if view is not None and view.readonly and self.cartridge is not None:
+            self.cartridge.make_private()
+            view = self.readPages[page]
+        return view
+
+    def poked(self, first, last): # Pokes go round the write handlers that watch code pages, so tell listeners instead
+        if last >= 0x2000:
+            for listener in self.listeners:
+                listener(first, last)
+
+    def save_state(self): # ram, prg ram and the register latches as one copy, see savestate.py
+        return b"".join((self.ram, self.prgram, self.ppuRegisters, self.ioRegisters))
+
+    def load_state(self, data): # Copied into the same buffers, the page views onto them stay valid
+        offset = 0
+        for buffer in (self.ram, self.prgram, self.ppuRegisters, self.ioRegisters):
+            buffer[:] = data[offset:offset + len(buffer)]
+            offset += len(buffer)
+
+    def open_bus(self, address):
+        return OPEN_BUS
+
+    def bad_write(self, address, data):
+        raise MemoryError(f"Attempted to write to invalid memory address {hex(address)}")
+
+    def read_ppu(self, address):
+        return self.ppuRegisters[address & 0x07]
+
+    def write_ppu(self, address, data):
+        self.ppuRegisters[address & 0x07] = data
+
+    def read_io(self, address):
+        handler = self.ioReadHandlers.get(address)
+        if handler is not None:
+            return handler(address)
+        if address & 0xFF < 0x20:
+            return self.ioRegisters[address & 0x1F]
+        return OPEN_BUS
+
+    def write_io(self, address, data):
+        handler = self.ioWriteHandlers.get(address)
+        if handler is not None:
+            handler(address, data)
+        elif address & 0xFF < 0x20:
+            self.ioRegisters[address & 0x1F] = data
+        else:
+            self.bad_write(address, data)
+
+    # addSpace style indexing, so bus[0x10] and bus[0x10:0x1D] keep working for debugging and tests
+    # Goes through peek/poke, a page at a time so slices over ram are just buffer copies
+    def __len__(self):
+        return 0x10000
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(0x10000)
+            if step != 1:
+                return [self.peek(address) for address in range(start, stop, step)]
+            out = []
+            while start < stop:
+                end = min(stop, (start | 0xFF) + 1)
+                page = self.readPages[start >> 8]
+                if page is not None:
+                    out += page[start & 0xFF:((end - 1) & 0xFF) + 1]
+                else:
+                    out += [self.peek(address) for address in range(start, end)]
+                start = end
+            return out
+        return self.peek(key)
+
+    def __setitem__(self, key, values):
+        if not isinstance(key, slice):
+            self.poke(key, values)
+            return
+        start, stop, step = key.indices(0x10000)
+        values = list(values)
+        if len(values) != len(range(start, stop, step)):
+            raise ValueError("Memory slices can't change size")
+        if step != 1:
+            for address, value in zip(range(start, stop, step), values):
+                self.poke(address, value)
+            return
+        index = 0
+        while start < stop:
+            end = min(stop, (start | 0xFF) + 1)
+            page = self.pokeable(start >> 8)
+            if page is not None:
+                page[start & 0xFF:((end - 1) & 0xFF) + 1] = bytes(values[index:index + end - start])
+                self.poked(start, end - 1)
+            else:
+                for address in range(start, end):
+                    self.poke(address, values[index + address - start])
+            index += end - start
+            start = end
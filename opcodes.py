@@ -1 +1,864 @@
-# Will consider migrating opcodes into this file if it gets too cumberson for Emulation.py
\ No newline at end of file
+from customTypes import *
+from interrupts import IRQ_VECTOR
+import math
+
+# Will consider migrating opcodes into this file if it gets too cumberson for Emulation.py
+# It got too cumbersome. Every opcode now lives here as its own method, named op_XX after the opcode byte
+# Emulation builds a 256 entry table of these (already bound to the instance) once in __init__, so dispatching an
+# instruction is a single list index instead of walking down the old match statement arm by arm
+
+# I'M GONNA RENAME INDIRECT INDEXED ADDRESSING TO EXCLUSIVE ADDRESSING AND INDEXED INDIRECT ADDRESSING TO INCLUSIVE ADDRESSING
+# Okay so ($04, X) will be called Inclusive indirect and ($04), Y will be called Exclusive please email all of your complaints to gaben@valvesoftware.com
+
+# At the beginning of each op, the program counter will point to the address immediately following the opcode
+# Ops with operands increment the program counter past their last operand byte themselves, one byte ops and ops that
+# set the program counter (jumps, returns, BRK) leave it alone
+
+
+class Opcodes:
+    def build_optable(self): # Build the dispatch table, every slot without an op_XX method falls through to op_illegal
+        optable = [self.op_illegal] * 256
+        for code in range(256):
+            handler = getattr(self, f"op_{code:02X}", None)
+            if handler is not None:
+                optable[code] = handler
+        return optable
+
+    def op_illegal(self): # Shared handler for every opcode that isn't implemented (yet)
+        print(hex(self.opcode) + " not implemented")
+        self.error = f"{hex(self.opcode)} not implemented at {hex(self.pgmctr - 1)}"
+        self.stop()
+        self.pgmctr += 1
+
+    def op_00(self): # Break, an IRQ with B set in the pushed flags (see Emulation.interrupt)
+        self.pgmctr += 1
+        self.interrupt(IRQ_VECTOR, FLAG_B)
+
+    def op_01(self): # OR w/ Accumulator, Indirect X (Inclusive Indirect)
+        addr = self.get_incl_indr()
+        self.regA |= self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 6
+        self.pgmctr += 1
+
+    def op_02(self): # Halt
+        self.stop()
+        self.pgmctr += 1
+
+    def op_05(self): # OR w/ Accumulator Zero Page
+        addr = self.read()
+        self.regA |= self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]; self.cycles += 3
+        self.pgmctr += 1
+
+    def op_06(self): # Arithmetic Shift Left Zero Page
+        addr = self.read()
+        self.write(addr, self.asl(self.read(addr)))
+        self.cycles += 5
+        self.pgmctr += 1
+
+    def op_08(self): # Push Flags
+        self.push(self.status | FLAG_B | FLAG_U); self.cycles += 3
+
+    def op_09(self): # OR w/ Accumulator Immediate
+        self.regA |= self.read()
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]; self.cycles += 2
+        self.pgmctr += 1
+
+    def op_0D(self): # OR w/ Accumulator Absolute
+        self.regA |= self.read(self.get_abs())
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]; self.cycles += 4
+        self.pgmctr += 1
+
+    def op_0A(self): # Arithmetic Shift Left Accumulator
+        self.regA = self.asl(self.regA)
+        self.cycles += 2
+
+    def op_0E(self): # Arithmetic Shift Left Absolute
+        addr = self.get_abs()
+        self.write(addr, self.asl(self.read(addr))); self.cycles += 6
+        self.pgmctr += 1
+
+    def op_10(self): # Branch on Plus
+        if not self.status & FLAG_N:
+            signedval = signed8(self.read())
+            temppg = self.pgmctr
+            self.pgmctr += signedval
+            if math.floor(temppg / 256) != math.floor(self.pgmctr / 256):
+                self.cycles += 1  # Branch takes extra cycle if crossing page boundary
+            self.cycles += 1  # Takes 1 additional cycles if nonzero
+        self.cycles += 2  # Takes 2 cycles no matter what
+        self.pgmctr += 1
+        # TODO: Refactor Branching to use get_abs_indx()
+
+    def op_11(self): # OR w/ Accumulator Indirect, Y Indexed (Exclusive Indirect)
+        addr, addcycle = self.get_excl_indr()
+        self.regA |= self.read(addr)
+        self.cycles += addcycle + 5
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.pgmctr += 1
+
+    def op_15(self): # OR w/ Accumulator Zero Page, X Indexed
+        addr = (self.read() + self.regX) % 256
+        self.regA |= self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]; self.cycles += 4
+        self.pgmctr += 1
+
+    def op_16(self): # Arithmetic Shift Left Zero Page, X Indexed
+        addr = (self.read() + self.regX) % 256
+        self.write(addr, self.asl(self.read(addr))); self.cycles += 6
+        self.pgmctr += 1
+
+    def op_18(self): # Clear Carry
+        self.status &= ~FLAG_C; self.cycles += 2
+
+    def op_19(self): # OR w/ Accumulator Absolute, Y Index
+        addr = self.get_abs_indx(self.get_abs(), self.regY)
+        self.regA |= self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_1D(self): # OR w/ Accumulator Absolute, X Indexed
+        addr = self.get_abs_indx(self.get_abs(), self.regX)
+        self.regA |= self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_1E(self): # Arithmetic Shift Left Absolute, X Indexed
+        addr = self.get_abs() + self.regX
+        self.write(addr, self.asl(self.read(addr))); self.cycles += 7
+        self.pgmctr += 1
+
+    def op_20(self): # Jump to Subroutine
+        tlow = self.read(); self.pgmctr += 1
+        thigh = self.read()
+        self.push(math.floor(self.pgmctr/256)); self.push(self.pgmctr % 256)
+        self.pgmctr = (tlow+thigh*256); self.cycles += 6
+
+    def op_21(self): # AND w/ Accumulator Indirect, X Indexed (Inclusive Indirect)
+        addr = self.get_incl_indr()
+        self.regA &= self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 6
+        self.pgmctr += 1
+
+    def op_24(self): # test Bit Zero Page
+        addr = self.read()
+        self.bit(self.read(addr))
+        self.cycles += 3
+        self.pgmctr += 1
+
+    def op_25(self): # AND w/ Accumulator Zero Page
+        addr = self.read()
+        self.regA &= self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 3
+        self.pgmctr += 1
+
+    def op_26(self): # Rotate Left Zero Page
+        addr = self.read()
+        self.write(addr, self.rol(self.read(addr))); self.cycles += 5
+        self.pgmctr += 1
+
+    def op_28(self): # Pull Flags
+        self.status = self.pull() & ~FLAG_B | FLAG_U # B isn't a real flag, it only exists on the stack
+        self.cycles += 3
+        self.interrupts.poll()
+
+    def op_29(self): # AND w/ Accumulator Immediate
+        self.regA &= self.read()
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 2
+        self.pgmctr += 1
+
+    def op_2A(self): # Rotate Left Accumulator
+        self.regA = self.rol(self.regA)
+        self.cycles += 2
+
+    def op_2C(self): # test Bit Absolute
+        addr = self.get_abs()
+        self.bit(self.read(addr))
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_2D(self): # AND w/ Accumulator Absolute
+        addr = self.get_abs()
+        self.regA &= self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_2E(self): # Rotate Left Absolute
+        addr = self.get_abs()
+        self.write(addr, self.rol(self.read(addr)))
+        self.cycles += 6
+        self.pgmctr += 1
+
+    def op_30(self): # Branch on Minus
+        if self.status & FLAG_N:
+            signedval = signed8(self.read())
+            temppg = self.pgmctr
+            self.pgmctr += signedval
+            if math.floor(temppg / 256) != math.floor(self.pgmctr / 256):
+                self.cycles += 1  # Branch takes extra cycle if crossing page boundary
+            self.cycles += 1  # Takes 1 additional cycles if nonzero
+        self.cycles += 2  # Takes 2 cycles no matter what
+        self.pgmctr += 1
+
+    def op_31(self): # AND w/ Accumulator Indirect, Y Indexed (Exclusive Indirect)
+        addr, addcycle = self.get_excl_indr()
+        self.regA &= self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 5 + addcycle
+        self.pgmctr += 1
+
+    def op_35(self): # AND w/ Accumulator Zero Page, X Indexed
+        addr = (self.read() + self.regX) % 256
+        self.regA &= self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_36(self): # Rotate Left Zero Page, X Indexed
+        addr = (self.read() + self.regX) % 256
+        self.write(addr, self.rol(self.read(addr))); self.cycles += 6
+        self.pgmctr += 1
+
+    def op_38(self): # Set Carry
+        self.status |= FLAG_C; self.cycles += 2
+
+    def op_39(self): # AND w/ Accumulator Absolute Y Indexed
+        addr = self.get_abs_indx(self.get_abs(), self.regY)
+        self.regA &= self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_3D(self): # AND w/ Accumulator Absolute X Indexed
+        addr = self.get_abs_indx(self.get_abs(), self.regX)
+        self.regA &= self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_3E(self): # Rotate Left Absolute, X Indexed
+        addr = self.get_abs_indx(self.get_abs(), self.regX) # Add cycle if page boundary crossed
+        self.write(addr, self.rol(self.read(addr)))
+        self.cycles += 7
+        self.pgmctr += 1
+
+    def op_40(self): # Return from Interrupt
+        self.status = self.pull() & ~FLAG_B | FLAG_U
+        tlow = self.pull(); thigh = self.pull()
+        self.pgmctr = tlow + thigh * 256
+        self.cycles += 7
+        self.interrupts.poll()
+
+    def op_41(self): # EOR w/ Accumulator Indirect, X Indexed (Inclusive Indirect)
+        addr = self.get_incl_indr()
+        self.regA ^= self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 6
+        self.pgmctr += 1
+
+    def op_45(self): # EOR w/ Accumulator Zero Page
+        addr = self.read()
+        self.regA ^= self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 3
+        self.pgmctr += 1
+
+    def op_46(self): # Logical Shift Right Zero Page
+        addr = self.read()
+        self.write(addr, self.lsr(self.read(addr)))
+        self.cycles += 5
+        self.pgmctr += 1
+
+    def op_48(self): # Push Accumulator
+        self.push(self.regA); self.cycles += 3
+
+    def op_49(self): # EOR w/ Accumulator Immediate
+        self.regA ^= self.read()
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 2
+        self.pgmctr += 1
+
+    def op_4A(self): # Logical Shift Right Accumulator
+        self.regA = self.lsr(self.regA)
+        self.cycles += 2
+
+    def op_4C(self): # Jump
+        tlow = self.read(); self.pgmctr += 1
+        thigh = self.read()
+        self.pgmctr = (tlow + thigh * 256); self.cycles += 3
+
+    def op_4D(self): # EOR w/ Accumulator Absolute
+        addr = self.get_abs()
+        self.regA ^= self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_4E(self): # Logical Shift Right Absolute
+        addr = self.get_abs()
+        self.write(addr, self.rol(self.read(addr)))
+        self.cycles += 6
+        self.pgmctr += 1
+
+    def op_50(self): # Branch on Not Overflow
+        if not self.status & FLAG_V:
+            signedval = signed8(self.read())
+            temppg = self.pgmctr
+            self.pgmctr += signedval
+            if math.floor(temppg / 256) != math.floor(self.pgmctr / 256):
+                self.cycles += 1  # Branch takes extra cycle if crossing page boundary
+            self.cycles += 1  # Takes 1 additional cycles if nonzero
+        self.cycles += 2  # Takes 2 cycles no matter what
+        self.pgmctr += 1
+
+    def op_51(self): # EOR w/ Accumulator Indirect, Y Indexed (Exclusive Indirect)
+        addr, addcycle = self.get_excl_indr()
+        self.regA ^= self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 5 + addcycle
+        self.pgmctr += 1
+
+    def op_55(self): # EOR w/ Accumulator Zero Page, X Indexed
+        addr = self.read() + self.regX
+        self.regA ^= self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_56(self): # Logical Shift Right Zero Page, X Indexed
+        addr = (self.read() + self.regX) % 256
+        self.write(addr, self.lsr(self.read(addr)))
+        self.pgmctr += 1
+
+    def op_58(self): # Clear Interrupt-Disable
+        self.status &= ~FLAG_I; self.cycles += 2
+        self.interrupts.poll() # An IRQ held off by I goes now
+
+    def op_59(self): # EOR w/ Accumulator Absolute Y Indexed
+        addr = self.get_abs_indx(self.get_abs(), self.regY)  # Add cycle if page boundary crossed
+        self.regA ^= self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_5D(self): # EOR w/ Accumulator Absolute X Indexed
+        addr = self.get_abs_indx(self.get_abs(), self.regX)  # Add cycle if page boundary crossed
+        self.regA ^= self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_5E(self): # Logical Shift Right Absolute, X Indexed
+        addr = self.get_abs_indx(self.get_abs(), self.regX)  # Add cycle if page boundary crossed
+        self.write(addr, self.lsr(self.read(addr))); self.cycles += 7
+        self.pgmctr += 1
+
+    def op_60(self): # Return from Subroutine
+        tlow = self.pull()
+        self.pgmctr = (tlow+self.pull()*256); self.cycles += 6
+        self.pgmctr += 1
+
+    def op_61(self): # Add with Carry Indirect, X Indexed (Inclusive Indirect)
+        addr = self.get_incl_indr()
+        self.regA = self.adc(self.read(addr), self.regA)
+        self.cycles += 6
+        self.pgmctr += 1
+
+    def op_65(self): # Add to Accumulator Zero Page
+        addr = self.read()
+        self.regA = self.adc(self.regA, self.read(addr))
+        self.cycles += 3
+        self.pgmctr += 1
+
+    def op_66(self): # Rotate Right Zero Page
+        addr = self.read()
+        self.write(addr, self.ror(self.read(addr))); self.cycles += 5
+        self.pgmctr += 1
+
+    def op_68(self): # Pull Accumulator
+        self.regA = self.pull(); self.cycles += 4
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+
+    def op_69(self): # Add to Accumulator Immediate
+        self.regA = self.adc(self.regA, self.read())
+        self.cycles += 2
+        self.pgmctr += 1
+        # Fun fact, the NES does not use the Decimal flag, ask me how much time I spent implementing BCD from the raw 6502 docs before coming to this realization
+
+    def op_6A(self): # Rotate Right Accumulator
+        self.regA = self.ror(self.regA)
+        self.cycles += 2
+
+    def op_6C(self): # Jump to Indirect Address
+        addr = self.get_abs()
+        tlow = self.read(addr)
+        addr += 1
+        if addr % 256 == 0:
+            addr -= 256
+        thigh = self.read(addr)
+        self.pgmctr = tlow + thigh*256
+        self.cycles += 5
+
+    def op_6D(self): # Add to Accumulator Absolute
+        addr = self.get_abs()
+        self.regA = self.adc(self.regA, self.read(addr))
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_6E(self): # Rotate Right Absolute
+        addr = self.get_abs()
+        self.write(addr, self.ror(self.read(addr)))
+        self.cycles += 6
+        self.pgmctr += 1
+
+    def op_70(self): # Branch on Overflow
+        if self.status & FLAG_V:
+            signedval = signed8(self.read())
+            temppg = self.pgmctr
+            self.pgmctr += signedval
+            if math.floor(temppg / 256) != math.floor(self.pgmctr / 256):
+                self.cycles += 1  # Branch takes extra cycle if crossing page boundary
+            self.cycles += 1  # Takes 1 additional cycles if nonzero
+        self.cycles += 2  # Takes 2 cycles no matter what
+        self.pgmctr += 1
+
+    def op_71(self): # Add with Carry Indirect, Y Indexed (Exclusive Indirect)
+        addr, addcycle = self.get_excl_indr()
+        self.regA = self.adc(self.regA, self.read(addr))
+        self.cycles += 5 + addcycle
+        self.pgmctr += 1
+
+    def op_75(self): # Add to Accumulator Zero Page, X Indexed
+        addr = (self.read() + self.regX) % 256
+        self.regA = self.adc(self.regA, self.read(addr))
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_76(self): # Rotate Right Zero Page, X Indexed
+        addr = (self.read() + self.regX) % 256
+        self.write(addr, self.ror(self.read(addr)))
+        self.cycles += 6
+        self.pgmctr += 1
+
+    def op_78(self): # Set Interrupt-Disable
+        self.status |= FLAG_I; self.cycles += 2
+
+    def op_79(self): # Add to Accumulator Absolute, Y Indexed
+        addr = self.get_abs_indx(self.get_abs(), self.regY) # Add cycle if page boundary crossed
+        self.regA = self.adc(self.regA, self.read(addr + self.regY))
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_7D(self): # Add to Accumulator Absolute, X Indexed
+        addr = self.get_abs_indx(self.get_abs(), self.regX)  # Add cycle if page boundary crossed
+        self.regA = self.adc(self.regA, self.read(addr + self.regX))
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_7E(self): # Rotate Right Absolute, X Indexed
+        addr = self.get_abs() + self.regX # No Additional cycles when boundary crossed
+        self.write(addr, self.ror(self.read(addr)))
+        self.cycles += 7
+        self.pgmctr += 1
+
+    def op_81(self): # Store Accumulator Indirect, X Indexed (Inclusive Indirect)
+        addr = self.get_incl_indr()
+        print(hex(addr), hex(self.regA))
+        self.write(self.read(addr),self.regA)
+        self.cycles += 6
+        self.pgmctr += 1
+
+    def op_84(self): # STY Zero Page
+        self.write(self.read(), self.regY); self.cycles += 3
+        self.pgmctr += 1
+
+    def op_85(self): # STA Zero Page
+        self.write(self.read(), self.regA)
+        self.cycles += 3
+        self.pgmctr += 1
+
+    def op_86(self): # STX Zero Page
+        self.write(self.read(), self.regX); self.cycles += 3
+        self.pgmctr += 1
+
+    def op_88(self): # Decrement Y
+        self.regY = self.dec(self.regY)
+        self.cycles += 2
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regY]
+        self.pgmctr += 1
+
+    def op_8A(self): # Transfer X > A
+        self.regA = self.regX; self.cycles += 2
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+
+    def op_8C(self): # Store Register Y Absolute
+        self.write(self.read(self.get_abs()), self.regY); self.cycles += 4
+        self.pgmctr += 1
+
+    def op_8D(self): # Store Register A Absolute
+        self.write(self.get_abs(), self.regA)
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_8E(self): # Store Register X Absolute
+        self.write(self.read(self.get_abs()), self.regX); self.cycles += 4
+        self.pgmctr += 1
+
+    def op_90(self): # Branch on Not Carry
+        if not self.status & FLAG_C:
+            signedval = signed8(self.read())
+            temppg = self.pgmctr
+            self.pgmctr += signedval
+            if math.floor(temppg / 256) != math.floor(self.pgmctr / 256):
+                self.cycles += 1  # Branch takes extra cycle if crossing page boundary
+            self.cycles += 1  # Takes 1 additional cycles if nonzero
+        self.cycles += 2  # Takes 2 cycles no matter what
+        self.pgmctr += 1
+
+    def op_91(self): # Store Accumulator Indirect, XY Indexed (Exclusive Indirect)
+        addr, addcycle = self.get_excl_indr()
+        self.write(self.read(addr), self.regA)
+        self.cycles += 6
+        self.pgmctr += 1
+
+    def op_95(self): # STA Zero Page, X Indexed
+        addr = (self.read() + self.regX) % 256
+        self.write(addr, self.regA)
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_98(self): # Transfer Y > A
+        self.regA = self.regY; self.cycles += 2
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+
+    def op_99(self): # Store Accumulator Absolute, Y Indexed
+        addr = self.get_abs_indx(self.get_abs(), self.regX)
+        self.write(self.read(addr), self.regA)
+        self.cycles += 5
+        self.pgmctr += 1
+
+    def op_9A(self): # Transfer X to Stack Pointer
+        self.stackptr = self.regX
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regX]
+        self.cycles += 2
+
+    def op_9D(self): # Store Accumulator Absolute, X Indexed
+        addr = self.get_abs_indx(self.get_abs(), self.regX)
+        self.write(addr, self.regA)
+        self.cycles += 5
+        self.pgmctr += 1
+
+    def op_A0(self): # Load Y Immediate
+        self.regY = self.read(); self.cycles += 2
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regY]
+        self.pgmctr += 1
+
+    def op_A1(self): # Load Accumulator Indirect, X Indexed (Inclusive Indirect)
+        addr = self.get_incl_indr()
+        self.regA = self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 6
+        self.pgmctr += 1
+
+    def op_A2(self): # Load Immediate X
+        self.regX = self.read(); self.cycles += 2
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regX]
+        self.pgmctr += 1
+
+    def op_A5(self): # Load A Zero Page
+        self.regA = self.read(); self.cycles += 2
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.pgmctr += 1
+
+    def op_A8(self): # Transfer A > Y
+        self.regY = self.regA; self.cycles += 2
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regY]
+
+    def op_A9(self): # Load A Immediate
+        self.regA = self.read(); self.cycles += 2
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.pgmctr += 1
+
+    def op_AA(self): # Transfer A > X
+        self.regX = self.regA; self.cycles += 2
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regX]
+
+    def op_AD(self): # Load A Absolute
+        addr = self.get_abs()
+        self.regA = self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]; self.cycles += 4
+        self.pgmctr += 1
+
+    def op_B0(self): # Branch on Carry
+        if self.status & FLAG_C:
+            signedval = signed8(self.read())
+            temppg = self.pgmctr
+            self.pgmctr += signedval
+            if math.floor(temppg / 256) != math.floor(self.pgmctr / 256):
+                self.cycles += 1 # Branch takes extra cycle if crossing page boundary
+            self.cycles += 1 # Takes 1 additional cycles if nonzero
+        self.cycles += 2 # Takes 2 cycles no matter what
+        self.pgmctr += 1
+
+    def op_B1(self): # Load Accumulator Indirect, Y Indexed (Exclsuive Indirect)
+        addr, addcycle = self.get_excl_indr()
+        self.regA = self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 5 + addcycle
+        self.pgmctr += 1
+
+    def op_B5(self): # Load Accumulator Zero Page, X Indexed
+        addr = (self.read() + self.regX) % 256
+        self.regA = self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_B8(self): # Clear Overflow
+        self.status &= ~FLAG_V; self.cycles += 2
+
+    def op_B9(self): # Load Accumulator Absolute, Y Indexed
+        addr = self.get_abs_indx(self.get_abs(), self.regY)
+        self.regA = self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_BA(self): # Transfer Stack Pointer to X
+        self.regX = self.stackptr
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regX]
+        self.cycles += 2
+
+    def op_BD(self): # Load Accumulator Absolute, X Indexed
+        addr = self.get_abs_indx(self.get_abs(), self.regX)
+        self.regA = self.read(addr)
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regA]
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_C0(self): # Compare with Y Register Immediate
+        self.cmp(self.regY, self.read())
+        self.cycles += 2
+        self.pgmctr += 1
+
+    def op_C1(self): # Compare with Accumulator Indirect, X Indexed (Inclusive Indirect)
+        addr = self.get_incl_indr()
+        self.cmp(self.regA, self.read(addr))
+        self.cycles += 6
+        self.pgmctr += 1
+
+    def op_C4(self): # Compare with Y Zero Page
+        addr = self.read()
+        self.cmp(self.regY, self.read(addr))
+        self.cycles += 3
+        self.pgmctr += 1
+
+    def op_C5(self): # Compare with Accumulator Zero Page
+        addr = self.read()
+        self.cmp(self.regA, self.read(addr))
+        self.cycles += 3
+        self.pgmctr += 1
+
+    def op_C6(self): # Decrement Memory Zero Page
+        addr = self.read()
+        self.write(addr, self.dec(self.read(addr)))
+        self.cycles += 5
+        self.pgmctr += 1
+
+    def op_C8(self): # Increment Y
+        self.regY = self.inc(self.regY)
+        self.cycles += 2
+
+    def op_C9(self): # Compare with Accumulator Immediate
+        self.cmp(self.regA, self.read())
+        self.cycles += 2
+        self.pgmctr += 1
+
+    def op_CA(self): # Decrement X
+        self.regX = self.dec(self.regX)
+        self.cycles += 2
+        self.status = self.status & CLEAR_NZ | NZ_FLAGS[self.regX]
+
+    def op_CC(self): # Compare with Y Register Absolute
+        addr = self.get_abs()
+        self.cmp(self.regY, self.read(addr))
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_CD(self): # Compare with Accumulator Absolute
+        addr = self.get_abs()
+        self.cmp(self.regA, self.read(addr))
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_CE(self): # Decrement Memory Absolute
+        addr = self.get_abs()
+        self.write(addr,self.dec(self.read(addr)))
+        self.cycles += 3
+        self.pgmctr += 1
+
+    def op_D0(self): # Branch on Not Equal
+        if not self.status & FLAG_Z:
+            signedval = signed8(self.read())
+            temppg = self.pgmctr
+            self.pgmctr += signedval
+            if math.floor(temppg / 256) != math.floor(self.pgmctr / 256):
+                self.cycles += 1 # Branch takes extra cycle if crossing page boundary
+            self.cycles += 1 # Takes 1 additional cycles if nonzero
+        self.cycles += 2 # Takes 2 cycles no matter what
+        self.pgmctr += 1
+
+    def op_D1(self): # Compare with Accumulator Indirect, Y Indexed (Exclusive Indirect)
+        addr = self.get_incl_indr()
+        self.cmp(self.regA, self.read(addr))
+        self.cycles += 5
+        self.pgmctr += 1
+
+    def op_D5(self): # Compare with Accumulator Zero Page, X Indexed
+        addr = (self.read() + self.regX) % 256
+        self.cmp(self.regA, self.read(addr))
+        self.cycles += 3
+        self.pgmctr += 1
+
+    def op_D6(self): # Decrement Memory Zero Page, X Indexed
+        addr = (self.read() + self.regX) % 256
+        self.write(addr, self.dec(self.read(addr)))
+        self.cycles += 6
+        self.pgmctr += 1
+
+    def op_D8(self): # Clear Decimal -- Not Used
+        self.status &= ~FLAG_D; self.cycles += 2
+
+    def op_D9(self): # Compare with Accumulator Absolute, y Indexed
+        addr = self.get_abs_indx(self.get_abs(), self.regY)
+        self.cmp(self.regA, self.read(addr))
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_DD(self): # Compare with Accumulator Absolute, X Indexed
+        addr = self.get_abs_indx(self.get_abs(), self.regX)
+        self.cmp(self.regA, self.read(addr))
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_DE(self): # Decrement Memory Absolute, X Indexed
+        addr = self.get_abs_indx(self.get_abs(), self.regX)
+        self.write(addr, self.dec(self.read(addr)))
+        self.cycles += 7
+        self.pgmctr += 1
+
+    def op_E0(self): # Compare with X Register Immediate
+        self.cmp(self.regX, self.read())
+        self.cycles += 2
+        self.pgmctr += 1
+
+    def op_E1(self): # Subtract with Carry Indirect, X Indexed (Inclusive Indirect)
+        addr = self.get_incl_indr()
+        self.regA = self.sbc(self.regA, self.read(addr))
+        self.cycles += 6
+        self.pgmctr += 1
+
+    def op_E4(self): # Compare with X Register Zero Page
+        addr = self.read()
+        self.cmp(self.regX, self.read(addr))
+        self.cycles += 3
+        self.pgmctr += 1
+
+    def op_E5(self): # Subtract with Carry Zero Page
+        addr = self.read()
+        self.regA = self.sbc(self.regA, self.read(addr))
+        self.cycles += 3
+        self.pgmctr += 1
+
+    def op_E6(self): # Increment Memory Zero page
+        addr = self.read()
+        self.write(addr, self.inc(self.read(addr)))
+        self.cycles += 5
+        self.pgmctr += 1
+
+    def op_E8(self): # Increment X
+        self.regX = self.inc(self.regX)
+        self.cycles += 2
+
+    def op_E9(self): # Subtract with Carry Immediate
+        self.regA = self.sbc(self.regA, self.read())
+        self.cycles += 2
+        self.pgmctr += 1
+
+    def op_EA(self): # No Operation
+        self.cycles += 2
+
+    def op_EC(self): # Compare with X Register Absolute
+        addr = self.get_abs()
+        self.cmp(self.regX, self.read(addr))
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_ED(self): # Subtract with Carry Absolute
+        addr = self.get_abs()
+        self.regA = self.sbc(self.regA, self.read(addr))
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_EE(self): # Increment Memory Absolute
+        addr = self.get_abs()
+        self.write(addr, self.inc(self.read(addr)))
+        self.cycles += 6
+        self.pgmctr += 1
+
+    def op_F0(self): # Branch on Equal
+        if self.status & FLAG_Z:
+            signedval = signed8(self.read())
+            temppg = self.pgmctr
+            self.pgmctr += signedval
+            if math.floor(temppg / 256) != math.floor(self.pgmctr / 256):
+                self.cycles += 1  # Branch takes extra cycle if crossing page boundary
+            self.cycles += 1  # Takes 1 additional cycles if nonzero
+        self.cycles += 2  # Takes 2 cycles no matter what
+        self.pgmctr += 1
+
+    def op_F1(self): # Subtract with Carry Indirect, Y Indexed (Exclusive Indirect)
+        addr, addcycle = self.get_excl_indr()
+        self.regA = self.sbc(self.regA, self.read(addr))
+        self.cycles += 5 + addcycle
+        self.pgmctr += 1
+
+    def op_F5(self): # Subtract with Carry Zero Page, X Indexed
+        addr = (self.read() + self.regX) % 256
+        self.regA = self.sbc(self.regA, self.read(addr))
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_F6(self): # Increment Memory Zero Page, X Indexed
+        addr = (self.read() + self.regX) % 256
+        self.write(addr, self.inc(self.read(addr)))
+        self.cycles += 6
+        self.pgmctr += 1
+
+    def op_F8(self): # Set Decimal Flag -- Not Used
+        self.status |= FLAG_D; self.cycles += 2
+
+    def op_F9(self): # Subtract with Carry Absolute, Y Indexed
+        addr = self.get_abs_indx(self.get_abs(), self.regY)
+        self.regA = self.sbc(self.regA, self.read(addr))
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_FD(self): # Subtract with Carry Absolute, X Indexed
+        addr = self.get_abs_indx(self.get_abs(), self.regX)
+        self.regA = self.sbc(self.regA, self.read(addr))
+        self.cycles += 4
+        self.pgmctr += 1
+
+    def op_FE(self): # Increment Memory Absolute, X Indexed
+        addr = self.get_abs() + self.regX
+        self.write(addr, self.inc(self.read(addr)))
+        self.cycles += 7 # No additional cycles for crossing page boundary
+        self.pgmctr += 1
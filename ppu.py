@@ -0,0 +1,514 @@
+from cartridge import HORIZONTAL, VERTICAL, FOUR_SCREEN, SINGLE_LOW, SINGLE_HIGH
+from interrupts import NMI
+from savestate import Fields
+from tileCache import TileCache
+import numpy as np
+import struct
+
+# Picture processing unit. Registers at 0x2000-0x2007 (mirrored up to 0x3FFF), 2K of nametable vram (4K for four
+# screen carts), 256 bytes of OAM and 32 bytes of palette, all held in NumPy arrays
+# The PPU doesn't run alongside the CPU dot by dot. It's caught up lazily to cpu cycles * 3 whenever something can tell
+# the difference (any register access, OAM DMA, the end of a frame), and then runs whole scanlines at a time: each
+# visible line is rendered with array ops over the 256 pixels of the line, not per pixel Python. Pattern data comes
+# from a TileCache of pre-decoded tiles (see tileCache.py)
+# Fast mode skips the per line work and renders the whole frame at the start of vblank in one go, using the scroll
+# the frame started with, which is right for everything that doesn't change scroll or banks mid frame
+# Headless mode never makes a picture. Timing, vblank and NMI are the same
+# In both, the two status bits games poll for (sprite 0 hit and overflow) are worked out once at the top of the frame
+# (plan_frame) and set when their line comes, as a rendered line would have set them
+
+DOTS = 341 # Per scanline
+LINES = 262 # Per frame, 0-239 visible, 240 post render, 241-260 vblank, 261 pre render
+VBLANK_LINE = 241
+PRE_RENDER = 261
+FRAME_DOTS = DOTS * LINES
+
+# PPUCTRL, PPUMASK and PPUSTATUS bits
+CTRL_INCREMENT = 0x04
+CTRL_SPRITE_TABLE = 0x08
+CTRL_BG_TABLE = 0x10
+CTRL_TALL_SPRITES = 0x20
+CTRL_NMI = 0x80
+MASK_GREY = 0x01
+MASK_BG_LEFT = 0x02
+MASK_SPRITES_LEFT = 0x04
+MASK_BG = 0x08
+MASK_SPRITES = 0x10
+STATUS_OVERFLOW = 0x20
+STATUS_SPRITE0 = 0x40
+STATUS_VBLANK = 0x80
+
+# Which 1K of vram each of the four nametables uses
+MIRRORING = {HORIZONTAL: (0, 0, 1, 1), VERTICAL: (0, 1, 0, 1), SINGLE_LOW: (0, 0, 0, 0), SINGLE_HIGH: (1, 1, 1, 1),
+             FOUR_SCREEN: (0, 1, 2, 3)}
+
+# 2C02 colours, 64 RGB triples
+NES_RGB = np.array([
+    84, 84, 84, 0, 30, 116, 8, 16, 144, 48, 0, 136, 68, 0, 100, 92, 0, 48, 84, 4, 0, 60, 24, 0,
+    32, 42, 0, 8, 58, 0, 0, 64, 0, 0, 60, 0, 0, 50, 60, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    152, 150, 152, 8, 76, 196, 48, 50, 236, 92, 30, 228, 136, 20, 176, 160, 20, 100, 152, 34, 32, 120, 60, 0,
+    84, 90, 0, 40, 114, 0, 8, 124, 0, 0, 118, 40, 0, 102, 120, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    236, 238, 236, 76, 154, 236, 120, 124, 236, 176, 98, 236, 228, 84, 236, 236, 88, 180, 236, 106, 100, 212, 136, 32,
+    160, 170, 0, 116, 196, 0, 76, 208, 32, 56, 204, 108, 56, 180, 204, 60, 60, 60, 0, 0, 0, 0, 0, 0,
+    236, 238, 236, 168, 204, 236, 188, 188, 236, 212, 178, 236, 236, 174, 236, 236, 174, 212, 236, 180, 176, 228, 196, 144,
+    204, 210, 120, 180, 222, 120, 168, 226, 144, 152, 226, 180, 160, 214, 228, 160, 162, 160, 0, 0, 0, 0, 0, 0,
+], dtype=np.uint8).reshape(64, 3)
+
+# Save state scalars, then frameScroll and the headless status lines (-1 for none) that don't fit Fields as they are
+FIELDS = Fields(("ctrl", "B"), ("mask", "B"), ("status", "B"), ("oamAddr", "B"), ("v", "H"), ("t", "H"), ("x", "B"),
+                ("w", "?"), ("buffer", "B"), ("latch", "B"), ("dots", "q"), ("scanline", "H"), ("frames", "q"),
+                ("nmiPending", "?"))
+LINES_STATE = struct.Struct("<HBhh")
+
+COLUMNS = np.arange(33) # Tile columns a scanline touches, 33 because fine x can push it into one more
+SPRITE_X = np.arange(8)
+SCREEN_X = np.arange(256)
+SCREEN_Y = np.arange(240)
+
+
+def palette_index(address): # 0x3F10/14/18/1C are mirrors of 0x3F00/04/08/0C
+    address &= 0x1F
+    return address & 0x0F if address & 0x13 == 0x10 else address
+
+
+class PPU:
+    def __init__(self, cartridge, fast=False, headless=False):
+        self.mapper = cartridge.mapper
+        self.vram = np.zeros(0x1000, np.uint8)
+        self.palette = np.zeros(0x20, np.uint8)
+        self.oam = np.zeros(0x100, np.uint8)
+        self.frame = np.zeros((240, 256), np.uint8) # Palette indexes, rgb() turns them into colours
+        self.ctrl = self.mask = self.status = self.oamAddr = 0
+        self.v = self.t = self.x = 0 # Current and temporary vram address, fine x scroll
+        self.w = False # First or second write of 0x2005/0x2006
+        self.buffer = 0 # 0x2007 read buffer
+        self.latch = 0 # Last value written to any register, the low bits of 0x2002 read it back
+        self.fast = fast
+        self.headless = headless
+        self.hitLine = self.overflowLine = None # Fast or headless, lines the status bits get set on this frame
+        self.dots = 0 # Dots run since power on, always at the start of a scanline
+        self.scanline = 0
+        self.frames = 0
+        self.frameScroll = (0, 0)
+        self.nmiPending = False # Set on every NMI edge, for standalone use, attached it also raises the CPU's NMI line
+        self.tileCache = TileCache(self.mapper)
+        self.mapper.listeners.append(self.bank_switched)
+        self.scanlineHook = getattr(self.mapper, "clock_scanline", None) # MMC3 counts scanlines
+        self.cpu = None
+        self.bus = None
+        self.scheduler = None
+        self.interrupts = None
+
+    def attach(self, emu): # Take over 0x2000-0x3FFF and OAM DMA on emu's bus, and run off its cycle count
+        self.cpu = emu
+        self.bus = emu.bus
+        self.bus.map_handler(0x20, 0x3F, self.read_register, self.write_register, self.peek_register)
+        self.bus.ioWriteHandlers[0x4014] = self.oam_dma
+        self.scheduler = getattr(emu, "scheduler", None)
+        self.interrupts = getattr(emu, "interrupts", None)
+        self.reschedule()
+
+    def reschedule(self): # Events for the scanline we're on, on attach and after load_state
+        if self.scheduler is not None:
+            self.scheduler.drop(("vblank", "scanline"))
+            self.schedule_line(VBLANK_LINE, self.vblank_event, "vblank")
+            if self.scanlineHook is not None: # The mapper's IRQ counter has to be clocked on time
+                self.schedule_line((self.scanline + 1) % LINES, self.scanline_event, "scanline")
+
+    @property
+    def planned(self): # No lines are rendered, the status bits come from plan_frame
+        return self.fast or self.headless
+
+    # <editor-fold desc="Timing">
+    def catch_up(self): # Run up to where the CPU is
+        if self.cpu is not None:
+            self.advance_to(self.cpu.cycles * 3)
+
+    def advance_to(self, dots): # Run every scanline that ends at or before dots
+        while self.dots + DOTS <= dots:
+            self.end_line()
+
+    def schedule_line(self, line, callback, name): # Event for the cpu cycle the next start of line falls on
+        lines = (line - self.scanline) % LINES or LINES
+        dots = self.dots + lines * DOTS
+        return self.scheduler.schedule(-(-dots // 3), callback, name)
+
+    def vblank_event(self, cycle): # vblank starts, catch up so the status bit and NMI are set on time
+        self.catch_up()
+        self.schedule_line(VBLANK_LINE, self.vblank_event, "vblank")
+
+    def scanline_event(self, cycle):
+        self.catch_up()
+        self.schedule_line((self.scanline + 1) % LINES, self.scanline_event, "scanline")
+
+    def raise_nmi(self):
+        self.nmiPending = True
+        if self.interrupts is not None:
+            self.interrupts.raise_line(NMI)
+
+    def quiet_until(self): # First cpu cycle a 0x2002 read could see different bits than now, for idle loop skipping
+        line = self.scanline
+        lines = [PRE_RENDER] # The end of it clears the status, the start of vblank is a scheduled event already
+        if line < 240 and self.mask & (MASK_BG | MASK_SPRITES):
+            if self.planned:
+                lines += [hit for hit in (self.hitLine, self.overflowLine) if hit is not None and hit >= line]
+            else:
+                lines.append(line) # Any rendered line can set sprite 0 hit or overflow
+        ahead = min((end - line) % LINES for end in lines)
+        return -(-(self.dots + (ahead + 1) * DOTS) // 3)
+
+    def run_frame(self): # Standalone use, run to the start of the next vblank
+        frames = self.frames
+        while self.frames == frames:
+            self.end_line()
+
+    def end_line(self):
+        line = self.scanline
+        rendering = self.mask & (MASK_BG | MASK_SPRITES)
+        if line < 240:
+            if line == 0:
+                self.frameScroll = (self.v, self.x)
+                if self.planned:
+                    self.plan_frame()
+            if rendering:
+                if self.planned:
+                    if line == self.hitLine:
+                        self.status |= STATUS_SPRITE0
+                    if line == self.overflowLine:
+                        self.status |= STATUS_OVERFLOW
+                else:
+                    self.render_line(line)
+                self.next_line()
+                if self.scanlineHook is not None:
+                    self.scanlineHook()
+            elif not self.planned:
+                self.frame[line] = self.palette[0]
+        elif line == PRE_RENDER and rendering:
+            self.v = self.v & ~0x7BE0 | self.t & 0x7BE0 # Vertical scroll is reloaded from t
+            self.v = self.v & ~0x041F | self.t & 0x041F
+            if self.scanlineHook is not None:
+                self.scanlineHook()
+        self.dots += DOTS
+        self.scanline = line = (line + 1) % LINES
+        if line == VBLANK_LINE:
+            if self.fast and not self.headless:
+                self.render_frame()
+            self.status |= STATUS_VBLANK
+            self.frames += 1
+            if self.ctrl & CTRL_NMI:
+                self.raise_nmi()
+        elif line == PRE_RENDER:
+            self.status &= ~(STATUS_VBLANK | STATUS_SPRITE0 | STATUS_OVERFLOW)
+
+    def next_line(self): # Fine y / coarse y increment at dot 256, then the horizontal copy from t at dot 257
+        v = self.v
+        if v & 0x7000 != 0x7000:
+            v += 0x1000
+        else:
+            v &= ~0x7000
+            coarse = v >> 5 & 0x1F
+            if coarse == 29:
+                coarse = 0
+                v ^= 0x0800
+            elif coarse == 31:
+                coarse = 0
+            else:
+                coarse += 1
+            v = v & ~0x03E0 | coarse << 5
+        self.v = v & ~0x041F | self.t & 0x041F
+    # </editor-fold>
+
+    # <editor-fold desc="Save states">
+    def save_state(self): # Registers and timing, then vram, palette, OAM and the picture as raw copies
+        lines = LINES_STATE.pack(*self.frameScroll, -1 if self.hitLine is None else self.hitLine,
+                                 -1 if self.overflowLine is None else self.overflowLine)
+        return b"".join((FIELDS.pack(self), lines, self.vram, self.palette, self.oam, self.frame))
+
+    def load_state(self, data):
+        offset = FIELDS.unpack(self, data)
+        v, x, hit, overflow = LINES_STATE.unpack_from(data, offset)
+        offset += LINES_STATE.size
+        self.frameScroll = (v, x)
+        self.hitLine = hit if hit >= 0 else None
+        self.overflowLine = overflow if overflow >= 0 else None
+        for array in (self.vram, self.palette, self.oam, self.frame):
+            array.reshape(-1)[:] = np.frombuffer(data, np.uint8, array.size, offset)
+            offset += array.size
+        if not self.tileCache.rom: # chr ram came back with the mapper, any tile could be different
+            self.tileCache.invalidate()
+        self.reschedule()
+    # </editor-fold>
+
+    # <editor-fold desc="Rendering">
+    def bank_switched(self, kind):
+        if kind == "chr":
+            self.tileCache.bank_switched()
+
+    def nametables(self): # vram offset of each of the four nametables, for the current mirroring
+        return np.array(MIRRORING[self.mapper.mirroring]) * 0x400
+
+    def background_line(self, v, fineX): # Background pixel values (0-3) and palette indexes for one line
+        if not self.mask & MASK_BG:
+            zeros = np.zeros(256, np.uint8)
+            return zeros, zeros
+        tiles = self.tileCache.update()
+        columns = (v & 0x1F) + COLUMNS
+        coarseY = v >> 5 & 0x1F
+        tables = ((v >> 10) & 2) | ((v >> 10) + (columns >> 5)) & 1
+        base = self.nametables()[tables]
+        columns &= 0x1F
+        names = self.vram[base + coarseY * 32 + columns].astype(np.intp)
+        attributes = self.vram[base + 0x3C0 + (coarseY >> 2) * 8 + (columns >> 2)]
+        attributes = attributes >> ((coarseY & 2) << 1 | (columns & 2)) & 3
+        pixels = tiles[(0x100 if self.ctrl & CTRL_BG_TABLE else 0) + names, v >> 12 & 7].reshape(-1)
+        pixels = pixels[fineX:fineX + 256].copy()
+        if not self.mask & MASK_BG_LEFT:
+            pixels[:8] = 0
+        indexes = np.where(pixels != 0, np.repeat(attributes, 8)[fineX:fineX + 256] << 2 | pixels, 0)
+        return pixels, indexes
+
+    def sprite_rows(self, line, sprites): # 8 pixel values per sprite for the row of each sprite that's on line
+        oam = self.oam.reshape(64, 4)
+        tiles = oam[sprites, 1].astype(np.intp)
+        flags = oam[sprites, 2]
+        height = 16 if self.ctrl & CTRL_TALL_SPRITES else 8
+        rows = line - (oam[sprites, 0].astype(np.intp) + 1)
+        rows = np.where(flags & 0x80, height - 1 - rows, rows)
+        if height == 16:
+            tiles = (tiles & 1) * 0x100 + (tiles & 0xFE) + (rows >> 3)
+        elif self.ctrl & CTRL_SPRITE_TABLE:
+            tiles = tiles + 0x100
+        pixels = self.tileCache.update()[tiles, rows & 7]
+        return np.where((flags & 0x40)[:, None] != 0, pixels[:, ::-1], pixels)
+
+    def sprites_on(self, line): # OAM indexes of the sprites on line, first 8 only, sets overflow past that
+        height = 16 if self.ctrl & CTRL_TALL_SPRITES else 8
+        rows = line - (self.oam[0::4].astype(np.intp) + 1)
+        sprites = np.flatnonzero((rows >= 0) & (rows < height))
+        if len(sprites) > 8:
+            self.status |= STATUS_OVERFLOW
+            sprites = sprites[:8]
+        return sprites
+
+    def render_line(self, line):
+        background, indexes = self.background_line(self.v, self.x)
+        if self.mask & MASK_SPRITES:
+            sprites = self.sprites_on(line)
+            if len(sprites):
+                indexes = self.composite(line, sprites, background, indexes)
+        self.frame[line] = self.palette[indexes] & (0x30 if self.mask & MASK_GREY else 0x3F)
+
+    def composite(self, line, sprites, background, indexes):
+        # Lower OAM index wins where sprites overlap, so each pixel takes the smallest sprite number covering it
+        pixels = self.sprite_rows(line, sprites)
+        xs = self.oam[sprites * 4 + 3].astype(np.intp)
+        positions = xs[:, None] + SPRITE_X
+        opaque = (pixels != 0) & (positions < 256)
+        if not self.mask & MASK_SPRITES_LEFT:
+            opaque &= positions >= 8
+        if sprites[0] == 0 and self.mask & MASK_BG:
+            hits = positions[0][opaque[0]]
+            hits = hits[hits != 255]
+            if background[hits].any():
+                self.status |= STATUS_SPRITE0
+        owner = np.full(256, len(sprites))
+        np.minimum.at(owner, positions[opaque], np.broadcast_to(np.arange(len(sprites))[:, None], opaque.shape)[opaque])
+        covered = np.flatnonzero(owner < len(sprites))
+        if not len(covered):
+            return indexes
+        winner = owner[covered]
+        value = pixels[winner, covered - xs[winner]]
+        flags = self.oam[sprites[winner] * 4 + 2]
+        show = (flags & 0x20 == 0) | (background[covered] == 0) # Behind background only shows through bg colour 0
+        indexes = indexes.copy()
+        indexes[covered[show]] = 0x10 | (flags[show] & 3) << 2 | value[show]
+        return indexes
+
+    def render_frame(self): # Fast mode, the whole picture from the scroll at the top of the frame
+        v, fineX = self.frameScroll
+        frame = np.zeros((240, 256), np.uint8)
+        background = np.zeros((240, 256), np.uint8)
+        if self.mask & MASK_BG:
+            background, frame = self.background_frame(v, fineX)
+        if self.mask & MASK_SPRITES:
+            frame = self.sprite_frame(background, frame)
+        self.frame[:] = self.palette[frame] & (0x30 if self.mask & MASK_GREY else 0x3F)
+
+    def background_frame(self, v, fineX):
+        return self.background_at(v, fineX, SCREEN_Y[:, None], SCREEN_X[None, :])
+
+    def background_at(self, v, fineX, y, x): # Background pixel values and palette indexes at screen y, x (arrays)
+        cache = self.tileCache.update()
+        screenX = x
+        x = (((v & 0x1F) << 3 | fineX) + (v >> 10 & 1) * 256 + x) % 512 # Position in the 512x480 nametable plane
+        y = (((v >> 5 & 0x1F) << 3 | v >> 12 & 7) + (v >> 11 & 1) * 240 + y) % 480
+        column = (x & 0xFF) >> 3
+        row = (y % 240) >> 3
+        base = self.nametables()[y // 240 * 2 | x >> 8]
+        names = self.vram[base + row * 32 + column].astype(np.intp)
+        attributes = self.vram[base + 0x3C0 + (row >> 2) * 8 + (column >> 2)]
+        attributes = attributes >> ((row & 2) << 1 | (column & 2)) & 3
+        pixels = cache[(0x100 if self.ctrl & CTRL_BG_TABLE else 0) + names, y & 7, x & 7]
+        if not self.mask & MASK_BG_LEFT:
+            pixels = np.where(screenX < 8, 0, pixels).astype(np.uint8)
+        return pixels, np.where(pixels != 0, attributes << 2 | pixels, 0).astype(np.uint8)
+
+    def sprite_pixels(self, sprite): # Pixel values of a whole sprite, (8 or 16, 8), flips applied
+        tile, flags = int(self.oam[sprite * 4 + 1]), int(self.oam[sprite * 4 + 2])
+        cache = self.tileCache.update()
+        if self.ctrl & CTRL_TALL_SPRITES: # Top and bottom tile stacked
+            first = (tile & 1) * 0x100 + (tile & 0xFE)
+            pixels = cache[first:first + 2].reshape(16, 8)
+        else:
+            pixels = cache[(0x100 if self.ctrl & CTRL_SPRITE_TABLE else 0) + tile]
+        if flags & 0x80:
+            pixels = pixels[::-1]
+        if flags & 0x40:
+            pixels = pixels[:, ::-1]
+        return pixels
+
+    def sprite_frame(self, background, frame): # Sprites back to front so lower OAM indexes end up on top
+        oam = self.oam.reshape(64, 4)
+        height = 16 if self.ctrl & CTRL_TALL_SPRITES else 8
+        top = oam[:, 0].astype(np.intp) + 1
+        out = frame.copy()
+        for sprite in range(63, -1, -1):
+            if top[sprite] >= 240:
+                continue
+            flags, x = int(oam[sprite, 2]), int(oam[sprite, 3])
+            pixels = self.sprite_pixels(sprite)
+            bottom = min(240, top[sprite] + height); right = min(256, x + 8)
+            pixels = pixels[:bottom - top[sprite], :right - x]
+            area = (slice(top[sprite], bottom), slice(x, right))
+            opaque = pixels != 0
+            if not self.mask & MASK_SPRITES_LEFT and x < 8:
+                opaque[:, :8 - x] = False
+            if flags & 0x20:
+                opaque &= background[area] == 0
+            out[area] = np.where(opaque, 0x10 | (flags & 3) << 2 | pixels, out[area])
+        return out
+
+    def plan_frame(self): # Fast and headless, this frame's sprite 0 hit and overflow lines without drawing anything
+        self.hitLine = self.overflowLine = None
+        if not self.mask & MASK_SPRITES:
+            return
+        height = 16 if self.ctrl & CTRL_TALL_SPRITES else 8
+        top = self.oam[0::4].astype(np.intp) + 1
+        onScreen = top[top < 240]
+        coverage = np.zeros(240 + height + 1, np.intp) # Sprites per line, from +1 at each top and -1 past each bottom
+        np.add.at(coverage, onScreen, 1)
+        np.add.at(coverage, onScreen + height, -1)
+        crowded = np.flatnonzero(np.cumsum(coverage)[:240] > 8)
+        if len(crowded):
+            self.overflowLine = int(crowded[0])
+        if not self.mask & MASK_BG or top[0] >= 240:
+            return
+        # Sprite 0 only hits where it's opaque, so only those pixels get the background looked up under them
+        rows, columns = np.nonzero(self.sprite_pixels(0))
+        y = top[0] + rows
+        x = int(self.oam[3]) + columns
+        keep = (y < 240) & (x < 255)
+        if not self.mask & MASK_SPRITES_LEFT:
+            keep &= x >= 8
+        y, x = y[keep], x[keep]
+        if len(y):
+            background, _ = self.background_at(*self.frameScroll, y, x)
+            hits = y[background != 0]
+            if len(hits):
+                self.hitLine = int(hits.min())
+
+    def rgb(self): # (240, 256, 3) uint8 picture of the last frame
+        return NES_RGB[self.frame]
+    # </editor-fold>
+
+    # <editor-fold desc="Registers">
+    def read_register(self, address):
+        self.catch_up()
+        register = address & 7
+        if register == 2:
+            value = self.status & 0xE0 | self.latch & 0x1F
+            self.status &= ~STATUS_VBLANK
+            self.w = False
+            return value
+        if register == 4:
+            return int(self.oam[self.oamAddr])
+        if register == 7:
+            address = self.v & 0x3FFF
+            if address < 0x3F00: # Buffered, the read gets last read's value
+                value, self.buffer = self.buffer, self.vram_read(address)
+            else: # Palette comes straight back, the buffer gets the nametable byte underneath
+                value, self.buffer = self.vram_read(address), self.vram_read(address - 0x1000)
+            self.v = (self.v + (32 if self.ctrl & CTRL_INCREMENT else 1)) & 0x7FFF
+            return value
+        return self.latch # Write only registers read back the bus latch
+
+    def peek_register(self, address): # No side effects, for debugging
+        register = address & 7
+        if register == 2:
+            return self.status & 0xE0 | self.latch & 0x1F
+        if register == 4:
+            return int(self.oam[self.oamAddr])
+        return self.latch
+
+    def write_register(self, address, data):
+        self.catch_up()
+        self.latch = data
+        register = address & 7
+        if register == 0:
+            if data & CTRL_NMI and not self.ctrl & CTRL_NMI and self.status & STATUS_VBLANK:
+                self.raise_nmi()
+            self.ctrl = data
+            self.t = self.t & ~0x0C00 | (data & 3) << 10
+        elif register == 1:
+            self.mask = data
+        elif register == 3:
+            self.oamAddr = data
+        elif register == 4:
+            self.oam[self.oamAddr] = data
+            self.oamAddr = (self.oamAddr + 1) & 0xFF
+        elif register == 5:
+            if not self.w:
+                self.t = self.t & ~0x001F | data >> 3
+                self.x = data & 7
+            else:
+                self.t = self.t & ~0x73E0 | (data & 7) << 12 | (data >> 3) << 5
+            self.w = not self.w
+        elif register == 6:
+            if not self.w:
+                self.t = self.t & 0x00FF | (data & 0x3F) << 8
+            else:
+                self.t = self.t & 0xFF00 | data
+                self.v = self.t
+            self.w = not self.w
+        elif register == 7:
+            self.vram_write(self.v & 0x3FFF, data)
+            self.v = (self.v + (32 if self.ctrl & CTRL_INCREMENT else 1)) & 0x7FFF
+
+    def oam_dma(self, address, data): # 0x4014, copy a page of CPU memory into OAM, stalls the CPU 513/514 cycles
+        self.catch_up()
+        start = self.oamAddr
+        page = np.array(self.bus[data << 8:(data << 8) + 0x100], np.uint8)
+        self.oam[:] = np.roll(page, start)
+        if self.cpu is not None:
+            self.cpu.cycles += 513 + (self.cpu.cycles & 1)
+
+    def vram_read(self, address):
+        if address < 0x2000:
+            return self.mapper.chr_read(address)
+        if address < 0x3F00:
+            return int(self.vram[self.nametable_index(address)])
+        return int(self.palette[palette_index(address)])
+
+    def vram_write(self, address, data):
+        if address < 0x2000:
+            self.mapper.chr_write(address, data)
+            self.tileCache.write(address)
+        elif address < 0x3F00:
+            self.vram[self.nametable_index(address)] = data
+        else:
+            self.palette[palette_index(address)] = data & 0x3F
+
+    def nametable_index(self, address):
+        address &= 0x0FFF
+        return MIRRORING[self.mapper.mirroring][address >> 10] * 0x400 + (address & 0x3FF)
+    # </editor-fold>
@@ -0,0 +1,205 @@
+from array import array
+import argparse
+import json
+
+# Per opcode and per address execution profiler. attach() swaps every slot of emu.optable for a wrapper that counts the
+# instruction and the cycles it took, then calls the real handler, so the run loops don't change at all and a run
+# without a profiler pays nothing. Control flow ops additionally mark where basic blocks start and JSR/RTS keep a call
+# stack for per routine cycles
+# Only interpreted instructions are counted, code run through run_compiled goes straight past the optable
+
+CONTROL_FLOW = (0x00, 0x10, 0x20, 0x30, 0x40, 0x4C, 0x50, 0x60, 0x6C, 0x70, 0x90, 0xB0, 0xD0, 0xF0) # Ops that end a basic block
+JSR = 0x20
+RTS = 0x60
+TOP = 10 # Rows per section in the text report
+
+
+class Profiler:
+    def __init__(self, reportPath=None): # reportPath gets a json report written to it when the run ends
+        self.opCounts = array("Q", bytes(8 * 0x100))
+        self.opCycles = array("Q", bytes(8 * 0x100))
+        self.pcCounts = array("Q", bytes(8 * 0x10000))
+        self.pcCycles = array("Q", bytes(8 * 0x10000))
+        self.opcodes = bytearray(0x10000) # Last opcode seen at each address
+        self.leaders = bytearray(0x10000) # Addresses that start a basic block
+        self.routines = {} # JSR target: [calls, inclusive cycles, exclusive cycles]
+        self.calls = [] # Open frames, [target, cycles at the JSR, cycles spent in callees]
+        self.idleLoops = {} # Loop head: [skips, instructions, cycles] fast forwarded by the idle skipper (see idle.py)
+        self.reportPath = reportPath
+        self.emu = None
+        self.handlers = None
+
+    def attach(self, emu): # Start counting, the optable list is patched in place so loops that already hold it see it
+        if self.emu is not None:
+            raise RuntimeError("Profiler is already attached")
+        self.emu = emu
+        self.leaders[emu.pgmctr & 0xFFFF] = 1
+        emu.breakpoints.beneath(self.wrap_ops) # Breakpoints keep stopping before we count
+        return self
+
+    def wrap_ops(self):
+        emu = self.emu
+        self.handlers = list(emu.optable)
+        for code, handler in enumerate(self.handlers):
+            emu.optable[code] = self.wrap(code, handler)
+
+    def detach(self): # Put the original handlers back, frames still open count up to now
+        emu = self.emu
+        if emu is None:
+            return self
+        emu.breakpoints.beneath(self.unwrap_ops)
+        while self.calls:
+            self.close_frame(emu.cycles)
+        self.emu = self.handlers = None
+        return self
+
+    def unwrap_ops(self):
+        self.emu.optable[:] = self.handlers
+
+    def wrap(self, code, handler):
+        emu = self.emu
+        opCounts = self.opCounts; opCycles = self.opCycles; pcCounts = self.pcCounts; pcCycles = self.pcCycles
+        opcodes = self.opcodes; leaders = self.leaders
+
+        def counted():
+            pc = (emu.pgmctr - 1) & 0xFFFF
+            start = emu.cycles
+            handler()
+            spent = emu.cycles - start
+            opCounts[code] += 1; opCycles[code] += spent
+            pcCounts[pc] += 1; pcCycles[pc] += spent
+            opcodes[pc] = code
+            return start
+
+        if code not in CONTROL_FLOW:
+            return counted
+
+        if code == JSR:
+            calls = self.calls
+
+            def control():
+                start = counted()
+                leaders[emu.pgmctr & 0xFFFF] = 1
+                calls.append([emu.pgmctr & 0xFFFF, start, 0])
+        elif code == RTS:
+            def control():
+                counted()
+                leaders[emu.pgmctr & 0xFFFF] = 1
+                if self.calls: # RTS used as a jump (pushed address tricks) has no frame to close
+                    self.close_frame(emu.cycles)
+        else:
+            def control():
+                counted()
+                leaders[emu.pgmctr & 0xFFFF] = 1 # Taken or not, both sides of a branch start a block
+        return control
+
+    def close_frame(self, now):
+        target, start, inner = self.calls.pop()
+        spent = now - start
+        routine = self.routines.setdefault(target, [0, 0, 0])
+        routine[0] += 1; routine[1] += spent; routine[2] += spent - inner
+        if self.calls:
+            self.calls[-1][2] += spent
+
+    def idle_skipped(self, head, instructions, cycles): # The skipped cycles still count on the loop's jump back
+        loop = self.idleLoops.setdefault(head, [0, 0, 0])
+        loop[0] += 1; loop[1] += instructions; loop[2] += cycles
+
+    def finish(self, emu): # Called by run_emu when a run ends
+        if self.reportPath is not None:
+            self.write(self.reportPath)
+
+    # <editor-fold desc="Reports">
+    def instructions(self):
+        return sum(self.opCounts)
+
+    def cycles(self):
+        return sum(self.opCycles)
+
+    def hot_opcodes(self, top=TOP): # [(opcode, count, cycles)] by cycles
+        rows = [(code, self.opCounts[code], self.opCycles[code]) for code in range(0x100) if self.opCounts[code]]
+        return sorted(rows, key=lambda row: (-row[2], -row[1], row[0]))[:top]
+
+    def blocks(self): # [(start, last instruction, entries, instructions, cycles)] in address order
+        # A block runs from a leader through the executed addresses after it, up to the next leader, a control flow op,
+        # or a gap too wide to be operand bytes
+        blocks = []
+        current = None
+        last = -0x10
+        for pc in (pc for pc in range(0x10000) if self.pcCounts[pc]):
+            if current is None or self.leaders[pc] or pc - last > 3 or self.opcodes[last] in CONTROL_FLOW:
+                current = [pc, pc, self.pcCounts[pc], 0, 0]
+                blocks.append(current)
+            current[1] = pc
+            current[3] += self.pcCounts[pc]
+            current[4] += self.pcCycles[pc]
+            last = pc
+        return [tuple(block) for block in blocks]
+
+    def hot_blocks(self, top=TOP):
+        return sorted(self.blocks(), key=lambda block: (-block[4], block[0]))[:top]
+
+    def idle(self): # (skips, instructions, cycles) fast forwarded in total
+        return tuple(sum(loop[n] for loop in self.idleLoops.values()) for n in range(3))
+
+    def hot_idle_loops(self, top=TOP): # [(head, skips, instructions, cycles)] by cycles
+        return sorted(((head, *loop) for head, loop in self.idleLoops.items()), key=lambda row: -row[3])[:top]
+
+    def hot_routines(self, top=TOP): # [(target, calls, inclusive cycles, exclusive cycles)] by inclusive cycles
+        rows = [(target, *routine) for target, routine in self.routines.items()]
+        return sorted(rows, key=lambda row: (-row[2], row[0]))[:top]
+
+    def to_dict(self, top=TOP):
+        return {
+            "instructions": self.instructions(),
+            "cycles": self.cycles(),
+            "opcodes": [{"opcode": hex(code), "count": count, "cycles": cycles}
+                        for code, count, cycles in self.hot_opcodes(top)],
+            "blocks": [{"start": hex(start), "end": hex(end), "entries": entries, "instructions": count,
+                        "cycles": cycles} for start, end, entries, count, cycles in self.hot_blocks(top)],
+            "routines": [{"address": hex(target), "calls": calls, "cycles": inclusive, "self cycles": exclusive}
+                         for target, calls, inclusive, exclusive in self.hot_routines(top)],
+            "idle": {"skips": self.idle()[0], "instructions": self.idle()[1], "cycles": self.idle()[2],
+                     "loops": [{"address": hex(head), "skips": skips, "instructions": count, "cycles": cycles}
+                               for head, skips, count, cycles in self.hot_idle_loops(top)]},
+        }
+
+    def report(self, top=TOP): # Plain text version of to_dict
+        total = self.cycles() or 1
+        lines = [f"{self.instructions()} instructions, {self.cycles()} cycles", "", "Hottest opcodes:"]
+        lines += [f"  {code:02X}  {count:>10} executed  {cycles:>10} cycles  {cycles / total:6.1%}"
+                  for code, count, cycles in self.hot_opcodes(top)]
+        lines += ["", "Hottest blocks:"]
+        lines += [f"  {start:04X}-{end:04X}  {entries:>10} entries  {cycles:>10} cycles  {cycles / total:6.1%}"
+                  for start, end, entries, count, cycles in self.hot_blocks(top)]
+        lines += ["", "Routines:"]
+        lines += [f"  {target:04X}  {calls:>10} calls  {inclusive:>10} cycles  {exclusive:>10} self"
+                  for target, calls, inclusive, exclusive in self.hot_routines(top)]
+        skips, count, cycles = self.idle()
+        lines += ["", f"Idle loops: {skips} skips, {count} instructions and {cycles} cycles fast forwarded"]
+        lines += [f"  {head:04X}  {skips:>10} skips  {count:>10} instructions  {cycles:>10} cycles"
+                  for head, skips, count, cycles in self.hot_idle_loops(top)]
+        return "\n".join(lines)
+
+    def write(self, path, top=TOP):
+        with open(path, "w") as file:
+            json.dump(self.to_dict(top), file, indent=2)
+    # </editor-fold>
+
+
+def main(): # python profiler.py rom.nes
+    from Emulation import Emulation
+    parser = argparse.ArgumentParser(description="Run a rom under the profiler and print where the time went")
+    parser.add_argument("rom")
+    parser.add_argument("--debug", action="store_true", help="Start at 0x8000 instead of the reset vector")
+    parser.add_argument("--top", type=int, default=TOP)
+    parser.add_argument("--json", help="Also write the report here")
+    args = parser.parse_args()
+    emu = Emulation(args.rom, debug=args.debug)
+    profiler = emu.profile(Profiler(args.json))
+    emu.run_emu()
+    print(profiler.report(args.top))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+from bisect import bisect_right
+from memoryBus import aliases
+from rewind import Rewind, BUDGET
+import time
+
+# Reverse debugging. The debugger runs the emulator an instruction at a time (Emulation.op, the scheduler and
+# interrupts handled between instructions the same way run_untraced does), counting instructions, and takes a
+# checkpoint (a snapshot in a Rewind history, kept as compressed deltas under a byte budget) every spacing instructions.
+# Going backwards is going to the checkpoint before the target and replaying forward, which gives back exactly the
+# same states since nothing in the emulator is random
+# spacing follows how fast instructions are running, so that replaying one gap between checkpoints takes about replay
+# seconds. That's the bound on what a step_back costs, however long the program has run
+# Searches backwards (reverse_continue, last_write) replay one gap at a time, newest first, noting where the pc hit a
+# breakpoint or the address was written, and stop in the newest gap that had one
+# Instruction n is the state after n instructions, with anything due at that boundary (events, an interrupt being
+# taken) already done, so the pc is the next instruction that will run
+
+REPLAY = 0.02 # Seconds a replay of one gap should take
+MIN_SPACING = 100
+MAX_SPACING = 1 << 20
+
+
+class Write:
+    def __init__(self, instruction, address, data):
+        self.instruction = instruction # Count of the instruction that wrote, seeking there stops just before it
+        self.address = address # As written, which may be a mirror of the one asked about
+        self.data = data
+        self.pgmctr = None # Of the instruction, filled in once we're stopped on it
+
+    def __repr__(self):
+        return f"<Write {self.data:#04x} to {self.address:#06x} at instruction {self.instruction}>"
+
+
+class ReverseDebugger:
+    def __init__(self, emu, replay=REPLAY, budget=BUDGET):
+        self.emu = emu
+        self.replay = replay
+        self.breakpoints = set() # pc values continue_ and reverse_continue stop on
+        self.count = 0 # Instructions run since the debugger started, where we are
+        self.frontier = 0 # Furthest count reached, past it there are no checkpoints yet
+        self.spacing = MIN_SPACING
+        self.replayed = 0 # Instructions run again going backwards, for tests and tuning
+        self.idleWasEnabled = emu.idle.enabled # close() leaves it the way we found it
+        emu.idle.detach() # Skipped trips would be instructions nobody counted
+        self.boundary()
+        self.history = Rewind(frames=None, budget=budget).attach(emu) # No period, checkpoints are taken by count
+        self.history.snapshots[0].instruction = 0
+        self.nextCheckpoint = self.spacing # Never behind frontier, so replays below it don't take checkpoints
+
+    def close(self): # Give the emulator its idle skipping back, if it had it
+        if self.idleWasEnabled:
+            self.emu.idle.attach()
+
+    # <editor-fold desc="Running">
+    def boundary(self): # Fire due events and take an interrupt, like the outer run loops do between instructions
+        emu = self.emu
+        scheduler = emu.scheduler; interrupts = emu.interrupts
+        while emu.cycles >= scheduler.next:
+            scheduler.run_due(emu.cycles)
+            if interrupts.pending and not emu.halt:
+                interrupts.service()
+
+    def run(self, target, stop=None): # Step until count is target, halt, or stop (a set of pcs) is hit after moving
+        emu = self.emu
+        read = emu.bus.read; op = emu.op; scheduler = emu.scheduler
+        started = time.perf_counter(); first = self.count
+        try:
+            while self.count < target and not emu.halt:
+                if self.count >= self.nextCheckpoint:
+                    self.checkpoint()
+                emu.opcode = read(emu.pgmctr)
+                emu.pgmctr += 1
+                op()
+                self.count += 1 # Kept on self, not a local, write traps note which instruction wrote
+                if emu.cycles >= scheduler.next:
+                    self.boundary()
+                if stop is not None and emu.pgmctr in stop:
+                    break
+        finally:
+            self.frontier = max(self.frontier, self.count)
+            self.tune(self.count - first, time.perf_counter() - started)
+        return self.count
+
+    def tune(self, instructions, seconds): # Spacing for the speed instructions are running at now
+        if instructions >= MIN_SPACING and seconds > 0:
+            self.spacing = min(MAX_SPACING, max(MIN_SPACING, int(instructions / seconds * self.replay)))
+
+    def checkpoint(self):
+        history = self.history
+        if history.position != len(history) - 1: # Replayed back up to the newest checkpoint, record on from it
+            history.resume()
+        history.capture().instruction = self.count
+        self.nextCheckpoint = self.count + self.spacing
+
+    def step(self, count=1): # Forward count instructions
+        return self.run(self.count + count)
+
+    def continue_(self, limit=None): # Forward to the next breakpoint, halt, or limit instructions
+        return self.run(self.count + limit if limit is not None else float("inf"), self.breakpoints)
+    # </editor-fold>
+
+    # <editor-fold desc="Going back">
+    def seek(self, target): # Go to instruction target, from the checkpoint before it
+        snapshots = self.history.snapshots
+        index = bisect_right([snapshot.instruction for snapshot in snapshots], target) - 1
+        if index < 0:
+            raise ValueError(f"Instruction {target} is before the oldest checkpoint, {snapshots[0].instruction}")
+        if not snapshots[index].instruction <= self.count <= target: # Otherwise just carry on from here
+            self.count = self.history.seek(index).instruction
+        self.replayed += target - self.count
+        self.run(target)
+        return self.count
+
+    def step_back(self, count=1): # Back count instructions, as far as the oldest checkpoint
+        return self.seek(max(self.history.snapshots[0].instruction, self.count - count))
+
+    def search(self, found): # Newest instruction before count that found(start, end) reports, replaying gap by gap
+        end = self.count
+        snapshots = self.history.snapshots
+        index = bisect_right([snapshot.instruction for snapshot in snapshots], end - 1) - 1
+        while index >= 0:
+            start = self.history.seek(index).instruction
+            self.count = start
+            hits = found(start, end)
+            self.replayed += self.count - start
+            if hits:
+                self.seek(hits[-1])
+                return hits[-1]
+            end = start
+            index -= 1
+        self.seek(snapshots[0].instruction)
+        return None
+
+    def reverse_continue(self): # Back to the last time the pc was on a breakpoint, or the oldest checkpoint
+        def found(start, end):
+            hits = []
+            while True:
+                if self.emu.pgmctr in self.breakpoints:
+                    hits.append(self.count)
+                if self.count >= end - 1 or self.emu.halt:
+                    return hits
+                self.run(end - 1, self.breakpoints)
+        return self.search(found)
+
+    def last_write(self, address): # Back to just before the last instruction that wrote address, the Write or None
+        bus = self.emu.bus
+        pages = sorted({alias >> 8 for alias in aliases(address)})
+        targets = set(aliases(address))
+        writes = []
+        saved = {}
+
+        def trap(page):
+            view, handler = bus.writePages[page], bus.writeHandlers[page]
+
+            def checked(address, data):
+                if address in targets:
+                    writes.append(Write(self.count, address, data))
+                if view is not None:
+                    view[address & 0xFF] = data
+                else:
+                    handler(address, data)
+            return checked
+
+        def found(start, end):
+            del writes[:]
+            for page in pages: # Compiled blocks keep their own hold on pages, we aren't running any
+                self.emu.compiler.invalidate_page(page)
+                saved[page] = bus.writePages[page], bus.writeHandlers[page]
+                bus.writeHandlers[page] = trap(page)
+                bus.writePages[page] = None
+            try:
+                self.run(end)
+            finally:
+                for page, (view, handler) in saved.items():
+                    bus.writePages[page], bus.writeHandlers[page] = view, handler
+            return [write.instruction for write in writes if write.instruction < end]
+
+        instruction = self.search(found)
+        if instruction is None:
+            return None
+        write = next(write for write in reversed(writes) if write.instruction == instruction)
+        write.pgmctr = self.emu.pgmctr
+        return write
+    # </editor-fold>
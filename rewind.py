@@ -0,0 +1,166 @@
+from bisect import bisect_right
+import zlib
+
+# Rewind history. A snapshot (Emulation.save_state) is taken every so many cycles by a scheduler event, and each one is
+# kept as the zlib compressed XOR of it with the snapshot before. Consecutive states are mostly the same bytes, so the
+# XOR is mostly zeros and compresses to almost nothing. Every KEYFRAMES snapshots one is kept whole instead, so going
+# back to any point decodes at most that many deltas from its keyframe and never runs any code
+# XOR works both ways, so a state is decoded from whichever is closer, its keyframe or the last state decoded. Stepping
+# back one snapshot at a time costs one delta each. States are XORed as big ints, one conversion per delta
+# The history is kept under a byte budget by dropping the oldest keyframe together with the deltas that hang off it
+# Seeking back doesn't throw anything away. The next snapshot taken from there starts a new timeline, and that's when
+# the snapshots after the seek point go
+
+FRAME_CYCLES = 29781 # CPU cycles in an NTSC frame, rounded up
+KEYFRAMES = 30 # Snapshots per keyframe
+BUDGET = 32 << 20 # Bytes of compressed snapshots
+LEVEL = 1 # zlib level, the deltas are nearly all zeros so the fastest level compresses them just as well
+
+
+def value(data): # Bytes as an int, so XOR is one operation whatever the length
+    return int.from_bytes(data, "little")
+
+
+class Snapshot:
+    def __init__(self, cycle, frame, key, size, data):
+        self.cycle = cycle # Taken at
+        self.frame = frame # PPU frame count when it was taken, None without a PPU
+        self.key = key # data is the whole state, not a delta
+        self.size = size # Length of the state, deltas come out as long as the longer of the two states
+        self.data = data # Compressed
+
+
+class Rewind:
+    def __init__(self, frames=1, cycles=None, keyframes=KEYFRAMES, budget=BUDGET):
+        # Cycles between snapshots, with frames and cycles both None the owner calls capture itself
+        self.period = cycles if cycles is not None else frames * FRAME_CYCLES if frames is not None else None
+        self.keyframes = keyframes
+        self.budget = budget
+        self.snapshots = []
+        self.bytes = 0 # Compressed size of everything in snapshots
+        self.position = -1 # Index of the snapshot the emulator is at or came from
+        self.last = None # State at position as an int, what the next delta is made against, and its length
+        self.lastSize = 0
+        self.decoded = None # (snapshot, state as an int) of the last decode, the next one can start from it
+        self.evicted = 0 # Snapshots dropped for the budget
+        self.emu = None
+        self.event = None
+
+    def attach(self, emu): # Take a snapshot now and then every period cycles
+        self.emu = emu
+        self.capture()
+        if self.period is not None:
+            self.schedule(emu.cycles + self.period)
+        return self
+
+    def detach(self):
+        if self.event is not None:
+            self.emu.scheduler.cancel(self.event)
+            self.event = None
+        return self
+
+    def schedule(self, cycle):
+        if self.event is not None:
+            self.emu.scheduler.cancel(self.event)
+        self.event = self.emu.scheduler.schedule(cycle, self.snapshot_event, "rewind")
+
+    def snapshot_event(self, cycle): # The next one is a period after this one was actually taken, like after a seek
+        self.event = None
+        self.capture()
+        self.schedule(self.emu.cycles + self.period)
+
+    # <editor-fold desc="Recording">
+    def capture(self): # Snapshot the emulator as it is now, the end of the history if we'd gone back
+        emu = self.emu
+        snapshots = self.snapshots
+        self.bytes -= sum(len(snapshot.data) for snapshot in snapshots[self.position + 1:])
+        del snapshots[self.position + 1:]
+        state = emu.save_state()
+        current = value(state)
+        key = self.last is None or self.since_key() + 1 >= self.keyframes
+        raw = state if key else (current ^ self.last).to_bytes(max(len(state), self.lastSize), "little")
+        frame = emu.ppu.frames if emu.ppu is not None else None
+        snapshot = Snapshot(emu.cycles, frame, key, len(state), zlib.compress(raw, LEVEL))
+        snapshots.append(snapshot)
+        self.bytes += len(snapshot.data)
+        self.position = len(snapshots) - 1
+        self.last, self.lastSize = current, len(state)
+        self.decoded = (snapshot, current)
+        self.evict()
+        return snapshot
+
+    def since_key(self): # Snapshots from the last keyframe up to position
+        start = self.position
+        while not self.snapshots[start].key:
+            start -= 1
+        return self.position - start
+
+    def evict(self): # Drop the oldest keyframe and its deltas until we're under budget, the newest group always stays
+        snapshots = self.snapshots
+        while self.bytes > self.budget:
+            end = next((n for n in range(1, len(snapshots)) if snapshots[n].key), None)
+            if end is None or end > self.position:
+                return
+            self.bytes -= sum(len(snapshot.data) for snapshot in snapshots[:end])
+            del snapshots[:end]
+            self.position -= end
+            self.evicted += end
+    # </editor-fold>
+
+    # <editor-fold desc="Seeking">
+    def state(self, index): # Snapshot index's state, from the last decoded state if it's in the same keyframe's group
+        snapshots = self.snapshots
+        index %= len(snapshots)
+        start = end = index
+        while not snapshots[start].key:
+            start -= 1
+        while end + 1 < len(snapshots) and not snapshots[end + 1].key:
+            end += 1
+        cached = None
+        if self.decoded is not None and self.decoded[0] in snapshots[start:end + 1]:
+            cached = snapshots.index(self.decoded[0], start, end + 1)
+        if cached is not None and abs(cached - index) <= index - start:
+            state = self.decoded[1]
+            if cached <= index: # Forward, each delta takes us from the one before to its own snapshot
+                deltas = range(cached + 1, index + 1)
+            else: # Back, each delta takes us from its own snapshot to the one before
+                deltas = range(cached, index, -1)
+        else:
+            state = value(zlib.decompress(snapshots[start].data))
+            deltas = range(start + 1, index + 1)
+        for n in deltas:
+            state ^= value(zlib.decompress(snapshots[n].data))
+        self.decoded = (snapshots[index], state)
+        return state.to_bytes(snapshots[index].size, "little")
+
+    def seek(self, index): # Put the emulator back to snapshot index (negative counts from the newest)
+        index %= len(self.snapshots)
+        state = self.state(index)
+        self.emu.load_state(state)
+        self.position = index
+        self.last, self.lastSize = self.decoded[1], len(state)
+        if self.period is not None:
+            self.schedule(self.snapshots[index].cycle + self.period) # The snapshot times of the timeline it came from
+        return self.snapshots[index]
+
+    def resume(self): # Carry on recording after the newest snapshot without loading it, for owners that know the
+        # emulator has replayed its way back onto the same timeline
+        index = len(self.snapshots) - 1
+        self.lastSize = len(self.state(index))
+        self.position, self.last = index, self.decoded[1]
+
+    def back(self, count=1): # count snapshots back from where we are, as far as the oldest
+        return self.seek(max(0, self.position - count))
+
+    def seek_cycle(self, cycle): # Newest snapshot taken at or before cycle
+        index = bisect_right(self.cycles(), cycle) - 1
+        if index < 0:
+            raise ValueError(f"Nothing recorded as far back as cycle {cycle}, the oldest is {self.snapshots[0].cycle}")
+        return self.seek(index)
+
+    def cycles(self):
+        return [snapshot.cycle for snapshot in self.snapshots]
+
+    def __len__(self):
+        return len(self.snapshots)
+    # </editor-fold>
@@ -0,0 +1,71 @@
+import struct
+
+# Save states. A state is one versioned binary blob: a header with the format version and the hash of the rom it was
+# made with, then a tagged section per component (CPU, bus memory, mapper, PPU, APU), each of them made and read back
+# by the component's own save_state / load_state
+# Memory (ram, prg ram, chr ram, vram, OAM, palette, the picture) goes in as raw buffer copies and every component's
+# scalars are packed with one struct call (Fields), so neither way loops over bytes in Python
+# Scheduled events aren't saved, they're callbacks. The PPU and APU schedule theirs again from the state they were
+# restored to (reschedule), events anyone else scheduled are left alone
+
+MAGIC = b"NESS"
+VERSION = 1
+HEADER = struct.Struct("<4sH40s") # Magic, version, rom sha1 (hex, empty for roms that weren't loaded from a file)
+SECTION = struct.Struct("<4sI") # Tag, length
+
+
+class Fields: # A fixed set of attributes packed with one struct, spec is (attribute, struct format) pairs
+    def __init__(self, *spec):
+        self.spec = spec
+        self.names = tuple(name for name, _ in spec)
+        self.struct = struct.Struct("<" + "".join(form for _, form in spec))
+        self.size = self.struct.size
+
+    def __add__(self, other):
+        return Fields(*self.spec, *other.spec)
+
+    def pack(self, obj):
+        return self.struct.pack(*[getattr(obj, name) for name in self.names])
+
+    def unpack(self, obj, data, offset=0): # Set the attributes from data at offset, returns the offset after them
+        for name, value in zip(self.names, self.struct.unpack_from(data, offset)):
+            setattr(obj, name, value)
+        return offset + self.size
+
+
+def pack(digest, sections): # sections is (tag, bytes like) pairs
+    parts = [HEADER.pack(MAGIC, VERSION, (digest or "").encode())]
+    for tag, data in sections:
+        parts += [SECTION.pack(tag, len(data)), data]
+    return b"".join(parts)
+
+
+def unpack(blob, digest): # {tag: memoryview} of a blob made by pack for the same rom
+    view = memoryview(blob)
+    if len(view) < HEADER.size:
+        raise ValueError("Not a save state, it's too short")
+    magic, version, saved = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError("Not a save state, the header doesn't start with NESS")
+    if version != VERSION:
+        raise ValueError(f"Save state version {version} isn't supported, this build reads version {VERSION}")
+    saved = saved.rstrip(b"\0").decode()
+    if saved and digest and saved != digest:
+        raise ValueError("Save state was made with a different rom")
+    sections = {}
+    offset = HEADER.size
+    while offset < len(view):
+        tag, length = SECTION.unpack_from(view, offset)
+        offset += SECTION.size
+        if offset + length > len(view):
+            raise ValueError(f"Save state is truncated in section {tag.decode(errors='replace')}")
+        sections[tag] = view[offset:offset + length]
+        offset += length
+    return sections
+
+
+def section(sections, tag): # The section tagged tag, for a component that has to be in the state
+    data = sections.get(tag)
+    if data is None:
+        raise ValueError(f"Save state has no {tag.decode().strip()} section")
+    return data
@@ -0,0 +1,63 @@
+from itertools import count
+import heapq
+
+# Timed events on the CPU cycle clock. Components (PPU vblank and scanline IRQs, the APU frame counter, DMA) schedule
+# a callback for the cycle they next need the CPU's attention on, and the run loops run instructions until cycles
+# reaches scheduler.next, then call run_due. Between events nothing else runs, everything catches up lazily when its
+# registers are touched
+# Cancelled events stay in the heap with their callback cleared and are dropped when they reach the top
+# stop() pulls next below any cycle count, so a halt drops out of the run loops on the deadline check alone
+
+NEVER = 1 << 62 # An int rather than inf, cycles < next stays an int compare
+
+
+class Scheduler:
+    def __init__(self):
+        self.queue = [] # Heap of [cycle, sequence, callback, name], sequence keeps equal cycles first come first served
+        self.next = NEVER # Cycle of the earliest event, what the run loops compare against
+        self.sequence = count()
+        self.fired = 0
+
+    def schedule(self, cycle, callback, name=""): # callback(cycle) is called once cycles reaches cycle
+        event = [cycle, next(self.sequence), callback, name]
+        heapq.heappush(self.queue, event)
+        if cycle < self.next:
+            self.next = cycle
+        return event
+
+    def cancel(self, event):
+        event[2] = None
+        self.drop_cancelled()
+
+    def drop(self, names): # Cancel every live event called one of names
+        for event in self.queue:
+            if event[3] in names:
+                event[2] = None
+        self.drop_cancelled()
+
+    def drop_cancelled(self):
+        queue = self.queue
+        while queue and queue[0][2] is None:
+            heapq.heappop(queue)
+        self.next = queue[0][0] if queue else NEVER
+
+    def run_due(self, now): # Fire everything due at or before now, callbacks may schedule more
+        queue = self.queue
+        while queue and queue[0][0] <= now:
+            cycle, _, callback, name = heapq.heappop(queue)
+            if callback is not None:
+                self.fired += 1
+                callback(cycle)
+        self.drop_cancelled()
+
+    def stop(self): # Make the run loops return to run_due now, which puts next back
+        self.next = -1
+
+    def due(self, cycle, name): # Whether a live event called name falls on cycle
+        return any(event[0] == cycle and event[3] == name and event[2] is not None for event in self.queue)
+
+    def pending(self): # (cycle, name) of every live event, soonest first
+        return sorted((event[0], event[3]) for event in self.queue if event[2] is not None)
+
+    def __len__(self):
+        return sum(event[2] is not None for event in self.queue)
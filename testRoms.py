@@ -0,0 +1,111 @@
+from cartridge import CHR_BANK, PRG_BANK, Cartridge
+from memoryBus import MemoryBus
+import os
+import tempfile
+
+# Little roms and 6502 snippets the tests share. Not a test module itself, the test_ modules import from here rather
+# than from each other
+# temp_rom and temp_vectored_rom write the image to a temporary file that's removed again when the test finishes,
+# temp_file and temp_dir do the same for traces and reports. make_image builds a bare cartridge image in memory for
+# the mapper and PPU tests
+
+
+def make_rom(program, org=0x8000): # 32K NROM image with program at org and the reset vector pointing at it
+    prg = bytearray([0xFF] * 0x8000)
+    prg[org - 0x8000:org - 0x8000 + len(program)] = bytes(program)
+    prg[0x7FFC] = org & 0xFF; prg[0x7FFD] = org >> 8
+    handle, path = tempfile.mkstemp(suffix=".nes")
+    with os.fdopen(handle, "wb") as rom:
+        rom.write(b"NES\x1a\x02\x00" + bytes(10) + prg)
+    return path
+
+
+def vectored_rom(main, nmi=(0x02,), irq=(0x02,)): # main at 0x8000, NMI handler at 0x9000, IRQ/BRK handler at 0x9800
+    prg = bytearray([0xFF] * 0x8000)
+    prg[:len(main)] = bytes(main)
+    prg[0x1000:0x1000 + len(nmi)] = bytes(nmi)
+    prg[0x1800:0x1800 + len(irq)] = bytes(irq)
+    prg[0x7FFA:0x7FFC] = b"\x00\x90"
+    prg[0x7FFE:0x8000] = b"\x00\x98"
+    return make_rom(prg)
+
+
+def temp_rom(test, program, org=0x8000):
+    path = make_rom(program, org)
+    test.addCleanup(os.remove, path)
+    return path
+
+
+def temp_vectored_rom(test, main, nmi=(0x02,), irq=(0x02,)):
+    path = vectored_rom(main, nmi, irq)
+    test.addCleanup(os.remove, path)
+    return path
+
+
+def temp_file(test, suffix=""): # Path of an empty file
+    handle, path = tempfile.mkstemp(suffix=suffix)
+    os.close(handle)
+    test.addCleanup(os.remove, path)
+    return path
+
+
+def temp_dir(test):
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    return directory.name
+
+
+def make_image(mapper=0, prgBanks=2, chrBanks=1, flags6=0, nes2=False): # Every 8K prg bank is filled with its number
+    flags7 = mapper & 0xF0 | (0x08 if nes2 else 0)
+    header = bytes([0x4E, 0x45, 0x53, 0x1A, prgBanks, chrBanks, (mapper & 0x0F) << 4 | flags6, flags7]) + bytes(8)
+    prg = b"".join(bytes([bank]) * PRG_BANK for bank in range(prgBanks * 2))
+    chr = b"".join(bytes([0x80 | bank]) * CHR_BANK for bank in range(chrBanks * 8))
+    return header + prg + chr
+
+
+def attach(image):
+    cartridge = Cartridge(image)
+    bus = MemoryBus()
+    cartridge.attach(bus)
+    return cartridge, bus
+
+
+# <editor-fold desc="Snippets">
+def store(address, value): # LDA #value, STA address
+    return [0xA9, value, 0x8D, address & 0xFF, address >> 8]
+
+
+def spin(program, org=0x8000): # JMP to itself after program
+    here = org + len(program)
+    return program + [0x4C, here & 0xFF, here >> 8]
+
+
+# Pulse 1 on, duty 50%, length counter halted, constant volume 15, period 253 (1789773 / 16 / 254 = 440 Hz)
+TONE = store(0x4015, 0x01) + store(0x4000, 0xBF) + store(0x4002, 0xFD) + store(0x4003, 0x00)
+# NMI on, then wait for the NMI handler to count 5 frames in $10: LDA $10, CMP #5, BNE -7, halt
+COUNT_FRAMES = (store(0x2000, 0x80) + [0xAD, 0x10, 0x00, 0xC9, 0x05, 0xD0, 0xF9, 0x02],
+                [0xE6, 0x10, 0xAD, 0x02, 0x20, 0x40]) # INC $10, LDA $2002, RTI
+# Fill 0x0300 + X with X for X = 0-199, then 0xAA into 0x0305 and 0xBB into its mirror at 0x0B05, count passes in
+# $40 and go round again. Never halts
+FILL = [0xA2, 0x00, # 8000: LDX #0
+        0x8A, 0x9D, 0x00, 0x03, 0xE8, 0xE0, 0xC8, 0xD0, 0xF7, # 8002: TXA, STA $0300,X, INX, CPX #200, BNE 8002
+        0xA9, 0xAA, 0x8D, 0x05, 0x03, # 800B: LDA #$AA, STA $0305
+        0xA9, 0xBB, 0x8D, 0x05, 0x0B, # 8010: LDA #$BB, STA $0B05
+        0xE6, 0x40, 0x4C, 0x00, 0x80] # 8015: INC $40, JMP 8000
+FILL_PASS = 1 + 200 * 5 + 6 # Instructions round the whole thing once
+# A tone, picture and NMI on, then spin while the NMI handler counts frames in $10 forever
+FOREVER = (spin(TONE + store(0x2001, 0x18) + store(0x2000, 0x80)), [0xE6, 0x10, 0xAD, 0x02, 0x20, 0x40])
+# </editor-fold>
+
+
+# <editor-fold desc="Comparing runs">
+def state(emu): # What two runs that should agree are compared on
+    ppu = emu.ppu
+    return emu.pgmctr, emu.regA, emu.regX, emu.regY, emu.status, emu.stackptr, emu.cycles, emu.bus[0:0x800], \
+        emu.bus[0x6000:0x8000], ppu and (ppu.scanline, ppu.dots, ppu.status, ppu.frames)
+
+
+def everything(emu): # state() plus what only the PPU, APU and scheduler know
+    return state(emu), emu.ppu and emu.ppu.frame.tobytes(), emu.apu and emu.apu.save_state(), \
+        emu.scheduler.pending(), emu.interrupts.pending, emu.interrupts.taken
+# </editor-fold>
@@ -1,45 +1,157 @@
-from Emulation import Emulation
+from Emulation import Emulation, CYCLES, INSTRUCTIONS, FRAMES, ADDRESS, PREDICATE, BREAKPOINT, HALT, ERROR
+from customTypes import *
+from testRoms import FILL, FILL_PASS, FOREVER, state, temp_rom, temp_vectored_rom
+import bench_dispatch
 import unittest
 import math
 
 
 class NESemuTest(unittest.TestCase):
     def test_adc(self):
-        ops = [0x69, 0x65, 0x75, 0x6D, 0x7D, 0x79, 0x61, 0x71]
-        for op in ops:
-
-            addressSpace = [0xa9, a, op, ]
-            self.scene = Emulation("test.nes")
-            for a in range(0, 255):
-                for b in range(0, 255):
-                    for c in [True, False]:
-                        match op:
-                            case 0x69:  # Immediate
-                                add1 = a
-                        # Set test scene
-                        teststr = f"a{a} b{b} c{c}"
-                        self.scene.halt = False
-                        self.scene.pgmctr = 0x8000
-                        self.scene.addSpace[0x8000:0x8004] = [0xa9, a, op, add1, 0x02]
-                        self.scene.flag_Carry = c
-                        self.scene.run_emu()
-                        # Check assertions
-                        tsum = a + b + c
-                        if tsum == 0:
-                            assert self.scene.flag_Zero, f"Failure testing $69, high expected Z" + teststr
-                        else:
-                            assert not self.scene.flag_Zero, f"Failure testing $69, low expected Z" + teststr
-                        if tsum > 255:
-                            assert self.scene.flag_Carry, f"Failure testing $69, high expected C" + teststr
-                            tsum -= 255
-                        else:
-                            assert not self.scene.flag_Carry, f"Failure testing $69, low expected C" + teststr
-                        if tsum > 127:
-                            assert self.scene.flag_Negative,  f"Failure testing $69, high expected N" + teststr
-                        else:
-                            assert not self.scene.flag_Negative, f"Failure testing $69, low expected N" + teststr
-                        assert self.scene.regA == tsum, f"Failure at $69 {a} + {b} + {c}= {tsum}, got {self.scene.regA}"
-
-
-unittest.main()
+        # ADC Immediate for every a, b and carry in
+        self.scene = Emulation("5_Instructions1.nes", debug=True)
+        for a in range(0, 256):
+            for b in range(0, 256):
+                for c in [True, False]:
+                    # Set test scene
+                    teststr = f"a{a} b{b} c{c}"
+                    self.scene.halt = False
+                    self.scene.addSpace[0x8001] = b
+                    self.scene.pgmctr = 0x8001
+                    self.scene.opcode = 0x69
+                    self.scene.regA = a
+                    self.scene.flag_Carry = c
+                    self.scene.op()
+                    # Check assertions
+                    tsum = a + b + c
+                    if tsum > 255:
+                        assert self.scene.flag_Carry, f"Failure testing $69, high expected C" + teststr
+                        tsum -= 256
+                    else:
+                        assert not self.scene.flag_Carry, f"Failure testing $69, low expected C" + teststr
+                    if tsum == 0:
+                        assert self.scene.flag_Zero, f"Failure testing $69, high expected Z" + teststr
+                    else:
+                        assert not self.scene.flag_Zero, f"Failure testing $69, low expected Z" + teststr
+                    if tsum > 127:
+                        assert self.scene.flag_Negative,  f"Failure testing $69, high expected N" + teststr
+                    else:
+                        assert not self.scene.flag_Negative, f"Failure testing $69, low expected N" + teststr
+                    # Overflow when both inputs have the same sign and the result's sign is different
+                    overflow = (a ^ tsum) & (b ^ tsum) & 0x80 != 0
+                    assert self.scene.flag_Overflow == overflow, f"Failure testing $69, expected V {overflow}" + teststr
+                    assert self.scene.regA == tsum, f"Failure at $69 {a} + {b} + {c}= {tsum}, got {self.scene.regA}"
+                    assert self.scene.pgmctr == 0x8002
+
+    def test_optable_matches_match(self):
+        # Every opcode in the dispatch table has to land in the same state as the old match statement did
+        self.assertEqual(bench_dispatch.check_engines(trials=5), [])
+
+    def test_unimplemented_op_halts(self):
+        emu = Emulation("5_Instructions1.nes", debug=True)
+        emu.opcode = 0xFF
+        emu.op()
+        assert emu.halt
+        assert emu.optable[0xFF] == emu.op_illegal
+
+    def test_packed_status(self):
+        emu = Emulation("5_Instructions1.nes", debug=True)
+        emu.status = FLAG_U | FLAG_N | FLAG_C
+        assert emu.flag_Negative and emu.flag_Carry and not emu.flag_Zero
+        assert emu.build_Fstring() == "NvTBdizC"
+        emu.flag_Zero = True; emu.flag_Carry = False
+        assert emu.status == FLAG_U | FLAG_N | FLAG_Z
+        # PHP pushes B and the unused bit set, PLP drops B again
+        emu.opcode = 0x08; emu.op()
+        assert emu.read(0x100 + emu.stackptr + 1) == FLAG_N | FLAG_U | FLAG_B | FLAG_Z
+        emu.status = FLAG_U
+        emu.opcode = 0x28; emu.op()
+        assert emu.status == FLAG_U | FLAG_N | FLAG_Z
+
+    def test_nz_flags(self):
+        for value in range(256):
+            assert NZ_FLAGS[value] & FLAG_N == (FLAG_N if value > 127 else 0)
+            assert NZ_FLAGS[value] & FLAG_Z == (FLAG_Z if value == 0 else 0)
+
+
+
+class BoundedRunTest(unittest.TestCase):
+    def setUp(self):
+        self.paths = [temp_rom(self, FILL), temp_vectored_rom(self, FOREVER[0], nmi=FOREVER[1])]
+
+    def test_run_cycles(self):
+        for compiled in (True, False):
+            emu = Emulation(self.paths[1])
+            for _ in range(3):
+                start = emu.cycles
+                result = emu.run_cycles(50000, compiled)
+                self.assertEqual(result.reason, CYCLES)
+                self.assertTrue(50000 <= result.cycles == emu.cycles - start < 50007, result.cycles)
+                self.assertFalse(emu.halt)
+            self.assertGreater(emu.bus[0x10], 3) # The NMI handler kept counting frames
+            self.assertNotIn("budget", [name for cycle, name in emu.scheduler.pending()]) # Nothing left behind
+
+    def test_compiled_stops_like_interpreted(self): # On the instruction boundary, not at the end of a block
+        for path in self.paths:
+            for count in (1, 7, 3003, 29781):
+                compiled, interpreted = Emulation(path), Emulation(path)
+                self.assertEqual(compiled.run_cycles(count).cycles, interpreted.run_cycles(count, False).cycles)
+                self.assertEqual(state(compiled), state(interpreted), count)
+            compiled, interpreted = Emulation(path), Emulation(path)
+            for _ in range(3):
+                compiled.run_frames(1)
+                interpreted.run_frames(1, False)
+                self.assertEqual(state(compiled), state(interpreted))
+            compiled.run_until(lambda emu: False, limit=5000)
+            interpreted.run_until(lambda emu: False, limit=5000, compiled=False)
+            self.assertEqual(state(compiled), state(interpreted))
+
+    def test_run_frames(self):
+        for compiled in (True, False):
+            emu = Emulation(self.paths[1])
+            result = emu.run_frames(3, compiled)
+            self.assertEqual((result.reason, result.frames, emu.ppu and emu.ppu.frames), (FRAMES, 3, emu.ppu and 3))
+            result = emu.run_frames(2, compiled)
+            self.assertEqual((result.reason, result.frames), (FRAMES, emu.ppu and 2))
+            if emu.ppu is not None:
+                self.assertEqual(emu.ppu.scanline, 241) # Stopped at the start of vblank
+
+    def test_run_instructions(self):
+        emu = Emulation(self.paths[0])
+        result = emu.run_instructions(FILL_PASS)
+        self.assertEqual((result.reason, result.instructions, emu.pgmctr, emu.bus[0x40]),
+                         (INSTRUCTIONS, FILL_PASS, 0x8000, 0))
+        one, many = Emulation(self.paths[1]), Emulation(self.paths[1]) # Mostly an idle loop, which mustn't be skipped
+        for _ in range(3000):
+            one.run_instructions(1)
+        many.run_instructions(3000)
+        self.assertEqual(state(one), state(many))
+
+    def test_run_until(self):
+        for compiled in (True, False):
+            emu = Emulation(self.paths[0])
+            result = emu.run_until(0x800B, compiled=compiled)
+            self.assertEqual((result.reason, emu.pgmctr, emu.regX, emu.bus[0x40]), (ADDRESS, 0x800B, 200, 0xFF))
+            result = emu.run_until(0x800B, compiled=compiled) # Runs the one it's on, then to the next time round
+            self.assertEqual((result.reason, emu.pgmctr, emu.bus[0x40]), (ADDRESS, 0x800B, 0x00))
+            self.assertEqual((len(emu.breakpoints), emu.compiler.stops), (0, set()))
+            result = emu.run_until(lambda emu: emu.bus[0x40] == 0x02, compiled=compiled)
+            self.assertEqual((result.reason, emu.bus[0x40]), (PREDICATE, 0x02))
+            result = emu.run_until(lambda emu: False, limit=5000, compiled=compiled)
+            self.assertEqual(result.reason, CYCLES)
+            self.assertLess(result.cycles, 5007)
+
+    def test_stop_reasons(self):
+        emu = Emulation(self.paths[0])
+        point = emu.breakpoints.watch(0x0305)
+        result = emu.run_cycles(10 ** 6)
+        self.assertEqual((result.reason, result.point, emu.pgmctr), (BREAKPOINT, point, 0x8006))
+        self.assertTrue(emu.halt)
+        emu = Emulation(temp_rom(self, [0xA9, 0x01, 0x02, 0xFF]))
+        self.assertEqual(emu.run_cycles(10 ** 6).reason, HALT)
+        self.assertEqual(emu.run_instructions(10).reason, ERROR) # Carries on past the halt, into 0xFF
+
+
+if __name__ == '__main__':
+    unittest.main()
 
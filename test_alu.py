@@ -0,0 +1,43 @@
+from customTypes import *
+import alu
+import unittest
+
+
+class ALUTest(unittest.TestCase):
+    # Exhaustive, every (a, operand, carry) combination against the reference implementations in alu.py
+    def test_adc_sbc(self):
+        for carry in (0, 1):
+            for a in range(256):
+                for b in range(256):
+                    assert alu.ADC[carry << 16 | a << 8 | b] == alu.pack(alu.ref_adc(a, b, carry)), (a, b, carry)
+                    assert alu.ADC[carry << 16 | a << 8 | b ^ 0xFF] == alu.pack(alu.ref_sbc(a, b, carry)), (a, b, carry)
+
+    def test_cmp(self):
+        for a in range(256):
+            for b in range(256):
+                assert alu.CMP[a << 8 | b] == alu.ref_cmp(a, b), (a, b)
+
+    def test_shifts(self):
+        for value in range(256):
+            assert alu.ASL[value] == alu.pack(alu.ref_asl(value))
+            assert alu.LSR[value] == alu.pack(alu.ref_lsr(value))
+            for carry in (0, 1):
+                assert alu.ROL[carry << 8 | value] == alu.pack(alu.ref_rol(value, carry))
+                assert alu.ROR[carry << 8 | value] == alu.pack(alu.ref_ror(value, carry))
+
+    def test_reference_spot_checks(self): # Known 6502 results, so the reference itself is checked too
+        assert alu.ref_adc(0x50, 0x50, 0) == (0xA0, FLAG_N | FLAG_V)
+        assert alu.ref_adc(0xFF, 0x01, 0) == (0x00, FLAG_Z | FLAG_C)
+        assert alu.ref_adc(0x7F, 0x00, 1) == (0x80, FLAG_N | FLAG_V)
+        assert alu.ref_sbc(0x50, 0xF0, 1) == (0x60, 0)
+        assert alu.ref_sbc(0x50, 0xB0, 1) == (0xA0, FLAG_N | FLAG_V)
+        assert alu.ref_sbc(0x05, 0x05, 1) == (0x00, FLAG_Z | FLAG_C)
+        assert alu.ref_cmp(0x10, 0x20) == FLAG_N
+        assert alu.ref_ror(0x01, 1) == (0x80, FLAG_N | FLAG_C)
+
+    def test_memory_budget(self): # The build time half of the budget is reported by bench.py, it's no use as a test
+        assert alu.TABLE_BYTES <= alu.MEMORY_BUDGET, alu.report()
+
+
+if __name__ == '__main__':
+    unittest.main()
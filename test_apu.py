@@ -0,0 +1,145 @@
+from Emulation import Emulation
+from apu import *
+from interrupts import IRQ, IRQ_DMC, IRQ_FRAME
+from testRoms import TONE, spin, store, temp_rom, temp_vectored_rom
+import numpy as np
+import os
+import tempfile
+import unittest
+import wave
+
+
+def dominant(samples, rate=SAMPLE_RATE):
+    samples = samples.astype(float) - samples.mean()
+    return np.fft.rfftfreq(len(samples), 1 / rate)[np.argmax(abs(np.fft.rfft(samples)))]
+
+
+class APUTest(unittest.TestCase):
+    def test_pulse_tone(self):
+        batches = []
+        emu = Emulation(temp_rom(self, spin(TONE)), audio=batches.append)
+        emu.run_compiled(limit=CPU_HZ // 2)
+        emu.apu.close()
+        samples = np.concatenate(batches)
+        self.assertEqual(samples.dtype, np.int16)
+        self.assertAlmostEqual(len(samples), SAMPLE_RATE // 2, delta=SAMPLE_RATE // 60 + 2)
+        self.assertGreater(len(batches), 25) # A batch a frame, not one at the end
+        self.assertAlmostEqual(dominant(samples), 440, delta=3)
+
+    def test_triangle_and_noise(self):
+        # Triangle at period 126 (1789773 / 32 / 127 = 440 Hz), linear counter held, then noise on its own
+        program = store(0x4015, 0x04) + store(0x4008, 0xFF) + store(0x400A, 0x7E) + store(0x400B, 0x00)
+        batches = []
+        emu = Emulation(temp_rom(self, spin(program)), audio=batches.append)
+        emu.run_compiled(limit=CPU_HZ // 4)
+        emu.apu.flush()
+        self.assertAlmostEqual(dominant(np.concatenate(batches)), 440, delta=5)
+
+        program = store(0x4015, 0x08) + store(0x400C, 0x3F) + store(0x400E, 0x03) + store(0x400F, 0x00)
+        batches = []
+        emu = Emulation(temp_rom(self, spin(program)), audio=batches.append)
+        emu.run_compiled(limit=CPU_HZ // 10)
+        emu.apu.flush()
+        samples = np.concatenate(batches)
+        self.assertGreater(len(np.unique(samples)), 1)
+        self.assertLess(abs(np.corrcoef(samples[:-1], samples[1:])[0, 1]), 0.9) # Not a tone
+
+    def test_wav_file(self):
+        handle, path = tempfile.mkstemp(suffix=".wav")
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        emu = Emulation(temp_rom(self, spin(TONE)), audio=path)
+        emu.run_compiled(limit=CPU_HZ // 10)
+        emu.apu.close()
+        with wave.open(path) as file:
+            self.assertEqual((file.getnchannels(), file.getsampwidth(), file.getframerate()), (1, 2, SAMPLE_RATE))
+            self.assertEqual(file.getnframes(), emu.apu.samples)
+            samples = np.frombuffer(file.readframes(file.getnframes()), "<i2")
+        self.assertAlmostEqual(dominant(samples), 440, delta=10)
+
+    def test_no_sink_synthesizes_nothing(self):
+        emu = Emulation(temp_rom(self, spin(TONE)))
+        emu.run_compiled(limit=CPU_HZ // 10)
+        emu.apu.catch_up()
+        self.assertEqual((emu.apu.chunks, emu.apu.samples), ([], 0))
+
+    def test_length_counter_and_status(self):
+        # Pulse 2 with its length counter running, length index 1 = 254 half frames, then index 3 = 2 half frames
+        emu = Emulation(temp_rom(self, spin(store(0x4015, 0x02) + store(0x4004, 0x1F) + store(0x4007, 0x18))))
+        emu.run_compiled(limit=1000)
+        self.assertEqual(emu.bus.read(0x4015) & 0x0F, 0x02)
+        self.assertEqual(emu.apu.pulse2.length, 2)
+        emu.run_compiled(limit=30000) # Two half frame clocks
+        self.assertEqual(emu.bus.read(0x4015) & 0x0F, 0)
+
+    def test_frame_irq(self):
+        # CLI and spin, the IRQ handler halts. The frame counter is in 4 step mode with the IRQ on after power on
+        emu = Emulation(temp_vectored_rom(self, spin([0x58])))
+        emu.run_emu()
+        self.assertEqual(emu.pgmctr, 0x9802)
+        self.assertEqual(emu.interrupts.taken[IRQ], 1)
+        self.assertTrue(emu.interrupts.pending & IRQ_FRAME)
+        self.assertGreaterEqual(emu.cycles, STEPS[4][3])
+        self.assertLess(emu.cycles, STEPS[4][3] + 20)
+        self.assertTrue(emu.bus.read(0x4015) & 0x40)
+        self.assertFalse(emu.interrupts.pending & IRQ_FRAME) # Reading the status acknowledged it
+
+    def test_frame_irq_inhibit(self):
+        emu = Emulation(temp_rom(self, spin(store(0x4017, 0x40))))
+        emu.run_compiled(limit=100000)
+        self.assertFalse(emu.interrupts.pending)
+        self.assertFalse(emu.apu.frameIrq)
+
+    def test_log_stays_short(self): # No sink and the frame IRQ off, the frame steps still replay the log
+        loop = [0x8D, 0x00, 0x40, 0x4C, 0x05, 0x80] # loop: STA $4000, JMP loop
+        emu = Emulation(temp_rom(self, store(0x4017, 0x40) + loop))
+        emu.run_frames(60)
+        size = len(emu.save_state())
+        self.assertLess(len(emu.apu.log), STEPS[4][0] // 7 + 1) # A write every 7 cycles, no more than a step's worth
+        emu.run_frames(60)
+        self.assertLess(len(emu.apu.log), STEPS[4][0] // 7 + 1)
+        self.assertLess(abs(len(emu.save_state()) - size), STEPS[4][0] // 7 * WRITE.size)
+
+    def test_dmc(self):
+        # One byte sample at 0xC000 at the fastest rate with the IRQ on, playing 0xFF goes up 2 a bit from 64
+        batches = []
+        program = store(0x4017, 0x40) + store(0x4011, 64) + store(0x4010, 0x8F) + store(0x4012, 0x00) + \
+            store(0x4013, 0x00) + store(0x4015, 0x10)
+        path = temp_rom(self, spin(program) + [0] * (0x4000 - len(program) - 3) + [0xFF])
+        emu = Emulation(path, audio=batches.append)
+        emu.run_compiled(limit=2000)
+        self.assertEqual(emu.apu.dmc.level, 64 + 16)
+        self.assertEqual(emu.interrupts.pending, IRQ_DMC)
+        self.assertEqual(emu.bus.read(0x4015) & 0x90, 0x80)
+        emu.bus.write(0x4015, 0x00)
+        self.assertEqual(emu.interrupts.pending, 0)
+
+    def test_dmc_clamps(self):
+        dmc = DMC(lambda address: 0xFF)
+        dmc.level = 120
+        dmc.write(3, 1) # 17 bytes
+        dmc.restart()
+        dmc.run(None, 54 * 100)
+        self.assertEqual(dmc.level, 126)
+
+    def test_envelope_and_sweep(self):
+        pulse = Pulse(1)
+        pulse.enabled = True
+        pulse.write(0, 0x02) # Decaying envelope, divider period 2
+        pulse.write(3, 0x08)
+        levels = []
+        for _ in range(10):
+            pulse.clock_envelope()
+            levels.append(pulse.level())
+        self.assertEqual(levels, [15, 15, 15, 14, 14, 14, 13, 13, 13, 12])
+        pulse.period = 0x100
+        pulse.write(1, 0x89) # Sweep on, period 0, negate, shift 1
+        pulse.clock_sweep()
+        self.assertEqual(pulse.period, 0x100 - 0x80 - 1)
+
+    def test_noise_sequences(self):
+        self.assertEqual((len(NOISE[0]), len(NOISE[1])), (32767, 93))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+from batch import Batch, KERNELS
+from Emulation import Emulation
+from testRoms import temp_rom
+import unittest
+
+# Copies go different ways depending on ram[0] and Y, mixing vector kernels and ops that fall back to the interpreter
+PROGRAM = [0xAD, 0x00, 0x00, # 8000: LDA $0000
+           0x0A, # 8003: ASL A, interpreted
+           0x69, 0x37, 0x85, 0x00, 0xAA, # 8004: ADC #$37, STA $00, TAX
+           0x29, 0x03, 0xF0, 0x02, 0xF6, 0x10, # 8009: AND #3, BEQ 800F, INC $10,X
+           0x20, 0x20, 0x80, # 800F: JSR 8020
+           0x88, 0xEA, 0x48, 0x68, # 8012: DEY (interpreted, it skips the NOP), NOP, PHA, PLA
+           0x9D, 0x00, 0x03, 0xE6, 0x01, 0x4C, 0x00, 0x80] # 8016: STA $0300,X, INC $01, JMP 8000
+PROGRAM += [0xFF] * (0x20 - len(PROGRAM))
+PROGRAM += [0xC9, 0x80, 0xB0, 0x02, 0xE8, 0xE8, # 8020: CMP #$80, BCS 8026, INX, INX
+            0x8A, 0x5D, 0x00, 0x03, 0x60] # 8026: TXA, EOR $0300,X, RTS
+
+
+def registers(emu):
+    return emu.pgmctr, emu.regA, emu.regX, emu.regY, emu.status, emu.stackptr, emu.cycles
+
+
+def batched(batch, row):
+    return tuple(int(getattr(batch, name)[row]) for name in ("pgmctr", "regA", "regX", "regY", "status", "stackptr",
+                                                             "cycles"))
+
+
+def interpreted(path, steps): # Emulation run an instruction at a time like a batch copy, and what it raised if it did
+    emu = Emulation(path, idle=False)
+    try:
+        for _ in range(steps):
+            emu.opcode = emu.bus.read(emu.pgmctr)
+            emu.pgmctr += 1
+            emu.op()
+    except (MemoryError, IndexError) as error:
+        return emu, str(error)
+    return emu, None
+
+
+class BatchTest(unittest.TestCase):
+
+    def test_matches_interpreter(self):
+        path = temp_rom(self, PROGRAM)
+        batch = Batch(path, 40)
+        for row in range(batch.count):
+            batch.ram[row, 0] = row * 7 & 0xFF
+            batch.regY[row] = row
+        batch.run(2000)
+        self.assertFalse(batch.halt.any(), batch.errors)
+        for row in range(batch.count):
+            emu = Emulation(path, idle=False)
+            emu.bus[0] = row * 7 & 0xFF
+            emu.regY = row
+            for _ in range(2000):
+                emu.opcode = emu.bus.read(emu.pgmctr)
+                emu.pgmctr += 1
+                emu.op()
+            self.assertEqual(batched(batch, row), registers(emu), row)
+            self.assertEqual(bytes(batch.ram[row]), bytes(emu.bus[0:0x800]), row)
+
+    def test_halts(self):
+        path = temp_rom(self, [0xAD, 0x00, 0x00, 0xF0, 0x05, # 8000: LDA $0000, BEQ 800A
+                         0xC9, 0x01, 0xF0, 0x02, # 8005: CMP #1, BEQ 800B
+                         0x02, # 8009: halt
+                         0xFF, # 800A: illegal
+                         0x8D, 0x00, 0x80]) # 800B: STA $8000, rom
+        batch = Batch(path, 3)
+        batch.ram[:, 0] = [0, 1, 2]
+        batch.run(10)
+        self.assertTrue(batch.halt.all())
+        self.assertEqual(set(batch.errors), {0, 1}) # The halt opcode isn't an error
+        self.assertIn("not implemented at 0x800a", batch.errors[0])
+        self.assertIn("invalid memory address 0x8000", batch.errors[1])
+        self.assertEqual(batch.run(5), 0)
+
+    def test_divergent_halts(self):
+        path = temp_rom(self, [0xAD, 0x00, 0x00, 0xF0, 0x01, # 8000: LDA $0000, BEQ 8006
+                         0x02, # 8005: halt
+                         0x4C, 0x06, 0x80]) # 8006: JMP 8006
+        batch = Batch(path, 4)
+        batch.ram[:, 0] = [0, 1, 0, 2]
+        batch.run(20)
+        self.assertEqual(batch.halt.tolist(), [False, True, False, True])
+        self.assertEqual(batch.errors, {})
+        self.assertEqual(batch.pgmctr[[0, 2]].tolist(), [0x8006, 0x8006])
+
+    def test_faults_match_interpreter(self): # A copy that faults stops in the state Emulation raises in
+        programs = [[0xA9, 0x07, 0x8D, 0x00, 0x80], # LDA #7, STA $8000 (kernel)
+                    [0xA2, 0x01, 0x9D, 0xFF, 0x80], # LDX #1, STA $80FF,X (kernel, crosses a page)
+                    [0xA9, 0x07, 0xEE, 0x00, 0x80], # LDA #7, INC $8000 (kernel, flags set before the write)
+                    [0xA9, 0x07, 0x0E, 0x00, 0x80], # LDA #7, ASL $8000 (interpreted)
+                    [0xA2, 0x05, 0xBD, 0xFF, 0xFF], # LDX #5, LDA $FFFF,X (past the end of memory)
+                    [0xA2, 0x00, 0x9A, 0xA9, 0x42, 0x48, 0x08, 0x4C, 0x05, 0x80], # Push until the stack runs out
+                    [0xA2, 0x00, 0x9A, 0x20, 0x03, 0x80]] # JSR to itself until the stack runs out
+        for program in programs:
+            path = temp_rom(self, program)
+            emu, error = interpreted(path, 1000)
+            batch = Batch(path, 3)
+            batch.run(1000)
+            self.assertIsNotNone(error)
+            self.assertEqual(batch.errors, {row: error for row in range(3)})
+            for row in range(3):
+                self.assertEqual(batched(batch, row), registers(emu), program)
+                self.assertEqual(bytes(batch.ram[row]), bytes(emu.bus[0:0x800]), program)
+
+    def test_scales(self): # While copies stay in step a step is one group on the vector path, however many there are
+        path = temp_rom(self, [0xE8, 0xCA, 0x8A, 0x69, 0x01, 0x85, 0x10, 0x4C, 0x00, 0x80]) # INX DEX TXA ADC STA JMP
+        self.assertTrue(all(code in KERNELS for code in (0xE8, 0xCA, 0x8A, 0x69, 0x85, 0x4C)))
+        for count in (1, 1000):
+            batch = Batch(path, count)
+            self.assertEqual(batch.run(600), count * 600)
+            self.assertEqual((batch.steps, batch.groups, batch.interpreted), (600, 600, 0), count)
+        batch = Batch(temp_rom(self, PROGRAM), 100)
+        batch.ram[:, 0] = range(100)
+        batch.run(300)
+        self.assertLess(batch.interpreted, 100 * 300 // 5) # Copies that drift apart still mostly stay vectorised
+
+
+if __name__ == '__main__':
+    unittest.main()
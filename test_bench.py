@@ -0,0 +1,31 @@
+import bench
+import tempfile
+import unittest
+
+
+class BenchTest(unittest.TestCase):
+    def test_workloads_run_clean(self):
+        # Every workload halts on its $02, and the interpreter and compiler end up in the same place
+        with tempfile.TemporaryDirectory() as directory:
+            for workload in bench.workloads(directory, 2):
+                interpreted = workload.emulator(); workload.run(interpreted, "interpreter")
+                compiled = workload.emulator(); workload.run(compiled, "compiled")
+                assert interpreted.error is None and interpreted.halt, workload.name
+                assert (interpreted.pgmctr, interpreted.regA, interpreted.regX, interpreted.regY, interpreted.status,
+                        interpreted.stackptr, interpreted.cycles, interpreted.bus[0:0x800]) == \
+                       (compiled.pgmctr, compiled.regA, compiled.regX, compiled.regY, compiled.status,
+                        compiled.stackptr, compiled.cycles, compiled.bus[0:0x800]), workload.name
+                instructions, cycles = workload.count()
+                assert instructions > 0 and cycles == interpreted.cycles, workload.name
+
+    def test_compare_flags_slowdowns(self):
+        baseline = {"alu/interpreter": {"ips": 1000, "cps": 2000, "peak_rss": 100}}
+        same = {"alu/interpreter": {"ips": 950, "cps": 1900, "peak_rss": 105}, "new/compiled": {}}
+        assert bench.compare(same, baseline, 0.1) == []
+        slow = {"alu/interpreter": {"ips": 800, "cps": 1900, "peak_rss": 150}}
+        assert bench.compare(slow, baseline, 0.1) == [("alu/interpreter", "ips", 1000, 800),
+                                                      ("alu/interpreter", "peak_rss", 100, 150)]
+
+
+if __name__ == '__main__':
+    unittest.main()
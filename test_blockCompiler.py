@@ -0,0 +1,113 @@
+from Emulation import Emulation
+from blockCompiler import EMITTERS, BRANCHES
+from testRoms import state, store, temp_rom
+import io
+import random
+import unittest
+
+
+class BlockCompilerTest(unittest.TestCase):
+    def run_both(self, program, org=0x8000):
+        path = temp_rom(self, program, org)
+        interpreted = Emulation(path)
+        interpreted.run_emu(io.StringIO())
+        compiled = Emulation(path)
+        compiled.status |= 0x04 # run_emu sets I on the way in
+        compiled.run_compiled()
+        return interpreted, compiled
+
+    def test_bundled_rom(self):
+        interpreted = Emulation("5_Instructions1.nes", debug=True)
+        interpreted.run_emu(io.StringIO())
+        compiled = Emulation("5_Instructions1.nes", debug=True)
+        compiled.status |= 0x04
+        compiled.run_compiled()
+        assert state(interpreted) == state(compiled)
+        assert compiled.compiler.compiled > 0
+
+    def test_random_straight_line_code(self):
+        # Random runs of every compilable (non control flow) op, both engines have to agree exactly
+        rng = random.Random(1)
+        straight = [code for code in EMITTERS if code not in BRANCHES and code not in (0x4C, 0x20, 0x60)]
+        for trial in range(40):
+            program = []
+            for _ in range(30):
+                code = rng.choice(straight)
+                length = EMITTERS[code][0]
+                if length == 3: # Keep absolute addresses in ram or prg ram
+                    address = rng.choice((rng.randrange(0x0200, 0x0700), rng.randrange(0x6000, 0x6100)))
+                    program += [code, address & 0xFF, address >> 8]
+                else:
+                    program += [code] + [rng.randrange(256) for _ in range(length - 1)]
+            program += [0x02]
+            interpreted, compiled = self.run_both([0xA2, 0x80, 0x9A] + program) # Park the stack mid page first
+            assert state(interpreted) == state(compiled), f"trial {trial}"
+
+    def test_stack_underflow(self): # sp doesn't wrap, past the bottom of the page both engines go through the bus
+        program = [0xA2, 0x00, 0x9A, 0xA9, 0x42, # LDX #0, TXS, LDA #$42
+                   0x48, 0x08, 0x4C, 0x05, 0x80] # loop: PHA, PHP, JMP loop
+        path = temp_rom(self, program)
+        engines = []
+        for engine in ("run_emu", "run_compiled"):
+            emu = Emulation(path)
+            emu.status |= 0x04
+            with self.assertRaises(MemoryError): # Pushing to 0x100 - 257, off the bottom of the address space into rom
+                getattr(emu, engine)(*([io.StringIO()] if engine == "run_emu" else []))
+            engines.append(emu)
+        interpreted, compiled = engines
+        assert state(interpreted) == state(compiled)
+        assert compiled.stackptr == -257 and compiled.bus[0x7FF] == 0xFF # Not wrapped round into the end of ram
+
+    def test_loops(self):
+        program = [0xA2, 0x00,              # LDX #0
+                   0xA0, 0x10,              # LDY #$10
+                   0xBD, 0x00, 0x90,        # copy: LDA $9000,X
+                   0x9D, 0x00, 0x02,        #       STA $0200,X
+                   0xE8,                    #       INX
+                   0xD0, 0xF7,              #       BNE copy
+                   0xCA,                    # delay: DEX
+                   0xD0, 0xFD,              #        BNE delay
+                   0xC8,                    #        INY
+                   0xD0, 0xFA,              #        BNE delay
+                   0x20, 0x20, 0x80,        # JSR sub
+                   0x02,                    # halt
+                   ] + [0xFF] * 9 + [0xA9, 0x42, 0x60] # sub: LDA #$42, RTS
+        interpreted, compiled = self.run_both(program)
+        assert state(interpreted) == state(compiled)
+        assert compiled.regA == 0x42
+
+    def test_writes_invalidate_blocks(self):
+        emu = Emulation("5_Instructions1.nes", debug=True)
+        emu.bus[0x6000:0x6005] = [0xA9, 0x01, 0x4C, 0x00, 0x60] # LDA #1, JMP $6000
+        emu.pgmctr = 0x6000
+        emu.run_compiled(limit=100)
+        assert emu.regA == 1 and 0x6000 in emu.compiler.cache
+        emu.write(0x6001, 0x07) # Change the immediate
+        assert 0x6000 not in emu.compiler.cache
+        emu.pgmctr = 0x6000
+        emu.run_compiled(limit=emu.cycles + 100)
+        assert emu.regA == 7
+
+    def test_indexed_store_into_own_block(self): # STA $6008,X rewrites the block it's in, the rest mustn't run stale
+        code = [0xA2, 0x00, 0xA9, 0xE8, # 6000: LDX #0, LDA #$E8 (INX)
+                0x9D, 0x08, 0x60, 0xEA, 0xEA, 0x02] # 6004: STA $6008,X, NOP, NOP (becomes INX), halt
+        program = sum((store(0x6000 + index, byte) for index, byte in enumerate(code)), []) + [0x4C, 0x00, 0x60]
+        interpreted, compiled = self.run_both(program)
+        assert state(interpreted) == state(compiled)
+        assert compiled.regX == 1
+
+    def test_poke_rom_between_runs(self):
+        emu = Emulation(temp_rom(self, [0xA9, 0x01, 0x4C, 0x00, 0x80])) # LDA #1, JMP $8000
+        emu.run_compiled(limit=1000)
+        assert emu.regA == 1 and 0x8000 in emu.compiler.cache
+        emu.bus[0x8001] = 0x07 # Straight into rom, round the bus's write handlers
+        assert 0x8000 not in emu.compiler.cache
+        emu.run_compiled(limit=emu.cycles + 1000)
+        assert emu.regA == 7
+        emu.bus[0x8000:0x8002] = [0xA2, 0x09] # LDX #9 instead, through a slice
+        emu.run_compiled(limit=emu.cycles + 1000)
+        assert emu.regX == 9
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+from Emulation import Emulation
+from reverse import ReverseDebugger
+from testRoms import FILL, temp_rom
+import unittest
+
+ENGINES = ("run_emu", "run_compiled")
+
+
+def go(emu, engine, limit=10 ** 6): # Run on from a stop until something stops us again, FILL never halts by itself
+    emu.halt = False
+    if engine == "run_emu":
+        event = emu.scheduler.schedule(emu.cycles + limit, lambda cycle: emu.stop(), "stop")
+        emu.run_emu()
+        emu.scheduler.cancel(event)
+    else:
+        emu.run_compiled(emu.cycles + limit)
+    return emu.breakpoints.hit
+
+
+def tables(emu): # Everything a breakpoint or watchpoint could have swapped out
+    bus = emu.bus
+    return list(emu.optable), list(bus.readPages), list(bus.writePages), list(bus.readHandlers), \
+        list(bus.writeHandlers), list(bus.peekHandlers)
+
+
+class BreakpointsTest(unittest.TestCase):
+    def setUp(self):
+        self.path = temp_rom(self, FILL)
+
+    def test_pc(self):
+        for engine in ENGINES:
+            emu = Emulation(self.path)
+            point = emu.breakpoints.break_at(0x800B)
+            self.assertIs(go(emu, engine), point)
+            self.assertEqual((emu.pgmctr, emu.regX, emu.bus[0x0305], emu.bus[0x40]), (0x800B, 200, 5, 0xFF), engine)
+            go(emu, engine) # Runs the instruction it stopped on, then round again
+            self.assertEqual((emu.pgmctr, emu.bus[0x0305], emu.bus[0x40], point.hits), (0x800B, 5, 0x00, 2), engine)
+            emu.breakpoints.remove(point)
+            inside = emu.breakpoints.break_at(0x8006, lambda emu: emu.regX == 100) # The INX in the loop
+            self.assertIs(go(emu, engine), inside)
+            self.assertEqual((emu.pgmctr, emu.regX, emu.bus[0x0364], inside.hits), (0x8006, 100, 100, 1), engine)
+
+    def test_condition(self):
+        for engine in ENGINES:
+            emu = Emulation(self.path)
+            point = emu.breakpoints.break_when(lambda emu: emu.regA == 0x77)
+            self.assertIs(go(emu, engine), point)
+            self.assertEqual((emu.pgmctr, emu.regX), (0x8003, 0x77), engine) # Just after the TXA
+            self.assertNotEqual(emu.bus[0x0377], 0x77)
+
+    def test_watch_write(self):
+        for engine in ENGINES:
+            emu = Emulation(self.path)
+            point = emu.breakpoints.watch(0x0305)
+            seen = []
+            for _ in range(4):
+                go(emu, engine)
+                seen.append((emu.pgmctr, point.address, point.data))
+            self.assertEqual(seen, [(0x8006, 0x0305, 5), (0x8010, 0x0305, 0xAA), (0x8015, 0x0B05, 0xBB),
+                                    (0x8006, 0x0305, 5)], engine)
+            emu.breakpoints.clear()
+            ranged = emu.breakpoints.watch(0x0300, 0x03FF, condition=lambda address, data: data == 150)
+            self.assertIs(go(emu, engine), ranged)
+            self.assertEqual((ranged.address, emu.regX, emu.pgmctr), (0x0396, 150, 0x8006), engine)
+
+    def test_watch_read(self):
+        for engine in ENGINES:
+            emu = Emulation(self.path)
+            point = emu.breakpoints.watch(0x40, read=True, write=False)
+            self.assertEqual(emu.bus[0x40], 0xFF) # Peeking doesn't count
+            self.assertIsNone(emu.breakpoints.hit)
+            go(emu, engine)
+            self.assertEqual((emu.pgmctr, point.data, emu.bus[0x40]), (0x8017, 0xFF, 0x00), engine) # INC $40
+
+    def test_nothing_set_costs_nothing(self):
+        emu = Emulation(self.path)
+        before = tables(emu)
+        emu.breakpoints.break_at(0x8006)
+        emu.breakpoints.watch(0x0305)
+        after = tables(emu)
+        self.assertIsNot(after[0][0xE8], before[0][0xE8]) # INX, the opcode at the breakpoint, is wrapped
+        self.assertIs(after[0][0x8A], before[0][0x8A])
+        changed = [page for page in range(0x100) if after[2][page] is not before[2][page]]
+        self.assertEqual(changed, [0x03, 0x0B, 0x13, 0x1B]) # The page and its mirrors, writes only
+        self.assertEqual(after[1], before[1])
+        emu.breakpoints.clear()
+        go(emu, "run_compiled", 10000)
+        self.assertIsNone(emu.breakpoints.hit)
+        self.assertTrue(all(map(lambda new, old: all(a is b for a, b in zip(new, old)), tables(emu), before)))
+        self.assertFalse(emu.compiler.exact or emu.compiler.stops)
+
+    def test_profiler_leaves_breakpoints(self):
+        for engine in ENGINES:
+            emu = Emulation(self.path)
+            emu.profile()
+            point = emu.breakpoints.break_at(0x800B)
+            emu.stop_profiling()
+            self.assertIs(go(emu, engine), point, engine)
+            self.assertEqual(emu.pgmctr, 0x800B)
+            profiler = emu.profile()
+            self.assertIs(go(emu, engine), point, engine) # Still outermost with a profiler attached after it
+            self.assertEqual(point.hits, 2)
+            emu.stop_profiling()
+            self.assertEqual(profiler.pcCounts[0x800B], 1, engine) # Ran on from the first stop, the second isn't run
+
+    def test_idle_skipping_leaves_breakpoints(self):
+        for engine in ENGINES:
+            emu = Emulation(self.path)
+            point = emu.breakpoints.break_at(0x8017) # The JMP, which idle skipping wraps too
+            debugger = ReverseDebugger(emu) # Takes idle skipping off
+            self.assertIs(go(emu, engine), point, engine)
+            debugger.close()
+            self.assertIs(go(emu, engine), point, engine)
+            self.assertEqual((emu.pgmctr, point.hits), (0x8017, 2))
+            emu.breakpoints.remove(point)
+            self.assertIsNone(go(emu, engine, 10000), engine) # Nothing left over from the last hit
+
+    def test_nothing_set_costs_nothing_with_layers(self):
+        emu = Emulation(self.path)
+        before = list(emu.optable)
+        emu.breakpoints.break_at(0x8017)
+        emu.idle.detach()
+        emu.profile()
+        emu.breakpoints.clear()
+        emu.stop_profiling()
+        emu.idle.attach()
+        self.assertEqual([code for code in range(0x100) if emu.optable[code] is not before[code]],
+                         sorted(emu.idle.handlers)) # Idle skipping wrapped its ops afresh, nothing else changed
+
+
+if __name__ == '__main__':
+    unittest.main()
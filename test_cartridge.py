@@ -0,0 +1,180 @@
+from Emulation import Emulation
+from cartridge import *
+from memoryBus import MemoryBus
+from testRoms import attach, make_image
+import os
+import tempfile
+import unittest
+
+
+class HeaderTest(unittest.TestCase):
+    def test_ines(self):
+        header = Header(make_image(mapper=4, prgBanks=8, chrBanks=4, flags6=0x03))
+        assert (header.mapper, header.prgSize, header.chrSize, header.mirroring, header.battery, header.nes2) == \
+               (4, 0x20000, 0x8000, VERTICAL, True, False)
+
+    def test_nes2_extends_mapper_and_sizes(self):
+        image = bytearray(make_image(mapper=0x12, nes2=True))
+        image[8] = 0x31 # Submapper 3, mapper bits 8-11 = 1
+        image[9] = 0x01 # prg size msb
+        header = Header(image)
+        assert (header.nes2, header.mapper, header.submapper, header.prgSize) == (True, 0x112, 3, 0x102 * PRG_UNIT)
+
+    def test_diskdude_junk_ignored(self):
+        image = bytearray(make_image(mapper=0x41))
+        image[7:16] = b"DiskDude!"
+        assert Header(image).mapper == 1
+
+    def test_bad_magic(self):
+        with self.assertRaises(ValueError):
+            Header(bytes(16))
+
+
+class MapperTest(unittest.TestCase):
+    def test_nrom_16k_mirrors_and_rom_writes_fail(self):
+        cartridge, bus = attach(make_image(prgBanks=1))
+        assert type(cartridge.mapper) is NROM
+        assert [bus.read(address) for address in (0x8000, 0xA000, 0xC000, 0xE000)] == [0, 1, 0, 1]
+        with self.assertRaises(MemoryError):
+            bus.write(0x8000, 1)
+
+    def test_uxrom_switches_views_not_bytes(self):
+        cartridge, bus = attach(make_image(mapper=2, prgBanks=8))
+        mapper = cartridge.mapper
+        assert bus.read(0x8000) == 0 and bus.read(0xC000) == 14 and bus.read(0xFFFF) == 15
+        bus.write(0x8000, 5)
+        assert bus.read(0x8000) == 10 and bus.read(0xBFFF) == 11 and bus.read(0xC000) == 14
+        assert bus.readPages[0x80] is mapper.prgBanks[10][0] # The page table holds the bank's own views
+
+    def test_mmc1_serial_writes(self):
+        cartridge, bus = attach(make_image(mapper=1, prgBanks=8, chrBanks=2))
+        def load(address, value):
+            for bit in range(5):
+                bus.write(address, value >> bit & 1)
+        load(0xE000, 3)
+        assert bus.read(0x8000) == 6 and bus.read(0xC000) == 14 # Mode 3, last bank fixed
+        load(0x8000, 0x18 | 0x02) # prg mode 2, 4K chr, vertical
+        assert bus.read(0x8000) == 0 and bus.read(0xC000) == 6
+        assert cartridge.mapper.mirroring == VERTICAL
+        load(0xC000, 3)
+        assert cartridge.mapper.chr_read(0x1000) == 0x80 | 12
+        bus.write(0x8000, 0x80) # Reset goes back to mode 3
+        assert bus.read(0xC000) == 14
+
+    def test_cnrom_chr(self):
+        cartridge, bus = attach(make_image(mapper=3, chrBanks=4))
+        bus.write(0x8000, 2)
+        assert cartridge.mapper.chr_read(0x0000) == 0x80 | 16 and cartridge.mapper.chr_read(0x1FFF) == 0x80 | 23
+
+    def test_mmc3_prg_modes_and_irq(self):
+        cartridge, bus = attach(make_image(mapper=4, prgBanks=8, chrBanks=2))
+        mapper = cartridge.mapper
+        bus.write(0x8000, 6); bus.write(0x8001, 3)
+        bus.write(0x8000, 7); bus.write(0x8001, 4)
+        assert [bus.read(address) for address in (0x8000, 0xA000, 0xC000, 0xE000)] == [3, 4, 14, 15]
+        bus.write(0x8000, 0x46) # Swap, R6 goes to 0xC000
+        assert [bus.read(address) for address in (0x8000, 0xA000, 0xC000, 0xE000)] == [14, 4, 3, 15]
+        bus.write(0xC000, 2); bus.write(0xC001, 0); bus.write(0xE001, 0)
+        for _ in range(3):
+            mapper.clock_scanline()
+        assert mapper.irqPending
+        bus.write(0xE000, 0)
+        assert not mapper.irqPending
+
+    def test_switch_notifies_listeners(self):
+        cartridge, bus = attach(make_image(mapper=2, prgBanks=4))
+        seen = []
+        cartridge.mapper.listeners.append(lambda kind: seen.append((kind, sorted(cartridge.mapper.moved[kind]))))
+        bus.write(0x8000, 1)
+        assert seen == [("prg", [0, 1])]
+        bus.write(0x8000, 1) # Same bank again, nothing moved
+        assert seen == [("prg", [0, 1])]
+
+    def test_mmc3_rewrites_dont_notify(self):
+        cartridge, bus = attach(make_image(mapper=4, prgBanks=8, chrBanks=2))
+        seen = []
+        cartridge.mapper.listeners.append(lambda kind: seen.append((kind, sorted(cartridge.mapper.moved[kind]))))
+        for _ in range(3): # Select R7 and load bank 5 into it, the way games do before every access
+            bus.write(0x8000, 0x07); bus.write(0x8001, 5)
+        assert seen == [("prg", [1])]
+
+
+class EmulationTest(unittest.TestCase):
+    def test_bank_switch_flushes_compiled_code(self):
+        # Bank 0 and bank 1 both have code at 0x8000 that loads their own number into X then jumps to 0xC000, where
+        # the fixed bank switches to bank 1 the first time through and halts the second
+        image = bytearray(make_image(mapper=2, prgBanks=4, chrBanks=0))
+        for bank in (0, 1):
+            base = 0x10 + bank * PRG_UNIT
+            image[base:base + 5] = bytes([0xA2, bank, 0x4C, 0x00, 0xC0]) # LDX #bank, JMP $C000
+        fixed = 0x10 + 3 * PRG_UNIT
+        image[fixed:fixed + 13] = bytes([0xE0, 0x01, 0xF0, 0x08, # CPX #1, BEQ to the halt
+                                         0xA9, 0x01, 0x8D, 0x00, 0x80, # LDA #1, STA $8000
+                                         0x4C, 0x00, 0x80, 0x02]) # JMP $8000, halt
+        image[fixed + 0x3FFC:fixed + 0x3FFE] = bytes([0x00, 0x80])
+        handle, path = tempfile.mkstemp(suffix=".nes")
+        with os.fdopen(handle, "wb") as rom:
+            rom.write(image)
+        try:
+            emu = Emulation(path)
+            emu.run_compiled()
+        finally:
+            os.remove(path)
+        assert emu.halt and emu.error is None
+        assert emu.regX == 1
+
+    def test_bank_switch_keeps_other_windows(self):
+        image = bytearray(make_image(mapper=2, prgBanks=4, chrBanks=0))
+        for bank in range(4): # LDX #bank, JMP to itself at the start of every bank
+            base = 0x10 + bank * PRG_UNIT
+            image[base:base + 5] = bytes([0xA2, bank, 0x4C, 0x00, 0x80 if bank < 3 else 0xC0])
+        handle, path = tempfile.mkstemp(suffix=".nes")
+        with os.fdopen(handle, "wb") as rom:
+            rom.write(image)
+        self.addCleanup(os.remove, path)
+        emu = Emulation(path)
+        switchable, fixed = emu.compiler.get(0x8000), emu.compiler.get(0xC000)
+        emu.bus.write(0x8000, 0) # The bank that's already there
+        assert emu.compiler.cache[0x8000] is switchable
+        emu.bus.write(0x8000, 1)
+        assert 0x8000 not in emu.compiler.cache
+        assert emu.compiler.cache[0xC000] is fixed # The fixed bank didn't move
+
+
+class ImageCacheTest(unittest.TestCase):
+    def setUp(self):
+        clear_cache()
+        self.paths = []
+        for _ in range(2): # Same bytes under two names
+            handle, path = tempfile.mkstemp(suffix=".nes")
+            with os.fdopen(handle, "wb") as rom:
+                rom.write(make_image(mapper=2, prgBanks=4))
+            self.paths.append(path)
+
+    def tearDown(self):
+        clear_cache()
+        for path in self.paths:
+            os.remove(path)
+
+    def test_instances_share_one_mapping(self):
+        first = Cartridge.from_file(self.paths[0])
+        second = Cartridge.from_file(self.paths[1])
+        assert first.image is second.image and len(IMAGES) == 1
+        assert first.prg.obj is second.prg.obj # Both views are into the same mmap
+        assert first.prg.readonly and first.prgBanks is second.prgBanks
+
+    def test_poke_copies_only_that_instance(self):
+        first, second = Emulation(self.paths[0]), Emulation(self.paths[1])
+        first.bus.write(0x8000, 2) # Switch before poking, the private copy has to keep the current banks
+        first.bus[0x8000] = 0xEA
+        first.bus[0x9FFE:0x8000 + 0x2001] = [1, 2, 3]
+        assert first.bus.read(0x8000) == 0xEA and first.bus[0x9FFE:0xA001] == [1, 2, 3]
+        assert first.cartridge.private and not second.cartridge.private
+        assert second.bus.read(0x8000) == 0 and second.bus.read(0x9FFE) == 0 and second.bus.read(0xA000) == 1
+        assert first.bus.read(0xC000) == 6 # Fixed bank still mapped
+        first.bus.write(0x8000, 0)
+        assert first.bus.read(0x8000) == 0 and first.bus.read(0xA000) == 1
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+from Emulation import Emulation
+from idle import READS
+from profiler import Profiler
+from testRoms import COUNT_FRAMES, spin, state, store, temp_rom, temp_vectored_rom
+import unittest
+
+ENGINES = ("run_emu", "run_compiled")
+
+# Background on, then BIT $2002 / BPL -5 three times over, halt
+WAIT_VBLANK = store(0x2001, 0x08) + [0x2C, 0x02, 0x20, 0x10, 0xFB] * 3 + [0x02]
+
+
+class IdleTest(unittest.TestCase):
+    def both(self, path, run, **kwargs): # (plain emulator, idle skipping emulator), each run the same way
+        emus = [Emulation(path, idle=idle, **kwargs) for idle in (False, True)]
+        for emu in emus:
+            getattr(emu, run)()
+        return emus
+
+    def test_nmi_flag_wait(self):
+        path = temp_vectored_rom(self, COUNT_FRAMES[0], nmi=COUNT_FRAMES[1])
+        for run in ENGINES:
+            plain, idle = self.both(path, run)
+            self.assertEqual(state(plain), state(idle), run)
+            self.assertEqual(idle.bus[0x10], 5)
+            self.assertEqual(plain.idle.skips, 0)
+            self.assertGreaterEqual(idle.idle.skips, 5, run)
+            self.assertGreater(idle.idle.cycles, idle.cycles * 0.9) # Nearly everything was waiting
+
+    def test_vblank_poll(self):
+        path = temp_rom(self, WAIT_VBLANK)
+        for run in ENGINES:
+            for headless in (False, True):
+                plain, idle = self.both(path, run, headless=headless)
+                self.assertEqual(state(plain), state(idle), (run, headless))
+                self.assertTrue(idle.halt)
+                self.assertGreater(idle.idle.skips, 0)
+
+    def test_busy_loops_run(self):
+        path = temp_rom(self, [0xA2, 0x00, 0xE8, 0xD0, 0xFD, 0x02]) # LDX #0, INX, BNE -3, halt
+        for run in ENGINES:
+            plain, idle = self.both(path, run)
+            self.assertEqual(state(plain), state(idle))
+            self.assertEqual(idle.idle.skips, 0)
+            self.assertIsNone(idle.idle.loops[0x8002])
+
+    def test_compiled_limit(self):
+        path = temp_rom(self, spin([]))
+        for limit in (1000, 12345, 100000):
+            plain = Emulation(path, idle=False)
+            emu = Emulation(path)
+            plain.run_compiled(limit)
+            emu.run_compiled(limit)
+            self.assertEqual(state(plain), state(emu), limit)
+            self.assertGreater(emu.idle.skips, 0)
+
+    def test_profiler_reports_skips(self):
+        path = temp_vectored_rom(self, COUNT_FRAMES[0], nmi=COUNT_FRAMES[1])
+        emu = Emulation(path)
+        profiler = emu.profile(Profiler())
+        emu.run_emu()
+        skips, instructions, cycles = profiler.idle()
+        self.assertEqual((skips, instructions, cycles), (emu.idle.skips, emu.idle.instructions, emu.idle.cycles))
+        self.assertGreater(profiler.cycles(), cycles) # Skipped cycles still count, on the loop's branch
+        self.assertEqual(profiler.to_dict()["idle"]["loops"][0]["address"], hex(0x8005))
+        self.assertIn("Idle loops", profiler.report())
+        self.assertLess(profiler.instructions() * 10, instructions)
+
+    def test_quiet_until(self):
+        path = temp_rom(self, [0x02])
+        ppu = Emulation(path).ppu
+        if ppu is None:
+            self.skipTest("ppu needs numpy")
+        self.assertEqual(ppu.quiet_until(), -(-262 * 341 // 3)) # Rendering off, the pre render line clears status
+        ppu.mask = 0x08
+        self.assertEqual(ppu.quiet_until(), -(-341 // 3)) # Any rendered line could set sprite 0 hit
+        ppu.headless = True
+        ppu.hitLine = 100
+        self.assertEqual(ppu.quiet_until(), -(-101 * 341 // 3))
+
+    def test_reads_are_side_effect_free(self):
+        self.assertFalse({0x8D, 0x85, 0x48, 0x08, 0xE6, 0xC6, 0x58} & set(READS)) # Stores, pushes, INC/DEC, CLI
+
+
+if __name__ == '__main__':
+    unittest.main()
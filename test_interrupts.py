@@ -0,0 +1,97 @@
+from Emulation import Emulation
+from customTypes import *
+from interrupts import *
+from scheduler import Scheduler
+from testRoms import attach, make_image, vectored_rom
+from types import SimpleNamespace
+import os
+import unittest
+
+ENGINES = ("run_emu", "run_compiled")
+
+
+def pushed(emu, sp=None): # Flags, return address of the interrupt frame just above sp
+    sp = emu.stackptr if sp is None else sp
+    return emu.bus.read(0x101 + sp), emu.bus.read(0x102 + sp) | emu.bus.read(0x103 + sp) << 8
+
+
+class InterruptTest(unittest.TestCase):
+    def setUp(self):
+        self.paths = []
+
+    def tearDown(self):
+        for path in self.paths:
+            os.remove(path)
+
+    def emulator(self, *args, **kwargs):
+        path = vectored_rom(*args, **kwargs)
+        self.paths.append(path)
+        return Emulation(path)
+
+    def test_brk_and_rti(self):
+        # 8000: CLI, BRK, padding byte, LDA #$55, halt. The handler sets X and returns
+        for run in ENGINES:
+            emu = self.emulator([0x58, 0x00, 0xEA, 0xA9, 0x55, 0x02], irq=[0xA2, 0x11, 0x40])
+            getattr(emu, run)()
+            self.assertEqual((emu.regA, emu.regX), (0x55, 0x11), run)
+            self.assertFalse(emu.status & FLAG_I, run) # RTI put the flags from before BRK back
+            self.assertEqual(emu.stackptr, 0xFD)
+            flags, ret = pushed(emu, emu.stackptr - 3) # Still there below the stack pointer after RTI
+            self.assertEqual(ret, 0x8003) # BRK skips the byte after it
+            self.assertTrue(flags & FLAG_B)
+
+    def test_vblank_nmi(self):
+        # LDA #$80, STA $2000 (NMI on), then spin. The NMI handler halts
+        for run in ENGINES:
+            emu = self.emulator([0xA9, 0x80, 0x8D, 0x00, 0x20, 0x4C, 0x05, 0x80])
+            if emu.ppu is None:
+                self.skipTest("ppu needs numpy")
+            emu.status |= FLAG_I # NMI isn't masked
+            getattr(emu, run)()
+            self.assertEqual(emu.pgmctr, 0x9002, run)
+            self.assertEqual(emu.interrupts.taken[NMI], 1)
+            self.assertEqual(emu.interrupts.pending, 0)
+            flags, ret = pushed(emu)
+            self.assertEqual(ret, 0x8005)
+            self.assertFalse(flags & FLAG_B)
+            self.assertTrue(emu.status & FLAG_I)
+            self.assertGreaterEqual(emu.cycles, emu.ppu.dots // 3)
+
+    def test_irq_waits_for_cli(self):
+        # LDX #0, INX, BNE -3 (about 1300 cycles with I set), CLI, spin. The IRQ handler halts
+        for run in ENGINES:
+            emu = self.emulator([0xA2, 0x00, 0xE8, 0xD0, 0xFD, 0x58, 0x4C, 0x06, 0x80])
+            emu.scheduler.schedule(100, lambda cycle: emu.interrupts.raise_line(IRQ_MAPPER), "irq")
+            getattr(emu, run)()
+            self.assertEqual(emu.pgmctr, 0x9802, run)
+            self.assertEqual(emu.regX, 0)
+            flags, ret = pushed(emu)
+            self.assertIn(ret, (0x8006, 0x8009), run) # Taken right after the CLI, before or after the first jump
+            self.assertFalse(flags & FLAG_I)
+            self.assertEqual(emu.interrupts.pending, IRQ_MAPPER) # Level triggered, still up until acknowledged
+
+    def test_reset(self):
+        emu = self.emulator([0xE8, 0x4C, 0x00, 0x80])
+        emu.scheduler.schedule(500, lambda cycle: emu.interrupts.raise_line(RESET | NMI), "reset")
+        emu.scheduler.schedule(1000, lambda cycle: emu.stop(), "stop")
+        emu.run_emu()
+        self.assertEqual(emu.interrupts.taken[RESET], 1)
+        self.assertEqual(emu.interrupts.taken[NMI], 0) # Swallowed by the reset
+        self.assertEqual(emu.stackptr, 0xFA)
+        self.assertTrue(0x8000 <= emu.pgmctr < 0x8004)
+
+    def test_mmc3_irq_line(self):
+        cartridge, bus = attach(make_image(mapper=4, prgBanks=4))
+        interrupts = cartridge.mapper.interrupts = Interrupts(SimpleNamespace(scheduler=Scheduler()))
+        bus.write(0xC000, 2); bus.write(0xC001, 0); bus.write(0xE001, 0) # Latch 2, reload, enable
+        for _ in range(3): # Reload to 2, then 1, then 0
+            self.assertFalse(interrupts.pending)
+            cartridge.mapper.clock_scanline()
+        self.assertEqual(interrupts.pending, IRQ_MAPPER)
+        self.assertLess(interrupts.cpu.scheduler.next, 0) # The run loop is told to come out
+        bus.write(0xE000, 0) # Disable and acknowledge
+        self.assertEqual(interrupts.pending, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+from memoryBus import MemoryBus, OPEN_BUS, aliases
+import unittest
+
+
+class MemoryBusTest(unittest.TestCase):
+    def setUp(self):
+        self.bus = MemoryBus(bytes(range(256)) * 64) # 16K of prg rom
+
+    def test_ram_mirrors(self):
+        self.bus.write(0x0012, 0x34)
+        for mirror in (0x0012, 0x0812, 0x1012, 0x1812):
+            assert self.bus.read(mirror) == 0x34
+        self.bus.write(0x1FFF, 0x56)
+        assert self.bus.read(0x07FF) == 0x56
+
+    def test_ppu_registers_mirror_every_8_bytes(self):
+        self.bus.write(0x2006, 0x21)
+        assert self.bus.read(0x3FFE) == 0x21
+        assert self.bus.ppuRegisters[6] == 0x21
+
+    def test_io_and_unmapped(self):
+        self.bus.write(0x4015, 0x0F)
+        assert self.bus.read(0x4015) == 0x0F
+        assert self.bus.read(0x5000) == OPEN_BUS
+        with self.assertRaises(MemoryError):
+            self.bus.write(0x4100, 1)
+
+    def test_prg_ram(self):
+        self.bus.write(0x6000, 0x99)
+        assert self.bus.read(0x6000) == 0x99
+        assert self.bus.prgram[0] == 0x99
+
+    def test_rom_is_read_only_and_16k_is_mirrored(self):
+        assert self.bus.read(0x8005) == 5
+        assert self.bus.read(0xC005) == 5
+        with self.assertRaises(MemoryError):
+            self.bus.write(0x8000, 0)
+        self.bus[0x8000] = 0xEA # poke goes straight through for debugging
+        assert self.bus.read(0xC000) == 0xEA
+
+    def test_slices(self):
+        self.bus[0x07FE:0x0802] = [1, 2, 3, 4]
+        assert self.bus[0x0000:0x0002] == [3, 4]
+        assert self.bus[0x07FE:0x0800] == [1, 2]
+        assert self.bus[0x1FFE:0x2001] == [1, 2, 0]
+
+    def test_aliases(self):
+        assert aliases(0x0A10) == [0x0210, 0x0A10, 0x1210, 0x1A10]
+        assert len(aliases(0x2002)) == 0x400 and 0x3FFA in aliases(0x2002)
+        assert aliases(0x6000) == [0x6000]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+from Emulation import Emulation
+from cartridge import Cartridge, VERTICAL
+from memoryBus import MemoryBus
+from ppu import *
+from testRoms import make_image, make_rom
+import numpy as np
+import os
+import unittest
+
+
+def make_ppu(fast=False, seed=1): # PPU over random chr, vram and OAM with the sprites spread one per 4 lines
+    rng = np.random.default_rng(seed)
+    image = bytearray(make_image(prgBanks=2, chrBanks=1))
+    image[0x10 + 0x8000:] = rng.integers(0, 256, 0x2000, dtype=np.uint8).tobytes()
+    ppu = PPU(Cartridge(bytes(image)), fast)
+    ppu.mapper.attach(MemoryBus())
+    ppu.vram[:] = rng.integers(0, 256, 0x1000, dtype=np.uint8)
+    ppu.palette[:] = np.arange(32)
+    ppu.oam[:] = rng.integers(0, 256, 0x100, dtype=np.uint8)
+    ppu.oam[0::4] = np.arange(64) * 4
+    ppu.mask = MASK_BG | MASK_SPRITES | MASK_BG_LEFT | MASK_SPRITES_LEFT
+    ppu.ctrl = CTRL_BG_TABLE
+    ppu.t = 0x0123; ppu.x = 3
+    return ppu
+
+
+def reference_background(ppu, line, pixel): # One background pixel the slow way, straight from the nametables
+    v, fineX = ppu.frameScroll
+    x = ((v & 0x1F) * 8 + fineX + (v >> 10 & 1) * 256 + pixel) % 512
+    y = ((v >> 5 & 0x1F) * 8 + (v >> 12 & 7) + (v >> 11 & 1) * 240 + line) % 480
+    base = ppu.nametable_index(0x2000 + (y // 240 * 2 + x // 256) * 0x400)
+    column, row = x % 256 // 8, y % 240 // 8
+    tile = int(ppu.vram[base + row * 32 + column])
+    attribute = int(ppu.vram[base + 0x3C0 + row // 4 * 8 + column // 4]) >> (row & 2) * 2 + (column & 2) & 3
+    address = 0x1000 + tile * 16 + y % 8
+    value = ppu.mapper.chr_read(address) >> 7 - x % 8 & 1 | (ppu.mapper.chr_read(address + 8) >> 7 - x % 8 & 1) << 1
+    return attribute * 4 + value if value else 0
+
+
+class RenderTest(unittest.TestCase):
+    def test_background_matches_reference(self):
+        ppu = make_ppu()
+        ppu.mask = MASK_BG | MASK_BG_LEFT
+        ppu.run_frame(); ppu.run_frame()
+        for line in (0, 7, 100, 239):
+            assert list(ppu.frame[line]) == [reference_background(ppu, line, pixel) for pixel in range(256)], line
+
+    def test_fast_mode_matches_scanlines(self):
+        frames = []
+        for fast in (False, True):
+            ppu = make_ppu(fast)
+            ppu.run_frame(); ppu.run_frame()
+            frames.append((ppu.frame.copy(), ppu.status))
+        assert (frames[0][0] == frames[1][0]).all() and frames[0][1] == frames[1][1]
+
+    def test_sprite_priority_and_sprite0_hit(self):
+        ppu = make_ppu()
+        ppu.mask = MASK_SPRITES | MASK_SPRITES_LEFT
+        ppu.oam[:] = 0xFF # Everything off screen
+        ppu.oam[0:8] = [49, 0, 0x01, 100, 49, 0, 0x02, 104] # Two sprites overlapping by 4 pixels on lines 50-57
+        pattern = ppu.mapper.chrBanks[0]
+        tile = np.frombuffer(pattern[:16], np.uint8)
+        ppu.run_frame(); ppu.run_frame()
+        line = ppu.frame[50]
+        row = np.unpackbits(tile[0:1]) | np.unpackbits(tile[8:9]) << 1 # Top row, sprites start the line after their y
+        first = np.where(row != 0, 0x14 | row, 0)
+        second = np.where(row != 0, 0x18 | row, 0)
+        expected = np.zeros(256, np.uint8)
+        expected[104:112] = second
+        expected[100:108] = np.where(first != 0, first, expected[100:108]) # Sprite 0 wins where both are opaque
+        assert list(line) == list(expected)
+        assert not ppu.status & STATUS_SPRITE0 # No background, nothing to hit
+        ppu.mask |= MASK_BG
+        ppu.run_frame()
+        assert ppu.status & STATUS_SPRITE0
+
+    def test_overflow(self):
+        ppu = make_ppu()
+        ppu.oam[0::4] = 20
+        ppu.run_frame()
+        assert ppu.status & STATUS_OVERFLOW
+
+    def test_rgb(self):
+        ppu = make_ppu(True)
+        ppu.run_frame()
+        assert ppu.rgb().shape == (240, 256, 3) and (ppu.rgb()[0, 0] == NES_RGB[ppu.frame[0, 0]]).all()
+
+
+class RegisterTest(unittest.TestCase):
+    def setUp(self):
+        self.emu = Emulation("5_Instructions1.nes", debug=True)
+        self.bus = self.emu.bus
+        self.ppu = self.emu.ppu
+
+    def test_vram_access(self):
+        bus = self.bus
+        bus.write(0x2006, 0x24); bus.write(0x2006, 0x05)
+        bus.write(0x2007, 0x11); bus.write(0x2007, 0x22)
+        bus.write(0x2006, 0x24); bus.write(0x2006, 0x05)
+        assert bus.read(0x2007) != 0x11 # First read is the stale buffer
+        assert bus.read(0x2007) == 0x11 and bus.read(0x2007) == 0x22
+        assert self.ppu.vram[self.ppu.nametable_index(0x2405)] == 0x11
+        bus.write(0x2000, CTRL_INCREMENT)
+        bus.write(0x2006, 0x3F); bus.write(0x2006, 0x10)
+        bus.write(0x2007, 0x2A) # 0x3F10 mirrors 0x3F00
+        assert self.ppu.palette[0] == 0x2A and self.ppu.v == 0x3F30
+
+    def test_vblank_and_nmi_timing(self):
+        bus, ppu, emu = self.bus, self.ppu, self.emu
+        bus.write(0x2000, CTRL_NMI)
+        emu.cycles = VBLANK_LINE * DOTS // 3 - 1
+        assert not bus.read(0x2002) & STATUS_VBLANK and not ppu.nmiPending
+        emu.cycles += 2
+        assert bus.read(0x2002) & STATUS_VBLANK and ppu.nmiPending
+        assert not bus.read(0x2002) & STATUS_VBLANK # Reading clears it
+        emu.cycles = PRE_RENDER * DOTS // 3 + 1
+        bus.read(0x2002)
+        assert ppu.frames == 1 and ppu.scanline == PRE_RENDER
+
+    def test_oam_dma(self):
+        bus, ppu, emu = self.bus, self.ppu, self.emu
+        bus[0x0200:0x0300] = list(range(256))
+        bus.write(0x2003, 0x10)
+        emu.cycles = 10
+        bus.write(0x4014, 0x02)
+        assert ppu.oam[0x10] == 0 and ppu.oam[0x0F] == 0xFF
+        assert emu.cycles == 10 + 513
+
+    def test_dma_from_compiled_code_keeps_stall(self):
+        path = make_rom([0xA9, 0x02, 0x8D, 0x14, 0x40, 0x02]) # LDA #2, STA $4014, halt
+        try:
+            interpreted = Emulation(path); interpreted.run_emu()
+            compiled = Emulation(path); compiled.run_compiled()
+        finally:
+            os.remove(path)
+        assert interpreted.cycles == compiled.cycles == 2 + 4 + 513
+
+
+def status_lines(ppu): # First line sprite 0 hit and overflow show up on, over one frame
+    ppu.run_frame()
+    while ppu.scanline != 0:
+        ppu.end_line()
+    hit = overflow = None
+    for line in range(240):
+        ppu.end_line()
+        if hit is None and ppu.status & STATUS_SPRITE0:
+            hit = line
+        if overflow is None and ppu.status & STATUS_OVERFLOW:
+            overflow = line
+    return hit, overflow
+
+
+class HeadlessTest(unittest.TestCase):
+    def test_status_lines_match_rendering(self):
+        for seed in range(12):
+            lines = []
+            for fast, headless in ((False, False), (False, True), (True, False)):
+                ppu = make_ppu(fast, seed=seed)
+                ppu.headless = headless
+                rng = np.random.default_rng(seed)
+                ppu.oam[0::4] = rng.integers(0, 240, 64)
+                ppu.oam[0:4] = [rng.integers(0, 230), ppu.oam[1], rng.integers(0, 256), rng.integers(0, 250)]
+                if seed % 3 == 0:
+                    ppu.ctrl |= CTRL_TALL_SPRITES
+                if seed % 4 == 1:
+                    ppu.mask &= ~(MASK_BG_LEFT | MASK_SPRITES_LEFT)
+                lines.append(status_lines(ppu))
+            assert lines[0] == lines[1] == lines[2], seed
+
+    def test_no_pixels_but_same_timing(self):
+        emu = Emulation("5_Instructions1.nes", debug=True, headless=True)
+        ppu = emu.ppu
+        ppu.palette[0] = 0x21
+        ppu.mask = MASK_BG | MASK_SPRITES
+        emu.bus.write(0x2000, CTRL_NMI)
+        emu.cycles = VBLANK_LINE * DOTS // 3 + 1
+        assert emu.bus.read(0x2002) & STATUS_VBLANK and ppu.nmiPending
+        assert not ppu.frame.any()
+
+    def test_fast_from_emulation(self):
+        emu = Emulation("5_Instructions1.nes", debug=True, fast=True)
+        assert emu.ppu.fast and emu.ppu.planned and not emu.ppu.headless
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+from Emulation import Emulation
+from profiler import Profiler
+from testRoms import temp_dir, temp_rom
+import json
+import os
+import unittest
+
+
+class ProfilerTest(unittest.TestCase):
+    def test_totals_match_run(self):
+        emu = Emulation("5_Instructions1.nes", debug=True)
+        plain = list(emu.optable)
+        profiler = emu.profile()
+        emu.run_emu()
+        assert profiler.cycles() == emu.cycles
+        assert sum(profiler.pcCounts) == profiler.instructions() == 83
+        assert sum(profiler.pcCycles) == emu.cycles
+        assert profiler.pcCounts[0x8000] == 1
+        assert emu.stop_profiling() is profiler
+        assert emu.optable == plain and emu.profiler is None
+
+    def test_shift_and_sed_add_cycles(self):
+        # ASL zp, ASL A and SED used to overwrite the cycle count instead of adding to it
+        emu = Emulation(temp_rom(self, [0xEA, 0x06, 0x10, 0x0A, 0xF8, 0x02]))
+        emu.run_emu()
+        assert emu.cycles == 2 + 5 + 2 + 2
+
+    def test_blocks_and_routines(self):
+        # 8000: LDX #3
+        # 8002: JSR 8010 / DEX / BNE 8002 / halt
+        # 8010: JSR 8014 / RTS
+        # 8014: NOP / RTS
+        program = [0xA2, 0x03, 0x20, 0x10, 0x80, 0xCA, 0xD0, 0xFA, 0x02] + [0xEA] * 7 + \
+                  [0x20, 0x14, 0x80, 0x60, 0xEA, 0x60]
+        emu = Emulation(temp_rom(self, program))
+        profiler = emu.profile()
+        emu.run_emu()
+        routines = {target: (calls, inclusive, exclusive) for target, calls, inclusive, exclusive in profiler.hot_routines()}
+        assert routines[0x8014] == (3, 3 * (6 + 2 + 6), 3 * (6 + 2 + 6))
+        assert routines[0x8010] == (3, 3 * (6 + 6 + 14), 3 * (6 + 6)) # Inclusive counts the inner routine, self doesn't
+        starts = [block[0] for block in profiler.blocks()]
+        assert starts == [0x8000, 0x8002, 0x8005, 0x8008, 0x8010, 0x8013, 0x8014]
+        assert profiler.hot_blocks(1)[0] == (0x8014, 0x8015, 3, 6, 3 * (2 + 6)) # NOP / RTS
+
+    def test_report_written_when_run_ends(self):
+        path = os.path.join(temp_dir(self), "profile.json")
+        emu = Emulation("5_Instructions1.nes", debug=True)
+        emu.profile(Profiler(path))
+        emu.run_emu()
+        with open(path) as file:
+            report = json.load(file)
+        assert report["cycles"] == emu.cycles
+        assert report["opcodes"][0]["opcode"] == "0x85"
+
+
+if __name__ == '__main__':
+    unittest.main()
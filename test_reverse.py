@@ -0,0 +1,79 @@
+from Emulation import Emulation
+from reverse import ReverseDebugger, MIN_SPACING
+from testRoms import FILL, FILL_PASS, state, temp_rom
+import unittest
+
+
+class ReverseTest(unittest.TestCase):
+    def setUp(self):
+        self.path = temp_rom(self, FILL)
+
+    def test_step_back_matches_going_forward(self):
+        debugger = ReverseDebugger(Emulation(self.path))
+        states = [state(debugger.emu)]
+        for _ in range(3000):
+            debugger.step()
+            states.append(state(debugger.emu))
+        for target in (2999, 2500, 1999, 1000, 17, 0):
+            debugger.step_back(debugger.count - target)
+            self.assertEqual(debugger.count, target)
+            self.assertEqual(state(debugger.emu), states[target], target)
+        debugger.step(2000)
+        self.assertEqual(state(debugger.emu), states[2000]) # Forward again over ground already covered
+        debugger.step_back(10 ** 6)
+        self.assertEqual(debugger.count, 0)
+
+    def test_replay_is_bounded(self):
+        debugger = ReverseDebugger(Emulation(self.path))
+        debugger.step(50 * FILL_PASS)
+        self.assertGreater(len(debugger.history), 2)
+        self.assertGreater(debugger.spacing, MIN_SPACING) # Tuned to how fast this machine is running
+        for _ in range(5):
+            before = debugger.replayed
+            debugger.step_back()
+            self.assertLessEqual(debugger.replayed - before, debugger.spacing * 2)
+
+    def test_last_write(self):
+        debugger = ReverseDebugger(Emulation(self.path))
+        debugger.step(2 * FILL_PASS + 10) # Into the third pass, before it gets to 0x0305
+        write = debugger.last_write(0x0305)
+        self.assertEqual((write.address, write.data, write.pgmctr), (0x0B05, 0xBB, 0x8012)) # Through the mirror
+        self.assertEqual(debugger.emu.pgmctr, 0x8012)
+        self.assertEqual(debugger.emu.bus[0x40], 0x00) # Powered up 0xFF, one pass done
+        self.assertEqual(debugger.count, 2 * FILL_PASS - 3)
+        write = debugger.last_write(0x0305)
+        self.assertEqual((write.data, write.pgmctr, debugger.count), (0xAA, 0x800D, 2 * FILL_PASS - 5))
+        write = debugger.last_write(0x0305)
+        self.assertEqual((write.data, write.pgmctr), (5, 0x8003)) # The loop, second pass
+        self.assertEqual(debugger.emu.regX, 5)
+        debugger.step()
+        self.assertEqual(debugger.emu.bus[0x0305], 5)
+        debugger.step_back(debugger.count)
+        self.assertIsNone(debugger.last_write(0x0305))
+        self.assertEqual(debugger.emu.bus.writePages[0x03], debugger.emu.bus.readPages[0x03]) # Traps are gone
+
+    def test_reverse_continue(self):
+        debugger = ReverseDebugger(Emulation(self.path))
+        debugger.breakpoints.add(0x800B)
+        debugger.continue_()
+        self.assertEqual((debugger.emu.pgmctr, debugger.count), (0x800B, FILL_PASS - 6))
+        debugger.continue_()
+        self.assertEqual(debugger.count, 2 * FILL_PASS - 6)
+        debugger.step(300)
+        self.assertEqual(debugger.reverse_continue(), 2 * FILL_PASS - 6)
+        self.assertEqual(debugger.emu.pgmctr, 0x800B)
+        self.assertEqual(debugger.reverse_continue(), FILL_PASS - 6)
+        self.assertIsNone(debugger.reverse_continue())
+        self.assertEqual(debugger.count, 0)
+
+    def test_close_restores_idle_skipping(self):
+        for idle in (False, True):
+            emu = Emulation(self.path, idle=idle)
+            debugger = ReverseDebugger(emu)
+            self.assertFalse(emu.idle.enabled)
+            debugger.close()
+            self.assertEqual(emu.idle.enabled, idle)
+
+
+if __name__ == '__main__':
+    unittest.main()
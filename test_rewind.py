@@ -0,0 +1,65 @@
+from Emulation import Emulation
+from rewind import Rewind, FRAME_CYCLES
+from testRoms import FOREVER, everything, state, temp_vectored_rom
+import unittest
+
+
+class RewindTest(unittest.TestCase):
+    def setUp(self):
+        self.path = temp_vectored_rom(self, FOREVER[0], nmi=FOREVER[1])
+
+    def recorded(self, frames=30, **options): # Emulator that ran frames frames with a history, and the history
+        emu = Emulation(self.path)
+        history = emu.record(Rewind(**options))
+        emu.run_compiled(frames * FRAME_CYCLES + FRAME_CYCLES // 2) # Snapshots come a few cycles late, on instructions
+        return emu, history
+
+    def test_seek_replays_the_same(self):
+        emu, history = self.recorded()
+        end, final = emu.cycles, everything(emu)
+        self.assertEqual(len(history), 31)
+        for index in (0, 7, 29, -1):
+            snapshot = history.seek(index)
+            self.assertEqual(emu.cycles, snapshot.cycle)
+            emu.run_compiled(end)
+            self.assertEqual(everything(emu), final, index)
+
+    def test_back_one_at_a_time(self):
+        emu, history = self.recorded(keyframes=8)
+        cycles = history.cycles()
+        frames = [snapshot.frame for snapshot in history.snapshots]
+        for index in range(len(history) - 1, -1, -1):
+            history.seek(index) if index == len(history) - 1 else history.back()
+            self.assertEqual((emu.cycles, emu.ppu and emu.ppu.frames), (cycles[index], frames[index]))
+        with self.assertRaises(ValueError):
+            history.seek_cycle(cycles[0] - 1)
+        history.seek_cycle(cycles[5] + 10)
+        self.assertEqual(history.position, 5)
+
+    def test_new_timeline_drops_the_future(self):
+        emu, history = self.recorded(frames=10)
+        history.seek(4)
+        emu.bus[0x20] = 0x77 # Something the first timeline never did
+        emu.run_compiled(emu.cycles + 2 * FRAME_CYCLES + FRAME_CYCLES // 2)
+        self.assertEqual(len(history), 7)
+        history.seek(-1)
+        self.assertEqual(emu.bus[0x20], 0x77)
+        history.seek(4)
+        self.assertNotEqual(emu.bus[0x20], 0x77)
+
+    def test_budget(self):
+        emu, history = self.recorded(frames=100, keyframes=10)
+        full = history.bytes
+        self.assertLess(full / len(history), 2000) # Deltas of a frame waiting in a loop are tiny
+        emu, history = self.recorded(frames=100, keyframes=10, budget=full // 4)
+        self.assertLessEqual(history.bytes, full // 4)
+        self.assertGreater(history.evicted, 0)
+        self.assertTrue(history.snapshots[0].key)
+        end, final = emu.cycles, everything(emu)
+        history.seek(0)
+        emu.run_compiled(end)
+        self.assertEqual(state(emu), final[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+from Emulation import Emulation
+from savestate import HEADER, MAGIC, VERSION
+from testRoms import COUNT_FRAMES, TONE, attach, everything, make_image, make_rom, store, vectored_rom
+import os
+import time
+import unittest
+
+ENGINES = ("run_emu", "run_compiled")
+
+# A tone, picture on, then count frames in the NMI handler
+PROGRAM = (TONE + store(0x2001, 0x18) + COUNT_FRAMES[0], COUNT_FRAMES[1])
+
+
+def run(emu, engine, cycles):
+    if engine == "run_emu":
+        emu.scheduler.schedule(emu.cycles + cycles, lambda cycle: emu.stop(), "stop")
+        emu.run_emu()
+        emu.halt = False
+    else:
+        emu.run_compiled(emu.cycles + cycles)
+
+
+class SaveStateTest(unittest.TestCase):
+    def setUp(self):
+        self.paths = [vectored_rom(PROGRAM[0], nmi=PROGRAM[1])]
+
+    def tearDown(self):
+        for path in self.paths:
+            os.remove(path)
+
+    def test_restore_carries_on_the_same(self):
+        for engine in ENGINES:
+            batches = []
+            emu = Emulation(self.paths[0], audio=batches.append)
+            run(emu, engine, 45000) # Mid frame, with audio waiting for its flush
+            blob = emu.save_state()
+            run(emu, engine, 100000)
+            expected = everything(emu)
+            fresh = Emulation(self.paths[0], audio=[].append)
+            fresh.load_state(blob)
+            run(fresh, engine, 100000)
+            self.assertEqual(everything(fresh), expected, engine)
+            emu.load_state(blob) # And going back on the same emulator
+            run(emu, engine, 100000)
+            self.assertEqual(everything(emu), expected, engine)
+
+    def test_ram_code_is_recompiled(self):
+        # Copy LDA #1, RTS into prg ram and call it, then poke LDA #2 there and save that too
+        program = store(0x6000, 0xA9) + store(0x6001, 0x01) + store(0x6002, 0x60) + [0x20, 0x00, 0x60, 0x02]
+        self.paths.append(make_rom(program))
+        emu = Emulation(self.paths[-1])
+        emu.run_compiled()
+        blob = emu.save_state()
+        emu.bus[0x6001] = 0x02 # Straight into the buffer, the compiled block doesn't hear about it
+        saved = emu.save_state()
+        emu.load_state(blob)
+        emu.pgmctr, emu.halt = 0x800F, False
+        emu.run_compiled()
+        self.assertEqual(emu.regA, 0x01)
+        emu.load_state(saved)
+        emu.pgmctr, emu.halt = 0x800F, False
+        emu.run_compiled()
+        self.assertEqual(emu.regA, 0x02)
+
+    def test_mapper_banks(self):
+        for mapper, writes in ((1, [(0xE000, bit) for bit in (1, 0, 1, 0, 0)]), # MMC1 prg bank 5
+                               (4, [(0x8000, 0x06), (0x8001, 3), (0x8000, 0x02), (0x8001, 9), (0xA000, 1)])):
+            cartridge, bus = attach(make_image(mapper=mapper, prgBanks=8, chrBanks=2))
+            blob = cartridge.mapper.save_state()
+            before = [bus.read(address) for address in range(0x8000, 0x10000, 0x2000)], list(cartridge.mapper.chrSlots)
+            for address, data in writes:
+                bus.write(address, data)
+            after = [bus.read(address) for address in range(0x8000, 0x10000, 0x2000)], list(cartridge.mapper.chrSlots)
+            self.assertNotEqual(before, after, mapper)
+            switched = []
+            cartridge.mapper.listeners.append(switched.append)
+            changed = cartridge.mapper.save_state()
+            cartridge.mapper.load_state(blob)
+            self.assertEqual(([bus.read(address) for address in range(0x8000, 0x10000, 0x2000)],
+                              cartridge.mapper.chrSlots), before, mapper)
+            self.assertIn("prg", switched)
+            cartridge.mapper.load_state(changed)
+            self.assertEqual(cartridge.mapper.save_state(), changed)
+
+    def test_chr_ram(self):
+        emu = Emulation(self.paths[0])
+        if emu.ppu is None:
+            self.skipTest("ppu needs numpy")
+        blob = emu.save_state()
+        emu.ppu.vram_write(0x0000, 0xFF) # Row 0 of tile 0, low plane
+        self.assertEqual(emu.ppu.tileCache.update()[0, 0].tolist(), [1] * 8)
+        emu.load_state(blob)
+        self.assertEqual(emu.cartridge.chr[0], 0)
+        self.assertEqual(emu.ppu.tileCache.update()[0, 0].tolist(), [0] * 8)
+
+    def test_bad_states(self):
+        emu = Emulation(self.paths[0])
+        blob = emu.save_state()
+        other = make_rom([0x02])
+        self.paths.append(other)
+        for bad in (b"", b"XXXX" + blob[4:], blob[:4] + (VERSION + 1).to_bytes(2, "little") + blob[6:],
+                    blob[:HEADER.size + 20], Emulation(other).save_state()):
+            with self.assertRaises(ValueError):
+                emu.load_state(bad)
+        self.assertTrue(blob.startswith(MAGIC))
+        self.assertEqual(emu.save_state(), blob) # Nothing was touched by the failed loads
+
+    def test_fast(self):
+        emu = Emulation(self.paths[0])
+        emu.run_compiled(100000)
+        blob = emu.save_state()
+        start = time.perf_counter()
+        for _ in range(100):
+            emu.load_state(emu.save_state())
+        self.assertLess((time.perf_counter() - start) / 100, 0.001)
+        self.assertEqual(emu.save_state(), blob)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+from Emulation import Emulation
+from ppu import VBLANK_LINE, DOTS
+from scheduler import Scheduler, NEVER
+from testRoms import make_rom
+import os
+import unittest
+
+# LDY #0, LDX #0, INX, BNE -3, INY, CPY #30, BNE -9, halt. About 38000 cycles, past the first vblank
+LOOP = [0xA0, 0x00, 0xA2, 0x00, 0xE8, 0xD0, 0xFD, 0xC8, 0xC0, 0x1E, 0xD0, 0xF6, 0x02]
+
+
+class SchedulerTest(unittest.TestCase):
+    def test_order_and_next(self):
+        scheduler = Scheduler()
+        fired = []
+        self.assertEqual(scheduler.next, NEVER)
+        for cycle, name in ((30, "c"), (10, "a"), (20, "b"), (10, "a2")):
+            scheduler.schedule(cycle, lambda cycle, name=name: fired.append((cycle, name)), name)
+        self.assertEqual(scheduler.next, 10)
+        scheduler.run_due(15)
+        self.assertEqual(fired, [(10, "a"), (10, "a2")]) # Equal cycles fire in the order they were scheduled
+        self.assertEqual(scheduler.next, 20)
+        scheduler.run_due(100)
+        self.assertEqual([name for _, name in fired], ["a", "a2", "b", "c"])
+        self.assertEqual(scheduler.next, NEVER)
+        self.assertEqual(scheduler.fired, 4)
+
+    def test_cancel(self):
+        scheduler = Scheduler()
+        fired = []
+        first = scheduler.schedule(10, fired.append, "first")
+        scheduler.schedule(20, fired.append, "second")
+        scheduler.cancel(first)
+        self.assertEqual(scheduler.next, 20)
+        self.assertEqual(len(scheduler), 1)
+        self.assertEqual(scheduler.pending(), [(20, "second")])
+        scheduler.run_due(50)
+        self.assertEqual(fired, [20])
+
+    def test_callbacks_reschedule(self):
+        scheduler = Scheduler()
+        fired = []
+
+        def tick(cycle):
+            fired.append(cycle)
+            scheduler.schedule(cycle + 10, tick, "tick")
+        scheduler.schedule(10, tick, "tick")
+        scheduler.run_due(35) # Rescheduled events that are already due fire in the same call
+        self.assertEqual(fired, [10, 20, 30])
+        self.assertEqual(scheduler.next, 40)
+
+    def test_stop(self):
+        scheduler = Scheduler()
+        scheduler.schedule(10, lambda cycle: None)
+        scheduler.stop()
+        self.assertLess(scheduler.next, 0)
+        scheduler.run_due(0)
+        self.assertEqual(scheduler.next, 10)
+
+
+class EmulationEventTest(unittest.TestCase):
+    def setUp(self):
+        self.path = make_rom(LOOP)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_vblank_event_without_register_access(self):
+        for run in ("run_emu", "run_compiled"):
+            emu = Emulation(self.path)
+            if emu.ppu is None:
+                self.skipTest("ppu needs numpy")
+            getattr(emu, run)()
+            self.assertTrue(emu.halt)
+            self.assertGreater(emu.cycles, VBLANK_LINE * DOTS // 3)
+            # The program never touches the PPU, the vblank event alone brought it up to the start of vblank
+            self.assertEqual(emu.ppu.frames, 1, run)
+            self.assertEqual(emu.ppu.scanline, VBLANK_LINE, run)
+            self.assertIn("vblank", [name for _, name in emu.scheduler.pending()])
+
+    def test_resume_after_halt(self):
+        emu = Emulation(self.path)
+        emu.run_emu()
+        cycles = emu.cycles
+        emu.run_emu() # Still halted, nothing runs
+        self.assertEqual(emu.cycles, cycles)
+        emu.halt = False; emu.pgmctr = 0x8000 # The next run puts the deadline stop() pulled down back
+        emu.run_emu()
+        self.assertGreater(emu.cycles, 2 * cycles - 100)
+        self.assertEqual(emu.ppu.frames if emu.ppu is not None else 2, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
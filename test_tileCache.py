@@ -0,0 +1,66 @@
+from cartridge import Cartridge
+from memoryBus import MemoryBus
+from testRoms import make_image
+from tileCache import TileCache, decode
+import numpy as np
+import unittest
+
+
+def attach(image):
+    cartridge = Cartridge(image)
+    bus = MemoryBus()
+    cartridge.attach(bus)
+    return cartridge.mapper, bus
+
+
+class TileCacheTest(unittest.TestCase):
+    def test_decode(self):
+        raw = np.random.default_rng(0).integers(0, 256, (4, 16), dtype=np.uint8)
+        tiles = decode(raw)
+        for tile in range(4):
+            for row in range(8):
+                for column in range(8):
+                    value = raw[tile, row] >> 7 - column & 1 | (raw[tile, row + 8] >> 7 - column & 1) << 1
+                    assert tiles[tile, row, column] == value
+
+    def test_chr_ram_writes_dirty_one_tile(self):
+        mapper, bus = attach(make_image(chrBanks=0))
+        cache = TileCache(mapper)
+        cache.update()
+        assert cache.decoded == 512 and not cache.tiles.any()
+        mapper.chr_write(0x1012, 0xFF) # Tile 0x101, row 2, low plane
+        cache.write(0x1012)
+        cache.update()
+        assert cache.decoded == 513
+        assert list(cache.tiles[0x101, 2]) == [1] * 8 and cache.tiles.sum() == 8
+
+    def test_bank_switch_dirties_changed_slots_only(self):
+        mapper, bus = attach(make_image(mapper=3, chrBanks=4)) # CNROM, whole 8K switches
+        cache = TileCache(mapper)
+        cache.update()
+        assert cache.decoded == 512
+        cache.update()
+        assert cache.decoded == 512 # Nothing dirty, nothing decoded
+        bus.write(0x8000, 1)
+        cache.bank_switched()
+        assert cache.dirty.all()
+        cache.update()
+        assert cache.decoded == 1024
+        expected = decode(np.frombuffer(mapper.chrPages[0], np.uint8).reshape(64, 16))
+        assert (cache.tiles[:64] == expected).all()
+        bus.write(0x8000, 0) # Back to a bank we've seen, copied from the per bank cache
+        cache.bank_switched()
+        cache.update()
+        assert cache.decoded == 1024
+
+    def test_mmc3_single_slot(self):
+        mapper, bus = attach(make_image(mapper=4, prgBanks=2, chrBanks=2))
+        cache = TileCache(mapper)
+        cache.update()
+        bus.write(0x8000, 2); bus.write(0x8001, 9) # R2, the 1K slot at 0x1000
+        cache.bank_switched()
+        assert list(np.flatnonzero(cache.dirty)) == list(range(0x100, 0x140))
+
+
+if __name__ == '__main__':
+    unittest.main()
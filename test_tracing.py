@@ -0,0 +1,138 @@
+from Emulation import Emulation
+from pathlib import Path
+from tracing import CSVTrace, BinaryTrace, RingTrace, TraceReader, open_trace
+from testRoms import temp_dir, temp_file
+import tracing
+import contextlib
+import csv
+import io
+import os
+import unittest
+
+ROM = "5_Instructions1.nes"
+
+
+class TracingTest(unittest.TestCase):
+    def test_csv_trace_keeps_old_layout(self):
+        emu = Emulation(ROM, debug=True)
+        log = io.StringIO()
+        emu.run_emu(log)
+        rows = list(csv.reader(io.StringIO(log.getvalue())))
+        assert rows[0] == ["Program Counter", "Op", "Reg A", "Reg X", "Reg Y", "Fstring"]
+        assert rows[1][:2] == ["0x8000", "0x4c"]
+        assert rows[-1][:2] == ["0x808b", "0x2"]
+        assert rows[-1][6] == "[2, 1, 253, 61, 52, 5, 83, 17, 144, 240, 112, 1]"
+
+    def test_untraced_matches_traced(self):
+        traced = Emulation(ROM, debug=True)
+        traced.run_emu(io.StringIO())
+        untraced = Emulation(ROM, debug=True)
+        untraced.run_emu()
+        assert (traced.pgmctr, traced.regA, traced.status, traced.cycles, traced.bus[0:0x800]) == \
+               (untraced.pgmctr, untraced.regA, untraced.status, untraced.cycles, untraced.bus[0:0x800])
+
+    def test_sink_from_constructor_and_binary(self):
+        path = temp_file(self)
+        sink = open_trace("binary", path)
+        emu = Emulation(ROM, debug=True, trace=sink)
+        emu.run_emu()
+        assert sink.file.closed # The end of the run closed it
+        sink.close()
+        assert os.path.getsize(path) == tracing.HEADER.size + 83 * tracing.RECORD.size
+        reader = TraceReader(path)
+        assert len(reader) == 83
+        assert reader[0][:2] == (0x8000, 0x4C)
+        assert reader[-1][:2] == (0x808B, 0x02)
+        assert reader[-1][7] == emu.cycles - 0 # Halt doesn't add cycles
+        reader.close()
+
+    def test_binary_converts_to_same_csv(self):
+        path = temp_file(self)
+        sink = BinaryTrace(path, window=(0, tracing.MEMORY_WINDOW))
+        Emulation(ROM, debug=True).run_emu(trace=sink)
+        sink.close()
+        converted = io.StringIO()
+        tracing.to_csv(path, converted)
+        original = io.StringIO()
+        Emulation(ROM, debug=True).run_emu(original)
+        assert converted.getvalue() == original.getvalue()
+
+    def test_binary_flushes_in_chunks(self):
+        path = temp_file(self)
+        sink = BinaryTrace(path)
+        emu = Emulation(ROM, debug=True)
+        for _ in range(tracing.CHUNK + 5):
+            sink.record(emu)
+        assert sink.count == tracing.CHUNK # One full chunk written, the rest still buffered
+        sink.close()
+        assert os.path.getsize(path) == tracing.HEADER.size + (tracing.CHUNK + 5) * tracing.RECORD.size
+
+    def test_ring_keeps_last_n(self):
+        ring = RingTrace(8)
+        emu = Emulation(ROM, debug=True)
+        emu.run_emu(trace=ring)
+        records = ring.records()
+        assert len(ring) == len(records) == 8
+        assert records[-1][0] == 0x808b
+        assert [record[7] for record in records] == sorted(record[7] for record in records) # Oldest first after wrapping
+        assert ring.dumped is None # Halting with $02 isn't an error
+        out = io.StringIO()
+        ring.dump_csv(out)
+        assert len(out.getvalue().splitlines()) == 9
+
+    def test_ring_dumps_on_illegal_opcode(self):
+        path = os.path.join(temp_dir(self), "crash.bin")
+        ring = RingTrace(4, dumpPath=path)
+        emu = Emulation(ROM, debug=True)
+        emu.bus[0x808b] = 0xFF # Swap the final halt for an illegal opcode
+        with contextlib.redirect_stdout(io.StringIO()):
+            emu.run_emu(trace=ring)
+        assert emu.error is not None
+        reader = TraceReader(path)
+        assert len(reader) == 4
+        assert reader[-1][:2] == (0x808b, 0xFF)
+        reader.close()
+
+    def test_ring_dumps_on_exception(self):
+        path = os.path.join(temp_dir(self), "crash.bin")
+        ring = RingTrace(16, dumpPath=path)
+        emu = Emulation(ROM, debug=True)
+        emu.bus[0x8000:0x8005] = [0xA9, 0x01, 0x8D, 0x00, 0x80] # LDA #1, STA $8000 (rom)
+        with self.assertRaises(MemoryError):
+            emu.run_emu(trace=ring)
+        assert ring.dumped == Path(path)
+        reader = TraceReader(path)
+        assert [record[1] for record in reader] == [0xA9, 0x8D]
+        reader.close()
+
+    def test_ring_dumps_from_every_run(self): # A ring given to __init__ hears about faults from runs without a sink
+        runs = {"run_compiled": lambda emu: emu.run_compiled(), "run_cycles": lambda emu: emu.run_cycles(10 ** 6),
+                "interpreted run_cycles": lambda emu: emu.run_cycles(10 ** 6, compiled=False),
+                "run_frames": lambda emu: emu.run_frames(10), "run_until": lambda emu: emu.run_until(0x9000),
+                "run_instructions": lambda emu: emu.run_instructions(100)}
+        faults = [([0xA9, 0x01, 0x8D, 0x00, 0x80], MemoryError, [0xA9, 0x8D]), # STA $8000 raises
+                  ([0xA9, 0x01, 0xFF], None, [0xA9, 0xFF])] # 0xFF halts with emu.error set
+        directory = temp_dir(self)
+        for name, run in runs.items():
+            for program, raised, recorded in faults:
+                path = os.path.join(directory, f"{name} {recorded[-1]}.bin")
+                ring = RingTrace(16, dumpPath=path)
+                emu = Emulation(ROM, debug=True, trace=ring)
+                emu.bus[0x8000:0x8000 + len(program)] = program
+                with contextlib.redirect_stdout(io.StringIO()):
+                    if raised is None:
+                        run(emu)
+                        assert emu.error is not None, name
+                    else:
+                        with self.assertRaises(raised):
+                            run(emu)
+                assert ring.dumped == Path(path) and os.path.exists(path), name
+                if name == "interpreted run_cycles": # The only one of these that records, compiled code doesn't
+                    assert [record[1] for record in ring.records()] == recorded
+                if raised is None:
+                    ring.dumped = None
+                    run(emu)
+                    assert ring.dumped is None, name # The error left over from the last run isn't dumped again
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import numpy as np
+
+# Decoded pattern tables. All 512 tiles of the 8K the PPU can see are kept as 8x8 arrays of pixel values (0-3) in one
+# (512, 8, 8) array, so the renderers index tiles instead of unpacking bitplanes every line
+# Tiles are only decoded again when they're dirty: a chr ram write dirties its tile, a bank switch dirties the 64 tiles
+# of every 1K slot that now shows a different bank. Decoded chr rom banks are also kept per bank, so flipping between
+# banks (animated backgrounds, MMC3 sprite banks) only costs a copy after the first time
+
+TILES = 512
+SLOT_TILES = 64 # Tiles per 1K slot
+
+
+def decode(raw): # (tiles, 16) bytes, two bitplanes of 8 rows each -> (tiles, 8, 8) pixel values
+    planes = raw.reshape(-1, 2, 8)
+    return np.unpackbits(planes[:, 0], axis=1).reshape(-1, 8, 8) | \
+        np.unpackbits(planes[:, 1], axis=1).reshape(-1, 8, 8) << 1
+
+
+class TileCache:
+    def __init__(self, mapper):
+        self.mapper = mapper
+        self.tiles = np.zeros((TILES, 8, 8), np.uint8)
+        self.dirty = np.ones(TILES, bool)
+        self.anyDirty = True
+        self.slots = [None] * 8 # The bank view each slot was last decoded from
+        self.banks = {} # id of a chr rom bank view: its decoded tiles, chr ram changes under us so it's never kept
+        self.rom = not mapper.cartridge.chrRam
+        self.decoded = 0 # Tiles decoded so far, for tests and the profiler
+
+    def bank_switched(self): # Dirty the slots that are showing a different bank than last time
+        for slot, page in enumerate(self.mapper.chrPages):
+            if page is not self.slots[slot]:
+                self.dirty[slot * SLOT_TILES:(slot + 1) * SLOT_TILES] = True
+                self.anyDirty = True
+
+    def invalidate(self): # Every tile, for when chr ram was replaced wholesale (save states)
+        self.dirty[:] = True
+        self.anyDirty = True
+
+    def write(self, address): # chr ram write at a pattern table address
+        self.dirty[address >> 4 & 0x1FF] = True
+        self.anyDirty = True
+
+    def update(self): # Decode whatever is dirty, call before rendering
+        if not self.anyDirty:
+            return self.tiles
+        for slot, page in enumerate(self.mapper.chrPages):
+            first = slot * SLOT_TILES
+            dirty = self.dirty[first:first + SLOT_TILES]
+            if not dirty.any():
+                continue
+            raw = np.frombuffer(page, np.uint8).reshape(SLOT_TILES, 16)
+            if self.rom:
+                tiles = self.banks.get(id(page))
+                if tiles is None:
+                    tiles = self.banks[id(page)] = decode(raw)
+                    self.decoded += SLOT_TILES
+                self.tiles[first:first + SLOT_TILES] = tiles
+            else:
+                changed = np.flatnonzero(dirty)
+                self.tiles[first + changed] = decode(raw[changed])
+                self.decoded += len(changed)
+            self.slots[slot] = page
+            dirty[:] = False
+        self.anyDirty = False
+        return self.tiles
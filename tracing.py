@@ -0,0 +1,229 @@
+from customTypes import *
+from pathlib import Path
+import argparse
+import csv
+import datetime
+import mmap
+import struct
+
+# Per instruction trace sinks for run_emu. A sink gets begin(emu) once before the run, record(emu) before every
+# instruction (pgmctr pointing at the opcode, opcode already fetched) and end(emu) once the run stops. fault(emu, error)
+# comes before end when the run stopped because something went wrong
+# Runs without a sink don't go through any of this, run_emu uses a separate loop with no tracing in it at all
+
+MEMORY_WINDOW = 0x0C # How much of the bottom of ram the csv trace shows every row
+
+
+class TraceSink:
+    def begin(self, emu):
+        pass
+
+    def record(self, emu):
+        pass
+
+    def end(self, emu):
+        pass
+
+    def fault(self, emu, error): # The run stopped on an error, either an exception or emu.error from a halt
+        pass
+
+
+class CSVTrace(TraceSink): # The original human readable trace, one row per instruction
+    HEADER = ["Program Counter", "Op", "Reg A", "Reg X", "Reg Y", "Fstring"]
+
+    def __init__(self, log):
+        self.writer = csv.writer(log)
+
+    def begin(self, emu):
+        self.writer.writerow(self.HEADER)
+
+    def record(self, emu):
+        self.writer.writerow([hex(emu.pgmctr), hex(emu.opcode), hex(emu.regA), hex(emu.regX), hex(emu.regY),
+                              FSTRINGS[emu.status], list(emu.bus.ram[0:MEMORY_WINDOW])])
+
+
+# <editor-fold desc="Binary trace format">
+# File layout: a 16 byte header, then fixed width little endian records one after another so record n is at
+# HEADER.size + n * record size and can be read without touching anything before it
+#   header: magic b"NEST", version (B), window length (B), window start (H), record size (H), 6 reserved bytes
+#   record: pc (H), opcode (B), A (B), X (B), Y (B), P (B), SP (B), cycles (Q), then window length bytes of memory
+TRACE_MAGIC = b"NEST"
+TRACE_VERSION = 1
+HEADER = struct.Struct("<4sBBHH6x")
+RECORD = struct.Struct("<HBBBBBBQ")
+CHUNK = 0x10000 # Records buffered between writes
+
+
+class BinaryTrace(TraceSink): # Packs records into a preallocated buffer and writes it out a chunk at a time
+    def __init__(self, path, window=None): # window=(start, length) of memory to copy into every record
+        self.windowStart, self.windowLength = window or (0, 0)
+        self.recordSize = RECORD.size + self.windowLength
+        self.buffer = bytearray(self.recordSize * CHUNK)
+        self.view = memoryview(self.buffer)
+        self.offset = 0
+        self.limit = len(self.buffer)
+        self.count = 0
+        self.pack = RECORD.pack_into
+        self.windowSource = None
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(TRACE_MAGIC, TRACE_VERSION, self.windowLength, self.windowStart,
+                                    self.recordSize))
+
+    def begin(self, emu):
+        if self.file.closed: # An earlier run ended and closed it, this run's records go on the end
+            self.file = open(self.path, "ab")
+        if self.windowLength:
+            self.record = self.record_window # Pick the version of record once instead of checking every call
+            if self.windowStart + self.windowLength <= 0x800: # Windows in ram get copied straight out of it
+                self.windowSource = emu.bus.ram
+
+    def record(self, emu):
+        offset = self.offset
+        self.pack(self.buffer, offset, emu.pgmctr, emu.opcode, emu.regA, emu.regX, emu.regY, emu.status,
+                  emu.stackptr & 0xFF, emu.cycles)
+        self.offset = offset = offset + self.recordSize
+        if offset == self.limit:
+            self.flush()
+
+    def record_window(self, emu):
+        offset = self.offset
+        self.pack(self.buffer, offset, emu.pgmctr, emu.opcode, emu.regA, emu.regX, emu.regY, emu.status,
+                  emu.stackptr & 0xFF, emu.cycles)
+        offset += RECORD.size
+        source = self.windowSource if self.windowSource is not None else emu.bus
+        self.buffer[offset:offset + self.windowLength] = source[self.windowStart:self.windowStart + self.windowLength]
+        self.offset = offset = offset + self.windowLength
+        if offset == self.limit:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.view[:self.offset])
+        self.count += self.offset // self.recordSize
+        self.offset = 0
+
+    def end(self, emu): # Closed at the end of every run, so the file isn't held open (or locked, on Windows) after it
+        self.close()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+class TraceReader: # Random access to a binary trace through mmap, reader[n] is record n
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.windowLength, self.windowStart, self.recordSize = HEADER.unpack_from(self.map, 0)
+        if magic != TRACE_MAGIC or version != TRACE_VERSION:
+            raise ValueError(f"{path} is not a version {TRACE_VERSION} binary trace")
+
+    def __len__(self):
+        return (len(self.map) - HEADER.size) // self.recordSize
+
+    def __getitem__(self, n): # (pc, opcode, A, X, Y, P, SP, cycles, window bytes)
+        if n < 0:
+            n += len(self)
+        if not 0 <= n < len(self):
+            raise IndexError(n)
+        offset = HEADER.size + n * self.recordSize
+        return RECORD.unpack_from(self.map, offset) + \
+            (bytes(self.map[offset + RECORD.size:offset + self.recordSize]),)
+
+    def __iter__(self):
+        for n in range(len(self)):
+            yield self[n]
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+def to_csv(path, log): # Convert a binary trace to the same csv layout CSVTrace writes
+    reader = TraceReader(path)
+    writer = csv.writer(log)
+    writer.writerow(CSVTrace.HEADER)
+    for pc, opcode, a, x, y, p, sp, cycles, window in reader:
+        writer.writerow([hex(pc), hex(opcode), hex(a), hex(x), hex(y), FSTRINGS[p], list(window)])
+    reader.close()
+# </editor-fold>
+
+
+class RingTrace(TraceSink): # Keeps the last size instructions as packed records in a preallocated buffer
+    # Costs one pack_into per instruction and never grows. If the run dies (an exception out of an op, or a halt with
+    # emu.error set, like an illegal opcode) the ring gets dumped to dumpPath in the binary trace format, oldest
+    # record first, so TraceReader and to_csv work on crash dumps too
+    # Given to Emulation(trace=...) it hears about faults from every run loop, compiled and bounded runs included. Only
+    # the interpreted ones record, after a compiled run the dump holds what the ring last saw
+    def __init__(self, size=1024, dumpPath=None):
+        self.size = size
+        self.buffer = bytearray(RECORD.size * size)
+        self.offset = 0
+        self.limit = len(self.buffer)
+        self.wrapped = False
+        self.pack = RECORD.pack_into
+        self.dumpPath = dumpPath
+        self.dumped = None # Where the last crash dump went
+
+    def record(self, emu):
+        offset = self.offset
+        self.pack(self.buffer, offset, emu.pgmctr, emu.opcode, emu.regA, emu.regX, emu.regY, emu.status,
+                  emu.stackptr & 0xFF, emu.cycles)
+        offset += RECORD.size
+        if offset == self.limit:
+            offset = 0
+            self.wrapped = True
+        self.offset = offset
+
+    def __len__(self):
+        return self.size if self.wrapped else self.offset // RECORD.size
+
+    def records(self): # Unpacked records, oldest first
+        data = self.ordered()
+        return [RECORD.unpack_from(data, offset) for offset in range(0, len(data), RECORD.size)]
+
+    def ordered(self):
+        if self.wrapped:
+            return self.buffer[self.offset:] + self.buffer[:self.offset]
+        return self.buffer[:self.offset]
+
+    def fault(self, emu, error): # Returns where the dump went, dumped keeps it too
+        path = self.dumpPath or Path(f"logs/crash-{datetime.datetime.now().strftime('%Y-%m-%d.%H.%M.%S')}.bin")
+        self.dumped = self.dump(path)
+        return self.dumped
+
+    def dump(self, path): # Write the ring out as a binary trace
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("wb") as file:
+            file.write(HEADER.pack(TRACE_MAGIC, TRACE_VERSION, 0, 0, RECORD.size))
+            file.write(self.ordered())
+        return path
+
+    def dump_csv(self, log): # Same thing as csv, with the stack pointer and cycles on the end
+        writer = csv.writer(log)
+        writer.writerow(CSVTrace.HEADER + ["Stack Pointer", "Cycles"])
+        for pc, opcode, a, x, y, p, sp, cycles in self.records():
+            writer.writerow([hex(pc), hex(opcode), hex(a), hex(x), hex(y), FSTRINGS[p], hex(sp), cycles])
+
+
+SINKS = {"none": None, "csv": CSVTrace, "binary": BinaryTrace, "ring": RingTrace}
+
+
+def open_trace(kind, *args, **kwargs): # open_trace("csv", log), open_trace("binary", path), open_trace("ring", 4096)
+    sink = SINKS[kind]
+    return sink(*args, **kwargs) if sink is not None else None
+
+
+def main(): # python tracing.py trace.bin trace.csv
+    parser = argparse.ArgumentParser(description="Convert a binary trace to csv")
+    parser.add_argument("trace")
+    parser.add_argument("csv")
+    args = parser.parse_args()
+    with open(args.csv, "w", newline="") as log:
+        to_csv(args.trace, log)
+
+
+if __name__ == '__main__':
+    main()